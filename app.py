@@ -6,15 +6,22 @@
 # =======================================================
 # IMPORTAÇÕES
 # =======================================================
+import functools
+import hashlib
+import hmac
 import json
 import os
+import random
+import time
 import traceback
-from datetime import datetime
+from datetime import datetime, timedelta
 import logging
 from dotenv import load_dotenv
 import uuid
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 import psycopg2  # pode ficar aqui para uso futuro (Render/Postgres)
 
+import click
 import google.generativeai as genai
 from flask import (
     Flask,
@@ -25,9 +32,12 @@ from flask import (
     url_for,
     jsonify,
     flash,
+    has_request_context,
+    Response,
 )
 from flask_session import Session
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect, text
 from flask_login import (
     LoginManager,
     UserMixin,
@@ -37,19 +47,21 @@ from flask_login import (
     current_user,
 )
 
-from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 
+from lumi import (
+    banco, busca_chat, catalogo, coalescencia, consumo_llm, cursos, estaticos, faq as faq_busca, feed_calendario,
+    exportacao, fragmentos, geracao, horarios, metricas, provisionamento, registro, respostas, retencao, senhas, telemetria, uploads,
+    vark,
+)
+
 load_dotenv()
 
 # =======================================================
 # CONFIGURAÇÃO DA APLICAÇÃO FLASK
 # =======================================================
-logging.basicConfig(
-    filename="lumi.log",
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-)
+# Logging não bloqueante: fila + thread de escrita, JSON, rotação com gzip
+registro.configurar_logging()
 logging.info("Servidor iniciado - monitorando eventos Lumi")
 
 app = Flask(__name__)
@@ -58,6 +70,9 @@ app = Flask(__name__)
 # em vez de tentar enfiar tudo no cookie do navegador.
 app.config["SESSION_PERMANENT"] = False
 app.config["SESSION_TYPE"] = "filesystem"
+app.config["SESSION_FILE_DIR"] = os.environ.get(
+    "LUMI_SESSION_DIR", os.path.join(os.getcwd(), "flask_session")
+)
 Session(app)
 # --- FIM DA CONFIGURAÇÃO NOVA ---
 app.secret_key = os.environ.get(
@@ -77,26 +92,322 @@ else:
     )
 
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+# Pool e timeouts do Postgres, WAL no SQLite (ver lumi/banco.py)
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = banco.opcoes_engine(app.config["SQLALCHEMY_DATABASE_URI"])
 
 db = SQLAlchemy(app)
+banco.init_app(app, db)
+
+# --- ETags e compressão gzip/br (primeiro: a compressão roda por último) ---
+respostas.init_app(app)
+
+# --- Métricas por requisição (/metrics) e profiler amostral opcional ---
+arquivos_metricas = metricas.init_app(app, db)
+registro.init_app(app)
+
+# --- Arquivos estáticos com hash no nome, pré-comprimidos e cache de 1 ano ---
+estaticos.init_app(app)
+
+# --- Snapshots binários dos dados acadêmicos (gerados por `flask data-compile`) ---
+PASTA_SNAPSHOTS = os.environ.get("LUMI_SNAPSHOT_DIR") or os.path.join(app.instance_path, "snapshots")
+catalogo.configurar_snapshots(None if PASTA_SNAPSHOTS == "off" else PASTA_SNAPSHOTS)
+
+# --- Templates: bytecode compilado em disco e cache de fragmentos ({% cache %}) ---
+PASTA_JINJA_CACHE = os.environ.get("LUMI_JINJA_CACHE_DIR") or os.path.join(app.instance_path, "jinja_cache")
+fragmentos.init_app(app, None if PASTA_JINJA_CACHE == "off" else PASTA_JINJA_CACHE)
 
 # --- Uploads ---
 UPLOAD_FOLDER = os.path.join(app.root_path, "static", "uploads")
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
-app.config["ALLOWED_EXTENSIONS"] = {"png", "jpg", "jpeg", "gif"}
+app.config["ALLOWED_EXTENSIONS"] = {"png", "jpg", "jpeg", "gif", "webp"}
 
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
+# Validação por magic bytes, WebP sem metadados e deduplicação por hash
+processador_uploads = uploads.init_app(app)
+
+# --- Hash de senhas (scrypt) num pool de processos, fora das threads do worker ---
+pool_senhas = senhas.init_app(app)
+
+# --- Fuso da faculdade (grade de horários, dias da telemetria de estudo) ---
+try:
+    FUSO_HORARIO = ZoneInfo(os.environ.get("LUMI_FUSO_HORARIO", "America/Sao_Paulo"))
+except ZoneInfoNotFoundError:
+    FUSO_HORARIO = None  # sem tzdata: usa o horário local do servidor
+
 
 @app.cli.command("db-create-all")
 def db_create_all():
     """Cria as tabelas do banco de dados (usado pelo Render ou local)."""
     with app.app_context():
         db.create_all()
+        with db.engine.begin() as conexao:
+            busca_chat.garantir_estrutura(conexao)
+            # Bancos anteriores aos cursos (lumi/cursos.py) não têm a coluna
+            if "curso" not in {c["name"] for c in inspect(conexao).get_columns("user")}:
+                conexao.execute(text('ALTER TABLE "user" ADD COLUMN curso VARCHAR(40)'))
+            # create_all não cria índices em tabelas que já existiam
+            conexao.execute(text("CREATE INDEX IF NOT EXISTS ix_user_flashcard_user_id ON user_flashcard (user_id)"))
         print("Banco de dados e tabelas criados com sucesso.")
 
 
+@app.cli.command("data-compile")
+def data_compile():
+    """Valida simulador/matriz/calendário e grava os snapshots binários."""
+    if PASTA_SNAPSHOTS == "off":
+        raise SystemExit("LUMI_SNAPSHOT_DIR=off: defina uma pasta para gravar os snapshots.")
+    resultados = [(None, catalogo.compilar(os.path.dirname(os.path.abspath(__file__)), PASTA_SNAPSHOTS))]
+    for curso in dados_cursos.listar():
+        pasta = os.path.join(dados_cursos.pasta_cursos, curso)
+        resultados.append((curso, catalogo.compilar(pasta, PASTA_SNAPSHOTS, curso=curso)))
+    falhas = 0
+    for curso, resultado in resultados:
+        for nome, erros in resultado.items():
+            rotulo = f"{curso}/{nome}" if curso else nome
+            if erros:
+                falhas += 1
+                print(f"❌ {rotulo}: {len(erros)} erro(s); snapshot não gerado.")
+                for erro in erros[:20]:
+                    print(f"   - {erro}")
+            else:
+                destino = catalogo.caminho_snapshot(catalogo.FONTES_POR_NOME[nome], PASTA_SNAPSHOTS, curso)
+                print(f"✅ {rotulo}: snapshot gravado em {destino}")
+    if falhas:
+        raise SystemExit(1)
+
+
+@app.cli.command("chat-reindex")
+def chat_reindex():
+    """Cria o índice de busca do chat (se faltar) e indexa todo o histórico."""
+    with app.app_context():
+        with db.engine.begin() as conexao:
+            busca_chat.reconstruir(conexao)
+        print("Índice de busca do histórico do chat reconstruído.")
+
+
+@app.cli.command("users-import")
+@click.argument("arquivo", type=click.File("r", encoding="utf-8-sig"))
+@click.option("--credenciais", type=click.Path(dir_okay=False),
+              help="CSV onde gravar as senhas geradas (obrigatório sem a coluna 'senha').")
+@click.option("--lote", default=1000, show_default=True, help="Alunos por INSERT.")
+@click.option("--processos", type=int, help="Processos para gerar os hashes (padrão: todas as CPUs).")
+@click.option("--simular", is_flag=True, help="Só valida e mostra o que seria feito.")
+def users_import(arquivo, credenciais, lote, processos, simular):
+    """Cadastra alunos de um CSV (matricula, email, cpf; nome, telefone, senha opcionais)."""
+    linhas, erros = provisionamento.ler_csv(arquivo)
+    with app.app_context():
+        with db.engine.connect() as conexao:
+            existentes = provisionamento.ja_cadastrados(conexao, User.__table__, linhas)
+        novas, ignoradas = provisionamento.separar_novos(linhas, existentes)
+        for numero, motivo in erros + ignoradas:
+            print(f"   linha {numero}: {motivo}")
+        print(f"{len(novas)} aluno(s) novo(s), {len(ignoradas)} já cadastrado(s), {len(erros)} linha(s) inválida(s).")
+        if simular or not novas:
+            return
+        geradas = provisionamento.definir_senhas(novas)
+        if geradas and not credenciais:
+            raise click.UsageError(f"{len(geradas)} aluno(s) sem senha no CSV: informe --credenciais.")
+
+        inicio = time.perf_counter()
+        hashes = senhas.gerar_hashes([linha["senha"] for linha in novas], processos)
+        print(f"Hashes gerados em {time.perf_counter() - inicio:.1f}s.")
+        registros = provisionamento.registros_usuarios(novas, hashes)
+        inseridos, conflitos = provisionamento.inserir(db.engine, User.__table__, registros, lote)
+    if geradas:
+        provisionamento.gravar_credenciais(credenciais, [l for l in geradas if l["matricula"] not in conflitos])
+        print(f"Senhas geradas gravadas em {credenciais}.")
+    for matricula in conflitos:
+        print(f"   matrícula {matricula}: cadastrada durante a importação, ignorada")
+    print(f"✅ {inseridos} aluno(s) cadastrado(s).")
+
+
+@app.cli.command("chat-archive")
+@click.option("--dias", type=int, help="Arquiva mensagens com mais de N dias (padrão: LUMI_CHAT_RETENCAO_DIAS).")
+def chat_archive(dias):
+    """Apaga o que o /limpar marcou e arquiva as mensagens antigas do chat."""
+    if dias is not None:
+        servico_retencao.dias = dias
+    if servico_retencao.dias <= 0:
+        raise click.UsageError("Retenção desligada: use --dias N.")
+    apagadas, arquivadas = servico_retencao.rodar_ciclo()
+    print(f"{apagadas} mensagem(ns) apagada(s), {arquivadas} arquivada(s).")
+
+
+@app.cli.command("telemetria-rollup")
+def telemetria_rollup():
+    """Recalcula estudo_diario a partir de todos os eventos de estudo."""
+    coletor.descarregar()
+    with app.app_context():
+        with db.engine.begin() as conexao:
+            total = coletor.reconstruir_diario(conexao)
+        print(f"{total} totais diários recalculados.")
+
+
+@app.cli.command("llm-custos")
+@click.option("--dias", default=7, show_default=True, help="Período do relatório.")
+@click.option("--curso", help="Seções do contexto deste curso (padrão: o da raiz).")
+def llm_custos(dias, curso):
+    """Consumo de tokens do LLM e o peso de cada seção do contexto no prompt."""
+    consumo.descarregar()
+    desde = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(days=dias)
+    with app.app_context():
+        with db.engine.connect() as conexao:
+            totais = consumo.totais(conexao, desde)
+            maiores = consumo.maiores_consumidores(conexao, desde)
+    chamadas = totais["chamadas"]
+    print(f"Últimos {dias} dia(s): {chamadas} chamada(s) ao LLM")
+    if chamadas:
+        print(f"  prompt {totais['prompt_tokens']} tokens ({totais['cached_tokens']} do cache), "
+              f"resposta {totais['output_tokens']} tokens, latência média {totais['latencia_ms'] / chamadas:.0f} ms")
+    # Preços opcionais em US$ por milhão de tokens
+    precos = [float(os.environ.get(f"LUMI_LLM_PRECO_{n}", "0")) for n in ("ENTRADA", "CACHE", "SAIDA")]
+    if chamadas and any(precos):
+        custo = ((totais["prompt_tokens"] - totais["cached_tokens"]) * precos[0]
+                 + totais["cached_tokens"] * precos[1] + totais["output_tokens"] * precos[2]) / 1e6
+        print(f"  custo estimado US$ {custo:.2f} (US$ {custo / chamadas * 1000:.2f} por mil perguntas)")
+
+    print(f"\n{'seção do prompt':<22}{'tokens/chamada':>16}{'% do prompt':>13}{'no período':>13}")
+    secoes = carregar_secoes_contexto(curso)
+    for nome, por_chamada, fracao, no_periodo in consumo_llm.custo_por_secao(secoes, totais):
+        print(f"{nome:<22}{por_chamada:>16}{fracao:>12.1f}%{no_periodo:>13}")
+
+    if maiores:
+        print("\nalunos com mais tokens:")
+        for user_id, n, tokens in maiores:
+            print(f"   user_id {user_id}: {tokens} tokens em {n} chamada(s)")
+
+
+@app.cli.command("llm-gerar")
+@click.option("--tipo", type=click.Choice(["todos", *geracao.TIPOS]), default="todos", show_default=True)
+@click.option("--disciplina", multiple=True, help="Só estas disciplinas (padrão: todas as da matriz).")
+@click.option("--curso", help="Matriz, questões e flashcards deste curso (padrão: os da raiz).")
+@click.option("--lotes", default=2, show_default=True, help="Pedidos ao modelo por disciplina e tipo.")
+@click.option("--por-pedido", default=5, show_default=True, help="Itens pedidos em cada chamada.")
+@click.option("--concorrencia", default=4, show_default=True, help="Chamadas ao modelo em paralelo.")
+@click.option("--por-minuto", default=30, show_default=True, help="Limite de chamadas por minuto (0 = sem limite).")
+@click.option("--limiar", default=0.6, show_default=True, help="Similaridade a partir da qual um item é repetido.")
+@click.option("--saida", default=os.path.join("instance", "geracao"), show_default=True,
+              help="Pasta dos resultados; a mesma pasta retoma uma geração interrompida.")
+def llm_gerar(tipo, disciplina, curso, lotes, por_pedido, concorrencia, por_minuto, limiar, saida):
+    """Gera questões do simulador e flashcards candidatos com o LLM (lumi/geracao.py)."""
+    if LLM_BACKEND == "fake":
+        chamar = geracao.ModeloGeracaoFake().gerar
+    else:
+        modelo = criar_modelo(geracao.INSTRUCAO_GERACAO)
+        if modelo is None:
+            raise click.ClickException("Modelo indisponível: configure GEMINI_API_KEY.")
+
+        def chamar(prompt):
+            return perguntar_ao_modelo(prompt, modelo).text
+
+    disciplinas = list(disciplina) or geracao.disciplinas_da_matriz(carregar_matriz(curso))
+    if not disciplinas:
+        raise click.ClickException("Nenhuma disciplina na matriz.")
+    lote = geracao.GeracaoLote(chamar, saida, concorrencia=concorrencia, por_minuto=por_minuto, limiar=limiar)
+    # O que já existe entra na deduplicação e nos exemplos do prompt
+    banco = carregar_banco_questoes(curso)
+    for pool in banco.pools if banco else ():
+        lote.conhecer("questoes", pool.disciplina, [q.to_dict() for q in pool.questoes])
+    decks = (carregar_dados_json("flashcards.json", curso) or {}).get("flash_cards", {})
+    for nome, cartas in decks.items():
+        lote.conhecer("flashcards", nome, [c for c in cartas if isinstance(c, dict) and c.get("pergunta")])
+
+    tipos = geracao.TIPOS if tipo == "todos" else (tipo,)
+    tarefas = lote.tarefas(disciplinas, tipos, lotes, por_pedido)
+
+    def progresso(tarefa, resumo):
+        feitas = len(lote.concluidas & {t.id for t in tarefas})
+        print(f"  [{feitas}/{len(tarefas)}] {tarefa.id}: {resumo['aceitos']} aceito(s) até agora")
+
+    resumo = lote.rodar(tarefas, progresso)
+    print(f"{resumo['tarefas']} tarefa(s), {resumo['puladas']} já concluída(s), {resumo['falhas']} com falha.")
+    print(f"{resumo['aceitos']} candidato(s) novo(s), {resumo['duplicados']} repetido(s), "
+          f"{resumo['invalidos']} inválido(s). Resultados em {saida}/")
+    if resumo["falhas"]:
+        raise SystemExit(1)
+
+
+@app.cli.command("users-export")
+@click.argument("pasta", type=click.Path(file_okay=False))
+@click.option("--curso", help="Só os alunos deste curso.")
+@click.option("--matricula", "matriculas", multiple=True, help="Só estes alunos (pode repetir).")
+@click.option("--concorrencia", default=4, show_default=True, help="Alunos exportados ao mesmo tempo.")
+def users_export(pasta, curso, matriculas, concorrencia):
+    """Grava um zip com os dados de cada aluno em PASTA (pula os já exportados)."""
+    with app.app_context():
+        consulta = db.select(User.id, User.matricula).order_by(User.id)
+        if curso:
+            consulta = consulta.where(User.curso == curso)
+        if matriculas:
+            consulta = consulta.where(User.matricula.in_(matriculas))
+        alunos = [(user_id, secure_filename(matricula) or str(user_id))
+                  for user_id, matricula in db.session.execute(consulta)]
+        print(f"Exportando {len(alunos)} aluno(s) para {pasta}...")
+        resumo = exportador.exportar_varios(db.engine, alunos, pasta, concorrencia, progresso=print)
+    print(f"✅ {resumo['exportados']} exportado(s), {resumo['pulados']} já existente(s), "
+          f"{resumo['falhas']} falha(s); {resumo['bytes'] / 1e6:.1f} MB em {resumo['segundos']}s.")
+
+
+@app.cli.command("vark-rebuild")
+@click.option("--periodo", help="Período dos resultados antigos, sem data (padrão: o atual, ex. 2025.2).")
+def vark_rebuild(periodo):
+    """Copia os resultados VARK antigos para vark_resultado e refaz vark_coorte."""
+    periodo = periodo or turmas_vark.periodo_atual()
+    with app.app_context():
+        with db.engine.begin() as conexao:
+            ja_tem = set(conexao.execute(db.select(VarkResultado.user_id)).scalars())
+            novos = []
+            for user_id, curso, texto in conexao.execute(
+                db.select(User.id, User.curso, User.vark_scores_json).where(User.vark_scores_json.isnot(None))
+            ):
+                if user_id in ja_tem:
+                    continue
+                try:
+                    pontos = {letra: int(json.loads(texto)[letra]) for letra in vark.LETRAS}
+                except (ValueError, KeyError, TypeError):
+                    print(f"   user_id {user_id}: resultado VARK ilegível, ignorado")
+                    continue
+                novos.append({
+                    "user_id": user_id, "curso": curso or "", "periodo": periodo,
+                    "tipo_primario": vark.tipo_principal(pontos), "salvo_em": datetime.utcnow(),
+                    **{letra.lower(): pontos[letra] for letra in vark.LETRAS},
+                })
+            if novos:
+                conexao.execute(db.insert(VarkResultado), novos)
+            turmas = turmas_vark.reconstruir(conexao)
+    print(f"{len(novos)} resultado(s) antigo(s) copiado(s); {turmas} turma(s) recalculada(s).")
+
+
+@app.cli.command("calendar-broker")
+@click.option("--host", default="127.0.0.1", show_default=True)
+@click.option("--porta", default=6380, show_default=True, type=int)
+def calendar_broker(host, porta):
+    """Servidor pub/sub (protocolo do Redis) para o feed do calendário entre workers."""
+    servidor = feed_calendario.ServidorRESP((host, porta))
+    print(f"Broker do calendário em redis://{host}:{porta} (Ctrl+C para sair)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+@app.cli.command("templates-compile")
+def templates_compile():
+    """Compila todos os templates e grava o bytecode (instance/jinja_cache)."""
+    total = fragmentos.precompilar(app)
+    print(f"{total} templates compilados.")
+
+
+@app.cli.command("assets-build")
+def assets_build():
+    """Gera static/dist (hash, .gz/.br, WebP/AVIF e tamanhos reduzidos)."""
+    manifesto = estaticos.construir_manifesto(app.static_folder, forcar=True)
+    print(f"{manifesto['processados']} arquivos processados em static/dist.")
+
+
 # Configuração Flask-Login
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -131,6 +442,9 @@ class User(db.Model, UserMixin):
     vark_scores_json = db.Column(db.Text, nullable=True)
     vark_primary_type = db.Column(db.String(10), nullable=True)
 
+    # Curso/campus do aluno: escolhe os dados e o contexto do LLM (lumi/cursos.py)
+    curso = db.Column(db.String(40), nullable=True)
+
     # Imagem de perfil com default
     profile_image = db.Column(
         db.String(100), nullable=False, default="lumi-2.png"
@@ -145,12 +459,12 @@ class User(db.Model, UserMixin):
             return None
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = pool_senhas.gerar_hash(password)
 
     def check_password(self, password):
         if not self.password_hash:
             return False
-        return check_password_hash(self.password_hash, password)
+        return pool_senhas.verificar(self.password_hash, password)
 
     def __init__(
         self,
@@ -163,6 +477,7 @@ class User(db.Model, UserMixin):
         telefone=None,
         genero=None,
         etnia=None,
+        curso=None,
     ):
         # Aceita tanto `username` quanto `nome_completo` para compatibilidade
         if username:
@@ -179,11 +494,12 @@ class User(db.Model, UserMixin):
         self.telefone = telefone
         self.sexo = genero
         self.etnia = etnia
+        self.curso = curso
 
 
 class UserFlashcard(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
     materia = db.Column(db.String(100), nullable=False)  # Nome do "Deck"
     pergunta = db.Column(db.String(300), nullable=False)
     resposta = db.Column(db.String(500), nullable=False)
@@ -206,6 +522,154 @@ class ChatHistory(db.Model):
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
 
+# Índice de busca textual (FTS5 no SQLite, GIN no Postgres) criado junto com a tabela
+busca_chat.registrar_ddl(ChatHistory.__table__)
+
+
+class ChatArquivo(db.Model):
+    """Lote de mensagens antigas do chat, em JSON comprimido (ver lumi/retencao.py)."""
+    __tablename__ = "chat_arquivo"
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
+    inicio = db.Column(db.DateTime, nullable=False)  # primeira mensagem do lote
+    fim = db.Column(db.DateTime, nullable=False)  # última mensagem do lote
+    mensagens = db.Column(db.Integer, nullable=False)
+    codificacao = db.Column(db.String(8), nullable=False)  # "zstd" ou "gzip"
+    dados = db.Column(db.LargeBinary, nullable=False)
+    criado_em = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class ChatLimpeza(db.Model):
+    """Até qual mensagem o aluno limpou o chat (removidas aos poucos em segundo plano)."""
+    __tablename__ = "chat_limpeza"
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
+    ate_id = db.Column(db.Integer, nullable=False)
+
+
+# Mensagens antigas vão para chat_arquivo; /limpar apaga em lotes numa thread
+servico_retencao = retencao.init_app(
+    app, db, ChatHistory.__table__, ChatArquivo.__table__, ChatLimpeza.__table__
+)
+
+
+class EventoEstudo(db.Model):
+    """Evento bruto de estudo (só inteiros; ver lumi/telemetria.py)."""
+    __tablename__ = "evento_estudo"
+    __table_args__ = (db.Index("ix_evento_estudo_user_dia", "user_id", "dia"),)
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    dia = db.Column(db.Date, nullable=False)  # no fuso da faculdade
+    tipo = db.Column(db.SmallInteger, nullable=False)  # telemetria.FOCO, FLASHCARD, SIMULADOR
+    momento = db.Column(db.Integer, nullable=False)  # epoch em segundos
+    valor = db.Column(db.Integer, nullable=False)  # segundos de foco, cartas, acertos
+    extra = db.Column(db.Integer, nullable=False, default=0)  # sessão concluída, questões
+
+
+class EstudoDiario(db.Model):
+    """Totais de estudo por aluno e dia, mantidos pela thread da telemetria."""
+    __tablename__ = "estudo_diario"
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
+    dia = db.Column(db.Date, primary_key=True)
+    segundos_foco = db.Column(db.Integer, nullable=False, default=0)
+    sessoes_foco = db.Column(db.Integer, nullable=False, default=0)
+    sessoes_concluidas = db.Column(db.Integer, nullable=False, default=0)
+    flashcards_revisados = db.Column(db.Integer, nullable=False, default=0)
+    simulados = db.Column(db.Integer, nullable=False, default=0)
+    questoes = db.Column(db.Integer, nullable=False, default=0)
+    acertos = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Beacons do Modo Foco/flashcards e tentativas do simulador, gravados em lote
+coletor = telemetria.init_app(app, db, EventoEstudo.__table__, EstudoDiario.__table__, fuso=FUSO_HORARIO)
+
+
+class UsoLLM(db.Model):
+    """Uma chamada ao LLM: tokens e latência (só inteiros; ver lumi/consumo_llm.py)."""
+    __tablename__ = "uso_llm"
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    momento = db.Column(db.Integer, nullable=False)  # epoch em segundos
+    prompt_tokens = db.Column(db.Integer, nullable=False)  # system instruction + pergunta
+    cached_tokens = db.Column(db.Integer, nullable=False, default=0)  # parte do prompt vinda do cache
+    output_tokens = db.Column(db.Integer, nullable=False)
+    latencia_ms = db.Column(db.Integer, nullable=False)
+    estimado = db.Column(db.SmallInteger, nullable=False, default=0)  # 1 = sem usage_metadata
+
+
+class UsoLLMHora(db.Model):
+    """Totais de uso do LLM por hora (UTC) e aluno; base das cotas e relatórios."""
+    __tablename__ = "uso_llm_hora"
+    hora = db.Column(db.DateTime, primary_key=True)
+    user_id = db.Column(db.Integer, primary_key=True)
+    chamadas = db.Column(db.Integer, nullable=False, default=0)
+    prompt_tokens = db.Column(db.Integer, nullable=False, default=0)
+    cached_tokens = db.Column(db.Integer, nullable=False, default=0)
+    output_tokens = db.Column(db.Integer, nullable=False, default=0)
+    latencia_ms = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Tokens de cada chamada ao LLM, totais por hora e cotas diárias
+consumo = consumo_llm.init_app(app, db, UsoLLM.__table__, UsoLLMHora.__table__, fuso=FUSO_HORARIO)
+
+
+class CalendarioMudanca(db.Model):
+    """Mudança no calendário de um curso; o id é a versão do feed SSE (lumi/feed_calendario.py)."""
+    __tablename__ = "calendario_mudanca"
+    id = db.Column(db.Integer, primary_key=True)
+    curso = db.Column(db.String(40), nullable=True)  # None = calendário da raiz
+    acao = db.Column(db.String(10), nullable=False)  # added | updated | removed
+    evento_id = db.Column(db.String(64), nullable=False)
+    evento = db.Column(db.Text, nullable=True)  # JSON no formato do template; None em removed
+    momento = db.Column(db.Float, nullable=False)
+    __table_args__ = (db.Index("ix_calendario_mudanca_curso_id", "curso", "id"),)
+
+
+# Mudanças do calendário transmitidas por SSE às páginas abertas
+feed = feed_calendario.init_app(app, db, CalendarioMudanca.__table__)
+
+
+class VarkResultado(db.Model):
+    """Último resultado VARK de cada aluno, em colunas (ver lumi/vark.py)."""
+    __tablename__ = "vark_resultado"
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
+    curso = db.Column(db.String(40), nullable=False, default="")  # "" = sem curso
+    periodo = db.Column(db.String(7), nullable=False)  # período letivo em que foi salvo, "2025.2"
+    v = db.Column(db.SmallInteger, nullable=False)
+    a = db.Column(db.SmallInteger, nullable=False)
+    r = db.Column(db.SmallInteger, nullable=False)
+    k = db.Column(db.SmallInteger, nullable=False)
+    tipo_primario = db.Column(db.String(10), nullable=False)  # "V" ou, com empate, "V/K"
+    salvo_em = db.Column(db.DateTime, nullable=False)
+
+
+class VarkCoorte(db.Model):
+    """Totais VARK de uma turma (curso, período), atualizados a cada resultado salvo."""
+    __tablename__ = "vark_coorte"
+    curso = db.Column(db.String(40), primary_key=True)
+    periodo = db.Column(db.String(7), primary_key=True)
+    alunos = db.Column(db.Integer, nullable=False, default=0)
+    soma_v = db.Column(db.Integer, nullable=False, default=0)
+    soma_a = db.Column(db.Integer, nullable=False, default=0)
+    soma_r = db.Column(db.Integer, nullable=False, default=0)
+    soma_k = db.Column(db.Integer, nullable=False, default=0)
+    tipo_v = db.Column(db.Integer, nullable=False, default=0)
+    tipo_a = db.Column(db.Integer, nullable=False, default=0)
+    tipo_r = db.Column(db.Integer, nullable=False, default=0)
+    tipo_k = db.Column(db.Integer, nullable=False, default=0)
+    multimodal = db.Column(db.Integer, nullable=False, default=0)
+    atualizado_em = db.Column(db.Float, nullable=False)
+
+
+# Agregados VARK por turma para os painéis dos professores
+turmas_vark = vark.init_app(app, VarkResultado.__table__, VarkCoorte.__table__, fuso=FUSO_HORARIO)
+
+# Exportação dos dados do aluno em streaming (zip/NDJSON)
+exportador = exportacao.init_app(
+    app, User.__table__, VarkResultado.__table__, UserFlashcard.__table__, ChatHistory.__table__,
+    ChatArquivo.__table__, ChatLimpeza.__table__, EventoEstudo.__table__,
+)
+
+
 @login_manager.user_loader
 def load_user(user_id):
     if user_id is not None:
@@ -220,10 +684,43 @@ def load_user(user_id):
 # =======================================================
 # FUNÇÕES AUXILIARES DE JSON
 # =======================================================
-def carregar_dados_json(arquivo):
+CAMINHO_FAQ = os.path.join(os.path.dirname(__file__), "faq.json")
+CAMINHO_CALENDARIO = os.path.join(os.path.dirname(__file__), "calendario.json")
+CAMINHO_MATRIZ = os.path.join(os.path.dirname(__file__), "matriz.json")
+CAMINHO_SIMULADOR = os.path.join(os.path.dirname(__file__), "simulador.json")
+CAMINHO_FLASHCARDS = os.path.join(os.path.dirname(__file__), "flashcards.json")
+CAMINHO_VARK = os.path.join(os.path.dirname(__file__), "metodo_estudo.json")
+
+# Dados por curso (cursos/<curso>/), com a raiz como padrão e cache LRU limitado
+dados_cursos = cursos.init_app(app, os.path.dirname(os.path.abspath(__file__)))
+
+
+def curso_atual():
+    """Curso do aluno logado; None fora de uma requisição ou para quem não tem curso."""
+    if has_request_context() and current_user.is_authenticated:
+        return current_user.curso or None
+    return None
+
+
+def caminho_dados(arquivo, curso=None):
+    """Arquivo de dados do curso (padrão: o do aluno logado), ou o da raiz."""
+    return dados_cursos.caminho(curso or curso_atual(), arquivo)
+
+
+@app.template_global()
+def versao_dados(arquivo):
+    """Versão de um arquivo de dados, para chavear fragmentos em {% cache %}.
+
+    Inclui o caminho: cursos com arquivos próprios têm fragmentos e ETags próprios.
+    """
+    caminho = caminho_dados(arquivo)
+    return (os.path.relpath(caminho, dados_cursos.pasta_raiz), catalogo.versao(caminho))
+
+
+def carregar_dados_json(arquivo, curso=None):
     try:
-        caminho_arquivo = os.path.join(os.path.dirname(__file__), arquivo)
-        with open(caminho_arquivo, "r", encoding="utf-8") as f:
+        caminho_arquivo = caminho_dados(arquivo, curso)
+        with metricas.medir("json"), open(caminho_arquivo, "r", encoding="utf-8") as f:
             return json.load(f)
     except FileNotFoundError:
         print(f"AVISO: Arquivo {arquivo} não encontrado.")
@@ -238,10 +735,15 @@ def carregar_dados_json(arquivo):
 
 
 def salvar_dados_json(arquivo, dados):
+    """Grava o arquivo do curso do aluno logado (criando a versão do curso,
+    se ele ainda usava a da raiz)."""
     try:
-        caminho_arquivo = os.path.join(os.path.dirname(__file__), arquivo)
+        curso = curso_atual()
+        caminho_arquivo = dados_cursos.caminho_proprio(curso, arquivo)
+        os.makedirs(os.path.dirname(caminho_arquivo), exist_ok=True)
         with open(caminho_arquivo, "w", encoding="utf-8") as f:
             json.dump(dados, f, indent=2, ensure_ascii=False)
+        dados_cursos.invalidar(curso, arquivo)
         return True
     except Exception as e:
         print(f"ERRO: Falha ao salvar JSON em {arquivo}. Detalhe: {e}")
@@ -249,92 +751,41 @@ def salvar_dados_json(arquivo, dados):
         return False
 
 
-def carregar_calendario():
-    meses_map = {
-        1: "JAN",
-        2: "FEV",
-        3: "MAR",
-        4: "ABR",
-        5: "MAI",
-        6: "JUN",
-        7: "JUL",
-        8: "AGO",
-        9: "SET",
-        10: "OUT",
-        11: "NOV",
-        12: "DEZ",
-    }
-    eventos = []
-    dados = carregar_dados_json("calendario.json")
-    if dados is None:
-        print("AVISO: calendario.json não foi carregado. Retornando lista vazia.")
-        return []
-
-    if not isinstance(dados, list):
-        print("AVISO: calendario.json possui formato inválido. Esperada lista de eventos.")
-        return []
-
-    for item in dados:
-        if not isinstance(item, dict):
-            print(f"AVISO: Evento ignorado por formato inválido: {item}")
-            continue
-
-        data_inicio = item.get("data_inicio")
-        descricao = item.get("descricao", "Evento sem descrição")
-        data_fim = item.get("data_fim")
-        event_id = item.get("id", str(uuid.uuid4()))
-        event_type = item.get("type", "Outro")
-        event_description = item.get("description", "")
-
-        if not data_inicio:
-            print(f"AVISO: Evento sem data de início ignorado: {item}")
-            continue
+def carregar_calendario(curso=None):
+    """Eventos (lumi.catalogo.Evento) ordenados por data, em cache até o arquivo mudar."""
+    return dados_cursos.carregar(curso or curso_atual(), "calendario.json", catalogo.CALENDARIO)
 
-        try:
-            data_inicio_obj = datetime.strptime(data_inicio, "%Y-%m-%d")
-        except ValueError:
-            print(f"AVISO: Data de início inválida ignorada: {data_inicio}")
-            continue
-
-        data_fim_iso = None
-        if data_fim:
-            try:
-                data_fim_iso = datetime.strptime(
-                    data_fim, "%Y-%m-%d"
-                ).strftime("%Y-%m-%d")
-            except ValueError:
-                print(f"AVISO: Data final inválida ignorada: {data_fim}")
-
-        eventos.append(
-            {
-                "id": event_id,
-                "title": descricao,
-                "date": data_inicio,
-                "type": event_type,
-                "description": event_description,
-                "data_obj": data_inicio_obj,
-                "data_fim": data_fim_iso,
-                "mes_curto": meses_map.get(data_inicio_obj.month),
-            }
-        )
-    return sorted(eventos, key=lambda x: x["data_obj"])
 
+def carregar_matriz(curso=None):
+    return dados_cursos.carregar(curso or curso_atual(), "matriz.json", catalogo.MATRIZ)
 
-def carregar_matriz():
-    dados = carregar_dados_json("matriz.json")
-    if dados and isinstance(dados, list):
-        return dados
-    elif dados and isinstance(dados, dict):
-        print("AVISO: matriz.json em formato antigo (objeto único). Convertendo para lista.")
-        return [dados]
-    else:
-        print("AVISO: Falha ao carregar ou formato inválido para matriz.json.")
-        return None
+
+def carregar_banco_questoes(curso=None):
+    return dados_cursos.carregar(curso or curso_atual(), "simulador.json", catalogo.SIMULADOR)
 
 
-def carregar_quiz_vark():
-    return carregar_dados_json("metodo_estudo.json")
-def carregar_contexto_inicial():
+def _decks_do_json(dados):
+    if not dados:
+        return {}
+    return dados.get("flash_cards", dados)
+
+
+def carregar_decks_sistema(curso=None):
+    """Decks de flashcards.json (só leitura, em cache até o arquivo mudar)."""
+    return dados_cursos.carregar(curso or curso_atual(), "flashcards.json", _decks_do_json)
+
+
+def _quiz_do_json(dados):
+    return dados
+
+
+def carregar_quiz_vark(curso=None):
+    """Quiz VARK de metodo_estudo.json (só leitura, em cache até o arquivo mudar)."""
+    return dados_cursos.carregar(curso or curso_atual(), "metodo_estudo.json", _quiz_do_json)
+
+
+def carregar_secoes_contexto(curso=None):
+    """Seções do system instruction do curso (padrão: a raiz), em ordem: [(nome, texto)]."""
     contexto_base = ""
     contexto_calendario = ""
     contexto_matriz = ""
@@ -343,35 +794,35 @@ def carregar_contexto_inicial():
 
     # 1. Informações Base
     try:
-        with open("informacoes.txt", "r", encoding="utf-8") as f:
+        with open(dados_cursos.caminho(curso, "informacoes.txt"), "r", encoding="utf-8") as f:
             contexto_base = f.read()
     except Exception:
         contexto_base = "Você é a Lumi, assistente acadêmica da UniEVANGÉLICA."
 
     # 2. Calendário
     try:
-        eventos = carregar_calendario()
+        eventos = dados_cursos.carregar(curso, "calendario.json", catalogo.CALENDARIO)
         if eventos:
             contexto_calendario = "\n=== CALENDÁRIO ACADÊMICO ===\n"
             for e in eventos:
-                data_str = e["data_obj"].strftime("%d/%m/%Y")
-                contexto_calendario += f"- {data_str}: {e['title']}\n"
+                data_str = e.data_obj.strftime("%d/%m/%Y")
+                contexto_calendario += f"- {data_str}: {e.titulo}\n"
     except Exception: pass
 
     # 3. Matriz
     try:
-        matriz = carregar_matriz()
+        matriz = dados_cursos.carregar(curso, "matriz.json", catalogo.MATRIZ)
         if matriz:
             contexto_matriz = "\n=== MATRIZ CURRICULAR (Horários e Salas) ===\n"
             # Simplificando a matriz para gastar menos tokens
             for p in matriz:
-                for d in p.get("disciplinas", []):
-                    contexto_matriz += f"- {d.get('nome')}: {d.get('dia')} às {d.get('horario')} (Sala {d.get('sala')}, Prof. {d.get('professor')})\n"
+                for d in p.disciplinas:
+                    contexto_matriz += f"- {d.nome}: {d.dia} às {d.horario} (Sala {d.sala}, Prof. {d.professor})\n"
     except Exception: pass
 
     # 4. VARK
     try:
-        vark = carregar_quiz_vark()
+        vark = dados_cursos.carregar(curso, "metodo_estudo.json", _quiz_do_json)
         if vark and "resultados" in vark:
             contexto_vark = "\n=== GUIA VARK (Estilos de Aprendizagem) ===\n"
             for k, v in vark["resultados"].items():
@@ -380,7 +831,8 @@ def carregar_contexto_inicial():
 
     # 5. FLASHCARDS (Carrega aqui UMA VEZ, em vez de repetir no chat)
     try:
-        flash_data = carregar_dados_json("flashcards.json")
+        with open(dados_cursos.caminho(curso, "flashcards.json"), "r", encoding="utf-8") as f:
+            flash_data = json.load(f)
         if flash_data:
             contexto_flashcards = "\n=== BANCO DE FLASHCARDS (Use para estudar) ===\n"
             # Converte para string compacta
@@ -391,30 +843,167 @@ def carregar_contexto_inicial():
     data_hoje = datetime.now().strftime("%d/%m/%Y, %H:%M")
     instrucao_tempo = f"\n\nIMPORTANTE: A data e hora atual é {data_hoje}. Responda considerando esse momento presente.\n"
 
-    return contexto_base + instrucao_tempo + contexto_calendario + contexto_matriz + contexto_vark + contexto_flashcards
+    return [
+        ("informações base", contexto_base),
+        ("data atual", instrucao_tempo),
+        ("calendário", contexto_calendario),
+        ("matriz curricular", contexto_matriz),
+        ("guia VARK", contexto_vark),
+        ("flashcards", contexto_flashcards),
+    ]
+
+
+def carregar_contexto_inicial(curso=None):
+    return "".join(texto for _, texto in carregar_secoes_contexto(curso))
 
+# Carregados na importação: com `gunicorn --preload` os workers compartilham
+# esses objetos com o processo mestre em vez de cada um montar os seus.
+carregar_banco_questoes()
 CONTEXTO_INICIAL = carregar_contexto_inicial()
 
 # =======================================================
 # GEMINI - INICIALIZAÇÃO ÚNICA
 # =======================================================
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
+# "gemini" (padrão) ou "fake" (respostas locais, usado em testes e benchmarks)
+LLM_BACKEND = os.environ.get("LUMI_LLM_BACKEND", "gemini").lower()
 model = None
 
-if GEMINI_API_KEY:
+
+class RespostaFake:
+    def __init__(self, text):
+        self.text = text
+
+
+class ChatFake:
+    def __init__(self, modelo):
+        self.modelo = modelo
+
+    def send_message(self, texto):
+        self.modelo.chamadas += 1
+        return RespostaFake(f"[Lumi local] Você perguntou: {texto}")
+
+
+class ModeloFake:
+    """Imita a interface usada do GenerativeModel sem acessar a rede."""
+
+    def __init__(self, system_instruction=""):
+        self.system_instruction = system_instruction
+        self.chamadas = 0
+
+    def start_chat(self, history=None):
+        return ChatFake(self)
+
+
+def criar_modelo(system_instruction=None):
+    """Cria o modelo do chat (na importação e, de novo, em cada worker após o fork).
+
+    Com `system_instruction`, cria o modelo de um curso (ver contexto_do_curso).
+    """
+    if system_instruction is None:
+        system_instruction = CONTEXTO_INICIAL
+    if LLM_BACKEND == "fake":
+        print("🧪 Backend LLM local (fake) ativo.")
+        return ModeloFake(system_instruction=system_instruction)
+    if not GEMINI_API_KEY:
+        print("⚠️ API Key do Gemini não encontrada. O Chatbot não funcionará.")
+        return None
     try:
         genai.configure(api_key=GEMINI_API_KEY)
         # Aqui já usamos o contexto completo como system_instruction
-        model = genai.GenerativeModel(
+        modelo = genai.GenerativeModel(
             "gemini-2.5-flash",
-            system_instruction=CONTEXTO_INICIAL,
+            system_instruction=system_instruction,
         )
         print("✅ Modelo Gemini inicializado com system_instruction.")
+        return modelo
     except Exception as e:
         print(f"❌ Erro ao inicializar o modelo Gemini: {e}")
-        model = None
-else:
-    print("⚠️ API Key do Gemini não encontrada. O Chatbot não funcionará.")
+        return None
+
+
+model = criar_modelo()
+
+# Perguntas iguais ao mesmo tempo dividem uma chamada ao LLM (lumi/coalescencia.py).
+# A versão do contexto entra na chave: só compartilha quem faria o mesmo pedido.
+VERSAO_CONTEXTO = hashlib.sha256(CONTEXTO_INICIAL.encode("utf-8")).hexdigest()[:16]
+chamadas_llm = coalescencia.GrupoUnico(espera=float(os.environ.get("LUMI_COALESCER_ESPERA", "60")))
+
+
+# Arquivos que entram no system instruction (carregar_secoes_contexto)
+ARQUIVOS_CONTEXTO = ("informacoes.txt", "calendario.json", "matriz.json", "metodo_estudo.json", "flashcards.json")
+
+
+class ContextoLLM:
+    """System instruction de um curso, a versão dele e o modelo criado com ele."""
+
+    __slots__ = ("secoes", "texto", "versao", "modelo")
+
+    def __init__(self, secoes, texto, versao, modelo):
+        self.secoes = secoes
+        self.texto = texto
+        self.versao = versao
+        self.modelo = modelo
+
+
+def contexto_do_curso(curso=None):
+    """Contexto do LLM do curso (padrão: o do aluno logado).
+
+    Cursos sem arquivos próprios usam o contexto e o modelo da raiz; os
+    outros ficam no cache LRU de lumi/cursos.py, refeitos quando um dos
+    arquivos do contexto muda.
+    """
+    curso = curso or curso_atual()
+    caminhos = [dados_cursos.caminho(curso, arquivo) for arquivo in ARQUIVOS_CONTEXTO] if curso else []
+    if all(os.path.dirname(caminho) == dados_cursos.pasta_raiz for caminho in caminhos):
+        return ContextoLLM(None, CONTEXTO_INICIAL, VERSAO_CONTEXTO, model)
+
+    def construir():
+        secoes = carregar_secoes_contexto(curso)
+        texto = "".join(t for _, t in secoes)
+        versao = hashlib.sha256(texto.encode("utf-8")).hexdigest()[:16]
+        return ContextoLLM(secoes, texto, versao, criar_modelo(texto))
+
+    versao = tuple(catalogo.versao(caminho) for caminho in caminhos)
+    return dados_cursos.derivado(curso, "contexto", versao, construir)
+
+
+def perguntar_ao_modelo(texto, modelo=None):
+    chat_session = (modelo or model).start_chat(history=[])  # Pode passar histórico se quiser contexto
+    return chat_session.send_message(texto)
+
+
+def reiniciar_pos_fork():
+    """Recria, no worker, o que não pode ser herdado do processo mestre.
+
+    Chamado pelo gunicorn.conf.py (com preload_app) depois do fork. Os dados
+    imutáveis (catálogo, FAQ, CONTEXTO_INICIAL) continuam compartilhados; já
+    conexões, clientes de rede e threads pertencem ao mestre:
+    - conexões do pool do SQLAlchemy (descartadas sem fechar as do mestre);
+    - cliente do Gemini (canais gRPC/HTTP não sobrevivem ao fork);
+    - valores e arquivo das métricas (com LUMI_METRICS_DIR);
+    - thread de escrita do log, pool de threads dos uploads, pool de
+      processos das senhas, buffers da telemetria e do consumo do LLM,
+      thread de retenção do chat, chamadas ao LLM em andamento, os
+      modelos dos cursos (o cache de lumi/cursos.py é esvaziado) e as
+      conexões do broker do feed do calendário.
+    """
+    global model
+    registro.configurar_logging(por_processo=True)
+    if arquivos_metricas is not None:
+        arquivos_metricas.reiniciar()
+    with app.app_context():
+        db.engine.dispose(close=False)
+    processador_uploads.reiniciar()
+    pool_senhas.reiniciar()
+    coletor.reiniciar()
+    consumo.reiniciar()
+    dados_cursos.reiniciar()
+    servico_retencao.reiniciar()
+    chamadas_llm.reiniciar()
+    feed.reiniciar()
+    if LLM_BACKEND != "fake":
+        model = criar_modelo()
 
 
 # =======================================================
@@ -432,9 +1021,16 @@ def get_initial_chat_history():
     ]
 
 
+def consultar_historico(user_id):
+    """Mensagens do usuário, sem as que o /limpar já apagou (e ainda não foram removidas)."""
+    return ChatHistory.query.filter(
+        ChatHistory.user_id == user_id, ChatHistory.id > servico_retencao.limpo_ate(user_id)
+    )
+
+
 def carregar_historico_usuario(user_id):
     """Retorna uma lista de mensagens no formato esperado pelo Gemini."""
-    historico = ChatHistory.query.filter_by(user_id=user_id).order_by(ChatHistory.timestamp).all()
+    historico = consultar_historico(user_id).order_by(ChatHistory.timestamp).all()
     return [
         {"role": h.role, "parts": [h.content]}
         for h in historico
@@ -445,6 +1041,9 @@ def salvar_mensagem_no_banco(user_id, role, content):
     """Salva uma mensagem no histórico do usuário."""
     nova_msg = ChatHistory(user_id=user_id, role=role, content=content)
     db.session.add(nova_msg)
+    db.session.flush()
+    # Mantém o índice de busca em sincronia, na mesma transação
+    busca_chat.indexar(db.session, nova_msg)
     db.session.commit()
 
 
@@ -497,6 +1096,10 @@ def register():
             login_user(new_user)
             flash("Conta criada com sucesso! Você foi logado.", "success")
             return redirect(url_for("index"))
+        except senhas.ErroFilaSenhas as e:
+            db.session.rollback()
+            flash(str(e), "warning")
+            return render_template("register.html"), 503
         except Exception as e:
             db.session.rollback()
             print(f"Erro ao registrar usuário: {e}")
@@ -519,7 +1122,13 @@ def login():
             | (User.cpf == identifier)
         ).first()
 
-        if user and user.check_password(password):
+        try:
+            senha_ok = user is not None and user.check_password(password)
+        except senhas.ErroFilaSenhas as e:
+            flash(str(e), "warning")
+            return render_template("login.html"), 503
+
+        if senha_ok:
             login_user(user)
             flash("Login realizado com sucesso!", "success")
             return redirect(url_for("index"))
@@ -546,7 +1155,7 @@ def logout():
 @login_required
 def index():
     # 1. Busca o histórico no banco de dados
-    historico_db = ChatHistory.query.filter_by(user_id=current_user.id).order_by(ChatHistory.timestamp).all()
+    historico_db = consultar_historico(current_user.id).order_by(ChatHistory.timestamp).all()
     
     # 2. Formata para o jeito que o JavaScript do seu HTML entende (role + parts)
     historico_formatado = []
@@ -563,7 +1172,7 @@ def index():
 @login_required
 def chat():
     # Garante que o histórico inicial existe no banco para este usuário
-    historico_existente = ChatHistory.query.filter_by(user_id=current_user.id).first()
+    historico_existente = consultar_historico(current_user.id).first()
     if not historico_existente:
         # salva a mensagem inicial padrão no banco
         salvar_mensagem_no_banco(
@@ -574,37 +1183,48 @@ def chat():
         return render_template("index.html")
 
 
+def voltar_avatar_padrao(nome):
+    """Variantes de `nome` não foram geradas: quem aponta para ele volta ao avatar padrão."""
+    with app.app_context():
+        User.query.filter_by(profile_image=nome).update({"profile_image": "lumi-2.png"})
+        db.session.commit()
+
+
+processador_uploads.ao_falhar = voltar_avatar_padrao
+
+
+def remover_avatar_sem_uso(nome):
+    """Apaga um avatar antigo se nenhum outro usuário usa o mesmo arquivo."""
+    if not nome or nome == "lumi-2.png":
+        return
+    # A consulta roda dentro do lock do processador (junto com a remoção)
+    processador_uploads.remover(
+        nome, em_uso=lambda n: User.query.filter_by(profile_image=n).first() is not None
+    )
+
+
 @app.route("/profile", methods=["GET", "POST"])
 @login_required
 def profile():
     user = current_user
 
     if request.method == "POST":
+        novo_nome = None
         try:
-            # Upload da imagem
+            # Upload da imagem (processada em segundo plano)
+            imagem_antiga = None
             if "profile_pic" in request.files:
                 file = request.files["profile_pic"]
                 if file and file.filename != "" and allowed_file(file.filename):
-                    extension = file.filename.rsplit(".", 1)[1].lower()
-                    unique_filename = f"{uuid.uuid4()}.{extension}"
-                    save_path = os.path.join(
-                        app.config["UPLOAD_FOLDER"], unique_filename
-                    )
-                    file.save(save_path)
-
-                    if user.profile_image != "lumi-2.png":
-                        old_path = os.path.join(
-                            app.config["UPLOAD_FOLDER"], user.profile_image
-                        )
-                        if os.path.exists(old_path):
-                            try:
-                                os.remove(old_path)
-                            except Exception as e:
-                                print(
-                                    f"Aviso: Não foi possível remover o arquivo antigo: {e}"
-                                )
-
-                    user.profile_image = unique_filename
+                    try:
+                        novo_nome = processador_uploads.enviar(file.stream)
+                    except uploads.ErroUpload as e:
+                        flash(str(e), "danger")
+                        return redirect(url_for("profile"))
+
+                    if novo_nome != user.profile_image:
+                        imagem_antiga = user.profile_image
+                        user.profile_image = novo_nome
 
             novo_username = request.form.get("nome")
             novo_email = request.form.get("email")
@@ -628,6 +1248,13 @@ def profile():
             user.etnia = novo_etnia
 
             db.session.commit()
+            # O processamento pode ter falhado antes do commit acima
+            if imagem_antiga is not None and processador_uploads.falhou(user.profile_image):
+                user.profile_image = imagem_antiga
+                db.session.commit()
+                flash("Não foi possível processar a imagem enviada.", "danger")
+                return redirect(url_for("profile"))
+            remover_avatar_sem_uso(imagem_antiga)
 
             flash("Perfil atualizado com sucesso!", "success")
             return redirect(url_for("profile"))
@@ -637,33 +1264,61 @@ def profile():
             print(f"ERRO ao atualizar perfil: {e}")
             traceback.print_exc()
             flash(f"Ocorreu um erro ao atualizar: {e}", "danger")
+        finally:
+            if novo_nome is not None:
+                processador_uploads.liberar(novo_nome)
 
     return render_template("profile.html")
 
 
+def versao_pagina(*partes):
+    """Partes do ETag de uma página: os dados dela e o que o cabeçalho mostra do aluno."""
+    return (current_user.id, current_user.username, current_user.profile_image, *partes)
+
+
+def _versao_flashcards():
+    # Cartões do aluno só são criados (não há edição): quantidade e maior id
+    # mudam a cada gravação, e o índice em user_id responde sem ler o texto
+    quantos, ultimo = db.session.query(
+        db.func.count(UserFlashcard.id), db.func.max(UserFlashcard.id)
+    ).filter_by(user_id=current_user.id).one()
+    return versao_pagina(versao_dados("flashcards.json"), quantos, ultimo)
+
+
+def caminho_faq():
+    """faq.json do curso do aluno (ou o da raiz): o mesmo da página, da busca,
+    do atalho do chat e do ETag (versao_dados resolve pelo mesmo caminho_dados)."""
+    return caminho_dados("faq.json")
+
+
 @app.route("/faq")
 @login_required
+@respostas.condicional(lambda: versao_pagina(versao_dados("faq.json")))
 def faq():
-    dados = carregar_dados_json("faq.json") or []
+    # Os itens vêm do índice em memória (relido só quando faq.json muda)
+    dados = faq_busca.obter_indice(caminho_faq()).itens
     return render_template("faq.html", faq_data=dados)
 
 
 @app.route("/calendario")
 @login_required
+@respostas.condicional(lambda: versao_pagina(versao_dados("calendario.json")))
 def calendario():
-    eventos_data = carregar_calendario()
-    if not eventos_data:
+    # A versão do feed é lida antes dos eventos: no pior caso a página
+    # recebe de novo uma mudança que já mostra (o cliente aplica sem duplicar)
+    versao_feed = feed.versao_atual(curso_atual())
+    # O template converte os eventos para JSON dentro de um {% cache %}
+    eventos = carregar_calendario()
+    if not eventos:
         flash("Nenhum evento encontrado no calendário.", "info")
-    return render_template("calendario.html", eventos_data=eventos_data)
+    return render_template("calendario.html", eventos=eventos, versao_feed=versao_feed)
 
 
 @app.route("/flashcards")
 @login_required
+@respostas.condicional(_versao_flashcards)
 def flashcards():
-    dados_json = carregar_dados_json("flashcards.json")
-    system_decks = {}
-    if dados_json:
-        system_decks = dados_json.get("flash_cards", dados_json)
+    system_decks = carregar_decks_sistema()
 
     user_cards = UserFlashcard.query.filter_by(user_id=current_user.id).all()
     user_decks = {}
@@ -688,9 +1343,9 @@ def modo_foco():
 @app.route("/limpar")
 @login_required
 def limpar_chat():
-    # Apaga todo o histórico do usuário
-    ChatHistory.query.filter_by(user_id=current_user.id).delete()
-    db.session.commit()
+    # Esconde todo o histórico do usuário agora; as mensagens (e as entradas
+    # no índice de busca) são apagadas em lotes pela thread de retenção
+    servico_retencao.marcar_limpeza(current_user.id)
 
     # Recria a mensagem inicial de boas-vindas
     salvar_mensagem_no_banco(
@@ -735,11 +1390,57 @@ def metodo_de_estudo():
 @app.route("/simulador")
 @login_required
 def simulador():
-    simulador_data = carregar_dados_json("simulador.json")
+    simulador_data = carregar_banco_questoes()
     if simulador_data is None:
         flash("Erro ao carregar o simulado. Verifique o arquivo simulador.json.", "danger")
     return render_template("simulador.html", simulador_data=simulador_data)
 
+def selecionar_questoes_simulado(banco, quantidade, disciplina="todas"):
+    """Sorteia as questões do simulado a partir do banco (lumi.catalogo.BancoQuestoes).
+
+    Retorna (questoes, erro); em caso de erro, `questoes` é None.
+    """
+    if banco is None:
+        return None, "Arquivo simulador.json inválido."
+
+    # Filtrar pools por disciplina (prefixo do id das questões), se especificada
+    if disciplina != "todas" and not any(pool.pertence(disciplina) for pool in banco.pools):
+        return None, "Nenhuma questão encontrada para a disciplina selecionada."
+
+    todas_questoes = banco.questoes(disciplina)
+    if not todas_questoes:
+        return None, "Nenhuma questão encontrada em 'questions'."
+
+    # Seleciona a quantidade escolhida pelo usuário
+    num_questoes = min(quantidade, len(todas_questoes))
+    return random.sample(todas_questoes, num_questoes), None
+
+
+def corrigir_simulado(questoes, respostas):
+    """Compara as respostas marcadas com o gabarito das questões."""
+    acertos = 0
+    gabarito = []
+
+    for i, q in enumerate(questoes):
+        correta = q.correta
+        # Aceita tanto string "0", "1" quanto int 0, 1
+        marcada = respostas.get(str(i)) or respostas.get(i)
+
+        if marcada == correta:
+            acertos += 1
+
+        gabarito.append({
+            "numero": i + 1,
+            "correta": correta
+        })
+
+    return {
+        "acertos": acertos,
+        "total": len(questoes),
+        "gabarito": gabarito
+    }
+
+
 @app.route("/simulador/iniciar", methods=["POST"])
 @login_required
 def simulador_iniciar():
@@ -747,47 +1448,23 @@ def simulador_iniciar():
     quantidade_solicitada = data_request.get("quantidade", 10)
     disciplina_escolhida = data_request.get("disciplina", "todas")
     
-    data = carregar_dados_json("simulador.json")
-
-    if not data or "pools" not in data:
-        return jsonify({"erro": "Arquivo simulador.json inválido."}), 400
+    banco = carregar_banco_questoes()
 
-    # Filtrar pools por disciplina, se especificada
-    if disciplina_escolhida == "todas":
-        pools_filtrados = data["pools"]
-    else:
-        pools_filtrados = []
-        for pool in data["pools"]:
-            # Verifica se alguma questão no pool tem o prefixo da disciplina
-            questoes_pool = pool.get("questions", [])
-            if questoes_pool and questoes_pool[0].get("id", "").startswith(disciplina_escolhida):
-                pools_filtrados.append(pool)
-    
-    if not pools_filtrados:
-        return jsonify({"erro": "Nenhuma questão encontrada para a disciplina selecionada."}), 400
-
-    # Coletar todas as questões dos pools filtrados
-    todas_questoes = []
-    for pool in pools_filtrados:
-        todas_questoes.extend(pool.get("questions", []))
-
-    if not todas_questoes:
-        return jsonify({"erro": "Nenhuma questão encontrada em 'questions'."}), 400
-
-    import random
-    # Seleciona a quantidade escolhida pelo usuário
-    num_questoes = min(quantidade_solicitada, len(todas_questoes))
-    selecionadas = random.sample(todas_questoes, num_questoes)
+    selecionadas, erro = selecionar_questoes_simulado(
+        banco, quantidade_solicitada, disciplina_escolhida
+    )
+    if erro:
+        return jsonify({"erro": erro}), 400
 
-    # Salva as questões completas na sessão (com gabarito)
-    session["simulador_questoes"] = selecionadas
+    # Guarda só os ids na sessão; o gabarito fica no banco em memória
+    session["simulador_questoes"] = [q.id for q in selecionadas]
 
     # Envia ao frontend SEM o gabarito
     questoes_sem_gabarito = []
     for q in selecionadas:
         questoes_sem_gabarito.append({
-            "texto": q["stem"],
-            "alternativas": q["options"]
+            "texto": q.enunciado,
+            "alternativas": q.alternativas
         })
 
     return jsonify({"questoes": questoes_sem_gabarito})
@@ -798,32 +1475,20 @@ def simulador_resultado():
     data = request.get_json()
     respostas = data.get("respostas", {})
 
-    questoes = session.get("simulador_questoes", [])
+    banco = carregar_banco_questoes()
+    ids = [
+        # Sessões antigas guardavam a questão inteira
+        q.get("id") if isinstance(q, dict) else q
+        for q in session.get("simulador_questoes", [])
+    ]
+    questoes = [banco.por_id[i] for i in ids if banco is not None and i in banco.por_id]
 
     if not questoes:
         return jsonify({"erro": "Nenhuma questão encontrada na sessão."}), 400
 
-    acertos = 0
-    gabarito = []
-
-    for i, q in enumerate(questoes):
-        correta = q["correct"]
-        # Aceita tanto string "0", "1" quanto int 0, 1
-        marcada = respostas.get(str(i)) or respostas.get(i)
-
-        if marcada == correta:
-            acertos += 1
-
-        gabarito.append({
-            "numero": i + 1,
-            "correta": correta
-        })
-
-    return jsonify({
-        "acertos": acertos,
-        "total": len(questoes),
-        "gabarito": gabarito
-    })
+    resultado = corrigir_simulado(questoes, respostas)
+    coletor.registrar(current_user.id, "simulador", resultado["acertos"], resultado["total"])
+    return jsonify(resultado)
 # =======================================================
 # API: FLASHCARDS
 # =======================================================
@@ -887,13 +1552,40 @@ def ask():
     # (Isso garante que ela apareça quando recarregar)
     salvar_mensagem_no_banco(current_user.id, "user", user_text)
 
+    # Pergunta idêntica a uma do FAQ: responde direto, sem chamar o LLM
+    atalho = faq_busca.resposta_exata(caminho_faq(), user_text)
+    if atalho is not None:
+        posicao, model_text = atalho
+        registro.anotar(faq=posicao)
+        salvar_mensagem_no_banco(current_user.id, "model", model_text)
+        return jsonify({"resposta": model_text, "fonte": "faq"})
+
+    # Cota diária de tokens: só dicionários em memória (lumi/consumo_llm.py)
+    try:
+        consumo.conferir_cota(current_user.id)
+    except consumo_llm.CotaEsgotada as e:
+        salvar_mensagem_no_banco(current_user.id, "model", str(e))
+        return jsonify({"resposta": str(e), "cota": e.escopo}), 429
+
     try:
         # Lógica para gerar a resposta da Lumi
         # (Aqui mantive a lógica do Gemini que você já deve ter)
         # Se você usa outro método para 'chat', ajuste esta linha:
-        chat_session = model.start_chat(history=[]) # Pode passar histórico se quiser contexto
-        response = chat_session.send_message(user_text)
-        model_text = response.text
+        contexto = contexto_do_curso()
+        inicio = time.perf_counter()
+        with metricas.medir("llm"):
+            response, compartilhada = chamadas_llm.executar(
+                coalescencia.chave_pergunta(user_text, contexto.versao),
+                lambda: perguntar_ao_modelo(user_text, contexto.modelo),
+            )
+            model_text = response.text
+        if compartilhada:
+            # Os tokens ficam na conta de quem fez a chamada
+            registro.anotar(llm_compartilhada=True)
+        else:
+            uso = consumo_llm.medir_uso(response, contexto.texto + user_text, model_text)
+            consumo.registrar(current_user.id, uso, time.perf_counter() - inicio)
+            registro.anotar(llm_tokens=uso.prompt + uso.saida)
         
         # Se quiser formatar markdown para HTML no backend, pode fazer aqui,
         # mas geralmente mandamos o texto puro e o front resolve (ou usa filtro).
@@ -908,9 +1600,108 @@ def ask():
     salvar_mensagem_no_banco(current_user.id, "model", model_text)
 
     return jsonify({"resposta": model_text})
+
+
+@app.route("/api/llm/uso")
+@login_required
+def api_uso_llm():
+    """Tokens que o aluno já gastou hoje e quanto resta da cota."""
+    usado, _ = consumo.usado_hoje(current_user.id)
+    cota = consumo.cota_aluno or None
+    return jsonify({
+        "success": True,
+        "tokens_hoje": usado,
+        "cota": cota,
+        "restante": max(cota - usado, 0) if cota else None,
+    })
+# =======================================================
+# API: BUSCA NO FAQ
+# =======================================================
+@app.route("/api/faq/busca")
+@login_required
+def api_busca_faq():
+    consulta = request.args.get("q", "").strip()
+    if not consulta:
+        return jsonify({"success": False, "message": "Informe o termo de busca."}), 400
+    try:
+        limite = max(1, min(int(request.args.get("limite", faq_busca.LIMITE_PADRAO)), 50))
+    except ValueError:
+        limite = faq_busca.LIMITE_PADRAO
+
+    resultados = faq_busca.buscar(caminho_faq(), consulta, limite)
+    return jsonify({"success": True, "resultados": resultados})
+
+
+# =======================================================
+# API: BUSCA NO HISTÓRICO DO CHAT
+# =======================================================
+@app.route("/api/chat/busca")
+@login_required
+def api_busca_chat():
+    consulta = request.args.get("q", "").strip()
+    if not consulta:
+        return jsonify({"success": False, "message": "Informe o termo de busca."}), 400
+    try:
+        limite = int(request.args.get("limite", busca_chat.LIMITE_PADRAO))
+    except ValueError:
+        limite = busca_chat.LIMITE_PADRAO
+
+    resultados = busca_chat.buscar(
+        db.session, current_user.id, consulta, limite, depois_de=servico_retencao.limpo_ate(current_user.id)
+    )
+    return jsonify({"success": True, "resultados": resultados})
+
+
+@app.route("/api/chat/arquivo")
+@login_required
+def api_chat_arquivo():
+    """Lotes de mensagens antigas do aluno (metadados; abra com /api/chat/arquivo/<id>)."""
+    return jsonify({"success": True, "arquivos": servico_retencao.listar_arquivo(current_user.id)})
+
+
+@app.route("/api/chat/arquivo/<int:arquivo_id>")
+@login_required
+def api_chat_arquivo_mensagens(arquivo_id):
+    mensagens = servico_retencao.ler_arquivo(current_user.id, arquivo_id)
+    if mensagens is None:
+        return jsonify({"success": False, "message": "Arquivo não encontrado."}), 404
+    return jsonify({"success": True, "mensagens": mensagens})
+
+
 # =======================================================
 # API: VARK
 # =======================================================
+def _acesso_painel(view):
+    """Só painéis com o token de LUMI_PAINEL_TOKEN; sem ele definido, a rota fica fechada."""
+    @functools.wraps(view)
+    def envolvida(*args, **kwargs):
+        token = os.environ.get("LUMI_PAINEL_TOKEN")
+        if not token:
+            return jsonify({"erro": "Painel desativado: defina LUMI_PAINEL_TOKEN."}), 403
+        enviado = request.headers.get("Authorization", "").encode("utf-8")
+        if not hmac.compare_digest(enviado, f"Bearer {token}".encode("utf-8")):
+            return jsonify({"erro": "Token do painel inválido."}), 401
+        return view(*args, **kwargs)
+    return envolvida
+
+
+def _filtros_turmas():
+    return request.args.get("curso"), request.args.get("periodo")
+
+
+def _versao_turmas():
+    return (turmas_vark.resumo(lambda: db.engine.connect(), *_filtros_turmas())[0],)
+
+
+@app.route("/api/vark/turmas")
+@_acesso_painel
+@respostas.condicional(_versao_turmas, pagina=False)
+def vark_turmas():
+    """Distribuição dos tipos VARK e médias dos pontos por curso e período."""
+    _, dados = turmas_vark.resumo(lambda: db.engine.connect(), *_filtros_turmas())
+    return jsonify(dados)
+
+
 @app.route("/save_vark_result", methods=["POST"])
 @login_required
 def save_vark_result():
@@ -929,7 +1720,7 @@ def save_vark_result():
             400,
         )
     if not all(
-        k in scores and isinstance(scores[k], int) for k in ["V", "A", "R", "K"]
+        k in scores and isinstance(scores[k], int) and scores[k] >= 0 for k in ["V", "A", "R", "K"]
     ):
         return (
             jsonify(
@@ -949,6 +1740,8 @@ def save_vark_result():
         user = current_user
         user.vark_scores_json = json.dumps(scores)
         user.vark_primary_type = primary_type
+        # Colunas e totais da turma na mesma transação (lumi/vark.py)
+        turmas_vark.registrar(db.session, user.id, user.curso, scores)
         db.session.commit()
         return jsonify(
             {"success": True, "message": "Resultado salvo com sucesso."}
@@ -971,6 +1764,38 @@ def save_vark_result():
 # =======================================================
 # API: CALENDÁRIO
 # =======================================================
+def publicar_mudanca_calendario(acao, evento_id, evento=None):
+    """Registra no feed a mudança já gravada em calendario.json; None se falhar
+    (o arquivo vale: as outras páginas veem a mudança ao recarregar)."""
+    try:
+        return feed.registrar(curso_atual(), acao, evento_id, evento)
+    except Exception:
+        logging.exception("Falha ao registrar a mudança do calendário no feed")
+        return None
+
+
+@app.route("/api/calendario/mudancas")
+@login_required
+def calendario_mudancas():
+    """Stream SSE das mudanças do calendário do curso, a partir da versão
+    do cabeçalho Last-Event-ID ou de ?desde=."""
+    desde = request.headers.get("Last-Event-ID") or request.args.get("desde") or "0"
+    try:
+        desde = max(int(desde), 0)
+    except ValueError:
+        return jsonify({"erro": "Versão inválida."}), 400
+    if not feed.reservar():
+        return Response("Muitas conexões abertas.", status=503, headers={"Retry-After": "30"})
+    resposta = Response(
+        feed.transmitir(curso_atual(), desde),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # Libera ao fechar a resposta, mesmo que o corpo nunca seja lido
+    resposta.call_on_close(feed.liberar)
+    return resposta
+
+
 @app.route("/save_calendar_event", methods=["POST"])
 @login_required
 def save_calendar_event():
@@ -989,8 +1814,8 @@ def save_calendar_event():
         "description": data.get("description", ""),
     }
 
+    evento_encontrado = False
     if event_id:
-        evento_encontrado = False
         for i, evento in enumerate(eventos):
             if evento.get("id") == event_id:
                 eventos[i] = evento_salvo
@@ -1002,7 +1827,10 @@ def save_calendar_event():
         eventos.append(evento_salvo)
 
     if salvar_dados_json("calendario.json", eventos):
-        return jsonify({"success": True, "message": "Evento salvo com sucesso."})
+        mudanca = publicar_mudanca_calendario(
+            "updated" if evento_encontrado else "added", evento_salvo["id"], evento_salvo
+        )
+        return jsonify({"success": True, "message": "Evento salvo com sucesso.", "mudanca": mudanca})
     else:
         return (
             jsonify(
@@ -1038,7 +1866,8 @@ def delete_calendar_event():
         return jsonify({"success": False, "message": "Evento não encontrado."}), 404
 
     if salvar_dados_json("calendario.json", novos_eventos):
-        return jsonify({"success": True, "message": "Evento excluído com sucesso."})
+        mudanca = publicar_mudanca_calendario("removed", event_id)
+        return jsonify({"success": True, "message": "Evento excluído com sucesso.", "mudanca": mudanca})
     else:
         return (
             jsonify(
@@ -1051,16 +1880,174 @@ def delete_calendar_event():
         )
 
 
+# =======================================================
+# API: GRADE DE HORÁRIOS (matriz.json como intervalos, ver lumi/horarios.py)
+# =======================================================
+def carregar_grade(curso=None):
+    curso = curso or curso_atual()
+    matriz = carregar_matriz(curso)
+    if not dados_cursos.proprio(curso, "matriz.json"):
+        return horarios.obter_grade(matriz)
+    # Grade de um curso com matriz própria: no LRU dos cursos, junto com a matriz
+    versao = catalogo.versao(caminho_dados("matriz.json", curso))
+    return dados_cursos.derivado(curso, "grade", versao, lambda: horarios.GradeHorarios(matriz))
+
+
+def _momento_consulta():
+    """?momento=AAAA-MM-DDTHH:MM ou o instante atual no fuso da faculdade."""
+    texto = request.args.get("momento")
+    if not texto:
+        return datetime.now(FUSO_HORARIO)
+    return datetime.fromisoformat(texto)
+
+
+def _erro_horarios(mensagem):
+    return jsonify({"success": False, "message": mensagem}), 400
+
+
+@app.route("/api/horarios/agora")
+@login_required
+def api_horarios_agora():
+    try:
+        momento = _momento_consulta()
+    except ValueError:
+        return _erro_horarios("Parâmetro 'momento' inválido (use AAAA-MM-DDTHH:MM).")
+    periodo = request.args.get("periodo")
+    grade = carregar_grade()
+    proxima, inicio = grade.proxima(momento, periodo)
+    return jsonify({
+        "success": True,
+        "momento": momento.isoformat(timespec="minutes"),
+        "agora": [aula.to_dict() for aula in grade.em_andamento(momento, periodo)],
+        "proxima": dict(proxima.to_dict(), inicia_em=inicio.isoformat(timespec="minutes")) if proxima else None,
+    })
+
+
+@app.route("/api/horarios/sala")
+@login_required
+def api_horarios_sala():
+    sala = request.args.get("sala", "").strip()
+    if not sala:
+        return _erro_horarios("Informe a sala.")
+    try:
+        momento = _momento_consulta()
+    except ValueError:
+        return _erro_horarios("Parâmetro 'momento' inválido (use AAAA-MM-DDTHH:MM).")
+    args = request.args
+    dia = horarios.interpretar_dia(args["dia"]) if args.get("dia") else momento.weekday()
+    inicio = horarios.interpretar_hora(args["hora"]) if args.get("hora") else momento.hour * 60 + momento.minute
+    fim = horarios.interpretar_hora(args["ate"]) if args.get("ate") else None
+    if dia is None or inicio is None or (args.get("ate") and (fim is None or fim <= inicio)):
+        return _erro_horarios("Dia ou horário inválido (ex.: dia=segunda&hora=20h&ate=21h30).")
+    ocupada_por = carregar_grade().ocupacao_sala(sala, dia, inicio, fim)
+    return jsonify({
+        "success": True,
+        "sala": sala,
+        "dia": horarios.DIAS_SEMANA[dia],
+        "inicio": horarios.formatar_minutos(inicio),
+        "fim": horarios.formatar_minutos(fim) if fim is not None else None,
+        "livre": not ocupada_por,
+        "ocupada_por": [aula.to_dict() for aula in ocupada_por],
+    })
+
+
+@app.route("/api/horarios/conflitos")
+@login_required
+def api_horarios_conflitos():
+    grade = carregar_grade()
+    periodo = request.args.get("periodo")
+    nomes = [n for n in request.args.getlist("disciplina") if n.strip()]
+    if nomes:
+        aulas, desconhecidas = [], []
+        for nome in nomes:
+            encontradas = grade.aulas_da_disciplina(nome)
+            if periodo:
+                encontradas = [a for a in encontradas if a.periodo == horarios.normalizar_periodo(periodo)]
+            if not encontradas:
+                desconhecidas.append(nome)
+            aulas.extend(encontradas)
+        if desconhecidas:
+            return _erro_horarios(f"Disciplina(s) não encontrada(s): {', '.join(desconhecidas)}.")
+    elif periodo:
+        aulas = [a for a in grade.aulas + grade.sem_horario if a.periodo == horarios.normalizar_periodo(periodo)]
+    else:
+        return _erro_horarios("Informe 'disciplina' (uma ou mais vezes) ou 'periodo'.")
+    return jsonify({
+        "success": True,
+        "conflitos": [[a.to_dict(), b.to_dict()] for a, b in grade.conflitos(aulas)],
+        # Sem dia/horário interpretável: não dá para verificar
+        "sem_horario": [a.to_dict() for a in aulas if a.inicio is None],
+    })
+
+
+# =======================================================
+# API: TELEMETRIA DE ESTUDO (ver lumi/telemetria.py)
+# =======================================================
+@app.route("/api/telemetria", methods=["POST"])
+@login_required
+def api_telemetria():
+    # sendBeacon manda o JSON sem Content-Type de JSON
+    if (request.content_length or 0) > 64 * 1024:
+        return jsonify({"success": False, "message": "Lote grande demais."}), 413
+    dados = request.get_json(force=True, silent=True)
+    try:
+        eventos = dados.get("eventos") if isinstance(dados, dict) else None
+        aceitos, recusados = coletor.receber_lote(current_user.id, eventos)
+    except telemetria.ErroTelemetria as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    return jsonify({"success": True, "aceitos": aceitos, "recusados": recusados}), 202
+
+
+@app.route("/api/estudo/resumo")
+@login_required
+def api_estudo_resumo():
+    """Totais diários do aluno nos últimos `dias` (só estudo_diario)."""
+    dias = min(max(request.args.get("dias", 7, type=int), 1), 366)
+    hoje = datetime.now(FUSO_HORARIO).date()
+    desde = hoje - timedelta(days=dias - 1)
+    with db.engine.connect() as conexao:
+        linhas = {linha["dia"]: linha for linha in coletor.resumo(conexao, current_user.id, desde)}
+    serie, total = [], dict.fromkeys(telemetria.COLUNAS_DIARIO, 0)
+    for i in range(dias):
+        dia = desde + timedelta(days=i)
+        linha = linhas.get(dia, {})
+        valores = {c: linha.get(c, 0) for c in telemetria.COLUNAS_DIARIO}
+        for c, v in valores.items():
+            total[c] += v
+        serie.append(dict(valores, dia=dia.isoformat()))
+    return jsonify({"success": True, "dias": serie, "total": total})
+
+
 # =======================================================
 # API: SIMULADOR DE PROVAS
 # =======================================================
 @app.route("/api/simulador_config")
 @login_required
+@respostas.condicional(lambda: (versao_dados("simulador.json"),), pagina=False)
 def api_simulador_config():
-    simulador_data = carregar_dados_json("simulador.json")
-    if simulador_data is None:
+    banco = carregar_banco_questoes()
+    if banco is None:
         return jsonify({"success": False, "message": "Arquivo simulador.json não encontrado."}), 500
-    return jsonify({"success": True, "data": simulador_data})
+    # Sem `correct`/`feedback`: a correção é feita no servidor (/simulador/resultado)
+    return jsonify({"success": True, "data": banco.to_dict(gabarito=False)})
+
+
+# =======================================================
+# API: EXPORTAÇÃO DOS DADOS DO ALUNO (ver lumi/exportacao.py)
+# =======================================================
+@app.route("/api/exportar")
+@login_required
+def exportar_dados():
+    """Todos os dados do aluno logado, em zip (padrão) ou NDJSON, em streaming."""
+    formato = request.args.get("formato", "zip")
+    if formato not in exportacao.FORMATOS:
+        return jsonify({"erro": "Formato inválido: use zip ou ndjson."}), 400
+    nome = f"lumi-{secure_filename(current_user.matricula) or current_user.id}.{formato}"
+    return Response(
+        exportador.gerar(db.engine, current_user.id, formato),
+        mimetype="application/zip" if formato == "zip" else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{nome}"', "Cache-Control": "no-store"},
+    )
 
 
 # =======================================================
@@ -1086,6 +2073,8 @@ if __name__ == "__main__":
         with app.app_context():
             print("Criando tabelas do banco de dados (se não existirem)...")
             db.create_all()
+            with db.engine.begin() as conexao:
+                busca_chat.garantir_estrutura(conexao)
             print("Tabelas prontas.")
 
         print("Iniciando servidor Flask em http://127.0.0.1:5000")
@@ -0,0 +1,636 @@
+# =======================================================
+# BENCHMARKS – LUMI ASSISTENTE ACADÊMICA
+# =======================================================
+# Microbenchmarks dos carregadores de dados e da lógica do simulador,
+# e benchmarks ponta a ponta das rotas via test client do Flask com
+# usuários semeados (10, 1k e 100k mensagens/flashcards).
+#
+# Uso:
+#   python benchmarks/bench_lumi.py                  # tudo
+#   python benchmarks/bench_lumi.py --rapido         # sem o nível de 100k
+#   python benchmarks/bench_lumi.py -k calendario    # filtra por nome
+#   python benchmarks/bench_lumi.py --comparar benchmarks/resultados/<base>.json
+#
+# Os resultados são gravados em JSON (benchmarks/resultados/<commit>.json)
+# para comparar regressões entre commits.
+# =======================================================
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parents[1]
+PASTA_RESULTADOS = Path(__file__).resolve().parent / "resultados"
+
+NIVEIS_PADRAO = (10, 1_000, 100_000)
+NIVEIS_RAPIDOS = (10, 1_000)
+
+# Registro dos benchmarks: nome -> função que recebe o contexto e devolve
+# o callable a ser cronometrado (a preparação fica fora da medição).
+MICRO = {}
+E2E = {}
+
+
+def micro(nome):
+    def registrar(func):
+        MICRO[nome] = func
+        return func
+    return registrar
+
+
+def e2e(nome):
+    def registrar(func):
+        E2E[nome] = func
+        return func
+    return registrar
+
+
+# =======================================================
+# AMBIENTE
+# =======================================================
+def preparar_ambiente(pasta_tmp):
+    """Configura variáveis de ambiente ANTES de importar o app."""
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(pasta_tmp, "bench.db")
+    os.environ["LUMI_LLM_BACKEND"] = "fake"
+    os.environ["LUMI_LOG_ARQUIVO"] = os.path.join(pasta_tmp, "lumi.log")
+    os.environ["LUMI_SESSION_DIR"] = os.path.join(pasta_tmp, "sessoes")
+    os.chdir(RAIZ)
+    if str(RAIZ) not in sys.path:
+        sys.path.insert(0, str(RAIZ))
+
+
+def importar_app():
+    import app as lumi_app
+    return lumi_app
+
+
+def commit_atual():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, text=True
+        ).strip()
+    except Exception:
+        return "desconhecido"
+
+
+# =======================================================
+# MEDIÇÃO
+# =======================================================
+def medir(func, rodadas_min=5, tempo_min=0.5, rodadas_max=1000):
+    """Executa `func` repetidamente e devolve estatísticas em segundos."""
+    func()  # aquecimento
+    tempos = []
+    inicio = time.perf_counter()
+    while len(tempos) < rodadas_max:
+        t0 = time.perf_counter()
+        func()
+        tempos.append(time.perf_counter() - t0)
+        if len(tempos) >= rodadas_min and time.perf_counter() - inicio >= tempo_min:
+            break
+    return {
+        "rodadas": len(tempos),
+        "min": min(tempos),
+        "max": max(tempos),
+        "media": statistics.fmean(tempos),
+        "mediana": statistics.median(tempos),
+        "desvio": statistics.stdev(tempos) if len(tempos) > 1 else 0.0,
+    }
+
+
+# =======================================================
+# MICROBENCHMARKS
+# =======================================================
+@micro("carregar_calendario")
+def bench_carregar_calendario(ctx):
+    return ctx["app"].carregar_calendario
+
+
+@micro("carregar_contexto_inicial")
+def bench_carregar_contexto_inicial(ctx):
+    return ctx["app"].carregar_contexto_inicial
+
+
+@micro("carregar_dados_json_simulador")
+def bench_carregar_simulador(ctx):
+    lumi_app = ctx["app"]
+    return lambda: lumi_app.carregar_dados_json("simulador.json")
+
+
+@micro("construir_banco_questoes")
+def bench_construir_banco(ctx):
+    """Montagem dos objetos do simulador a partir do JSON já lido."""
+    from lumi import catalogo
+
+    dados = ctx["app"].carregar_dados_json("simulador.json")
+    return lambda: catalogo.construir_banco(dados)
+
+
+@micro("construir_calendario")
+def bench_construir_calendario(ctx):
+    from lumi import catalogo
+
+    dados = ctx["app"].carregar_dados_json("calendario.json")
+    return lambda: catalogo.construir_calendario(dados)
+
+
+TEMPLATES_GRANDES = ("calendario.html", "flashcards.html", "metodo_de_estudo.html")
+
+
+@micro("templates_compilacao")
+def bench_templates_compilacao(ctx):
+    """Compilação dos maiores templates, como num worker novo sem bytecode."""
+    ambiente = ctx["app"].app.jinja_env.overlay(cache_size=0, bytecode_cache=None)
+    return lambda: [ambiente.get_template(nome) for nome in TEMPLATES_GRANDES]
+
+
+@micro("templates_bytecode")
+def bench_templates_bytecode(ctx):
+    """Os mesmos templates lidos do bytecode cache em disco."""
+    from jinja2 import FileSystemBytecodeCache
+
+    pasta = ctx["jinja_cache"] = tempfile.TemporaryDirectory(prefix="lumi-bench-jinja-")
+    ambiente = ctx["app"].app.jinja_env.overlay(cache_size=0, bytecode_cache=FileSystemBytecodeCache(pasta.name))
+    for nome in TEMPLATES_GRANDES:
+        ambiente.get_template(nome)
+    return lambda: [ambiente.get_template(nome) for nome in TEMPLATES_GRANDES]
+
+
+def _dados_100x(ctx):
+    """simulador/matriz/calendário 100x maiores, já com snapshots (gerados uma vez)."""
+    if "dados_100x" not in ctx:
+        from lumi import catalogo
+        from rss_modelos import gerar_dados
+
+        pasta = tempfile.TemporaryDirectory(prefix="lumi-bench-dados-")
+        gerar_dados(pasta.name, 100)
+        catalogo.compilar(pasta.name, pasta.name)
+        ctx["dados_100x"] = pasta
+    return ctx["dados_100x"].name
+
+
+def _carga_json(nome):
+    def bench(ctx):
+        from lumi import catalogo
+
+        fonte = getattr(catalogo, nome.upper())
+        caminho = os.path.join(_dados_100x(ctx), fonte.arquivo)
+
+        def executar():
+            with open(caminho, encoding="utf-8") as f:
+                return fonte(json.load(f))
+        return executar
+    return bench
+
+
+def _carga_snapshot(nome):
+    def bench(ctx):
+        from lumi import catalogo
+
+        fonte = getattr(catalogo, nome.upper())
+        pasta = _dados_100x(ctx)
+        caminho = os.path.join(pasta, fonte.arquivo)
+        snapshot = catalogo.caminho_snapshot(fonte, pasta)
+        assert catalogo.ler_snapshot(fonte, caminho, snapshot) is not None
+        return lambda: fonte.montar(catalogo.ler_snapshot(fonte, caminho, snapshot))
+    return bench
+
+
+for _fonte in ("simulador", "matriz", "calendario"):
+    micro(f"carga_{_fonte}_100x_json")(_carga_json(_fonte))
+    micro(f"carga_{_fonte}_100x_snapshot")(_carga_snapshot(_fonte))
+
+
+@micro("simulador_selecao")
+def bench_simulador_selecao(ctx):
+    lumi_app = ctx["app"]
+    banco = lumi_app.carregar_banco_questoes()
+    return lambda: lumi_app.selecionar_questoes_simulado(banco, 40, "todas")
+
+
+@micro("simulador_correcao")
+def bench_simulador_correcao(ctx):
+    lumi_app = ctx["app"]
+    banco = lumi_app.carregar_banco_questoes()
+    questoes, _ = lumi_app.selecionar_questoes_simulado(banco, 40, "todas")
+    respostas = {str(i): q.correta for i, q in enumerate(questoes) if i % 2 == 0}
+    return lambda: lumi_app.corrigir_simulado(questoes, respostas)
+
+
+@micro("log_registro_acesso")
+def bench_log_registro_acesso(ctx):
+    """Custo do log por requisição pago pela thread (só enfileirar)."""
+    from lumi import registro
+
+    extra = {
+        "route": "/ask", "method": "POST", "path": "/ask", "status": 200,
+        "user_id": "1", "latency_ms": 12.5, "fases_ms": {"db": 1.2, "llm": 9.8},
+    }
+    return lambda: registro.logger_acesso.info("POST /ask 200", extra=extra)
+
+
+def _faq_sintetico(ctx, copias):
+    """faq.json repetido `copias` vezes, com um sufixo para variar o vocabulário."""
+    base = ctx["app"].carregar_dados_json("faq.json")
+    return [
+        {"pergunta": f"{item['pergunta']} turma{i}", "resposta": f"{item['resposta']} codigo{i}"}
+        for i in range(copias)
+        for item in base
+    ]
+
+
+@micro("faq_indice_construcao")
+def bench_faq_indice_construcao(ctx):
+    """Construção do índice com ~2000 perguntas."""
+    from lumi import faq
+
+    itens = _faq_sintetico(ctx, 250)
+    return lambda: faq.IndiceFAQ(itens)
+
+
+@micro("faq_busca")
+def bench_faq_busca(ctx):
+    from lumi import faq
+
+    indice = faq.IndiceFAQ(_faq_sintetico(ctx, 250))
+    return lambda: indice.buscar("horario biblioteca sabado")
+
+
+@micro("faq_busca_com_erro")
+def bench_faq_busca_com_erro(ctx):
+    """Termos fora do vocabulário passam pela correção por trigramas."""
+    from lumi import faq
+
+    indice = faq.IndiceFAQ(_faq_sintetico(ctx, 250))
+    return lambda: indice.buscar("bibliotca horaro sabdo")
+
+
+@micro("faq_resposta_exata")
+def bench_faq_resposta_exata(ctx):
+    """Custo do atalho do FAQ pago por toda pergunta do chat."""
+    from lumi import faq
+
+    caminho = ctx["app"].CAMINHO_FAQ
+    return lambda: faq.resposta_exata(caminho, "Quando é a semana de provas?")
+
+
+@micro("llm_singleflight")
+def bench_llm_singleflight(ctx):
+    """Custo do single-flight numa pergunta sem concorrência (normalizar + lock)."""
+    from lumi import coalescencia
+
+    grupo = coalescencia.GrupoUnico()
+    return lambda: grupo.executar(
+        coalescencia.chave_pergunta("Quando é a semana de provas?", "v1"), lambda: "resposta"
+    )
+
+
+@micro("llm_cota")
+def bench_llm_cota(ctx):
+    """Conferência da cota de tokens feita antes de cada chamada ao LLM."""
+    from lumi import consumo_llm
+
+    lumi_app = ctx["app"]
+    with lumi_app.app.app_context():
+        lumi_app.db.create_all()
+    consumo = consumo_llm.ConsumoLLM(
+        lumi_app.app, lumi_app.db, lumi_app.UsoLLM.__table__, lumi_app.UsoLLMHora.__table__,
+        fuso=lumi_app.FUSO_HORARIO, cota_aluno=10**9, cota_dia=10**12,
+    )
+    consumo.conferir_cota(1)  # primeira do dia: lê o total do banco
+    return lambda: consumo.conferir_cota(1)
+
+
+@micro("calendario_fanout")
+def bench_calendario_fanout(ctx):
+    """Uma mudança do calendário entregue a 100 páginas abertas (broker local)."""
+    from lumi import feed_calendario
+
+    broker = feed_calendario.BrokerLocal()
+    canal = feed_calendario.canal("medicina")
+    assinaturas = [broker.assinar(canal) for _ in range(100)]
+    mensagem = json.dumps({"versao": 1, "acao": "updated", "id": "e1", "evento": {"title": "Prova"}})
+
+    def rodar():
+        broker.publicar(canal, mensagem)
+        for assinatura in assinaturas:
+            assinatura.proxima(0)
+
+    return rodar
+
+
+@micro("geracao_duplicata")
+def bench_geracao_duplicata(ctx):
+    """Procura de item parecido entre 5000 já conhecidos (MinHash + LSH)."""
+    import random
+
+    from lumi import geracao
+
+    aleatorio = random.Random(3)
+    palavras = geracao.VOCABULARIO
+    indice = geracao.IndiceDuplicatas()
+    for _ in range(5000):
+        indice.adicionar(" ".join(aleatorio.choice(palavras) for _ in range(18)))
+    texto = " ".join(aleatorio.choice(palavras) for _ in range(18))
+    return lambda: indice.parecido(texto)
+
+
+@micro("horarios_agora")
+def bench_horarios_agora(ctx):
+    from datetime import datetime
+
+    grade = ctx["app"].carregar_grade()
+    momento = datetime(2025, 10, 20, 19, 30)
+    return lambda: (grade.em_andamento(momento, "2"), grade.proxima(momento, "2"))
+
+
+@micro("horarios_sala_livre")
+def bench_horarios_sala_livre(ctx):
+    grade = ctx["app"].carregar_grade()
+    return lambda: grade.sala_livre("H103", 0, 20 * 60, 21 * 60)
+
+
+@micro("horarios_conflitos")
+def bench_horarios_conflitos(ctx):
+    grade = ctx["app"].carregar_grade()
+    return lambda: grade.conflitos_periodo("2")
+
+
+# =======================================================
+# PONTA A PONTA (test client)
+# =======================================================
+SENHA_BENCH = "bench-senha-123"
+
+
+def semear_usuario(lumi_app, nivel):
+    """Cria um usuário com `nivel` mensagens de chat e `nivel` flashcards."""
+    db = lumi_app.db
+    email = f"bench{nivel}@lumi.test"
+    user = lumi_app.User.query.filter_by(email=email).first()
+    if user:
+        return user
+    user = lumi_app.User(
+        username=f"Bench {nivel}", email=email, matricula=f"BENCH{nivel}"
+    )
+    user.set_password(SENHA_BENCH)
+    db.session.add(user)
+    db.session.commit()
+
+    base = datetime(2025, 1, 1)
+    lote = 10_000
+    for inicio in range(0, nivel, lote):
+        fim = min(inicio + lote, nivel)
+        db.session.execute(
+            lumi_app.ChatHistory.__table__.insert(),
+            [
+                {
+                    "user_id": user.id,
+                    "role": "user" if i % 2 == 0 else "model",
+                    "content": f"Mensagem {i} sobre Cálculo e Algoritmos",
+                    "timestamp": base + timedelta(seconds=i),
+                }
+                for i in range(inicio, fim)
+            ],
+        )
+        db.session.execute(
+            lumi_app.UserFlashcard.__table__.insert(),
+            [
+                {
+                    "user_id": user.id,
+                    "materia": f"Deck {i % 20}",
+                    "pergunta": f"Pergunta {i}?",
+                    "resposta": f"Resposta {i}.",
+                }
+                for i in range(inicio, fim)
+            ],
+        )
+    db.session.commit()
+    # A carga em massa não passa por salvar_mensagem_no_banco: backfill do índice
+    from lumi import busca_chat
+    with db.engine.begin() as conexao:
+        busca_chat.reconstruir(conexao)
+    return user
+
+
+def cliente_logado(lumi_app, nivel):
+    client = lumi_app.app.test_client()
+    resp = client.post(
+        "/login",
+        data={"login_identifier": f"bench{nivel}@lumi.test", "password": SENHA_BENCH},
+    )
+    if resp.status_code != 302:
+        raise RuntimeError(f"Login do usuário de benchmark falhou ({resp.status_code}).")
+    return client
+
+
+def _get(rota):
+    def bench(ctx):
+        client = ctx["client"]
+
+        def executar():
+            resp = client.get(rota)
+            assert resp.status_code == 200, (rota, resp.status_code)
+        return executar
+    return bench
+
+
+for _nome, _rota in [
+    ("index", "/"),
+    ("flashcards", "/flashcards"),
+    ("calendario", "/calendario"),
+    ("faq", "/faq"),
+    ("simulador", "/simulador"),
+    ("metodo_de_estudo", "/metodo_de_estudo"),
+    ("api_simulador_config", "/api/simulador_config"),
+    ("busca_chat", "/api/chat/busca?q=calculo%20algoritmos"),
+    ("busca_faq", "/api/faq/busca?q=bibliotca%20horario"),
+]:
+    e2e(_nome)(_get(_rota))
+
+
+def _get_condicional(rota):
+    """GET com If-None-Match do ETag atual: 304 sem executar a view."""
+    def bench(ctx):
+        client = ctx["client"]
+        client.get("/")  # consome mensagens flash pendentes (elas desligam o 304)
+        etag = client.get(rota).headers["ETag"]
+
+        def executar():
+            resp = client.get(rota, headers={"If-None-Match": etag})
+            assert resp.status_code == 304, (rota, resp.status_code)
+        return executar
+    return bench
+
+
+for _nome, _rota in [
+    ("calendario_304", "/calendario"),
+    ("api_simulador_config_304", "/api/simulador_config"),
+]:
+    e2e(_nome)(_get_condicional(_rota))
+
+
+@e2e("api_simulador_config_gzip")
+def bench_api_simulador_config_gzip(ctx):
+    client = ctx["client"]
+
+    def executar():
+        resp = client.get("/api/simulador_config", headers={"Accept-Encoding": "gzip"})
+        assert resp.headers.get("Content-Encoding") == "gzip"
+    return executar
+
+
+@e2e("ask")
+def bench_ask(ctx):
+    client = ctx["client"]
+
+    def executar():
+        resp = client.post("/ask", json={"pergunta": "Quando é a semana de provas?"})
+        assert resp.status_code == 200
+    return executar
+
+
+@e2e("ask_faq")
+def bench_ask_faq(ctx):
+    """Pergunta idêntica a uma do FAQ: respondida sem chamar o LLM."""
+    client = ctx["client"]
+
+    def executar():
+        resp = client.post("/ask", json={"pergunta": "Quais são os horários de funcionamento da biblioteca?"})
+        assert resp.get_json().get("fonte") == "faq"
+    return executar
+
+
+@e2e("simulador_iniciar_resultado")
+def bench_simulador_fluxo(ctx):
+    client = ctx["client"]
+
+    def executar():
+        resp = client.post("/simulador/iniciar", json={"quantidade": 20})
+        assert resp.status_code == 200
+        respostas = {str(i): "A" for i in range(20)}
+        resp = client.post("/simulador/resultado", json={"respostas": respostas})
+        assert resp.status_code == 200
+    return executar
+
+
+# =======================================================
+# EXECUÇÃO
+# =======================================================
+def executar(lumi_app, niveis=NIVEIS_PADRAO, filtro=None, rodadas_min=5,
+             tempo_min=0.5, incluir_e2e=True, saida=print):
+    """Roda os benchmarks registrados e devolve {nome: estatísticas}."""
+    resultados = {}
+
+    def selecionado(nome):
+        return not filtro or filtro in nome
+
+    ctx = {"app": lumi_app}
+    for nome, fabrica in MICRO.items():
+        chave = f"micro/{nome}"
+        if not selecionado(chave):
+            continue
+        resultados[chave] = medir(fabrica(ctx), rodadas_min, tempo_min)
+        saida(formatar(chave, resultados[chave]))
+
+    if not incluir_e2e:
+        return resultados
+
+    with lumi_app.app.app_context():
+        lumi_app.db.create_all()
+
+    for nivel in niveis:
+        nomes = [n for n in E2E if selecionado(f"e2e/{nivel}/{n}")]
+        if not nomes:
+            continue
+        t0 = time.perf_counter()
+        # A semeadura usa um app_context próprio: as requisições medidas
+        # precisam criar o seu (sessão do banco e `g` não podem vazar entre níveis).
+        with lumi_app.app.app_context():
+            semear_usuario(lumi_app, nivel)
+        saida(f"# nível {nivel}: usuário semeado em {time.perf_counter() - t0:.2f}s")
+        ctx_nivel = {"app": lumi_app, "client": cliente_logado(lumi_app, nivel)}
+        # Níveis grandes usam menos rodadas para o suite terminar em tempo útil
+        rodadas = rodadas_min if nivel < 100_000 else 2
+        for nome in nomes:
+            chave = f"e2e/{nivel}/{nome}"
+            resultados[chave] = medir(
+                E2E[nome](ctx_nivel), rodadas, tempo_min, rodadas_max=200
+            )
+            saida(formatar(chave, resultados[chave]))
+    return resultados
+
+
+def formatar(nome, est):
+    return (
+        f"{nome:<50} mediana {est['mediana'] * 1000:10.3f} ms   "
+        f"min {est['min'] * 1000:10.3f} ms   ({est['rodadas']} rodadas)"
+    )
+
+
+def comparar(atual, arquivo_base, tolerancia):
+    """Compara medianas com um resultado anterior; devolve as regressões."""
+    with open(arquivo_base, "r", encoding="utf-8") as f:
+        base = json.load(f)["resultados"]
+    regressoes = []
+    print(f"\n=== Comparação com {arquivo_base} ===")
+    for nome, est in atual.items():
+        if nome not in base:
+            continue
+        razao = est["mediana"] / base[nome]["mediana"] if base[nome]["mediana"] else 0
+        marcador = ""
+        if razao > 1 + tolerancia:
+            marcador = "  <-- REGRESSÃO"
+            regressoes.append(nome)
+        print(f"{nome:<50} {razao:6.2f}x{marcador}")
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks da Lumi")
+    parser.add_argument("-k", "--filtro", help="Roda apenas benchmarks cujo nome contém o texto")
+    parser.add_argument("--rapido", action="store_true", help="Pula o nível de 100k registros")
+    parser.add_argument("--so-micro", action="store_true", help="Roda só os microbenchmarks")
+    parser.add_argument("--saida", help="Arquivo JSON de saída (padrão: resultados/<commit>.json)")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.10,
+                        help="Aumento relativo da mediana considerado regressão (padrão 0.10)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="lumi-bench-") as pasta_tmp:
+        preparar_ambiente(pasta_tmp)
+        lumi_app = importar_app()
+        resultados = executar(
+            lumi_app,
+            niveis=NIVEIS_RAPIDOS if args.rapido else NIVEIS_PADRAO,
+            filtro=args.filtro,
+            incluir_e2e=not args.so_micro,
+        )
+
+    commit = commit_atual()
+    relatorio = {
+        "commit": commit,
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "maquina": platform.platform(),
+        "resultados": resultados,
+    }
+    saida = Path(args.saida) if args.saida else PASTA_RESULTADOS / f"{commit}.json"
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados gravados em {saida}")
+
+    if args.comparar and comparar(resultados, args.comparar, args.tolerancia):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+# =======================================================
+# GUNICORN – PRELOAD x SEM PRELOAD, SYNC x GTHREAD
+# =======================================================
+# Sobe o app de verdade com gunicorn (gunicorn.conf.py + wsgi.py) em cada
+# configuração, dispara requisições autenticadas em paralelo por alguns
+# segundos e mede:
+#   - requisições por segundo e latência p50/p95;
+#   - memória de cada worker: RSS, USS (privada) e PSS (RSS dividindo as
+#     páginas compartilhadas entre quem as usa), de /proc/<pid>/smaps_rollup.
+# A soma de PSS do mestre e dos workers é a memória total do serviço.
+#
+# Usa banco SQLite temporário e o backend LLM local (LUMI_LLM_BACKEND=fake).
+#
+# Uso:
+#   python benchmarks/comparar_gunicorn.py [--workers 4] [--clientes 16] [--segundos 10]
+# =======================================================
+
+import argparse
+import http.cookiejar
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parents[1]
+
+CONFIGURACOES = (
+    # nome, LUMI_PRELOAD, LUMI_WORKER_CLASS
+    ("sync sem preload", "0", "sync"),
+    ("sync preload", "1", "sync"),
+    ("gthread sem preload", "0", "gthread"),
+    ("gthread preload", "1", "gthread"),
+)
+
+ROTAS = (
+    "/",
+    "/calendario",
+    "/faq",
+    "/simulador",
+    "/api/simulador_config",
+    "/api/faq/busca?q=matricula",
+)
+
+
+# =======================================================
+# AMBIENTE
+# =======================================================
+def ambiente(pasta):
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": "sqlite:///" + os.path.join(pasta, "bench.db"),
+        "LUMI_LLM_BACKEND": "fake",
+        "LUMI_LOG_ARQUIVO": os.path.join(pasta, "lumi.log"),
+        "LUMI_SESSION_DIR": os.path.join(pasta, "sessoes"),
+        "LUMI_SNAPSHOT_DIR": os.path.join(pasta, "snapshots"),
+        "PYTHONPATH": str(RAIZ),
+    })
+    return env
+
+
+def semear(env):
+    """Cria as tabelas e o usuário do benchmark num processo separado."""
+    codigo = (
+        "from app import app, db, User\n"
+        "with app.app_context():\n"
+        "    db.create_all()\n"
+        "    u = User(username='bench', email='bench@teste.com', matricula='B1')\n"
+        "    u.set_password('123456')\n"
+        "    db.session.add(u)\n"
+        "    db.session.commit()\n"
+    )
+    subprocess.run([sys.executable, "-c", codigo], cwd=RAIZ, env=env, check=True, capture_output=True)
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# =======================================================
+# MEMÓRIA
+# =======================================================
+def memoria(pid):
+    """RSS, USS e PSS (MiB) de /proc/<pid>/smaps_rollup."""
+    campos = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as f:
+            for linha in f:
+                partes = linha.split()
+                if len(partes) >= 2 and partes[1].isdigit():
+                    campos[partes[0].rstrip(":")] = int(partes[1])
+    except OSError:
+        return {}
+    uss = campos.get("Private_Clean", 0) + campos.get("Private_Dirty", 0)
+    return {
+        "rss_mb": round(campos.get("Rss", 0) / 1024, 1),
+        "uss_mb": round(uss / 1024, 1),
+        "pss_mb": round(campos.get("Pss", 0) / 1024, 1),
+    }
+
+
+def filhos(pid):
+    encontrados = []
+    for nome in os.listdir("/proc"):
+        if not nome.isdigit():
+            continue
+        try:
+            with open(f"/proc/{nome}/stat", encoding="ascii") as f:
+                # O nome do processo vem entre parênteses e pode ter espaços
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        if ppid == pid:
+            encontrados.append(int(nome))
+    return encontrados
+
+
+# =======================================================
+# CARGA
+# =======================================================
+def cliente_logado(base):
+    abridor = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    dados = urllib.parse.urlencode({"login_identifier": "bench@teste.com", "password": "123456"}).encode()
+    abridor.open(base + "/login", data=dados, timeout=30).read()
+    return abridor
+
+
+def aguardar(base, processo, limite=60):
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        if processo.poll() is not None:
+            raise RuntimeError("gunicorn terminou antes de ficar pronto")
+        try:
+            urllib.request.urlopen(base + "/login", timeout=2).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("gunicorn não respondeu a tempo")
+
+
+def gerar_carga(base, clientes, segundos):
+    latencias = []
+    erros = [0]
+    trava = threading.Lock()
+    abridores = [cliente_logado(base) for _ in range(clientes)]
+    fim = time.monotonic() + segundos
+
+    def trabalhar(n, abridor):
+        locais = []
+        falhas = 0
+        i = n
+        while time.monotonic() < fim:
+            rota = ROTAS[i % len(ROTAS)]
+            i += 1
+            inicio = time.perf_counter()
+            try:
+                abridor.open(base + rota, timeout=30).read()
+            except OSError:
+                falhas += 1
+                continue
+            locais.append(time.perf_counter() - inicio)
+        with trava:
+            latencias.extend(locais)
+            erros[0] += falhas
+
+    threads = [threading.Thread(target=trabalhar, args=(n, a)) for n, a in enumerate(abridores)]
+    inicio = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duracao = time.monotonic() - inicio
+
+    latencias.sort()
+    return {
+        "requisicoes": len(latencias),
+        "erros": erros[0],
+        "req_s": round(len(latencias) / duracao, 1),
+        "p50_ms": round(statistics.median(latencias) * 1000, 1) if latencias else None,
+        "p95_ms": round(latencias[int(len(latencias) * 0.95) - 1] * 1000, 1) if latencias else None,
+    }
+
+
+def executar_configuracao(env, preload, classe, args):
+    porta = porta_livre()
+    env = {
+        **env,
+        "PORT": str(porta),
+        "WEB_CONCURRENCY": str(args.workers),
+        "LUMI_WORKER_CLASS": classe,
+        "LUMI_THREADS": str(args.threads),
+        "LUMI_PRELOAD": preload,
+    }
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+        cwd=RAIZ, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{porta}"
+    try:
+        aguardar(base, processo)
+        carga = gerar_carga(base, args.clientes, args.segundos)
+        workers = [memoria(pid) for pid in filhos(processo.pid)]
+        mestre = memoria(processo.pid)
+    finally:
+        processo.send_signal(signal.SIGTERM)
+        try:
+            processo.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            processo.kill()
+
+    def media(campo):
+        return round(sum(w.get(campo, 0) for w in workers) / max(len(workers), 1), 1)
+
+    return {
+        **carga,
+        "mestre": mestre,
+        "workers": workers,
+        "rss_medio_worker_mb": media("rss_mb"),
+        "uss_medio_worker_mb": media("uss_mb"),
+        "pss_total_mb": round(mestre.get("pss_mb", 0) + sum(w.get("pss_mb", 0) for w in workers), 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memória e vazão do app sob gunicorn")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4, help="Threads por worker no gthread")
+    parser.add_argument("--clientes", type=int, default=16, help="Clientes simultâneos")
+    parser.add_argument("--segundos", type=float, default=10)
+    parser.add_argument("--saida", help="Grava o relatório em JSON")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        print("Este relatório precisa de Linux (/proc/<pid>/smaps_rollup).")
+        return 1
+
+    relatorio = {"workers": args.workers, "threads": args.threads, "clientes": args.clientes,
+                 "segundos": args.segundos, "configuracoes": {}}
+    print(f"{args.workers} workers, {args.clientes} clientes, {args.segundos:g}s por configuração\n")
+    print(f"{'configuração':<22}{'req/s':>8}{'p50':>9}{'p95':>9}"
+          f"{'worker RSS':>12}{'worker USS':>12}{'PSS total':>11}")
+    with tempfile.TemporaryDirectory(prefix="lumi-gunicorn-") as pasta:
+        env = ambiente(pasta)
+        semear(env)
+        for nome, preload, classe in CONFIGURACOES:
+            resultado = executar_configuracao(env, preload, classe, args)
+            relatorio["configuracoes"][nome] = resultado
+            print(
+                f"{nome:<22}{resultado['req_s']:>8}{resultado['p50_ms']:>6} ms{resultado['p95_ms']:>6} ms"
+                f"{resultado['rss_medio_worker_mb']:>9} MB{resultado['uss_medio_worker_mb']:>9} MB"
+                f"{resultado['pss_total_mb']:>8} MB"
+                + (f"  ({resultado['erros']} erros)" if resultado["erros"] else "")
+            )
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, indent=2, ensure_ascii=False)
+        print(f"\nRelatório gravado em {args.saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
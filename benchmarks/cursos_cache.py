@@ -0,0 +1,146 @@
+# =======================================================
+# CURSOS – CACHE LRU DOS DADOS POR CURSO
+# =======================================================
+# Gera `--cursos` cursos numa pasta temporária, cada um com matriz,
+# calendário e banco de questões próprios (os da raiz com nomes trocados), e
+# faz `--acessos` consultas com popularidade Zipf (poucos cursos grandes,
+# muitos pequenos): catálogo, grade e contexto do LLM do curso sorteado.
+#
+# Mede, com o limite de `--limite-mb` e sem limite (todos os cursos em
+# memória): taxa de acerto, latência p50/p99 de um acesso, entradas e bytes
+# estimados no cache e o RSS do processo no fim.
+#
+# Uso:
+#   python benchmarks/cursos_cache.py [--cursos 300] [--acessos 20000] [--limite-mb 64]
+# =======================================================
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(RAIZ))
+
+
+def gerar_cursos(pasta, quantidade):
+    dados = {nome: json.loads((RAIZ / nome).read_text(encoding="utf-8"))
+             for nome in ("matriz.json", "calendario.json", "simulador.json")}
+    for i in range(quantidade):
+        curso = os.path.join(pasta, f"curso-{i:03d}")
+        os.makedirs(curso)
+        for nome, conteudo in dados.items():
+            # Troca o texto para cada curso ter strings próprias (não internadas em comum)
+            texto = json.dumps(conteudo, ensure_ascii=False).replace("a", f"a{i % 7}", 50 + i)
+            Path(curso, nome).write_text(texto, encoding="utf-8")
+        Path(curso, "informacoes.txt").write_text(f"Você é a Lumi do curso {i}.", encoding="utf-8")
+
+
+def rss_mb():
+    with open(f"/proc/{os.getpid()}/status") as f:
+        for linha in f:
+            if linha.startswith("VmRSS:"):
+                return int(linha.split()[1]) / 1024
+    return 0.0
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[max(int(len(valores) * p) - 1, 0)] if valores else 0.0
+
+
+def rodar(args):
+    """Roda um cenário neste processo (chamado num subprocesso por cenário)."""
+    import app as lumi_app
+    from lumi import cursos
+
+    dados = lumi_app.dados_cursos
+    dados.pasta_cursos = args.pasta
+    dados.cache.limite_bytes = int(args.limite_mb * 1024 * 1024) if args.limite_mb else 10**15
+    nomes = dados.listar()
+    aleatorio = random.Random(7)
+    pesos = [1 / (i + 1) for i in range(len(nomes))]
+    sorteados = aleatorio.choices(nomes, pesos, k=args.acessos)
+
+    antes = dict(cursos.ACESSOS._valores)
+    base = rss_mb()
+    tempos = []
+    for curso in sorteados:
+        inicio = time.perf_counter()
+        lumi_app.carregar_banco_questoes(curso)
+        lumi_app.carregar_calendario(curso)
+        lumi_app.carregar_grade(curso)
+        lumi_app.contexto_do_curso(curso)
+        tempos.append(time.perf_counter() - inicio)
+    contagem = {k[0]: v - antes.get(k, 0) for k, v in cursos.ACESSOS._valores.items()}
+    acertos, faltas = contagem.get("hit", 0), contagem.get("miss", 0)
+    estat = dados.cache.estatisticas()
+    return {
+        "cursos": len(nomes),
+        "acerto_pct": round(100 * acertos / max(acertos + faltas, 1), 1),
+        "despejos": int(contagem.get("evicted", 0)),
+        "p50_ms": round(statistics.median(tempos) * 1000, 3),
+        "p99_ms": round(percentil(tempos, 0.99) * 1000, 2),
+        "entradas": estat["entradas"],
+        "cache_mb": round(estat["bytes"] / 1024 / 1024, 1),
+        "rss_cresceu_mb": round(rss_mb() - base, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cache LRU dos dados por curso")
+    parser.add_argument("--cursos", type=int, default=300)
+    parser.add_argument("--acessos", type=int, default=20000)
+    parser.add_argument("--limite-mb", type=float, default=64)
+    parser.add_argument("--saida", help="Grava o relatório em JSON")
+    parser.add_argument("--pasta", help=argparse.SUPPRESS)
+    parser.add_argument("--cenario", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.cenario:
+        print(json.dumps(rodar(args)))
+        return 0
+
+    relatorio = {}
+    with tempfile.TemporaryDirectory(prefix="lumi-cursos-") as pasta:
+        gerar_cursos(os.path.join(pasta, "cursos"), args.cursos)
+        ambiente = dict(
+            os.environ,
+            DATABASE_URL="sqlite:///" + os.path.join(pasta, "cursos.db"),
+            LUMI_LLM_BACKEND="fake",
+            LUMI_SESSION_DIR=os.path.join(pasta, "sessoes"),
+            LUMI_LOG_ARQUIVO=os.path.join(pasta, "lumi.log"),
+            LUMI_ASSETS="off",
+            LUMI_SNAPSHOT_DIR="off",
+            LUMI_JINJA_CACHE_DIR="off",
+        )
+        # Um processo por cenário: o RSS de um não contamina o outro
+        for nome, limite in ((f"LRU {args.limite_mb:g} MB", args.limite_mb), ("sem limite", 0)):
+            saida = subprocess.run(
+                [sys.executable, __file__, "--cenario", "--pasta", os.path.join(pasta, "cursos"),
+                 "--acessos", str(args.acessos), "--limite-mb", str(limite)],
+                env=ambiente, capture_output=True, text=True, check=True,
+            ).stdout
+            relatorio[nome] = json.loads(saida.strip().splitlines()[-1])
+
+    print(f"{args.cursos} cursos, {args.acessos} acessos (Zipf)\n")
+    print(f"{'cenário':<14}{'acerto':>8}{'despejos':>10}{'p50':>10}{'p99':>10}{'entradas':>10}{'cache':>10}{'RSS +':>10}")
+    for nome, r in relatorio.items():
+        print(f"{nome:<14}{r['acerto_pct']:>7}%{r['despejos']:>10}{r['p50_ms']:>7} ms{r['p99_ms']:>7} ms"
+              f"{r['entradas']:>10}{r['cache_mb']:>7} MB{r['rss_cresceu_mb']:>7} MB")
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, indent=2, ensure_ascii=False)
+        print(f"\nRelatório gravado em {args.saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
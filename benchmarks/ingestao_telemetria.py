@@ -0,0 +1,188 @@
+# =======================================================
+# INGESTÃO DA TELEMETRIA DE ESTUDO – LOTE x UM EVENTO POR TRANSAÇÃO
+# =======================================================
+# Sobe o app num SQLite temporário (WAL, ver lumi/banco.py) e mede:
+#
+#   - "por evento": cada evento gravado na hora, uma transação com o INSERT
+#     e o UPSERT do total diário (o que seria gravar dentro da requisição);
+#   - "lote": clientes em threads mandando POST /api/telemetria com lotes de
+#     eventos, como o telemetria.js; a requisição só enfileira e a thread do
+#     coletor grava em lote. Mede requisições/s, eventos/s, latência do POST
+#     e quanto tempo a thread leva para esvaziar o buffer no fim.
+#
+# No fim confere que estudo_diario soma exatamente os eventos gravados.
+#
+# Uso:
+#   python benchmarks/ingestao_telemetria.py [--clientes 8] [--eventos-por-post 25] [--segundos 5]
+# =======================================================
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(RAIZ))
+
+SENHA = "bench-senha-123"
+
+
+def preparar_ambiente(pasta):
+    # O engine é criado na importação do app: o banco vem antes do import
+    os.environ.update({
+        "DATABASE_URL": "sqlite:///" + os.path.join(pasta, "telemetria.db"),
+        "LUMI_LLM_BACKEND": "fake",
+        "LUMI_SESSION_DIR": os.path.join(pasta, "sessoes"),
+        "LUMI_LOG_ARQUIVO": os.path.join(pasta, "lumi.log"),
+        "LUMI_ASSETS": "off",
+        "LUMI_SNAPSHOT_DIR": "off",
+        "LUMI_JINJA_CACHE_DIR": "off",
+    })
+
+
+def criar_usuarios(lumi_app, quantidade):
+    with lumi_app.app.app_context():
+        lumi_app.db.create_all()
+        ids = []
+        for i in range(quantidade):
+            user = lumi_app.User(username=f"Aluno {i}", email=f"tel{i}@bench.com", matricula=f"TEL{i}")
+            user.set_password(SENHA)
+            lumi_app.db.session.add(user)
+            lumi_app.db.session.flush()
+            ids.append(user.id)
+        lumi_app.db.session.commit()
+        return ids
+
+
+def contar(lumi_app):
+    from sqlalchemy import func, select
+
+    with lumi_app.app.app_context():
+        with lumi_app.db.engine.connect() as conexao:
+            eventos = conexao.execute(select(func.count()).select_from(lumi_app.EventoEstudo.__table__)).scalar()
+            diario = lumi_app.EstudoDiario.__table__
+            foco = conexao.execute(select(func.coalesce(func.sum(diario.c.sessoes_foco), 0))).scalar()
+            cartas = conexao.execute(select(func.coalesce(func.sum(diario.c.flashcards_revisados), 0))).scalar()
+    return eventos, foco + cartas
+
+
+def limpar(lumi_app):
+    with lumi_app.app.app_context():
+        with lumi_app.db.engine.begin() as conexao:
+            conexao.execute(lumi_app.EventoEstudo.__table__.delete())
+            conexao.execute(lumi_app.EstudoDiario.__table__.delete())
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[max(int(len(valores) * p) - 1, 0)] if valores else 0.0
+
+
+def cenario_por_evento(lumi_app, ids, args):
+    """Uma transação por evento, em várias threads."""
+    from lumi import telemetria
+
+    coletor = lumi_app.coletor
+    fim = time.time() + args.segundos
+    totais = []
+
+    def trabalhar(n):
+        feitos = 0
+        while time.time() < fim:
+            user_id = ids[n % len(ids)]
+            with lumi_app.app.app_context():
+                coletor.gravar([(user_id, telemetria.FLASHCARD, int(time.time()), 1, 0)])
+            feitos += 1
+        totais.append(feitos)
+
+    threads = [threading.Thread(target=trabalhar, args=(n,)) for n in range(args.clientes)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return {"eventos_s": round(sum(totais) / args.segundos, 1)}
+
+
+def cenario_lote(lumi_app, ids, args):
+    """Clientes HTTP mandando lotes para /api/telemetria."""
+    fim = time.time() + args.segundos
+    latencias, eventos_aceitos = [], []
+
+    def trabalhar(n):
+        cliente = lumi_app.app.test_client()
+        cliente.post("/login", data={"login_identifier": f"tel{n % len(ids)}@bench.com", "password": SENHA},
+                     follow_redirects=True)
+        aceitos, minhas = 0, []
+        while time.time() < fim:
+            agora = int(time.time() * 1000)
+            corpo = json.dumps({"eventos": [
+                {"tipo": "foco", "t": agora, "segundos": 60, "concluida": True} if i % 5 == 0
+                else {"tipo": "flashcard", "t": agora}
+                for i in range(args.eventos_por_post)
+            ]})
+            inicio = time.perf_counter()
+            resposta = cliente.post("/api/telemetria", data=corpo, content_type="text/plain")
+            minhas.append(time.perf_counter() - inicio)
+            aceitos += resposta.get_json()["aceitos"]
+        latencias.extend(minhas)
+        eventos_aceitos.append(aceitos)
+
+    threads = [threading.Thread(target=trabalhar, args=(n,)) for n in range(args.clientes)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    inicio = time.perf_counter()
+    lumi_app.coletor.descarregar()
+    return {
+        "requisicoes_s": round(len(latencias) / args.segundos, 1),
+        "eventos_s": round(sum(eventos_aceitos) / args.segundos, 1),
+        "p50_ms": round(statistics.median(latencias) * 1000, 2),
+        "p95_ms": round(percentil(latencias, 0.95) * 1000, 2),
+        "esvaziar_buffer_ms": round((time.perf_counter() - inicio) * 1000, 1),
+        "aceitos": sum(eventos_aceitos),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingestão de eventos de estudo: lote x transação por evento")
+    parser.add_argument("--clientes", type=int, default=8)
+    parser.add_argument("--eventos-por-post", type=int, default=25)
+    parser.add_argument("--segundos", type=float, default=5)
+    parser.add_argument("--saida", help="Grava o relatório em JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="lumi-telemetria-") as pasta:
+        preparar_ambiente(pasta)
+        import app as lumi_app
+
+        ids = criar_usuarios(lumi_app, args.clientes)
+        relatorio = {"clientes": args.clientes, "eventos_por_post": args.eventos_por_post}
+
+        relatorio["por_evento"] = cenario_por_evento(lumi_app, ids, args)
+        print(f"por evento: {relatorio['por_evento']['eventos_s']:>10} eventos/s")
+        limpar(lumi_app)
+
+        lote = relatorio["lote"] = cenario_lote(lumi_app, ids, args)
+        print(f"lote:       {lote['eventos_s']:>10} eventos/s  ({lote['requisicoes_s']} POST/s, "
+              f"p50 {lote['p50_ms']} ms, p95 {lote['p95_ms']} ms, buffer esvaziado em {lote['esvaziar_buffer_ms']} ms)")
+
+        gravados, somados = contar(lumi_app)
+        relatorio["conferencia"] = {"aceitos": lote["aceitos"], "gravados": gravados, "no_diario": somados}
+        print(f"conferência: {lote['aceitos']} aceitos, {gravados} gravados, {somados} somados em estudo_diario")
+        lumi_app.coletor.encerrar()
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, indent=2, ensure_ascii=False)
+        print(f"\nRelatório gravado em {args.saida}")
+    return 0 if gravados == somados == lote["aceitos"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
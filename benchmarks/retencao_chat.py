@@ -0,0 +1,156 @@
+# =======================================================
+# RETENÇÃO DO CHAT – ARQUIVO EM LOTES E TABELA QUENTE
+# =======================================================
+# Preenche um SQLite temporário com `--alunos` x `--mensagens` mensagens
+# (80% com mais de um ano) e mede, antes e depois de arquivar
+# (lumi/retencao.py):
+#   - linhas em chat_history;
+#   - tempo para carregar o histórico de um aluno (a consulta do "/");
+# e do próprio arquivamento: mensagens por segundo, maior transação de um
+# lote (quanto tempo o banco fica travado para escrita) e taxa de compressão.
+#
+# Uso:
+#   python benchmarks/retencao_chat.py [--alunos 200] [--mensagens 500] [--lote 500]
+# =======================================================
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(RAIZ))
+
+
+def preparar_ambiente(pasta, lote):
+    # O engine é criado na importação do app: o banco vem antes do import
+    os.environ.update({
+        "DATABASE_URL": "sqlite:///" + os.path.join(pasta, "retencao.db"),
+        "LUMI_LLM_BACKEND": "fake",
+        "LUMI_SESSION_DIR": os.path.join(pasta, "sessoes"),
+        "LUMI_LOG_ARQUIVO": os.path.join(pasta, "lumi.log"),
+        "LUMI_ASSETS": "off",
+        "LUMI_SNAPSHOT_DIR": "off",
+        "LUMI_JINJA_CACHE_DIR": "off",
+        "LUMI_SENHAS_PROCESSOS": "0",
+        "LUMI_RETENCAO_INTERVALO": "0",
+        "LUMI_RETENCAO_PAUSA": "0",
+        "LUMI_RETENCAO_LOTE": str(lote),
+    })
+
+
+def semear(lumi_app, args):
+    from sqlalchemy import insert
+
+    db = lumi_app.db
+    aleatorio = random.Random(42)
+    agora = datetime.utcnow()
+    frases = ["Quando é a prova de Cálculo?", "Explique recursão com um exemplo em Python.",
+              "Qual a sala de Redes na segunda?", "Resuma o conteúdo de Estruturas de Dados."]
+    with lumi_app.app.app_context():
+        db.create_all()
+        db.session.execute(insert(lumi_app.User.__table__), [
+            {"username": f"Aluno {i}", "email": f"r{i}@bench.com", "matricula": f"R{i}", "password_hash": "x"}
+            for i in range(args.alunos)
+        ])
+        linhas = []
+        for user_id in range(1, args.alunos + 1):
+            for j in range(args.mensagens):
+                antiga = j < args.mensagens * 0.8
+                dias = aleatorio.uniform(370, 700) if antiga else aleatorio.uniform(0, 60)
+                linhas.append({
+                    "user_id": user_id, "role": "user" if j % 2 == 0 else "model",
+                    "content": f"{aleatorio.choice(frases)} " * (1 if j % 2 == 0 else 12),
+                    "timestamp": agora - timedelta(days=dias),
+                })
+        db.session.execute(insert(lumi_app.ChatHistory.__table__), linhas)
+        db.session.commit()
+        with db.engine.begin() as conexao:
+            lumi_app.busca_chat.reconstruir(conexao)
+
+
+def medir_tabela(lumi_app):
+    from sqlalchemy import text
+
+    with lumi_app.app.app_context():
+        with lumi_app.db.engine.connect() as conexao:
+            linhas = conexao.execute(text("SELECT count(*) FROM chat_history")).scalar()
+        tempos = []
+        for user_id in range(1, 51):
+            inicio = time.perf_counter()
+            lumi_app.carregar_historico_usuario(user_id)
+            tempos.append(time.perf_counter() - inicio)
+        lumi_app.db.session.remove()
+    return {
+        "linhas_chat_history": linhas,
+        "historico_p50_ms": round(statistics.median(tempos) * 1000, 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Arquivamento do histórico do chat")
+    parser.add_argument("--alunos", type=int, default=200)
+    parser.add_argument("--mensagens", type=int, default=500, help="Mensagens por aluno")
+    parser.add_argument("--lote", type=int, default=500)
+    parser.add_argument("--saida", help="Grava o relatório em JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="lumi-retencao-") as pasta:
+        preparar_ambiente(pasta, args.lote)
+        import app as lumi_app
+        from lumi import retencao
+
+        semear(lumi_app, args)
+        relatorio = {"alunos": args.alunos, "mensagens_por_aluno": args.mensagens, "lote": args.lote}
+        relatorio["antes"] = medir_tabela(lumi_app)
+
+        duracoes = []
+        original = retencao.ServicoRetencao._arquivar_lote
+
+        def medido(self, *a):
+            inicio = time.perf_counter()
+            resultado = original(self, *a)
+            duracoes.append(time.perf_counter() - inicio)
+            return resultado
+
+        retencao.ServicoRetencao._arquivar_lote = medido
+        original_antes = retencao.BYTES_ARQUIVO.valor("original")
+        comprimido_antes = retencao.BYTES_ARQUIVO.valor("comprimido")
+        inicio = time.perf_counter()
+        _, arquivadas = lumi_app.servico_retencao.rodar_ciclo()
+        tempo = time.perf_counter() - inicio
+        retencao.ServicoRetencao._arquivar_lote = original
+        original_bytes = retencao.BYTES_ARQUIVO.valor("original") - original_antes
+        comprimido_bytes = retencao.BYTES_ARQUIVO.valor("comprimido") - comprimido_antes
+        relatorio["arquivamento"] = {
+            "mensagens": arquivadas,
+            "mensagens_s": round(arquivadas / tempo, 1),
+            "maior_lote_ms": round(max(duracoes) * 1000, 1),
+            "lote_p50_ms": round(statistics.median(duracoes) * 1000, 1),
+            "compressao": round(original_bytes / max(comprimido_bytes, 1), 1),
+        }
+        relatorio["depois"] = medir_tabela(lumi_app)
+
+    a, d, arq = relatorio["antes"], relatorio["depois"], relatorio["arquivamento"]
+    print(f"{args.alunos} alunos x {args.mensagens} mensagens, lotes de {args.lote}\n")
+    print(f"{'':<24}{'antes':>12}{'depois':>12}")
+    print(f"{'linhas em chat_history':<24}{a['linhas_chat_history']:>12}{d['linhas_chat_history']:>12}")
+    print(f"{'histórico de um aluno':<24}{a['historico_p50_ms']:>9} ms{d['historico_p50_ms']:>9} ms")
+    print(f"\narquivadas {arq['mensagens']} mensagens a {arq['mensagens_s']}/s; transação por lote "
+          f"p50 {arq['lote_p50_ms']} ms, máx {arq['maior_lote_ms']} ms; compressão {arq['compressao']}x")
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, indent=2, ensure_ascii=False)
+        print(f"\nRelatório gravado em {args.saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
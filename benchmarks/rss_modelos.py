@@ -0,0 +1,284 @@
+# =======================================================
+# MEMÓRIA POR WORKER – DICTS x MODELOS COMPACTOS
+# =======================================================
+# Gera simulador.json, matriz.json e calendario.json 100x maiores (com
+# textos únicos, como dados reais teriam) e mede a memória de processos
+# "worker" criados com fork, em três cenários:
+#
+#   dicts_por_worker     cada worker lê o JSON e guarda dicts aninhados
+#                        (o formato antigo, calendário com um dict por evento)
+#   modelos_por_worker   cada worker monta os objetos de lumi.catalogo
+#   modelos_preload      o mestre monta os objetos antes do fork
+#                        (gunicorn --preload) e os workers só os percorrem
+#
+# Para cada worker: RSS, USS (memória privada, o que de fato custa por
+# worker) e memória compartilhada, lidos de /proc/<pid>/smaps_rollup.
+# Também compara o pico de memória da carga a partir do JSON e a partir do
+# snapshot binário (`flask data-compile`).
+#
+# Uso:
+#   python benchmarks/rss_modelos.py [--escala 100] [--workers 2] [--saida arquivo.json]
+# =======================================================
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(RAIZ))
+
+from lumi import catalogo  # noqa: E402
+
+CENARIOS = ("dicts_por_worker", "modelos_por_worker", "modelos_preload")
+
+
+# =======================================================
+# DADOS SINTÉTICOS
+# =======================================================
+def gerar_dados(pasta, escala):
+    with open(RAIZ / "simulador.json", encoding="utf-8") as f:
+        simulador = json.load(f)
+    with open(RAIZ / "matriz.json", encoding="utf-8") as f:
+        matriz = json.load(f)
+    with open(RAIZ / "calendario.json", encoding="utf-8") as f:
+        calendario = json.load(f)
+
+    pools = []
+    for n in range(escala):
+        for pool in simulador["pools"]:
+            pools.append({
+                **pool,
+                "questions": [
+                    {**q, "id": f"{q['id']}-{n}", "stem": f"{q['stem']} ({n})",
+                     "feedback": f"{q.get('feedback', '')} ({n})"}
+                    for q in pool["questions"]
+                ],
+            })
+    simulador = {**simulador, "pools": pools}
+
+    matriz = [
+        {**p, "periodo": f"{p['periodo']} turma {n}"}
+        for n in range(escala)
+        for p in matriz
+    ]
+    calendario = [
+        {**e, "descricao": f"{e['descricao']} ({n})", "id": f"evt-{n}-{i}"}
+        for n in range(escala)
+        for i, e in enumerate(calendario)
+    ]
+
+    for nome, dados in (("simulador.json", simulador), ("matriz.json", matriz), ("calendario.json", calendario)):
+        with open(os.path.join(pasta, nome), "w", encoding="utf-8") as f:
+            json.dump(dados, f, ensure_ascii=False)
+
+
+# =======================================================
+# CARREGAMENTO (formato antigo x novo)
+# =======================================================
+def _calendario_dicts(dados):
+    """Réplica do carregar_calendario antigo: um dict por evento."""
+    eventos = []
+    for item in dados:
+        data_obj = datetime.strptime(item["data_inicio"], "%Y-%m-%d")
+        eventos.append({
+            "id": item.get("id"),
+            "title": item.get("descricao"),
+            "date": item["data_inicio"],
+            "type": item.get("type", "Outro"),
+            "description": item.get("description", ""),
+            "data_obj": data_obj,
+            "data_fim": item.get("data_fim"),
+            "mes_curto": catalogo.MESES_CURTOS[data_obj.month - 1],
+        })
+    return sorted(eventos, key=lambda x: x["data_obj"])
+
+
+def carregar_dicts(pasta):
+    def ler(nome):
+        with open(os.path.join(pasta, nome), encoding="utf-8") as f:
+            return json.load(f)
+    return ler("simulador.json"), ler("matriz.json"), _calendario_dicts(ler("calendario.json"))
+
+
+def carregar_modelos(pasta):
+    return (
+        catalogo.carregar(os.path.join(pasta, "simulador.json"), catalogo.construir_banco),
+        catalogo.carregar(os.path.join(pasta, "matriz.json"), catalogo.construir_matriz),
+        catalogo.carregar(os.path.join(pasta, "calendario.json"), catalogo.construir_calendario),
+    )
+
+
+def percorrer(dados):
+    """Simula requisições lendo tudo (conta referências, como o app faria)."""
+    total = 0
+    pilha = [dados]
+    while pilha:
+        item = pilha.pop()
+        if isinstance(item, dict):
+            pilha.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            pilha.extend(item)
+        elif hasattr(item, "__slots__"):
+            pilha.extend(getattr(item, nome) for nome in item.__slots__)
+        else:
+            total += 1
+    return total
+
+
+# =======================================================
+# MEDIÇÃO
+# =======================================================
+def memoria(pid="self"):
+    """RSS, USS e compartilhada (MiB) de /proc/<pid>/smaps_rollup."""
+    campos = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as f:
+            for linha in f:
+                partes = linha.split()
+                if len(partes) >= 2 and partes[1].isdigit():
+                    campos[partes[0].rstrip(":")] = int(partes[1])
+    except OSError:
+        return {}
+    uss = campos.get("Private_Clean", 0) + campos.get("Private_Dirty", 0)
+    compartilhada = campos.get("Shared_Clean", 0) + campos.get("Shared_Dirty", 0)
+    return {
+        "rss_mb": round(campos.get("Rss", 0) / 1024, 1),
+        "uss_mb": round(uss / 1024, 1),
+        "compartilhada_mb": round(compartilhada / 1024, 1),
+    }
+
+
+def carregar_snapshots(pasta):
+    return tuple(
+        fonte.montar(catalogo.ler_snapshot(
+            fonte, os.path.join(pasta, fonte.arquivo), catalogo.caminho_snapshot(fonte, pasta)
+        ))
+        for fonte in (catalogo.SIMULADOR, catalogo.MATRIZ, catalogo.CALENDARIO)
+    )
+
+
+def tamanho_objetos(carregar, pasta):
+    """MiB dos objetos que ficam vivos e pico durante a carga (temporários inclusos)."""
+    gc.collect()
+    tracemalloc.start()
+    dados = carregar(pasta)
+    gc.collect()
+    atual, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del dados
+    return round(atual / (1024 * 1024), 1), round(pico / (1024 * 1024), 1)
+
+
+def executar_cenario(cenario, pasta, workers):
+    gc.collect()
+    mestre_antes = memoria()
+    dados = None
+    if cenario == "modelos_preload":
+        dados = carregar_modelos(pasta)
+        gc.collect()
+        # Tira os objetos do alcance do GC para ele não reescrever suas páginas
+        gc.freeze()
+    mestre = memoria()
+
+    filhos = []
+    for _ in range(workers):
+        leitura, escrita = os.pipe()
+        pid = os.fork()
+        if pid == 0:  # worker
+            os.close(leitura)
+            locais = dados
+            if cenario == "dicts_por_worker":
+                locais = carregar_dicts(pasta)
+            elif cenario == "modelos_por_worker":
+                locais = carregar_modelos(pasta)
+            percorrer(locais)
+            gc.collect()
+            with os.fdopen(escrita, "w") as saida:
+                json.dump(memoria(), saida)
+            os._exit(0)
+        os.close(escrita)
+        filhos.append((pid, leitura))
+
+    medidas = []
+    for pid, leitura in filhos:
+        with os.fdopen(leitura) as entrada:
+            medidas.append(json.load(entrada))
+        os.waitpid(pid, 0)
+
+    return {
+        "mestre_antes": mestre_antes,
+        "mestre": mestre,
+        "workers": medidas,
+        "uss_medio_worker_mb": round(sum(m.get("uss_mb", 0) for m in medidas) / max(len(medidas), 1), 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memória por worker: dicts x modelos compactos")
+    parser.add_argument("--escala", type=int, default=100, help="Multiplica os JSON por N (padrão 100)")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--cenario", choices=CENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument("--pasta", help=argparse.SUPPRESS)
+    parser.add_argument("--saida", help="Grava o relatório em JSON")
+    args = parser.parse_args(argv)
+
+    if not hasattr(os, "fork") or not os.path.exists("/proc/self/smaps_rollup"):
+        print("Este relatório precisa de Linux (fork e /proc/<pid>/smaps_rollup).")
+        return 1
+
+    # Cada cenário roda num processo novo para um não herdar a memória do outro
+    if args.cenario:
+        json.dump(executar_cenario(args.cenario, args.pasta, args.workers), sys.stdout)
+        return 0
+
+    import subprocess
+
+    relatorio = {"escala": args.escala, "workers": args.workers, "cenarios": {}}
+    with tempfile.TemporaryDirectory(prefix="lumi-rss-") as pasta:
+        gerar_dados(pasta, args.escala)
+        tamanho = sum(os.path.getsize(os.path.join(pasta, n)) for n in os.listdir(pasta))
+        relatorio["json_mb"] = round(tamanho / (1024 * 1024), 1)
+        print(f"JSON sintético ({args.escala}x): {relatorio['json_mb']} MB, {args.workers} workers")
+        catalogo.compilar(pasta, pasta)
+        relatorio["objetos_mb"] = {}
+        print(f"\n{'carga':<22}{'objetos vivos':>15}{'pico na carga':>15}")
+        for nome, funcao in (
+            ("dicts (json)", carregar_dicts),
+            ("modelos (json)", carregar_modelos),
+            ("modelos (snapshot)", carregar_snapshots),
+        ):
+            vivos, pico = tamanho_objetos(funcao, pasta)
+            relatorio["objetos_mb"][nome] = {"vivos": vivos, "pico": pico}
+            print(f"{nome:<22}{vivos:>12} MB{pico:>12} MB")
+        for nome in ("simulador.json", "matriz.json", "calendario.json"):
+            catalogo.invalidar(os.path.join(pasta, nome))
+        print()
+        print(f"{'cenário':<22}{'mestre RSS':>12}{'worker RSS':>12}{'worker USS':>12}{'compart.':>10}")
+        for cenario in CENARIOS:
+            saida = subprocess.run(
+                [sys.executable, __file__, "--cenario", cenario, "--pasta", pasta, "--workers", str(args.workers)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            resultado = json.loads(saida.strip().splitlines()[-1])
+            relatorio["cenarios"][cenario] = resultado
+            worker = resultado["workers"][0]
+            print(
+                f"{cenario:<22}{resultado['mestre']['rss_mb']:>10} MB{worker['rss_mb']:>9} MB"
+                f"{resultado['uss_medio_worker_mb']:>9} MB{worker['compartilhada_mb']:>7} MB"
+            )
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, indent=2, ensure_ascii=False)
+        print(f"\nRelatório gravado em {args.saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
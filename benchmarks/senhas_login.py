@@ -0,0 +1,181 @@
+# =======================================================
+# SENHAS – HASH NA THREAD x POOL DE PROCESSOS, CADASTRO EM LOTE
+# =======================================================
+# 1. Pico de logins: `--clientes` threads fazendo POST /login sem parar
+#    enquanto uma thread "sonda" pede uma página leve (/api/faq/busca) com
+#    outro aluno já logado. Compara o scrypt na thread da requisição
+#    (LUMI_SENHAS_PROCESSOS=0) com o pool de processos de lumi/senhas.py:
+#    logins por segundo e latência p50/p95 da sonda, que é o que os outros
+#    alunos sentem durante o pico.
+#
+# 2. Cadastro de `--alunos` alunos: um a um como o /register (três
+#    consultas de unicidade, hash e commit por aluno) x o caminho do
+#    `flask users-import` (uma passada de unicidade, hashes em paralelo,
+#    INSERT em blocos).
+#
+# Usa um SQLite temporário e o backend LLM local.
+#
+# Uso:
+#   python benchmarks/senhas_login.py [--clientes 8] [--segundos 5] [--alunos 200]
+# =======================================================
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(RAIZ))
+
+SENHA = "bench-senha-123"
+
+
+def preparar_ambiente(pasta):
+    # O engine é criado na importação do app: o banco vem antes do import
+    os.environ.update({
+        "DATABASE_URL": "sqlite:///" + os.path.join(pasta, "senhas.db"),
+        "LUMI_LLM_BACKEND": "fake",
+        "LUMI_SESSION_DIR": os.path.join(pasta, "sessoes"),
+        "LUMI_LOG_ARQUIVO": os.path.join(pasta, "lumi.log"),
+        "LUMI_ASSETS": "off",
+        "LUMI_SNAPSHOT_DIR": "off",
+        "LUMI_JINJA_CACHE_DIR": "off",
+    })
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[max(int(len(valores) * p) - 1, 0)] if valores else 0.0
+
+
+def pico_de_logins(lumi_app, processos, args):
+    pool = lumi_app.pool_senhas
+    pool.encerrar()
+    pool.processos = processos
+    pool.fila = max(processos, 1) * 4
+    pool.reiniciar()
+    if processos:
+        pool.gerar_hash("aquecimento")  # sobe o forkserver e os processos fora da medição
+
+    sonda = lumi_app.app.test_client()
+    sonda.post("/login", data={"login_identifier": "sonda@bench.com", "password": SENHA}, follow_redirects=True)
+    fim = time.time() + args.segundos
+    logins, latencias = [], []
+
+    def logar(n):
+        cliente = lumi_app.app.test_client()
+        feitos = 0
+        while time.time() < fim:
+            cliente.post("/login", data={"login_identifier": f"pico{n}@bench.com", "password": SENHA})
+            cliente.get("/logout")
+            feitos += 1
+        logins.append(feitos)
+
+    def sondar():
+        while time.time() < fim:
+            inicio = time.perf_counter()
+            sonda.get("/api/faq/busca?q=biblioteca")
+            latencias.append(time.perf_counter() - inicio)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=logar, args=(n,)) for n in range(args.clientes)]
+    threads.append(threading.Thread(target=sondar))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return {
+        "logins_s": round(sum(logins) / args.segundos, 1),
+        "sonda_p50_ms": round(statistics.median(latencias) * 1000, 2),
+        "sonda_p95_ms": round(percentil(latencias, 0.95) * 1000, 2),
+    }
+
+
+def cadastro_um_a_um(lumi_app, args):
+    User, db = lumi_app.User, lumi_app.db
+    inicio = time.perf_counter()
+    with lumi_app.app.app_context():
+        for i in range(args.alunos):
+            email, matricula, cpf = f"um{i}@bench.com", f"UM{i}", f"{i:011d}"
+            if (User.query.filter_by(email=email).first() or User.query.filter_by(matricula=matricula).first()
+                    or User.query.filter_by(cpf=cpf).first()):
+                continue
+            user = User(username=f"Aluno {i}", email=email, matricula=matricula, cpf=cpf)
+            user.set_password(SENHA)
+            db.session.add(user)
+            db.session.commit()
+    return round(time.perf_counter() - inicio, 2)
+
+
+def cadastro_em_lote(lumi_app, args):
+    import io
+
+    from lumi import provisionamento, senhas
+
+    csv_alunos = "matricula,email,cpf,senha\n" + "".join(
+        f"LT{i},lt{i}@bench.com,{i + 10**9:011d},{SENHA}\n" for i in range(args.alunos)
+    )
+    tabela = lumi_app.User.__table__
+    inicio = time.perf_counter()
+    with lumi_app.app.app_context():
+        linhas, _ = provisionamento.ler_csv(io.StringIO(csv_alunos))
+        with lumi_app.db.engine.connect() as conexao:
+            existentes = provisionamento.ja_cadastrados(conexao, tabela, linhas)
+        novas, _ = provisionamento.separar_novos(linhas, existentes)
+        hashes = senhas.gerar_hashes([linha["senha"] for linha in novas])
+        provisionamento.inserir(lumi_app.db.engine, tabela, provisionamento.registros_usuarios(novas, hashes))
+    return round(time.perf_counter() - inicio, 2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Hash de senhas: thread x pool de processos; cadastro em lote")
+    parser.add_argument("--clientes", type=int, default=8, help="Threads fazendo login")
+    parser.add_argument("--segundos", type=float, default=5)
+    parser.add_argument("--processos", type=int, default=2, help="Processos do pool")
+    parser.add_argument("--alunos", type=int, default=200, help="Alunos no teste de cadastro")
+    parser.add_argument("--saida", help="Grava o relatório em JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="lumi-senhas-") as pasta:
+        preparar_ambiente(pasta)
+        import app as lumi_app
+
+        with lumi_app.app.app_context():
+            lumi_app.db.create_all()
+            for email in ["sonda@bench.com"] + [f"pico{n}@bench.com" for n in range(args.clientes)]:
+                user = lumi_app.User(username=email, email=email, matricula=email)
+                user.set_password(SENHA)
+                lumi_app.db.session.add(user)
+            lumi_app.db.session.commit()
+
+        relatorio = {"cpus": os.cpu_count(), "clientes": args.clientes, "pico": {}}
+        print(f"{os.cpu_count()} CPU(s), {args.clientes} threads fazendo login, {args.segundos:g}s por cenário\n")
+        print(f"{'cenário':<22}{'logins/s':>10}{'sonda p50':>12}{'sonda p95':>12}")
+        for nome, processos in (("na thread", 0), (f"pool ({args.processos} proc.)", args.processos)):
+            r = relatorio["pico"][nome] = pico_de_logins(lumi_app, processos, args)
+            print(f"{nome:<22}{r['logins_s']:>10}{r['sonda_p50_ms']:>9} ms{r['sonda_p95_ms']:>9} ms")
+        lumi_app.pool_senhas.encerrar()
+
+        lumi_app.pool_senhas.processos = 0
+        relatorio["cadastro"] = {
+            "alunos": args.alunos,
+            "um_a_um_s": cadastro_um_a_um(lumi_app, args),
+            "lote_s": cadastro_em_lote(lumi_app, args),
+        }
+        c = relatorio["cadastro"]
+        print(f"\ncadastro de {args.alunos} alunos: um a um {c['um_a_um_s']}s, em lote {c['lote_s']}s")
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, indent=2, ensure_ascii=False)
+        print(f"\nRelatório gravado em {args.saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+# =======================================================
+# CONFIGURAÇÃO DO GUNICORN
+# =======================================================
+# gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Variáveis de ambiente:
+#   PORT                 porta (padrão 8000)
+#   WEB_CONCURRENCY      número de workers (padrão 2)
+#   LUMI_WORKER_CLASS    gthread (padrão), sync ou gevent
+#   LUMI_THREADS         threads por worker no gthread (padrão 4)
+#   LUMI_TIMEOUT         segundos antes de matar um worker travado (padrão 120,
+#                        as respostas do Gemini podem demorar)
+#   LUMI_PRELOAD         0 desliga o preload (cada worker importa o app sozinho)
+#   LUMI_MAX_REQUESTS    recicla o worker após N requisições (0 = nunca)
+#   LUMI_METRICS_DIR     pasta onde os workers somam as métricas do /metrics
+#                        (padrão: uma pasta temporária por execução)
+# =======================================================
+
+import gc
+import os
+import shutil
+import tempfile
+
+worker_class = os.environ.get("LUMI_WORKER_CLASS", "gthread")
+
+if worker_class == "gevent":
+    # Com preload o app é importado aqui no mestre; o patch precisa vir antes
+    # para que sockets, locks e threads do app já nasçam cooperativos.
+    from gevent import monkey
+
+    monkey.patch_all()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+threads = int(os.environ.get("LUMI_THREADS", "4"))
+worker_connections = int(os.environ.get("LUMI_WORKER_CONNECTIONS", "200"))
+timeout = int(os.environ.get("LUMI_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+max_requests = int(os.environ.get("LUMI_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+preload_app = os.environ.get("LUMI_PRELOAD", "1") != "0"
+
+# /metrics soma os números de todos os workers a partir de uma pasta
+# compartilhada (ver lumi/metricas.py); sem LUMI_METRICS_DIR, uma pasta
+# temporária nova a cada execução, apagada no fim
+pasta_metricas_temporaria = "LUMI_METRICS_DIR" not in os.environ
+if pasta_metricas_temporaria:
+    os.environ["LUMI_METRICS_DIR"] = os.path.join(tempfile.gettempdir(), f"lumi-metricas-{os.getpid()}")
+
+# O app já grava um registro de acesso por requisição em lumi.log
+accesslog = None
+errorlog = "-"
+
+
+def on_starting(server):
+    """Sem preload, gera static/dist uma vez aqui no mestre.
+
+    Os workers importam o app depois do fork e só leem o manifesto pronto,
+    em vez de todos reconstruírem a mesma pasta ao mesmo tempo.
+    """
+    if not preload_app and os.environ.get("LUMI_ASSETS", "auto").lower() == "auto":
+        from lumi import estaticos
+
+        pasta_static = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+        try:
+            estaticos.construir_manifesto(pasta_static)
+        except OSError as e:
+            server.log.warning("Falha ao gerar static/dist (%s); os workers tentam de novo.", e)
+        else:
+            os.environ["LUMI_ASSETS"] = "manifesto"
+
+
+def when_ready(server):
+    """Congela os objetos já montados no mestre antes do primeiro fork.
+
+    O gc.freeze() tira esses objetos das gerações do coletor: sem isso cada
+    coleta nos workers reescreve o cabeçalho dos objetos e copia as páginas
+    que deveriam continuar compartilhadas.
+    """
+    if preload_app:
+        gc.collect()
+        gc.freeze()
+
+
+def on_exit(server):
+    if pasta_metricas_temporaria:
+        shutil.rmtree(os.environ["LUMI_METRICS_DIR"], ignore_errors=True)
+
+
+def post_worker_init(worker):
+    """Refaz no worker conexões, clientes e threads herdados do mestre.
+
+    Roda depois do init do worker (e do patch do gevent), antes da primeira
+    requisição.
+    """
+    if preload_app:
+        from app import reiniciar_pos_fork
+
+        reiniciar_pos_fork()
+    else:
+        # Cada worker importou o app sozinho, mas o log continua sendo um
+        # arquivo por processo (ver lumi/registro.py)
+        from lumi import registro
+
+        registro.configurar_logging(por_processo=True)
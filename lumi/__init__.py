@@ -0,0 +1,5 @@
+"""Módulos de apoio do servidor Lumi (métricas, infraestrutura e serviços).
+
+Cada módulo expõe funções puras e, quando precisa se ligar ao Flask,
+um `init_app(app, ...)` chamado a partir do app.py.
+"""
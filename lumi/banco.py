@@ -0,0 +1,131 @@
+# =======================================================
+# ENGINE DO BANCO (SQLite local, Postgres no Render)
+# =======================================================
+# Opções do engine vindas de variáveis de ambiente:
+#
+# SQLite (arquivo):
+#   - journal_mode=WAL: leitores não esperam o escritor (o chat grava a cada
+#     mensagem enquanto outras páginas leem); synchronous=NORMAL, seguro com
+#     WAL, troca um fsync por commit por um fsync por checkpoint.
+#   - busy_timeout: escritores concorrentes esperam a vez em vez de falhar
+#     na hora com "database is locked".
+#   LUMI_SQLITE_WAL=0 volta ao journal padrão; LUMI_SQLITE_BUSY_TIMEOUT_MS
+#   (padrão 5000).
+#
+# Postgres:
+#   - pool por worker: LUMI_DB_POOL_SIZE (padrão LUMI_THREADS, uma conexão
+#     por thread do gthread) + LUMI_DB_MAX_OVERFLOW (padrão 2). O total é
+#     workers x (pool + overflow) e precisa caber no max_connections do banco.
+#   - pool_pre_ping descarta conexões que o servidor fechou; pool_recycle
+#     (LUMI_DB_POOL_RECYCLE, padrão 1800 s) as renova antes do limite do
+#     proxy/servidor.
+#   - statement_timeout (LUMI_DB_STATEMENT_TIMEOUT_MS, padrão 30000) corta
+#     consultas que prenderiam o worker.
+#   LUMI_DB_POOL_TIMEOUT (padrão 10 s): espera máxima por uma conexão livre.
+#
+# Métricas em /metrics: espera para obter conexão do pool, conexões em uso
+# e timeouts do pool (a duração das consultas fica em lumi/metricas.py).
+# =======================================================
+
+import os
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as TimeoutPool
+from sqlalchemy.pool import QueuePool
+
+from lumi import metricas
+
+ESPERA_POOL = metricas.REGISTRO.histograma(
+    "lumi_db_pool_checkout_wait_seconds",
+    "Tempo esperando uma conexão livre no pool.",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0),
+)
+CONEXOES_EM_USO = metricas.REGISTRO.gauge(
+    "lumi_db_pool_connections_in_use", "Conexões do pool emprestadas no momento."
+)
+TIMEOUTS_POOL = metricas.REGISTRO.contador(
+    "lumi_db_pool_timeouts_total", "Pedidos de conexão que estouraram LUMI_DB_POOL_TIMEOUT."
+)
+
+
+class PoolMedido(QueuePool):
+    """QueuePool que mede a espera por conexão (o SQLAlchemy não tem evento para isso)."""
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except TimeoutPool:
+            TIMEOUTS_POOL.inc()
+            raise
+        finally:
+            ESPERA_POOL.observar(time.perf_counter() - inicio)
+
+
+def _inteiro(nome, padrao):
+    return int(os.environ.get(nome) or padrao)
+
+
+def _sqlite_em_arquivo(url):
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+
+def opcoes_engine(uri):
+    """SQLALCHEMY_ENGINE_OPTIONS para a URI do banco."""
+    url = make_url(uri)
+    if _sqlite_em_arquivo(url):
+        return {
+            "poolclass": PoolMedido,
+            # busy_timeout do sqlite3 (em segundos)
+            "connect_args": {"timeout": _inteiro("LUMI_SQLITE_BUSY_TIMEOUT_MS", 5000) / 1000},
+        }
+    if url.get_backend_name() == "postgresql":
+        return {
+            "poolclass": PoolMedido,
+            "pool_size": _inteiro("LUMI_DB_POOL_SIZE", _inteiro("LUMI_THREADS", 4)),
+            "max_overflow": _inteiro("LUMI_DB_MAX_OVERFLOW", 2),
+            "pool_timeout": _inteiro("LUMI_DB_POOL_TIMEOUT", 10),
+            "pool_recycle": _inteiro("LUMI_DB_POOL_RECYCLE", 1800),
+            "pool_pre_ping": True,
+            "connect_args": {
+                "connect_timeout": 10,
+                "application_name": "lumi",
+                "options": f"-c statement_timeout={_inteiro('LUMI_DB_STATEMENT_TIMEOUT_MS', 30000)}",
+            },
+        }
+    return {}
+
+
+def _pragmas_sqlite(conexao_dbapi, registro_conexao):
+    cursor = conexao_dbapi.cursor()
+    try:
+        if os.environ.get("LUMI_SQLITE_WAL", "1") != "0":
+            cursor.execute("PRAGMA journal_mode = WAL")
+            cursor.execute("PRAGMA synchronous = NORMAL")
+    finally:
+        cursor.close()
+
+
+def preparar_engine(engine):
+    """Liga os PRAGMAs do SQLite e as métricas do pool a um engine já criado."""
+    if _sqlite_em_arquivo(engine.url):
+        event.listen(engine, "connect", _pragmas_sqlite)
+    if isinstance(engine.pool, PoolMedido):
+        # Lê do pool atual: dispose() troca o pool do engine (e leva os eventos)
+        def _emprestada(*_):
+            CONEXOES_EM_USO.definir(valor=engine.pool.checkedout())
+
+        def _devolvida(*_):
+            # O evento chega antes de a conexão voltar para a fila do pool
+            CONEXOES_EM_USO.definir(valor=max(engine.pool.checkedout() - 1, 0))
+
+        event.listen(engine.pool, "checkout", _emprestada)
+        event.listen(engine.pool, "checkin", _devolvida)
+    return engine
+
+
+def init_app(app, db):
+    with app.app_context():
+        preparar_engine(db.engine)
@@ -0,0 +1,237 @@
+# =======================================================
+# BUSCA TEXTUAL NO HISTÓRICO DO CHAT
+# =======================================================
+# SQLite: tabela virtual FTS5 com "external content" (o texto continua só
+# em chat_history; o índice guarda os tokens). O tokenizer unicode61 com
+# remove_diacritics=2 faz "calculo" encontrar "Cálculo". O dono da mensagem
+# é indexado como token ("u42"), então a busca de um aluno percorre só as
+# listas de documentos dele, mesmo com milhões de mensagens no total.
+#
+# Postgres: índice GIN sobre to_tsvector('lumi_pt', content), onde lumi_pt é
+# a configuração portuguesa com a extensão unaccent. O próprio Postgres
+# mantém o índice; no SQLite quem mantém é `indexar()`/`remover_do_usuario()`.
+#
+# Resultados vêm ordenados por relevância (bm25 / ts_rank) com um trecho em
+# que os termos encontrados aparecem entre <mark></mark> (HTML escapado).
+# =======================================================
+
+import html
+import re
+
+from sqlalchemy import event, text
+
+TABELA_FTS = "chat_history_fts"
+VIEW_FTS = "chat_history_busca_v"
+CONFIG_PG = "lumi_pt"
+LIMITE_PADRAO = 20
+LIMITE_MAXIMO = 100
+
+# Marcadores internos do trecho: trocados por <mark> depois do escape HTML
+INICIO_MARCA = "\x02"
+FIM_MARCA = "\x03"
+
+TERMO = re.compile(r"\w+", re.UNICODE)
+
+DDL_SQLITE = (
+    f"""CREATE VIEW IF NOT EXISTS {VIEW_FTS} AS
+        SELECT id, content, 'u' || user_id AS dono FROM chat_history""",
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA_FTS} USING fts5(
+        content, dono,
+        content='{VIEW_FTS}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+)
+DROP_SQLITE = (
+    f"DROP TABLE IF EXISTS {TABELA_FTS}",
+    f"DROP VIEW IF EXISTS {VIEW_FTS}",
+)
+
+DDL_POSTGRES = (
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    f"""DO $$ BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = '{CONFIG_PG}') THEN
+            CREATE TEXT SEARCH CONFIGURATION {CONFIG_PG} (COPY = portuguese);
+            ALTER TEXT SEARCH CONFIGURATION {CONFIG_PG}
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+        END IF;
+    END $$""",
+    f"""CREATE INDEX IF NOT EXISTS ix_chat_history_busca
+        ON chat_history USING gin (to_tsvector('{CONFIG_PG}', content))""",
+    "CREATE INDEX IF NOT EXISTS ix_chat_history_user_id ON chat_history (user_id)",
+)
+
+
+# id(engine) -> o índice FTS existe? (evita consultar sqlite_master a cada insert)
+_estrutura_ok = {}
+
+
+def _dialeto(bind):
+    return bind.dialect.name
+
+
+def _indice_existe(conexao):
+    return conexao.execute(
+        text("SELECT 1 FROM sqlite_master WHERE name = :nome"), {"nome": TABELA_FTS}
+    ).first() is not None
+
+
+def _indice_pronto(sessao):
+    bind = sessao.get_bind()
+    if _dialeto(bind) != "sqlite":
+        return False
+    chave = id(bind)
+    if chave not in _estrutura_ok:
+        _estrutura_ok[chave] = _indice_existe(sessao)
+    return _estrutura_ok[chave]
+
+
+# =======================================================
+# ESTRUTURA (DDL)
+# =======================================================
+def criar_estrutura(conexao):
+    """Cria o índice de busca do dialeto da conexão (idempotente)."""
+    dialeto = _dialeto(conexao)
+    comandos = DDL_SQLITE if dialeto == "sqlite" else DDL_POSTGRES if dialeto == "postgresql" else ()
+    for comando in comandos:
+        conexao.execute(text(comando))
+    _estrutura_ok.clear()
+
+
+def remover_estrutura(conexao):
+    if _dialeto(conexao) == "sqlite":
+        for comando in DROP_SQLITE:
+            conexao.execute(text(comando))
+    _estrutura_ok.clear()
+
+
+def garantir_estrutura(conexao):
+    """Cria e preenche o índice se ele ainda não existe (bancos antigos)."""
+    if _dialeto(conexao) == "sqlite" and not _indice_existe(conexao):
+        reconstruir(conexao)
+    elif _dialeto(conexao) == "postgresql":
+        criar_estrutura(conexao)
+
+
+def registrar_ddl(tabela_chat):
+    """Cria/remove o índice junto com a tabela chat_history (create_all/drop_all)."""
+    event.listen(tabela_chat, "after_create", lambda alvo, conexao, **kw: criar_estrutura(conexao))
+    event.listen(tabela_chat, "before_drop", lambda alvo, conexao, **kw: remover_estrutura(conexao))
+
+
+def reconstruir(conexao):
+    """Backfill: cria a estrutura se faltar e reindexa todo o histórico."""
+    criar_estrutura(conexao)
+    if _dialeto(conexao) == "sqlite":
+        conexao.execute(text(f"INSERT INTO {TABELA_FTS}({TABELA_FTS}) VALUES ('rebuild')"))
+    elif _dialeto(conexao) == "postgresql":
+        conexao.execute(text("REINDEX INDEX ix_chat_history_busca"))
+
+
+# =======================================================
+# SINCRONIZAÇÃO (SQLite)
+# =======================================================
+def indexar(sessao, mensagem):
+    """Indexa uma mensagem recém-inserida (precisa de `id`, use flush antes)."""
+    if not _indice_pronto(sessao):
+        return
+    sessao.execute(
+        text(f"INSERT INTO {TABELA_FTS}(rowid, content, dono) VALUES (:id, :content, :dono)"),
+        {"id": mensagem.id, "content": mensagem.content, "dono": f"u{mensagem.user_id}"},
+    )
+
+
+def remover_do_usuario(sessao, user_id, ids=None):
+    """Tira do índice as mensagens do usuário (todas, ou só `ids`) ANTES do DELETE."""
+    if not _indice_pronto(sessao):
+        return
+    filtro = "user_id = :user_id"
+    params = {"user_id": user_id}
+    if ids is not None:
+        if not ids:
+            return
+        filtro += f" AND id IN ({','.join(str(int(i)) for i in ids)})"
+    sessao.execute(
+        text(
+            f"INSERT INTO {TABELA_FTS}({TABELA_FTS}, rowid, content, dono) "
+            f"SELECT 'delete', id, content, 'u' || user_id FROM chat_history WHERE {filtro}"
+        ),
+        params,
+    )
+
+
+# =======================================================
+# CONSULTA
+# =======================================================
+def _consulta_fts5(termos):
+    # Cada termo entre aspas (sem operadores do usuário); o último vira
+    # prefixo para a busca funcionar enquanto o aluno digita.
+    partes = [f'"{t}"' for t in termos]
+    partes[-1] += "*"
+    return " AND ".join(partes)
+
+
+def _trecho_html(trecho):
+    escapado = html.escape(trecho or "")
+    return escapado.replace(INICIO_MARCA, "<mark>").replace(FIM_MARCA, "</mark>")
+
+
+def buscar(sessao, user_id, consulta, limite=LIMITE_PADRAO, depois_de=0):
+    """Mensagens do usuário que casam com `consulta`, mais relevantes primeiro.
+
+    `depois_de`: ignora mensagens com id até esse valor (apagadas pelo
+    /limpar, ainda sendo removidas em segundo plano).
+    """
+    termos = TERMO.findall(consulta or "")
+    if not termos:
+        return []
+    limite = max(1, min(int(limite), LIMITE_MAXIMO))
+    dialeto = _dialeto(sessao.get_bind())
+
+    if dialeto == "sqlite":
+        sql = text(
+            f"""SELECT h.id, h.role, h.timestamp,
+                       snippet({TABELA_FTS}, 0, :ini, :fim, '…', 16) AS trecho
+                FROM {TABELA_FTS}
+                JOIN chat_history h ON h.id = {TABELA_FTS}.rowid
+                WHERE {TABELA_FTS} MATCH :consulta AND h.id > :depois_de
+                ORDER BY bm25({TABELA_FTS})
+                LIMIT :limite"""
+        )
+        params = {
+            "consulta": f"dono:u{int(user_id)} AND content:({_consulta_fts5(termos)})",
+            "depois_de": depois_de,
+            "ini": INICIO_MARCA,
+            "fim": FIM_MARCA,
+            "limite": limite,
+        }
+    elif dialeto == "postgresql":
+        sql = text(
+            f"""SELECT h.id, h.role, h.timestamp,
+                       ts_headline('{CONFIG_PG}', h.content, q,
+                                   'StartSel=' || :ini || ', StopSel=' || :fim || ', MaxWords=24, MinWords=8') AS trecho
+                FROM chat_history h, websearch_to_tsquery('{CONFIG_PG}', :consulta) q
+                WHERE h.user_id = :user_id AND h.id > :depois_de
+                  AND to_tsvector('{CONFIG_PG}', h.content) @@ q
+                ORDER BY ts_rank(to_tsvector('{CONFIG_PG}', h.content), q) DESC
+                LIMIT :limite"""
+        )
+        params = {
+            "consulta": " ".join(termos),
+            "user_id": user_id,
+            "depois_de": depois_de,
+            "ini": INICIO_MARCA,
+            "fim": FIM_MARCA,
+            "limite": limite,
+        }
+    else:
+        return []
+
+    return [
+        {
+            "id": linha.id,
+            "role": linha.role,
+            "timestamp": linha.timestamp.isoformat() if hasattr(linha.timestamp, "isoformat") else linha.timestamp,
+            "trecho": _trecho_html(linha.trecho),
+        }
+        for linha in sessao.execute(sql, params)
+    ]
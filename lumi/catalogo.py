@@ -0,0 +1,688 @@
+# =======================================================
+# MODELOS COMPACTOS DOS DADOS ACADÊMICOS (somente leitura)
+# =======================================================
+# simulador.json, matriz.json e calendario.json viram objetos com __slots__
+# (sem __dict__ por instância) e tuplas, em vez de dicts aninhados. Textos
+# que se repetem muito (disciplina, professor, sala, dia da semana, letra da
+# alternativa, tipo de evento) passam por sys.intern: todas as ocorrências
+# apontam para a mesma string.
+#
+# Cada fonte passa por duas etapas:
+#   normalizar  JSON -> tuplas simples (validação leniente, com avisos)
+#   montar      tuplas -> objetos
+# As tuplas normalizadas são o que o snapshot binário guarda (ver
+# `compilar()` e o comando `flask data-compile`): na carga, se existe um
+# snapshot atualizado da fonte, o app pula o json.load e a normalização.
+#
+# Os objetos são carregados uma vez e guardados em cache por arquivo; o
+# cache só é refeito quando o arquivo muda (mtime/tamanho) ou quando o app
+# chama `invalidar()` depois de gravá-lo. Como o carregamento acontece na
+# importação do app, com `gunicorn --preload` os workers herdam as mesmas
+# páginas de memória do processo mestre (copy-on-write), em vez de cada um
+# montar sua cópia.
+# =======================================================
+
+import hashlib
+import json
+import marshal
+import os
+import re
+import struct
+import sys
+import threading
+import uuid
+from datetime import datetime
+
+from lumi import metricas
+
+MESES_CURTOS = ("JAN", "FEV", "MAR", "ABR", "MAI", "JUN", "JUL", "AGO", "SET", "OUT", "NOV", "DEZ")
+
+CARGAS = metricas.REGISTRO.contador(
+    "lumi_catalogo_loads_total", "Cargas dos dados acadêmicos, por fonte e origem.", ("fonte", "origem")
+)
+
+# Tuplas de letras iguais ("A".."E") são compartilhadas entre as questões
+_letras_compartilhadas = {}
+
+
+def _i(valor):
+    """Interna strings; outros valores passam direto."""
+    return sys.intern(valor) if isinstance(valor, str) else valor
+
+
+def _letras(chaves):
+    chaves = tuple(_i(c) for c in chaves)
+    return _letras_compartilhadas.setdefault(chaves, chaves)
+
+
+class Fonte:
+    """Um arquivo de dados: JSON -> tuplas normalizadas -> objetos."""
+
+    def __init__(self, nome, arquivo, normalizar, montar, esquema, verificar=None):
+        self.nome = nome
+        self.arquivo = arquivo
+        self.normalizar = normalizar
+        self.montar = montar
+        self.esquema = esquema
+        self.verificar = verificar
+
+    def __call__(self, dados):
+        return self.montar(self.normalizar(dados))
+
+    def validar(self, dados):
+        """Erros de esquema e de conteúdo (lista vazia = válido)."""
+        erros = validar_esquema(dados, self.esquema)
+        if not erros and self.verificar is not None:
+            erros = self.verificar(dados)
+        return erros
+
+
+# =======================================================
+# SIMULADOR
+# =======================================================
+class Questao:
+    __slots__ = ("id", "enunciado", "letras", "textos", "correta", "feedback")
+
+    def __init__(self, id, enunciado, letras, textos, correta, feedback=""):
+        self.id = id
+        self.enunciado = enunciado
+        self.letras = _letras(letras)
+        self.textos = textos
+        self.correta = _i(correta)
+        self.feedback = feedback
+
+    @property
+    def alternativas(self):
+        return dict(zip(self.letras, self.textos))
+
+    def to_dict(self, gabarito=True):
+        """Formato do simulador.json; gabarito=False omite `correct` e `feedback`."""
+        dados = {
+            "id": self.id,
+            "stem": self.enunciado,
+            "options": self.alternativas,
+        }
+        if gabarito:
+            dados["correct"] = self.correta
+            dados["feedback"] = self.feedback
+        return dados
+
+
+class PoolQuestoes:
+    __slots__ = ("disciplina", "total_esperado", "questoes")
+
+    def __init__(self, disciplina, total_esperado, questoes):
+        self.disciplina = _i(disciplina)
+        self.total_esperado = total_esperado
+        self.questoes = tuple(questoes)
+
+    def pertence(self, prefixo):
+        # Mesmo critério de antes: o id da 1ª questão começa com o prefixo
+        return bool(self.questoes) and self.questoes[0].id.startswith(prefixo)
+
+    def to_dict(self, gabarito=True):
+        return {
+            "discipline": self.disciplina,
+            "total_expected": self.total_esperado,
+            "questions": [q.to_dict(gabarito) for q in self.questoes],
+        }
+
+
+class BancoQuestoes:
+    __slots__ = ("versao", "projeto", "politica", "pools", "por_id")
+
+    def __init__(self, versao, projeto, politica, pools):
+        self.versao = versao
+        self.projeto = projeto
+        self.politica = politica
+        self.pools = tuple(pools)
+        self.por_id = {q.id: q for pool in self.pools for q in pool.questoes}
+
+    def __len__(self):
+        return len(self.por_id)
+
+    def questoes(self, disciplina="todas"):
+        pools = self.pools if disciplina == "todas" else [p for p in self.pools if p.pertence(disciplina)]
+        return [q for pool in pools for q in pool.questoes]
+
+    def to_dict(self, gabarito=True):
+        return {
+            "version": self.versao,
+            "project": self.projeto,
+            "policy": self.politica,
+            "pools": [p.to_dict(gabarito) for p in self.pools],
+        }
+
+
+def normalizar_banco(dados):
+    if not isinstance(dados, dict) or not isinstance(dados.get("pools"), list):
+        print("AVISO: simulador.json possui formato inválido. Esperado objeto com 'pools'.")
+        return None
+    pools = []
+    for pool in dados["pools"]:
+        questoes = []
+        for q in pool.get("questions", []):
+            if not isinstance(q, dict):
+                continue
+            opcoes = q.get("options") or {}
+            questoes.append((
+                q.get("id", ""), q.get("stem", ""),
+                _letras(opcoes.keys()), tuple(opcoes.values()),
+                _i(q.get("correct")), q.get("feedback", ""),
+            ))
+        pools.append((_i(pool.get("discipline", "")), pool.get("total_expected"), tuple(questoes)))
+    return (dados.get("version"), dados.get("project"), dados.get("policy", {}), tuple(pools))
+
+
+def montar_banco(linhas):
+    if linhas is None:
+        return None
+    versao, projeto, politica, pools = linhas
+    return BancoQuestoes(
+        versao, projeto, politica,
+        [PoolQuestoes(disciplina, total, [Questao(*q) for q in questoes]) for disciplina, total, questoes in pools],
+    )
+
+
+def _verificar_banco(dados):
+    erros = []
+    vistos = set()
+    for p, pool in enumerate(dados["pools"]):
+        for n, q in enumerate(pool["questions"]):
+            caminho = f"$.pools[{p}].questions[{n}]"
+            if q["correct"] not in q["options"]:
+                erros.append(f"{caminho}.correct: '{q['correct']}' não é uma das alternativas")
+            if q["id"] in vistos:
+                erros.append(f"{caminho}.id: id repetido '{q['id']}'")
+            vistos.add(q["id"])
+    return erros
+
+
+# =======================================================
+# MATRIZ CURRICULAR
+# =======================================================
+class Disciplina:
+    __slots__ = ("nome", "professor", "dia", "horario", "sala")
+
+    def __init__(self, nome, professor, dia, horario, sala):
+        self.nome = _i(nome)
+        self.professor = _i(professor)
+        self.dia = _i(dia)
+        self.horario = _i(horario)
+        self.sala = _i(sala)
+
+
+class Prova:
+    __slots__ = ("va", "periodo")
+
+    def __init__(self, va, periodo):
+        self.va = _i(va)
+        self.periodo = _i(periodo)
+
+
+class Projeto:
+    __slots__ = ("mes", "titulo", "entrega")
+
+    def __init__(self, mes, titulo, entrega):
+        self.mes = _i(mes)
+        self.titulo = titulo
+        self.entrega = entrega
+
+
+class Periodo:
+    __slots__ = ("periodo", "disciplinas", "provas", "projetos")
+
+    def __init__(self, periodo, disciplinas, provas=(), projetos=()):
+        self.periodo = _i(periodo)
+        self.disciplinas = tuple(disciplinas)
+        self.provas = tuple(provas)
+        self.projetos = tuple(projetos)
+
+
+def normalizar_matriz(dados):
+    if isinstance(dados, dict):
+        print("AVISO: matriz.json em formato antigo (objeto único). Convertendo para lista.")
+        dados = [dados]
+    if not dados or not isinstance(dados, list):
+        print("AVISO: Falha ao carregar ou formato inválido para matriz.json.")
+        return None
+    return tuple(
+        (
+            _i(p.get("periodo")),
+            tuple(
+                tuple(_i(d.get(c)) for c in ("nome", "professor", "dia", "horario", "sala"))
+                for d in p.get("disciplinas", [])
+            ),
+            tuple((_i(v.get("va")), _i(v.get("periodo"))) for v in p.get("provas", [])),
+            tuple((_i(j.get("mes")), j.get("titulo"), j.get("entrega")) for j in p.get("projetos", [])),
+        )
+        for p in dados
+        if isinstance(p, dict)
+    )
+
+
+def montar_matriz(linhas):
+    if linhas is None:
+        return None
+    return tuple(
+        Periodo(
+            periodo,
+            [Disciplina(*d) for d in disciplinas],
+            [Prova(*v) for v in provas],
+            [Projeto(*j) for j in projetos],
+        )
+        for periodo, disciplinas, provas, projetos in linhas
+    )
+
+
+# =======================================================
+# CALENDÁRIO
+# =======================================================
+class Evento:
+    __slots__ = ("id", "titulo", "data_obj", "data_fim", "tipo", "descricao")
+
+    def __init__(self, id, titulo, data_obj, data_fim=None, tipo="Outro", descricao=""):
+        self.id = id
+        self.titulo = titulo
+        self.data_obj = data_obj
+        self.data_fim = data_fim
+        self.tipo = _i(tipo)
+        self.descricao = descricao
+
+    # A data em texto e o mês abreviado saem do datetime (não são guardados)
+    @property
+    def data(self):
+        return self.data_obj.strftime("%Y-%m-%d")
+
+    @property
+    def mes_curto(self):
+        return MESES_CURTOS[self.data_obj.month - 1]
+
+    def to_dict(self):
+        """Mesmo formato que o template do calendário sempre recebeu."""
+        return {
+            "id": self.id,
+            "title": self.titulo,
+            "date": self.data,
+            "type": self.tipo,
+            "description": self.descricao,
+            "data_obj": self.data_obj,
+            "data_fim": self.data_fim,
+            "mes_curto": self.mes_curto,
+        }
+
+
+def normalizar_calendario(dados):
+    if dados is None:
+        print("AVISO: calendario.json não foi carregado. Retornando lista vazia.")
+        return ()
+    if not isinstance(dados, list):
+        print("AVISO: calendario.json possui formato inválido. Esperada lista de eventos.")
+        return ()
+
+    eventos = []
+    for item in dados:
+        if not isinstance(item, dict):
+            print(f"AVISO: Evento ignorado por formato inválido: {item}")
+            continue
+
+        data_inicio = item.get("data_inicio")
+        if not data_inicio:
+            print(f"AVISO: Evento sem data de início ignorado: {item}")
+            continue
+        try:
+            data_inicio_obj = datetime.strptime(data_inicio, "%Y-%m-%d")
+        except ValueError:
+            print(f"AVISO: Data de início inválida ignorada: {data_inicio}")
+            continue
+
+        data_fim = item.get("data_fim")
+        data_fim_iso = None
+        if data_fim:
+            try:
+                data_fim_iso = datetime.strptime(data_fim, "%Y-%m-%d").strftime("%Y-%m-%d")
+            except ValueError:
+                print(f"AVISO: Data final inválida ignorada: {data_fim}")
+
+        eventos.append((
+            item.get("id") or str(uuid.uuid4()),
+            item.get("descricao", "Evento sem descrição"),
+            # (ano, mês, dia): o datetime é recriado na montagem
+            (data_inicio_obj.year, data_inicio_obj.month, data_inicio_obj.day),
+            data_fim_iso,
+            _i(item.get("type", "Outro")),
+            item.get("description", ""),
+        ))
+    eventos.sort(key=lambda e: e[2])
+    return tuple(eventos)
+
+
+def montar_calendario(linhas):
+    return tuple(
+        Evento(id, titulo, datetime(*data), data_fim, tipo, descricao)
+        for id, titulo, data, data_fim, tipo, descricao in linhas
+    )
+
+
+def _verificar_calendario(dados):
+    erros = []
+    for n, item in enumerate(dados):
+        datas = {}
+        for campo in ("data_inicio", "data_fim"):
+            if item.get(campo):
+                try:
+                    datas[campo] = datetime.strptime(item[campo], "%Y-%m-%d")
+                except ValueError:
+                    erros.append(f"$[{n}].{campo}: data inexistente '{item[campo]}'")
+        if len(datas) == 2 and datas["data_fim"] < datas["data_inicio"]:
+            erros.append(f"$[{n}].data_fim: anterior à data_inicio")
+    return erros
+
+
+# =======================================================
+# ESQUEMAS (subconjunto de JSON Schema)
+# =======================================================
+DATA_ISO = r"^\d{4}-\d{2}-\d{2}$"
+TEXTO = {"type": "string"}
+TEXTO_NAO_VAZIO = {"type": "string", "minLength": 1}
+
+
+def _objeto(obrigatorios, opcionais=None):
+    propriedades = {**obrigatorios, **(opcionais or {})}
+    return {"type": "object", "required": list(obrigatorios), "properties": propriedades}
+
+
+ESQUEMA_QUESTAO = _objeto(
+    {
+        "id": TEXTO_NAO_VAZIO,
+        "stem": TEXTO_NAO_VAZIO,
+        "options": {"type": "object", "minProperties": 2, "additionalProperties": TEXTO},
+        "correct": TEXTO_NAO_VAZIO,
+    },
+    {"feedback": TEXTO},
+)
+
+ESQUEMA_FLASHCARD = _objeto({"pergunta": TEXTO_NAO_VAZIO, "resposta": TEXTO_NAO_VAZIO})
+
+ESQUEMA_SIMULADOR = _objeto({
+    "pools": {
+        "type": "array",
+        "items": _objeto({
+            "discipline": TEXTO_NAO_VAZIO,
+            "questions": {"type": "array", "minItems": 1, "items": ESQUEMA_QUESTAO},
+        }, {"total_expected": {"type": "integer"}}),
+    },
+}, {"version": TEXTO, "project": TEXTO, "policy": {"type": "object"}})
+
+ESQUEMA_MATRIZ = {
+    "type": "array",
+    "items": _objeto(
+        {
+            "periodo": TEXTO_NAO_VAZIO,
+            "disciplinas": {
+                "type": "array",
+                "items": _objeto({c: TEXTO for c in ("nome", "professor", "dia", "horario", "sala")}),
+            },
+        },
+        {
+            "provas": {"type": "array", "items": _objeto({"va": TEXTO, "periodo": TEXTO})},
+            "projetos": {"type": "array", "items": _objeto({"mes": TEXTO, "titulo": TEXTO, "entrega": TEXTO})},
+        },
+    ),
+}
+
+ESQUEMA_CALENDARIO = {
+    "type": "array",
+    "items": _objeto(
+        {"data_inicio": {"type": "string", "pattern": DATA_ISO}, "descricao": TEXTO_NAO_VAZIO},
+        {
+            "data_fim": {"type": "string", "pattern": DATA_ISO},
+            "id": TEXTO_NAO_VAZIO,
+            "type": TEXTO,
+            "description": TEXTO,
+        },
+    ),
+}
+
+_TIPOS = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+}
+
+
+def validar_esquema(valor, esquema, caminho="$"):
+    """Valida `valor` contra um subconjunto de JSON Schema; devolve os erros."""
+    tipo = esquema.get("type")
+    if tipo:
+        esperado = _TIPOS[tipo]
+        if not isinstance(valor, esperado) or (tipo in ("integer", "number") and isinstance(valor, bool)):
+            return [f"{caminho}: esperado {tipo}, encontrado {type(valor).__name__}"]
+
+    erros = []
+    if isinstance(valor, dict):
+        for chave in esquema.get("required", ()):
+            if chave not in valor:
+                erros.append(f"{caminho}: campo obrigatório '{chave}' ausente")
+        if len(valor) < esquema.get("minProperties", 0):
+            erros.append(f"{caminho}: mínimo de {esquema['minProperties']} campos")
+        propriedades = esquema.get("properties", {})
+        extra = esquema.get("additionalProperties")
+        for chave, item in valor.items():
+            sub = propriedades.get(chave, extra)
+            if isinstance(sub, dict):
+                erros.extend(validar_esquema(item, sub, f"{caminho}.{chave}"))
+    elif isinstance(valor, list):
+        if len(valor) < esquema.get("minItems", 0):
+            erros.append(f"{caminho}: mínimo de {esquema['minItems']} itens")
+        if "items" in esquema:
+            for n, item in enumerate(valor):
+                erros.extend(validar_esquema(item, esquema["items"], f"{caminho}[{n}]"))
+    elif isinstance(valor, str):
+        if len(valor) < esquema.get("minLength", 0):
+            erros.append(f"{caminho}: texto vazio")
+        if "pattern" in esquema and not re.search(esquema["pattern"], valor):
+            erros.append(f"{caminho}: '{valor}' não segue o formato {esquema['pattern']}")
+    return erros
+
+
+# =======================================================
+# FONTES
+# =======================================================
+SIMULADOR = Fonte("simulador", "simulador.json", normalizar_banco, montar_banco, ESQUEMA_SIMULADOR, _verificar_banco)
+MATRIZ = Fonte("matriz", "matriz.json", normalizar_matriz, montar_matriz, ESQUEMA_MATRIZ)
+CALENDARIO = Fonte(
+    "calendario", "calendario.json", normalizar_calendario, montar_calendario, ESQUEMA_CALENDARIO, _verificar_calendario
+)
+FONTES = (SIMULADOR, MATRIZ, CALENDARIO)
+FONTES_POR_NOME = {fonte.nome: fonte for fonte in FONTES}
+
+# Nomes usados pelo app, benchmarks e testes
+construir_banco = SIMULADOR
+construir_matriz = MATRIZ
+construir_calendario = CALENDARIO
+
+
+# =======================================================
+# SNAPSHOT BINÁRIO
+# =======================================================
+# Layout: MAGICO | versão do formato (u16) | tamanho do cabeçalho (u32) |
+#         cabeçalho JSON | tuplas normalizadas em marshal
+# O marshal depende da versão do Python, que vai no cabeçalho: snapshot de
+# outra versão é tratado como desatualizado (cai para o JSON).
+MAGICO = b"LUMISNAP"
+VERSAO_FORMATO = 1
+_PREFIXO = struct.Struct("<HI")
+
+_pasta_snapshots = None
+
+
+def configurar_snapshots(pasta):
+    """Pasta dos snapshots (None desliga a leitura de snapshots)."""
+    global _pasta_snapshots
+    _pasta_snapshots = pasta
+
+
+def caminho_snapshot(fonte, pasta=None, curso=None):
+    """Snapshot de uma fonte da raiz ou de um curso (lumi/cursos.py)."""
+    nome = f"{curso}.{fonte.nome}" if curso else fonte.nome
+    return os.path.join(pasta or _pasta_snapshots, f"{nome}.snap")
+
+
+def _sha256(caminho):
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def gravar_snapshot(fonte, caminho_json, linhas, destino):
+    estado = os.stat(caminho_json)
+    cabecalho = json.dumps({
+        "fonte": fonte.nome,
+        "python": sys.implementation.cache_tag,
+        "tamanho": estado.st_size,
+        "mtime_ns": estado.st_mtime_ns,
+        "sha256": _sha256(caminho_json),
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+    }).encode("utf-8")
+    temporario = destino + ".tmp"
+    with open(temporario, "wb") as f:
+        f.write(MAGICO)
+        f.write(_PREFIXO.pack(VERSAO_FORMATO, len(cabecalho)))
+        f.write(cabecalho)
+        marshal.dump(linhas, f)
+    os.replace(temporario, destino)
+
+
+def ler_snapshot(fonte, caminho_json, caminho):
+    """Tuplas normalizadas do snapshot, ou None se faltar/estiver desatualizado."""
+    try:
+        with open(caminho, "rb") as f:
+            conteudo = f.read()
+    except OSError:
+        return None
+    inicio = len(MAGICO) + _PREFIXO.size
+    if not conteudo.startswith(MAGICO) or len(conteudo) < inicio:
+        return None
+    versao, tamanho_cabecalho = _PREFIXO.unpack_from(conteudo, len(MAGICO))
+    if versao != VERSAO_FORMATO:
+        return None
+    try:
+        cabecalho = json.loads(conteudo[inicio:inicio + tamanho_cabecalho])
+    except ValueError:
+        return None
+    if cabecalho.get("fonte") != fonte.nome or cabecalho.get("python") != sys.implementation.cache_tag:
+        return None
+
+    # Atualizado = mesmo tamanho e (mesmo mtime ou mesmo conteúdo; um
+    # checkout do git muda o mtime sem mudar o arquivo)
+    try:
+        estado = os.stat(caminho_json)
+    except OSError:
+        return None
+    if estado.st_size != cabecalho.get("tamanho"):
+        return None
+    if estado.st_mtime_ns != cabecalho.get("mtime_ns") and _sha256(caminho_json) != cabecalho.get("sha256"):
+        return None
+    try:
+        return marshal.loads(memoryview(conteudo)[inicio + tamanho_cabecalho:])
+    except (EOFError, ValueError, TypeError):
+        return None
+
+
+def compilar(pasta_dados, pasta_snapshots, fontes=FONTES, curso=None):
+    """Valida cada fonte e grava o snapshot das válidas. Devolve {nome: erros}.
+
+    Para um curso, `pasta_dados` é a pasta dele e só as fontes que ele tem
+    são compiladas (as outras vêm da raiz).
+    """
+    os.makedirs(pasta_snapshots, exist_ok=True)
+    resultado = {}
+    for fonte in fontes:
+        caminho_json = os.path.join(pasta_dados, fonte.arquivo)
+        if curso and not os.path.exists(caminho_json):
+            continue
+        dados = _ler_json(caminho_json)
+        if dados is None:
+            resultado[fonte.nome] = [f"{fonte.arquivo}: arquivo ausente ou JSON inválido"]
+            continue
+        erros = fonte.validar(dados)
+        if not erros:
+            destino = caminho_snapshot(fonte, pasta_snapshots, curso)
+            gravar_snapshot(fonte, caminho_json, fonte.normalizar(dados), destino)
+        resultado[fonte.nome] = erros
+    return resultado
+
+
+# =======================================================
+# CACHE POR ARQUIVO
+# =======================================================
+_cache = {}  # caminho -> ((mtime_ns, tamanho), objeto)
+_lock = threading.Lock()
+
+
+def versao(caminho):
+    """(mtime_ns, tamanho) do arquivo, ou None se ele não existe."""
+    try:
+        estado = os.stat(caminho)
+    except OSError:
+        return None
+    return (estado.st_mtime_ns, estado.st_size)
+
+
+def _ler_json(caminho):
+    try:
+        with metricas.medir("json"), open(caminho, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        print(f"AVISO: Arquivo {os.path.basename(caminho)} não encontrado.")
+    except json.JSONDecodeError as e:
+        print(f"ERRO: Falha ao decodificar JSON em {os.path.basename(caminho)}. Detalhe: {e}")
+    return None
+
+
+def _construir(caminho, construtor, versao, curso=None):
+    if isinstance(construtor, Fonte) and _pasta_snapshots and versao:
+        with metricas.medir("json"):
+            linhas = ler_snapshot(construtor, caminho, caminho_snapshot(construtor, curso=curso))
+        if linhas is not None:
+            CARGAS.inc(construtor.nome, "snapshot")
+            return construtor.montar(linhas)
+    if isinstance(construtor, Fonte):
+        CARGAS.inc(construtor.nome, "json")
+    return construtor(_ler_json(caminho) if versao else None)
+
+
+def carregar(caminho, construtor):
+    """`construtor(json)` do arquivo, refeito só quando o arquivo muda.
+
+    Com uma `Fonte` e snapshots configurados, usa o snapshot binário se ele
+    estiver atualizado em relação ao JSON.
+    """
+    versao_atual = versao(caminho)
+    em_cache = _cache.get(caminho)
+    if em_cache is not None and em_cache[0] == versao_atual:
+        return em_cache[1]
+    with _lock:
+        em_cache = _cache.get(caminho)
+        if em_cache is None or em_cache[0] != versao_atual:
+            em_cache = (versao_atual, _construir(caminho, construtor, versao_atual))
+            _cache[caminho] = em_cache
+    return em_cache[1]
+
+
+def construir(caminho, construtor, curso=None):
+    """Carga sem cache, para quem guarda o objeto por conta própria
+    (ex.: o LRU de lumi/cursos.py). Usa o snapshot do curso, se houver."""
+    return _construir(caminho, construtor, versao(caminho), curso)
+
+
+def invalidar(caminho):
+    """Força a releitura na próxima consulta (ex.: depois de gravar o arquivo)."""
+    with _lock:
+        _cache.pop(caminho, None)
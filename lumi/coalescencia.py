@@ -0,0 +1,100 @@
+# =======================================================
+# SINGLE-FLIGHT: PERGUNTAS IGUAIS AO MESMO TEMPO, UMA CHAMADA AO LLM
+# =======================================================
+# Quando um professor manda a turma perguntar a mesma coisa (ou o aluno clica
+# duas vezes em enviar), várias requisições chegam ao /ask com o mesmo texto
+# em poucos segundos. A primeira (a "líder") chama o Gemini; as que chegam
+# enquanto a chamada está em andamento esperam e recebem o mesmo resultado,
+# ou a mesma exceção. Terminada a chamada, a chave é liberada: não é um
+# cache, e a próxima pergunta igual chama o LLM de novo.
+#
+# A chave é o texto normalizado (minúsculas, sem acentos, espaços colapsados
+# e sem pontuação final) mais a versão do contexto do modelo; a resposta só
+# pode ser compartilhada se o pedido ao LLM seria o mesmo. Cada aluno
+# continua gravando a sua pergunta e a resposta no próprio histórico.
+#
+# Vale dentro de um processo (todas as threads de um worker). Quem espera
+# mais que LUMI_COALESCER_ESPERA segundos (padrão 60) desiste e faz a
+# própria chamada.
+# =======================================================
+
+import threading
+
+from lumi import metricas
+from lumi.faq import normalizar
+
+CHAMADAS = metricas.REGISTRO.contador(
+    "lumi_llm_singleflight_total",
+    "Pedidos ao LLM que fizeram a chamada (leader) ou reaproveitaram uma em andamento (shared).",
+    ("role",),
+)
+ECONOMIZADAS = metricas.REGISTRO.contador(
+    "lumi_llm_calls_saved_total", "Chamadas ao LLM evitadas por pedidos idênticos simultâneos."
+)
+EM_ANDAMENTO = metricas.REGISTRO.gauge(
+    "lumi_llm_inflight_calls", "Chamadas distintas ao LLM em andamento neste processo."
+)
+
+
+def chave_pergunta(texto, versao_contexto):
+    normalizado = " ".join(normalizar(texto).split()).rstrip("?!.… ")
+    return (versao_contexto, normalizado)
+
+
+class _Chamada:
+    __slots__ = ("pronta", "resultado", "erro", "compartilhada")
+
+    def __init__(self):
+        self.pronta = threading.Event()
+        self.resultado = None
+        self.erro = None
+        self.compartilhada = 0
+
+
+class GrupoUnico:
+    """Agrupa chamadas simultâneas com a mesma chave numa só."""
+
+    def __init__(self, espera=60.0):
+        self.espera = espera
+        self._chamadas = {}
+        self._lock = threading.Lock()
+
+    def executar(self, chave, funcao):
+        """Devolve (resultado, compartilhado); compartilhado=True se outra thread fez a chamada."""
+        with self._lock:
+            chamada = self._chamadas.get(chave)
+            lider = chamada is None
+            if lider:
+                chamada = self._chamadas[chave] = _Chamada()
+                EM_ANDAMENTO.definir(valor=len(self._chamadas))
+            else:
+                chamada.compartilhada += 1
+
+        if not lider:
+            if chamada.pronta.wait(self.espera):
+                CHAMADAS.inc("shared")
+                ECONOMIZADAS.inc()
+                if chamada.erro is not None:
+                    raise chamada.erro
+                return chamada.resultado, True
+            # A líder demorou demais: segue sozinha, fora do grupo
+            CHAMADAS.inc("leader")
+            return funcao(), False
+
+        CHAMADAS.inc("leader")
+        try:
+            chamada.resultado = funcao()
+            return chamada.resultado, False
+        except Exception as erro:
+            chamada.erro = erro
+            raise
+        finally:
+            with self._lock:
+                del self._chamadas[chave]
+                EM_ANDAMENTO.definir(valor=len(self._chamadas))
+            chamada.pronta.set()
+
+    def reiniciar(self):
+        """Estado novo (o lock e as chamadas do mestre não valem depois do fork)."""
+        self._chamadas = {}
+        self._lock = threading.Lock()
@@ -0,0 +1,405 @@
+# =======================================================
+# CONSUMO DE TOKENS DO LLM – CONTABILIDADE, COTAS E CUSTO POR SEÇÃO
+# =======================================================
+# Cada chamada do /ask ao modelo gera uma linha em uso_llm: tokens do prompt
+# (system instruction + pergunta), quantos deles vieram do cache de contexto,
+# tokens da resposta e latência. Os números vêm do `usage_metadata` do
+# Gemini; sem ele (backend fake) são estimados localmente (`estimar_tokens`,
+# marcados com estimado=1).
+#
+# Gravação no mesmo esquema da telemetria (lumi/telemetria.py): a requisição
+# só põe a linha num buffer e uma thread grava a cada
+# LUMI_LLM_USO_INTERVALO segundos (padrão 5), numa transação:
+#
+#   1. INSERT em lote em uso_llm (só inteiros, sem índices além da chave);
+#   2. UPSERT em uso_llm_hora, somando por (hora UTC, aluno). Relatórios e
+#      cotas leem só essa tabela.
+#
+# Cotas diárias, no fuso da faculdade (0 = sem limite):
+#   LUMI_LLM_COTA_ALUNO  tokens por aluno por dia
+#   LUMI_LLM_COTA_DIA    tokens de todos os alunos juntos por dia
+# A conferência antes de chamar o modelo é só uma consulta a dicionários em
+# memória: o total do banco (lido uma vez por aluno por dia e atualizado a
+# cada gravação) mais o que este processo gastou e ainda não gravou. Com
+# vários workers, cada um só vê o gasto dos outros depois da gravação
+# seguinte, então a cota pode estourar por até um intervalo de chamadas.
+#
+# `flask llm-custos` mostra o consumo do período e quanto cada seção do
+# contexto (calendário, matriz, flashcards...) pesa no prompt de cada chamada.
+# =======================================================
+
+import atexit
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import defaultdict, namedtuple
+from datetime import datetime, timezone
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from lumi import metricas
+
+COLUNAS_HORA = ("chamadas", "prompt_tokens", "cached_tokens", "output_tokens", "latencia_ms")
+
+TOKENS = metricas.REGISTRO.contador(
+    "lumi_llm_tokens_total",
+    "Tokens consumidos nas chamadas ao LLM (kind=prompt|cached|output; cached é parte de prompt).",
+    ("kind",),
+)
+RECUSADAS = metricas.REGISTRO.contador(
+    "lumi_llm_quota_rejected_total",
+    "Perguntas recusadas por cota de tokens esgotada (scope=aluno|global).",
+    ("scope",),
+)
+DURACAO_GRAVACAO = metricas.REGISTRO.histograma(
+    "lumi_llm_usage_flush_seconds", "Tempo para gravar um lote de uso do LLM e atualizar uso_llm_hora."
+)
+
+log = logging.getLogger(__name__)
+
+Uso = namedtuple("Uso", "prompt cached saida estimado")
+
+_PEDACOS = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+class CotaEsgotada(RuntimeError):
+    """Cota diária de tokens do aluno ou global esgotada."""
+
+    def __init__(self, escopo, mensagem):
+        super().__init__(mensagem)
+        self.escopo = escopo
+
+
+# =======================================================
+# MEDIÇÃO
+# =======================================================
+def estimar_tokens(texto):
+    """Estimativa local de tokens: ~4 caracteres por token em cada palavra,
+    e um token por sinal de pontuação (próximo do tokenizador do Gemini
+    para português)."""
+    if not texto:
+        return 0
+    return sum(math.ceil(len(p) / 4) for p in _PEDACOS.findall(texto))
+
+
+def medir_uso(resposta, prompt, saida):
+    """Uso de uma chamada: do `usage_metadata` da resposta ou estimado."""
+    meta = getattr(resposta, "usage_metadata", None)
+    if meta is not None and getattr(meta, "prompt_token_count", None):
+        return Uso(
+            meta.prompt_token_count,
+            getattr(meta, "cached_content_token_count", 0) or 0,
+            getattr(meta, "candidates_token_count", 0) or 0,
+            False,
+        )
+    return Uso(estimar_tokens(prompt), 0, estimar_tokens(saida), True)
+
+
+def _hora(momento):
+    """Início da hora (UTC, sem fuso) de um epoch em segundos."""
+    return datetime.fromtimestamp(momento - momento % 3600, timezone.utc).replace(tzinfo=None)
+
+
+# =======================================================
+# CONTABILIDADE (buffer + thread de gravação + cotas)
+# =======================================================
+class ConsumoLLM:
+    """Registra o uso de tokens, grava em lote e confere as cotas diárias."""
+
+    def __init__(self, app, db, chamadas, horas, fuso=None, intervalo=5.0,
+                 cota_aluno=0, cota_dia=0, limite=50_000):
+        self.app = app
+        self.db = db
+        self.chamadas = chamadas  # Table uso_llm
+        self.horas = horas  # Table uso_llm_hora
+        self.fuso = fuso
+        self.intervalo = intervalo
+        self.cota_aluno = cota_aluno
+        self.cota_dia = cota_dia
+        self.limite = limite
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Buffer, contadores e thread novos (threads não sobrevivem a um fork)."""
+        self._pendentes = []
+        self._cond = threading.Condition()
+        self._gravando = threading.Lock()
+        self._thread = None
+        self._parar = False
+        self._zerar_cotas(None)
+
+    def _zerar_cotas(self, dia):
+        # base: total do dia já gravado no banco (última leitura);
+        # local: gasto deste processo ainda não gravado
+        self._dia = dia
+        self._base_aluno = {}
+        self._local_aluno = defaultdict(int)
+        self._base_global = None
+        self._local_global = 0
+
+    def _inicio_do_dia(self):
+        agora = datetime.now(self.fuso)
+        inicio = agora.replace(hour=0, minute=0, second=0, microsecond=0)
+        if inicio.tzinfo is not None:
+            inicio = inicio.astimezone(timezone.utc).replace(tzinfo=None)
+        else:
+            inicio = datetime.utcfromtimestamp(inicio.timestamp())
+        return agora.date(), inicio
+
+    # ---------------------------------------------------
+    # COTAS
+    # ---------------------------------------------------
+    def _atualizar_dia(self):
+        # Chamado com self._cond travado
+        dia, inicio = self._inicio_do_dia()
+        if dia != self._dia:
+            self._zerar_cotas(dia)
+        return inicio
+
+    def _totais_do_banco(self, inicio, user_ids=None):
+        """{user_id: tokens} (ou o total global, com user_ids=None) desde `inicio`."""
+        h = self.horas
+        tokens = func.coalesce(func.sum(h.c.prompt_tokens + h.c.output_tokens), 0)
+        with self.app.app_context(), self.db.engine.connect() as conexao:
+            if user_ids is None:
+                return conexao.execute(select(tokens).where(h.c.hora >= inicio)).scalar()
+            consulta = (
+                select(h.c.user_id, tokens)
+                .where(h.c.hora >= inicio, h.c.user_id.in_(list(user_ids)))
+                .group_by(h.c.user_id)
+            )
+            totais = dict.fromkeys(user_ids, 0)
+            totais.update(dict(conexao.execute(consulta).all()))
+            return totais
+
+    def usado_hoje(self, user_id):
+        """(tokens do aluno hoje, tokens de todos hoje), vistos por este processo."""
+        with self._cond:
+            inicio = self._atualizar_dia()
+            falta_aluno = user_id not in self._base_aluno
+            falta_global = self._base_global is None
+        # Primeira pergunta do aluno no dia (neste worker): uma leitura do banco
+        if falta_aluno:
+            base = self._totais_do_banco(inicio, [user_id])[user_id]
+            with self._cond:
+                self._base_aluno.setdefault(user_id, base)
+        if falta_global and self.cota_dia:
+            base = self._totais_do_banco(inicio)
+            with self._cond:
+                if self._base_global is None:
+                    self._base_global = base
+        with self._cond:
+            return (
+                self._base_aluno.get(user_id, 0) + self._local_aluno[user_id],
+                (self._base_global or 0) + self._local_global,
+            )
+
+    def conferir_cota(self, user_id):
+        """Levanta CotaEsgotada se o aluno ou a faculdade passou da cota do dia."""
+        if not self.cota_aluno and not self.cota_dia:
+            return
+        aluno, total = self.usado_hoje(user_id)
+        if self.cota_dia and total >= self.cota_dia:
+            RECUSADAS.inc("global")
+            raise CotaEsgotada("global", "A Lumi atingiu o limite de uso de hoje. Tente de novo amanhã.")
+        if self.cota_aluno and aluno >= self.cota_aluno:
+            RECUSADAS.inc("aluno")
+            raise CotaEsgotada("aluno", "Você atingiu o limite de perguntas à Lumi por hoje. Tente de novo amanhã.")
+
+    # ---------------------------------------------------
+    # ENTRADA
+    # ---------------------------------------------------
+    def registrar(self, user_id, uso, latencia, momento=None):
+        """Registra uma chamada ao modelo (só a líder, em perguntas coalescidas)."""
+        momento = int(time.time()) if momento is None else momento
+        linha = (user_id, momento, uso.prompt, uso.cached, uso.saida, int(latencia * 1000), int(uso.estimado))
+        TOKENS.inc("prompt", valor=uso.prompt)
+        TOKENS.inc("cached", valor=uso.cached)
+        TOKENS.inc("output", valor=uso.saida)
+        with self._cond:
+            self._atualizar_dia()
+            self._local_aluno[user_id] += uso.prompt + uso.saida
+            self._local_global += uso.prompt + uso.saida
+            if len(self._pendentes) < self.limite:
+                self._pendentes.append(linha)
+            if self.intervalo > 0:
+                self._garantir_thread()
+        if self.intervalo <= 0:
+            self.descarregar()
+
+    def _garantir_thread(self):
+        # Chamado com self._cond travado; nasce na primeira chamada (depois do fork)
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._laco, name="lumi-consumo-llm", daemon=True)
+            self._thread.start()
+
+    # ---------------------------------------------------
+    # GRAVAÇÃO
+    # ---------------------------------------------------
+    def _laco(self):
+        while True:
+            with self._cond:
+                if not self._parar:
+                    self._cond.wait(self.intervalo)
+                if self._parar and not self._pendentes:
+                    return
+            self.descarregar()
+
+    def descarregar(self):
+        """Grava agora o buffer e atualiza as bases das cotas. Devolve quantas linhas."""
+        with self._gravando:
+            with self._cond:
+                linhas, self._pendentes = self._pendentes, []
+            if not linhas:
+                return 0
+            try:
+                with self.app.app_context():
+                    self.gravar(linhas)
+            except Exception:
+                log.exception("Falha ao gravar o uso de %d chamadas ao LLM; tentando de novo no próximo lote",
+                              len(linhas))
+                with self._cond:
+                    self._pendentes[:0] = linhas[: max(self.limite - len(self._pendentes), 0)]
+                return 0
+            self._atualizar_bases(linhas)
+            return len(linhas)
+
+    def gravar(self, linhas):
+        """INSERT das chamadas e UPSERT dos totais por hora numa transação."""
+        inicio = time.perf_counter()
+        registros, totais = [], {}
+        for user_id, momento, prompt, cached, saida, latencia_ms, estimado in linhas:
+            registros.append({
+                "user_id": user_id, "momento": momento, "prompt_tokens": prompt, "cached_tokens": cached,
+                "output_tokens": saida, "latencia_ms": latencia_ms, "estimado": estimado,
+            })
+            chave = (_hora(momento), user_id)
+            if chave not in totais:
+                totais[chave] = dict.fromkeys(COLUNAS_HORA, 0)
+            t = totais[chave]
+            t["chamadas"] += 1
+            t["prompt_tokens"] += prompt
+            t["cached_tokens"] += cached
+            t["output_tokens"] += saida
+            t["latencia_ms"] += latencia_ms
+
+        with self.db.engine.begin() as conexao:
+            conexao.execute(insert(self.chamadas), registros)
+            conexao.execute(
+                self._upsert_hora(conexao.dialect.name),
+                [dict(t, hora=h, user_id=u) for (h, u), t in totais.items()],
+            )
+        DURACAO_GRAVACAO.observar(time.perf_counter() - inicio)
+
+    def _upsert_hora(self, dialeto):
+        modulo = {"sqlite": sqlite, "postgresql": postgresql}.get(dialeto)
+        if modulo is None:
+            raise RuntimeError(f"Consumo do LLM sem suporte a UPSERT no banco '{dialeto}'.")
+        comando = modulo.insert(self.horas)
+        return comando.on_conflict_do_update(
+            index_elements=[self.horas.c.hora, self.horas.c.user_id],
+            set_={c: self.horas.c[c] + comando.excluded[c] for c in COLUNAS_HORA},
+        )
+
+    def _atualizar_bases(self, linhas):
+        """Depois de gravar: o que era local passa a estar no banco, que também
+        traz o que os outros workers gravaram."""
+        gravado = defaultdict(int)
+        for user_id, _, prompt, _, saida, _, _ in linhas:
+            gravado[user_id] += prompt + saida
+        with self._cond:
+            inicio = self._atualizar_dia()
+            alunos = [u for u in gravado if u in self._base_aluno]
+            if not alunos and not self.cota_dia:
+                self._descontar_local(gravado)
+                return
+        try:
+            por_aluno = self._totais_do_banco(inicio, alunos) if alunos else {}
+            total = self._totais_do_banco(inicio) if self.cota_dia else None
+        except Exception:
+            log.exception("Falha ao atualizar as cotas de tokens")
+            # O lote já está no banco: sai do local e as bases são relidas
+            # na próxima verificação
+            with self._cond:
+                self._descontar_local(gravado)
+                for user_id in alunos:
+                    self._base_aluno.pop(user_id, None)
+                self._base_global = None
+            return
+        with self._cond:
+            self._descontar_local(gravado)
+            self._base_aluno.update((u, t) for u, t in por_aluno.items() if u in self._base_aluno)
+            if total is not None:
+                self._base_global = total
+
+    def _descontar_local(self, gravado):
+        # Chamado com self._cond travado
+        for user_id, tokens in gravado.items():
+            self._local_aluno[user_id] = max(self._local_aluno[user_id] - tokens, 0)
+        self._local_global = max(self._local_global - sum(gravado.values()), 0)
+
+    def encerrar(self):
+        with self._cond:
+            self._parar = True
+            self._cond.notify()
+        self.descarregar()
+
+    # ---------------------------------------------------
+    # RELATÓRIOS
+    # ---------------------------------------------------
+    def totais(self, conexao, desde):
+        """Somas de uso_llm_hora a partir de `desde` (datetime UTC)."""
+        h = self.horas
+        consulta = select(*(func.coalesce(func.sum(h.c[c]), 0) for c in COLUNAS_HORA)).where(h.c.hora >= desde)
+        return dict(zip(COLUNAS_HORA, conexao.execute(consulta).one()))
+
+    def maiores_consumidores(self, conexao, desde, limite=10):
+        h = self.horas
+        tokens = func.sum(h.c.prompt_tokens + h.c.output_tokens)
+        consulta = (
+            select(h.c.user_id, func.sum(h.c.chamadas), tokens)
+            .where(h.c.hora >= desde)
+            .group_by(h.c.user_id)
+            .order_by(tokens.desc())
+            .limit(limite)
+        )
+        return [tuple(linha) for linha in conexao.execute(consulta)]
+
+
+def custo_por_secao(secoes, totais):
+    """Quanto cada seção do system instruction pesa no prompt.
+
+    `secoes` é uma lista de (nome, texto) na ordem do contexto; `totais`, a
+    saída de ConsumoLLM.totais. Cada seção é medida com `estimar_tokens`; o
+    que sobra da média real de tokens de prompt por chamada é a pergunta do
+    aluno. Se a estimativa passar da média real, as seções são reduzidas na
+    mesma proporção. Devolve [(nome, tokens por chamada, % do prompt,
+    tokens no período)].
+    """
+    estimadas = [(nome, estimar_tokens(texto)) for nome, texto in secoes]
+    soma = sum(t for _, t in estimadas) or 1
+    chamadas = totais["chamadas"]
+    media_prompt = totais["prompt_tokens"] / chamadas if chamadas else soma
+    fator = min(media_prompt / soma, 1.0)
+    por_chamada = [(nome, tokens * fator) for nome, tokens in estimadas]
+    por_chamada.append(("pergunta do aluno", max(media_prompt - soma * fator, 0)))
+    return [
+        (nome, round(tokens), 100 * tokens / max(media_prompt, 1), round(tokens * chamadas))
+        for nome, tokens in por_chamada
+    ]
+
+
+def init_app(app, db, chamadas, horas, fuso=None):
+    consumo = ConsumoLLM(
+        app, db, chamadas, horas, fuso=fuso,
+        intervalo=float(os.environ.get("LUMI_LLM_USO_INTERVALO", "5")),
+        cota_aluno=int(os.environ.get("LUMI_LLM_COTA_ALUNO", "0")),
+        cota_dia=int(os.environ.get("LUMI_LLM_COTA_DIA", "0")),
+    )
+    atexit.register(consumo.encerrar)
+    app.extensions["lumi_consumo_llm"] = consumo
+    return consumo
@@ -0,0 +1,216 @@
+# =======================================================
+# CURSOS – DADOS ACADÊMICOS E CONTEXTO DO LLM POR CURSO
+# =======================================================
+# Uma instalação atende vários cursos e campi. O curso do aluno vem de
+# User.curso; os arquivos de cada curso ficam em LUMI_CURSOS_DIR/<curso>/
+# (padrão cursos/), com os mesmos nomes da raiz do projeto:
+#
+#   cursos/medicina-anapolis/matriz.json
+#   cursos/medicina-anapolis/calendario.json
+#   cursos/medicina-anapolis/simulador.json
+#   cursos/medicina-anapolis/flashcards.json
+#   cursos/medicina-anapolis/metodo_estudo.json
+#   cursos/medicina-anapolis/informacoes.txt   (início do system instruction)
+#
+# O que o curso não tiver vem da raiz. Alunos sem curso, e arquivos que o
+# curso não sobrescreve, usam os objetos da raiz: carregados na importação,
+# compartilhados entre os workers (lumi/catalogo.py) e nunca despejados.
+#
+# O resto (catálogo, grade de horários e contexto do LLM de cada curso) fica
+# num cache LRU limitado por memória (LUMI_CURSOS_CACHE_MB, padrão 256): um
+# processo atende centenas de cursos carregando só os que estão em uso. O
+# tamanho de cada objeto é estimado uma vez, na carga, percorrendo-o
+# (`tamanho_aproximado`). Como no catálogo, cada entrada é refeita quando o
+# arquivo muda.
+# =======================================================
+
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+
+from lumi import catalogo, metricas
+
+CURSO_VALIDO = re.compile(r"^[a-z0-9][a-z0-9_-]{0,39}$")
+
+ACESSOS = metricas.REGISTRO.contador(
+    "lumi_tenant_cache_total",
+    "Consultas ao cache de dados por curso (result=hit|miss) e entradas despejadas (evicted).",
+    ("result",),
+)
+BYTES = metricas.REGISTRO.gauge(
+    "lumi_tenant_cache_bytes", "Tamanho estimado dos dados de cursos em memória neste processo."
+)
+ENTRADAS = metricas.REGISTRO.gauge(
+    "lumi_tenant_cache_entries", "Objetos de cursos (catálogos, grades, contextos) em memória neste processo."
+)
+
+
+def tamanho_aproximado(objeto):
+    """Bytes de um objeto e de tudo o que ele alcança (contando cada um uma vez).
+
+    Percorre contêineres, objetos com __slots__ e objetos do próprio pacote
+    `lumi`; o resto (datas, clientes do LLM) conta só o tamanho raso.
+    """
+    vistos, pilha, total = set(), [objeto], 0
+    while pilha:
+        atual = pilha.pop()
+        if id(atual) in vistos:
+            continue
+        vistos.add(id(atual))
+        total += sys.getsizeof(atual)
+        if isinstance(atual, (str, bytes, int, float, bool)) or atual is None:
+            continue
+        if isinstance(atual, dict):
+            pilha.extend(atual.keys())
+            pilha.extend(atual.values())
+        elif isinstance(atual, (list, tuple, set, frozenset)):
+            pilha.extend(atual)
+        else:
+            for classe in type(atual).__mro__:
+                for nome in getattr(classe, "__slots__", ()):
+                    if hasattr(atual, nome):
+                        pilha.append(getattr(atual, nome))
+            if type(atual).__module__.startswith("lumi") and hasattr(atual, "__dict__"):
+                pilha.append(vars(atual))
+    return total
+
+
+class CacheLRU:
+    """Objetos por chave, com versão, despejando os menos usados acima de `limite_bytes`."""
+
+    def __init__(self, limite_bytes):
+        self.limite_bytes = limite_bytes
+        self._entradas = OrderedDict()  # chave -> (versão, objeto, bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._carregando = {}  # chave -> Lock (uma carga por chave de cada vez)
+
+    def obter(self, chave, versao, construir):
+        """Objeto da chave; `construir()` só roda se faltar ou a versão mudou."""
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is not None and entrada[0] == versao:
+                self._entradas.move_to_end(chave)
+                ACESSOS.inc("hit")
+                return entrada[1]
+            trava = self._carregando.setdefault(chave, threading.Lock())
+        with trava:
+            with self._lock:
+                entrada = self._entradas.get(chave)
+                if entrada is not None and entrada[0] == versao:
+                    self._entradas.move_to_end(chave)
+                    ACESSOS.inc("hit")
+                    return entrada[1]
+            ACESSOS.inc("miss")
+            objeto = construir()
+            tamanho = tamanho_aproximado(objeto)
+            with self._lock:
+                antiga = self._entradas.pop(chave, None)
+                if antiga is not None:
+                    self._bytes -= antiga[2]
+                self._entradas[chave] = (versao, objeto, tamanho)
+                self._bytes += tamanho
+                self._despejar(manter=chave)
+                self._carregando.pop(chave, None)
+            return objeto
+
+    def _despejar(self, manter):
+        # Chamado com self._lock travado; a entrada recém-carregada fica
+        while self._bytes > self.limite_bytes and len(self._entradas) > 1:
+            chave, (_, _, tamanho) = next(iter(self._entradas.items()))
+            if chave == manter:
+                self._entradas.move_to_end(chave)
+                continue
+            del self._entradas[chave]
+            self._bytes -= tamanho
+            ACESSOS.inc("evicted")
+        BYTES.definir(valor=self._bytes)
+        ENTRADAS.definir(valor=len(self._entradas))
+
+    def descartar(self, filtro=None):
+        """Remove as entradas cujas chaves passam no filtro (todas, sem filtro)."""
+        with self._lock:
+            for chave in [c for c in self._entradas if filtro is None or filtro(c)]:
+                self._bytes -= self._entradas.pop(chave)[2]
+            BYTES.definir(valor=self._bytes)
+            ENTRADAS.definir(valor=len(self._entradas))
+
+    def estatisticas(self):
+        with self._lock:
+            return {"entradas": len(self._entradas), "bytes": self._bytes, "limite_bytes": self.limite_bytes}
+
+
+class Cursos:
+    """Resolve os arquivos de cada curso e guarda os objetos em cache LRU."""
+
+    def __init__(self, pasta_raiz, pasta_cursos, limite_bytes=256 * 1024 * 1024):
+        self.pasta_raiz = pasta_raiz
+        self.pasta_cursos = pasta_cursos
+        self.cache = CacheLRU(limite_bytes)
+
+    def reiniciar(self):
+        """Esvazia o cache (no worker, depois do fork: os modelos do LLM não
+        podem vir do mestre)."""
+        self.cache.descartar()
+
+    def existe(self, curso):
+        return bool(curso) and CURSO_VALIDO.match(curso) is not None and os.path.isdir(
+            os.path.join(self.pasta_cursos, curso)
+        )
+
+    def listar(self):
+        try:
+            nomes = os.listdir(self.pasta_cursos)
+        except OSError:
+            return []
+        return sorted(n for n in nomes if self.existe(n))
+
+    def caminho_proprio(self, curso, arquivo):
+        """Caminho do arquivo do curso (exista ou não), ou o da raiz sem curso."""
+        if not curso:
+            return os.path.join(self.pasta_raiz, arquivo)
+        if not CURSO_VALIDO.match(curso):
+            raise ValueError(f"Curso inválido: {curso!r}")
+        return os.path.join(self.pasta_cursos, curso, arquivo)
+
+    def caminho(self, curso, arquivo):
+        """Arquivo do curso se ele existir, senão o da raiz."""
+        if curso and CURSO_VALIDO.match(curso):
+            proprio = os.path.join(self.pasta_cursos, curso, arquivo)
+            if os.path.exists(proprio):
+                return proprio
+        return os.path.join(self.pasta_raiz, arquivo)
+
+    def proprio(self, curso, arquivo):
+        """O curso tem a sua versão do arquivo?"""
+        return self.caminho(curso, arquivo) != os.path.join(self.pasta_raiz, arquivo)
+
+    def carregar(self, curso, arquivo, construtor):
+        """`construtor(json)` do arquivo do curso, como catalogo.carregar."""
+        caminho = self.caminho(curso, arquivo)
+        if not self.proprio(curso, arquivo):
+            return catalogo.carregar(caminho, construtor)
+        return self.cache.obter(
+            (curso, arquivo), catalogo.versao(caminho),
+            lambda: catalogo.construir(caminho, construtor, curso),
+        )
+
+    def derivado(self, curso, nome, versao, construir):
+        """Objeto calculado a partir dos dados do curso (grade, contexto do LLM)."""
+        return self.cache.obter((curso, nome), versao, construir)
+
+    def invalidar(self, curso, arquivo):
+        self.cache.descartar(lambda chave: chave == (curso, arquivo))
+        catalogo.invalidar(self.caminho_proprio(curso, arquivo))
+
+
+def init_app(app, pasta_raiz):
+    cursos = Cursos(
+        pasta_raiz,
+        os.environ.get("LUMI_CURSOS_DIR", os.path.join(pasta_raiz, "cursos")),
+        limite_bytes=int(float(os.environ.get("LUMI_CURSOS_CACHE_MB", "256")) * 1024 * 1024),
+    )
+    app.extensions["lumi_cursos"] = cursos
+    return cursos
@@ -0,0 +1,370 @@
+# =======================================================
+# PIPELINE DE ARQUIVOS ESTÁTICOS (FINGERPRINT + PRÉ-COMPRESSÃO)
+# =======================================================
+# Na inicialização (ou via `flask assets-build`) cada arquivo de static/
+# recebe uma cópia com o hash do conteúdo no nome, em static/dist/:
+#
+#   style.css     -> dist/style.3f2a1b9c0d4e.css (+ .gz e .br)
+#   lumi-4.png    -> dist/lumi-4.<hash>.png, .w128.png, .w128.webp, .w128.avif ...
+#
+# Como a URL muda sempre que o conteúdo muda, esses arquivos são servidos
+# com Cache-Control de 1 ano + immutable e o navegador nem revalida.
+# O url_for('static', ...) é reescrito para apontar para a versão com hash;
+# `largura=N` escolhe a menor variante redimensionada que cubra N pixels.
+#
+# A reconstrução é incremental: só reprocessa arquivos cujo hash mudou.
+# Brotli é opcional (pacote `brotli`); sem ele só o .gz é gerado.
+#
+# Sem preload no gunicorn o mestre gera static/dist antes do fork (ver
+# gunicorn.conf.py) e os workers só leem o manifesto. Mesmo assim, quem
+# constrói segura uma trava em dist/.trava: processos que chegam juntos
+# esperam o primeiro terminar e aproveitam o que ele gerou.
+# =======================================================
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import contextlib
+import os
+import shutil
+import tempfile
+
+from flask import request, send_from_directory, session
+
+try:
+    import brotli
+except ImportError:  # opcional
+    brotli = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+try:
+    from PIL import Image, features
+except ImportError:  # opcional: sem Pillow não há variantes de imagem
+    Image = None
+    features = None
+
+VERSAO_MANIFESTO = 1
+PASTA_DIST = "dist"
+PASTAS_IGNORADAS = {PASTA_DIST, "uploads"}
+UM_ANO = 31536000
+CACHE_IMUTAVEL = f"public, max-age={UM_ANO}, immutable"
+
+EXTENSOES_COMPRIMIVEIS = {".css", ".js", ".svg", ".json", ".txt", ".html"}
+EXTENSOES_IMAGEM = {".png", ".jpg", ".jpeg"}
+LARGURAS = (64, 128, 256, 512, 1024)
+# Imagens maiores que isso não ganham variantes WebP/AVIF no tamanho original
+LADO_MAXIMO_ORIGINAL = 2048
+TAMANHO_MINIMO_COMPRESSAO = 512
+
+ARQUIVO_MANIFESTO = "manifest.json"
+ARQUIVO_TRAVA = ".trava"
+
+# Nem todas as versões do Python conhecem esses tipos
+mimetypes.add_type("image/webp", ".webp")
+mimetypes.add_type("image/avif", ".avif")
+
+
+# =======================================================
+# CONSTRUÇÃO
+# =======================================================
+def _hash_arquivo(caminho):
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(65536), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def listar_fontes(pasta_static):
+    """Caminhos relativos (com "/") de todos os arquivos a processar."""
+    fontes = []
+    for raiz, pastas, arquivos in os.walk(pasta_static):
+        rel_raiz = os.path.relpath(raiz, pasta_static)
+        if rel_raiz == ".":
+            pastas[:] = [p for p in pastas if p not in PASTAS_IGNORADAS]
+        for nome in arquivos:
+            rel = os.path.normpath(os.path.join(rel_raiz, nome)).replace(os.sep, "/")
+            fontes.append(rel)
+    return sorted(fontes)
+
+
+def _comprimir(destino, dados, entrada):
+    with open(destino + ".gz", "wb") as f:
+        f.write(gzip.compress(dados, compresslevel=9, mtime=0))
+    entrada["gzip"] = entrada["url"] + ".gz"
+    if brotli is not None:
+        with open(destino + ".br", "wb") as f:
+            f.write(brotli.compress(dados, quality=11))
+        entrada["br"] = entrada["url"] + ".br"
+
+
+def _suporta(formato):
+    return features is not None and features.check(formato)
+
+
+def _salvar_formatos(imagem, base_url, pasta_static, entrada):
+    """Grava WebP/AVIF de `imagem` ao lado de base_url (sem extensão)."""
+    sem_metadados = imagem.copy()
+    sem_metadados.info = {}
+    if _suporta("webp"):
+        url = base_url + ".webp"
+        sem_metadados.save(os.path.join(pasta_static, url), "WEBP", quality=82, method=4)
+        entrada["webp"] = url
+    if _suporta("avif"):
+        url = base_url + ".avif"
+        sem_metadados.save(os.path.join(pasta_static, url), "AVIF", quality=60, speed=8)
+        entrada["avif"] = url
+
+
+def _variantes_imagem(origem, base_url, extensao, pasta_static, entrada):
+    if Image is None:
+        return
+    with Image.open(origem) as imagem:
+        imagem.load()
+        if extensao in {".jpg", ".jpeg"} and imagem.mode not in ("RGB", "L"):
+            imagem = imagem.convert("RGB")
+        largura_original, altura_original = imagem.size
+
+        if max(imagem.size) <= LADO_MAXIMO_ORIGINAL:
+            _salvar_formatos(imagem, base_url, pasta_static, entrada)
+
+        # Da maior para a menor: cada variante é reduzida a partir da anterior,
+        # o que evita reamostrar a imagem original (até 6k x 6k) várias vezes.
+        entrada["larguras"] = {}
+        fonte = imagem
+        formato = "JPEG" if extensao in {".jpg", ".jpeg"} else "PNG"
+        for largura in sorted((l for l in LARGURAS if l < largura_original), reverse=True):
+            altura = max(1, round(altura_original * largura / largura_original))
+            fonte = fonte.resize((largura, altura), Image.LANCZOS)
+            variante = {"url": f"{base_url}.w{largura}{extensao}"}
+            fonte.save(os.path.join(pasta_static, variante["url"]), formato, optimize=True)
+            _salvar_formatos(fonte, f"{base_url}.w{largura}", pasta_static, variante)
+            entrada["larguras"][str(largura)] = variante
+
+
+def _processar(rel, pasta_static, sha):
+    origem = os.path.join(pasta_static, rel)
+    raiz, extensao = os.path.splitext(rel)
+    extensao = extensao.lower()
+    base_url = f"{PASTA_DIST}/{raiz}.{sha[:12]}"
+    entrada = {"sha256": sha, "url": base_url + extensao}
+
+    destino = os.path.join(pasta_static, entrada["url"])
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    shutil.copyfile(origem, destino)
+
+    if extensao in EXTENSOES_COMPRIMIVEIS:
+        with open(origem, "rb") as f:
+            dados = f.read()
+        if len(dados) >= TAMANHO_MINIMO_COMPRESSAO:
+            _comprimir(destino, dados, entrada)
+    elif extensao in EXTENSOES_IMAGEM:
+        _variantes_imagem(origem, base_url, extensao, pasta_static, entrada)
+    return entrada
+
+
+def _urls_da_entrada(entrada):
+    urls = {entrada["url"]}
+    for chave in ("gzip", "br", "webp", "avif"):
+        if chave in entrada:
+            urls.add(entrada[chave])
+    for variante in entrada.get("larguras", {}).values():
+        urls.update(_urls_da_entrada(variante))
+    return urls
+
+
+def carregar_manifesto(pasta_static):
+    caminho = os.path.join(pasta_static, PASTA_DIST, ARQUIVO_MANIFESTO)
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            manifesto = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if manifesto.get("versao") != VERSAO_MANIFESTO:
+        return None
+    return manifesto
+
+
+@contextlib.contextmanager
+def _trava(pasta_dist):
+    """Exclusão entre processos que constroem a mesma pasta dist/."""
+    with open(os.path.join(pasta_dist, ARQUIVO_TRAVA), "a") as arquivo:
+        if fcntl is not None:
+            fcntl.flock(arquivo, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(arquivo, fcntl.LOCK_UN)
+
+
+def construir_manifesto(pasta_static, forcar=False):
+    """Gera (ou atualiza) static/dist e devolve o manifesto."""
+    pasta_dist = os.path.join(pasta_static, PASTA_DIST)
+    os.makedirs(pasta_dist, exist_ok=True)
+    with _trava(pasta_dist):
+        return _construir(pasta_static, pasta_dist, forcar)
+
+
+def _construir(pasta_static, pasta_dist, forcar):
+    # Chamado com a trava: o manifesto lido aqui já inclui o que outro
+    # processo acabou de gerar
+    anterior = None if forcar else carregar_manifesto(pasta_static)
+    arquivos_anteriores = (anterior or {}).get("arquivos", {})
+    arquivos = {}
+    processados = 0
+
+    for rel in listar_fontes(pasta_static):
+        sha = _hash_arquivo(os.path.join(pasta_static, rel))
+        antiga = arquivos_anteriores.get(rel)
+        if antiga and antiga["sha256"] == sha and all(
+            os.path.exists(os.path.join(pasta_static, url)) for url in _urls_da_entrada(antiga)
+        ):
+            arquivos[rel] = antiga
+            continue
+        arquivos[rel] = _processar(rel, pasta_static, sha)
+        processados += 1
+
+    manifesto = {"versao": VERSAO_MANIFESTO, "arquivos": arquivos}
+    if processados or anterior is None or len(arquivos) != len(arquivos_anteriores):
+        _remover_orfaos(pasta_static, arquivos)
+        descritor, temporario = tempfile.mkstemp(prefix=ARQUIVO_MANIFESTO + ".", dir=pasta_dist)
+        try:
+            with os.fdopen(descritor, "w", encoding="utf-8") as f:
+                json.dump(manifesto, f, indent=1, ensure_ascii=False)
+            os.chmod(temporario, 0o644)
+            os.replace(temporario, os.path.join(pasta_dist, ARQUIVO_MANIFESTO))
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(temporario)
+            raise
+    manifesto["processados"] = processados
+    return manifesto
+
+
+def _remover_orfaos(pasta_static, arquivos):
+    validos = set()
+    for entrada in arquivos.values():
+        validos.update(_urls_da_entrada(entrada))
+    pasta_dist = os.path.join(pasta_static, PASTA_DIST)
+    for raiz, _, nomes in os.walk(pasta_dist):
+        for nome in nomes:
+            rel = os.path.relpath(os.path.join(raiz, nome), pasta_static).replace(os.sep, "/")
+            if rel not in validos and nome not in (ARQUIVO_MANIFESTO, ARQUIVO_TRAVA):
+                os.remove(os.path.join(raiz, nome))
+
+
+# =======================================================
+# SERVIÇO
+# =======================================================
+def _aceita(accept, valor):
+    """True só se o cliente listou `valor` explicitamente (ignora curingas)."""
+    return any(item == valor and qualidade > 0 for item, qualidade in accept)
+
+
+class Estaticos:
+    """Resolve URLs com hash e escolhe a variante certa para cada cliente."""
+
+    def __init__(self, manifesto):
+        self.arquivos = manifesto.get("arquivos", {}) if manifesto else {}
+        # URL servida -> entrada (para negociar formato/codificação)
+        self.por_url = {}
+        for entrada in self.arquivos.values():
+            self._indexar(entrada)
+
+    def _indexar(self, entrada):
+        self.por_url[entrada["url"]] = entrada
+        for variante in entrada.get("larguras", {}).values():
+            self._indexar(variante)
+
+    def url(self, filename, largura=None):
+        entrada = self.arquivos.get(filename)
+        if entrada is None:
+            return None
+        larguras = entrada.get("larguras")
+        if largura and larguras:
+            for chave in sorted(larguras, key=int):
+                if int(chave) >= int(largura):
+                    return larguras[chave]["url"]
+            # Nenhuma variante cobre a largura pedida: usa o original
+        return entrada["url"]
+
+    def escolher(self, filename, aceita_tipos, aceita_codificacoes):
+        """Devolve (arquivo, content-encoding, vary) para a URL pedida."""
+        entrada = self.por_url.get(filename)
+        if entrada is None:
+            return filename, None, None
+        if "avif" in entrada or "webp" in entrada:
+            for formato in ("avif", "webp"):
+                if formato in entrada and _aceita(aceita_tipos, f"image/{formato}"):
+                    return entrada[formato], None, "Accept"
+            return filename, None, "Accept"
+        if "gzip" in entrada:
+            for codificacao, chave in (("br", "br"), ("gzip", "gzip")):
+                if chave in entrada and _aceita(aceita_codificacoes, codificacao):
+                    return entrada[chave], codificacao, "Accept-Encoding"
+            return filename, None, "Accept-Encoding"
+        return filename, None, None
+
+
+def init_app(app):
+    """Liga o fingerprint ao url_for e serve /static/dist com cache longo.
+
+    LUMI_ASSETS: "auto" (padrão, reconstrói o que mudou na inicialização),
+    "manifesto" (só lê um manifesto já gerado) ou "off".
+    """
+    modo = os.environ.get("LUMI_ASSETS", "auto").lower()
+    pasta_static = app.static_folder
+
+    if modo == "off":
+        return None
+    if modo == "manifesto":
+        manifesto = carregar_manifesto(pasta_static)
+    else:
+        try:
+            manifesto = construir_manifesto(pasta_static)
+        except OSError as e:
+            print(f"AVISO: Falha ao gerar static/dist ({e}). Servindo arquivos sem hash.")
+            manifesto = None
+    estaticos = Estaticos(manifesto)
+    app.extensions["lumi_estaticos"] = estaticos
+
+    @app.url_defaults
+    def _url_com_hash(endpoint, values):
+        if endpoint != "static":
+            return
+        largura = values.pop("largura", None)
+        url = estaticos.url(values.get("filename"), largura)
+        if url:
+            values["filename"] = url
+
+    def servir_estatico(filename):
+        if not filename.startswith(PASTA_DIST + "/"):
+            return app.send_static_file(filename)
+        arquivo, codificacao, vary = estaticos.escolher(
+            filename, request.accept_mimetypes, request.accept_encodings
+        )
+        tipo = mimetypes.guess_type(filename)[0] if codificacao else None
+        response = send_from_directory(pasta_static, arquivo, mimetype=tipo, max_age=UM_ANO)
+        if codificacao:
+            response.headers["Content-Encoding"] = codificacao
+        if vary:
+            response.vary.add(vary)
+        response.headers["Cache-Control"] = CACHE_IMUTAVEL
+        return response
+
+    app.view_functions["static"] = servir_estatico
+
+    # Registrado antes do Flask-Login, então roda depois dele: os arquivos de
+    # dist/ são iguais para todos, e "Vary: Cookie" impediria cache em proxies.
+    @app.after_request
+    def _sem_vary_cookie(response):
+        if request.endpoint == "static" and request.view_args.get("filename", "").startswith(PASTA_DIST + "/"):
+            session.accessed = False
+        return response
+    return estaticos
@@ -0,0 +1,282 @@
+# =======================================================
+# EXPORTAÇÃO DOS DADOS DO ALUNO (zip ou NDJSON em streaming)
+# =======================================================
+# GET /api/exportar devolve tudo o que a Lumi guarda do aluno logado:
+# perfil, resultado VARK, flashcards, o chat inteiro (lotes arquivados e
+# mensagens recentes, sem o que ele limpou) e os eventos de estudo (Modo
+# Foco, flashcards e tentativas do simulador).
+#
+# Nada é montado em memória: cada seção é lida com cursor no servidor
+# (yield_per, LUMI_EXPORTACAO_LOTE linhas por vez, padrão 500), cada
+# registro vira uma linha de JSON e o zip é comprimido à medida que as
+# linhas chegam. A resposta recebe um pedaço a cada LUMI_EXPORTACAO_BLOCO
+# bytes (padrão 64 KiB), então a memória usada não depende do tamanho do
+# histórico. No Postgres tudo é lido numa transação REPEATABLE READ (uma
+# foto só do banco, mesmo com o aluno usando o chat durante o download).
+#
+# ?formato=zip (padrão) traz perfil.json, vark.json e um .ndjson por
+# seção; ?formato=ndjson manda um único stream com o campo "secao" em
+# cada linha.
+#
+# `flask users-export PASTA` grava o zip de vários alunos (todos, os de
+# --curso ou os de --matricula) em paralelo, um arquivo por aluno. Arquivos
+# já gravados são pulados: rodar de novo continua de onde parou.
+# =======================================================
+
+import contextlib
+import itertools
+import json
+import os
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from operator import itemgetter
+
+from sqlalchemy import select
+
+from lumi import metricas, retencao, telemetria
+
+FORMATOS = ("zip", "ndjson")
+# Seções com um registro só viram .json no zip; as demais, .ndjson
+SECOES_UNICAS = ("perfil", "vark")
+
+EXPORTACOES = metricas.REGISTRO.contador(
+    "lumi_data_exports_total",
+    "Exportações de dados de alunos (format=zip|ndjson, result=ok|erro).",
+    ("format", "result"),
+)
+BYTES = metricas.REGISTRO.contador(
+    "lumi_data_export_bytes_total",
+    "Bytes enviados ou gravados pelas exportações de dados de alunos.",
+    ("format",),
+)
+
+
+def _iso(valor):
+    return valor.isoformat() if hasattr(valor, "isoformat") else valor
+
+
+def _linha_json(registro):
+    return (json.dumps(registro, ensure_ascii=False, default=_iso) + "\n").encode("utf-8")
+
+
+class _Saida:
+    """Destino do ZipFile: junta os bytes até a resposta pedir o próximo pedaço.
+
+    Sem seek(), o zipfile grava cada arquivo com data descriptor em vez de
+    voltar para corrigir o cabeçalho, o que permite mandar o zip aos poucos.
+    """
+
+    def __init__(self):
+        self._partes = []
+        self.tamanho = 0  # bytes ainda não entregues
+        self._posicao = 0
+
+    def write(self, dados):
+        self._partes.append(bytes(dados))
+        self.tamanho += len(dados)
+        self._posicao += len(dados)
+        return len(dados)
+
+    def tell(self):
+        return self._posicao
+
+    def flush(self):
+        pass
+
+    def esvaziar(self):
+        dados = b"".join(self._partes)
+        self._partes.clear()
+        self.tamanho = 0
+        return dados
+
+
+class Exportador:
+    """Lê os dados de um aluno em streaming e os entrega como zip ou NDJSON."""
+
+    def __init__(self, usuarios, vark, flashcards, chat, arquivo, limpeza, eventos, lote=500, bloco=64 * 1024):
+        self.usuarios = usuarios
+        self.vark = vark
+        self.flashcards = flashcards
+        self.chat = chat
+        self.arquivo = arquivo
+        self.limpeza = limpeza
+        self.eventos = eventos
+        self.lote = lote
+        self.bloco = bloco
+
+    # ---------------------------------------------------
+    # LEITURA
+    # ---------------------------------------------------
+    def _cursor(self, conexao, consulta, lote=None):
+        return conexao.execute(consulta, execution_options={"yield_per": lote or self.lote})
+
+    def registros(self, conexao, user_id):
+        """(seção, dicionário) de cada dado do aluno, seção por seção."""
+        u = self.usuarios.c
+        perfil = conexao.execute(select(self.usuarios).where(u.id == user_id)).mappings().first()
+        if perfil is None:
+            return
+        yield "perfil", {
+            "id": perfil["id"], "nome": perfil["username"], "email": perfil["email"],
+            "matricula": perfil["matricula"], "cpf": perfil["cpf"], "telefone": perfil["telefone"],
+            "genero": perfil["sexo"], "etnia": perfil["etnia"], "curso": perfil["curso"],
+            "imagem_perfil": perfil["profile_image"],
+        }
+
+        if perfil["vark_scores_json"]:
+            v = self.vark.c
+            salvo = conexao.execute(select(v.periodo, v.salvo_em).where(v.user_id == user_id)).first()
+            try:
+                pontos = json.loads(perfil["vark_scores_json"])
+            except json.JSONDecodeError:
+                pontos = None
+            yield "vark", {
+                "pontos": pontos, "tipo_principal": perfil["vark_primary_type"],
+                "periodo": salvo.periodo if salvo else None, "salvo_em": salvo.salvo_em if salvo else None,
+            }
+
+        f = self.flashcards.c
+        for linha in self._cursor(conexao, select(f.id, f.materia, f.pergunta, f.resposta)
+                                  .where(f.user_id == user_id).order_by(f.id)):
+            yield "flashcards", dict(linha._mapping)
+
+        # Lotes arquivados primeiro (mais antigos), depois as mensagens recentes
+        a = self.arquivo.c
+        for codificacao, dados in self._cursor(conexao, select(a.codificacao, a.dados)
+                                               .where(a.user_id == user_id).order_by(a.inicio), lote=8):
+            for mensagem_id, role, content, timestamp in retencao.descompactar(codificacao, dados):
+                yield "chat", {"id": mensagem_id, "role": role, "content": content,
+                               "timestamp": timestamp, "arquivada": True}
+        limpo_ate = conexao.execute(
+            select(self.limpeza.c.ate_id).where(self.limpeza.c.user_id == user_id)
+        ).scalar() or 0
+        c = self.chat.c
+        for linha in self._cursor(conexao, select(c.id, c.role, c.content, c.timestamp)
+                                  .where(c.user_id == user_id, c.id > limpo_ate).order_by(c.id)):
+            yield "chat", dict(linha._mapping, arquivada=False)
+
+        e = self.eventos.c
+        for linha in self._cursor(conexao, select(e.tipo, e.momento, e.valor, e.extra)
+                                  .where(e.user_id == user_id).order_by(e.id)):
+            yield "estudo", _evento(linha)
+
+    def _abrir(self, motor):
+        conexao = motor.connect()
+        if motor.dialect.name == "postgresql":
+            conexao.execution_options(isolation_level="REPEATABLE READ", postgresql_readonly=True)
+        return conexao
+
+    # ---------------------------------------------------
+    # FORMATOS
+    # ---------------------------------------------------
+    def gerar(self, motor, user_id, formato="zip"):
+        """Gerador de pedaços de bytes do arquivo do aluno."""
+        produzir = self._zip if formato == "zip" else self._ndjson
+        enviados = 0
+        try:
+            with self._abrir(motor) as conexao, conexao.begin(), \
+                    contextlib.closing(produzir(self.registros(conexao, user_id))) as pedacos:
+                for pedaco in pedacos:
+                    enviados += len(pedaco)
+                    yield pedaco
+        except GeneratorExit:
+            raise  # o cliente desistiu do download
+        except Exception:
+            EXPORTACOES.inc(formato, "erro")
+            raise
+        else:
+            EXPORTACOES.inc(formato, "ok")
+        finally:
+            BYTES.inc(formato, valor=enviados)
+
+    def _ndjson(self, registros):
+        saida = _Saida()
+        for secao, registro in registros:
+            saida.write(_linha_json({"secao": secao, **registro}))
+            if saida.tamanho >= self.bloco:
+                yield saida.esvaziar()
+        if saida.tamanho:
+            yield saida.esvaziar()
+
+    def _zip(self, registros):
+        saida = _Saida()
+        with zipfile.ZipFile(saida, "w", compression=zipfile.ZIP_DEFLATED) as arquivo_zip:
+            for secao, grupo in itertools.groupby(registros, key=itemgetter(0)):
+                if secao in SECOES_UNICAS:
+                    registro = next(grupo)[1]
+                    conteudo = json.dumps(registro, ensure_ascii=False, indent=2, default=_iso)
+                    arquivo_zip.writestr(f"{secao}.json", conteudo)
+                    continue
+                with arquivo_zip.open(f"{secao}.ndjson", "w") as destino:
+                    for _, registro in grupo:
+                        destino.write(_linha_json(registro))
+                        if saida.tamanho >= self.bloco:
+                            yield saida.esvaziar()
+                if saida.tamanho >= self.bloco:
+                    yield saida.esvaziar()
+        yield saida.esvaziar()
+
+    # ---------------------------------------------------
+    # EXPORTAÇÃO EM LOTE (CLI)
+    # ---------------------------------------------------
+    def gravar(self, motor, user_id, caminho):
+        """Grava o zip do aluno em `caminho` (via arquivo .parcial). Devolve os bytes."""
+        parcial = caminho + ".parcial"
+        total = 0
+        with open(parcial, "wb") as destino:
+            for pedaco in self.gerar(motor, user_id):
+                destino.write(pedaco)
+                total += len(pedaco)
+        os.replace(parcial, caminho)
+        return total
+
+    def exportar_varios(self, motor, alunos, pasta, concorrencia=4, progresso=None):
+        """Grava `pasta/<nome>.zip` para cada (user_id, nome) de `alunos`, em paralelo.
+
+        Cada tarefa usa a própria conexão do pool do motor. Devolve um resumo
+        com exportados, pulados, falhas, bytes e segundos.
+        """
+        os.makedirs(pasta, exist_ok=True)
+        resumo = {"exportados": 0, "pulados": 0, "falhas": 0, "bytes": 0}
+        inicio = time.perf_counter()
+        pendentes = []
+        for user_id, nome in alunos:
+            caminho = os.path.join(pasta, f"{nome}.zip")
+            if os.path.exists(caminho):
+                resumo["pulados"] += 1
+            else:
+                pendentes.append((user_id, caminho))
+        with ThreadPoolExecutor(max(1, concorrencia), thread_name_prefix="lumi-exportacao") as executor:
+            futuros = {executor.submit(self.gravar, motor, user_id, caminho): caminho
+                       for user_id, caminho in pendentes}
+            for futuro in as_completed(futuros):
+                try:
+                    resumo["bytes"] += futuro.result()
+                    resumo["exportados"] += 1
+                except Exception as erro:
+                    resumo["falhas"] += 1
+                    if progresso:
+                        progresso(f"{os.path.basename(futuros[futuro])}: {erro}")
+        resumo["segundos"] = round(time.perf_counter() - inicio, 2)
+        return resumo
+
+
+def _evento(linha):
+    momento = datetime.fromtimestamp(linha.momento, timezone.utc).isoformat()
+    if linha.tipo == telemetria.FOCO:
+        return {"tipo": "foco", "momento": momento, "segundos": linha.valor, "concluida": bool(linha.extra)}
+    if linha.tipo == telemetria.SIMULADOR:
+        return {"tipo": "simulador", "momento": momento, "acertos": linha.valor, "questoes": linha.extra}
+    return {"tipo": "flashcard", "momento": momento, "cartas": linha.valor}
+
+
+def init_app(app, usuarios, vark, flashcards, chat, arquivo, limpeza, eventos):
+    exportador = Exportador(
+        usuarios, vark, flashcards, chat, arquivo, limpeza, eventos,
+        lote=int(os.environ.get("LUMI_EXPORTACAO_LOTE", "500")),
+        bloco=int(os.environ.get("LUMI_EXPORTACAO_BLOCO", str(64 * 1024))),
+    )
+    app.extensions["lumi_exportacao"] = exportador
+    return exportador
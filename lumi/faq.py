@@ -0,0 +1,225 @@
+# =======================================================
+# BUSCA NO FAQ (ÍNDICE INVERTIDO COM TOLERÂNCIA A ERROS)
+# =======================================================
+# O faq.json é lido uma vez e vira um índice invertido em memória:
+#   termo normalizado -> ((posição da pergunta, peso), ...)
+# "Normalizado" = minúsculas e sem acentos, então "matricula" encontra
+# "Matrícula". Para erros de digitação, cada termo do vocabulário também é
+# indexado pelos seus trigramas; um termo da consulta que não existe no
+# vocabulário é trocado pelos termos mais parecidos (similaridade de
+# trigramas, como o pg_trgm).
+#
+# O índice só é reconstruído quando o arquivo muda (mtime/tamanho), e é
+# imutável depois de pronto: as threads só trocam a referência.
+#
+# `resposta_exata()` é o atalho do chat: se a pergunta do aluno tem as
+# mesmas palavras, na mesma ordem, de uma pergunta do FAQ (ignorando só
+# artigos e preposições), a resposta sai daqui sem chamar o LLM. As
+# STOPWORDS da busca não valem aqui: "Quando posso justificar uma falta?"
+# não é "Como posso justificar uma falta?".
+# =======================================================
+
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+
+from lumi import metricas
+
+# Palavras com hífen ("Wi-Fi") valem pelas partes e pela forma junta ("wifi")
+TERMO = re.compile(r"\w+(?:-\w+)*", re.UNICODE)
+TAG_HTML = re.compile(r"<[^>]+>")
+
+# Palavras que não ajudam a distinguir uma pergunta da outra
+STOPWORDS = frozenset(
+    """
+    a o as os um uma uns umas de do da dos das em no na nos nas por pelo pela
+    pelos pelas para pra com sem e ou que qual quais quando onde como se eu
+    meu minha meus minhas voce seu sua ao aos ser sao sobre ha tem ter
+    faco fazer posso pode
+    """.split()
+)
+
+# Para a pergunta exata, só o que não muda o sentido (interrogativos ficam)
+PALAVRAS_VAZIAS_EXATA = frozenset(
+    """
+    a o as os um uma uns umas de do da dos das em no na nos nas por pelo pela
+    pelos pelas para pra ao aos e
+    """.split()
+)
+
+PESO_PERGUNTA = 2.0
+PESO_RESPOSTA = 1.0
+SIMILARIDADE_MINIMA = 0.4
+MAX_CORRECOES = 3
+LIMITE_PADRAO = 5
+
+CONSULTAS = metricas.REGISTRO.contador(
+    "lumi_faq_queries_total", "Buscas no índice do FAQ.", ("origem",)
+)
+ATALHOS_CHAT = metricas.REGISTRO.contador(
+    "lumi_faq_chat_hits_total", "Perguntas do chat respondidas pelo FAQ sem chamar o LLM."
+)
+
+
+def normalizar(texto):
+    """Minúsculas, sem acentos e sem HTML."""
+    texto = TAG_HTML.sub(" ", texto or "")
+    decomposto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def termos(texto):
+    encontrados = []
+    for palavra in TERMO.findall(normalizar(texto)):
+        if "-" in palavra:
+            partes = palavra.split("-")
+            encontrados.extend(partes)
+            encontrados.append("".join(partes))
+        else:
+            encontrados.append(palavra)
+    return [t for t in encontrados if t not in STOPWORDS]
+
+
+def assinatura(texto):
+    """Palavras da pergunta, em ordem, sem artigos e preposições ("Wi-Fi" = "wifi")."""
+    palavras = (p.replace("-", "") for p in TERMO.findall(normalizar(texto)))
+    return tuple(p for p in palavras if p not in PALAVRAS_VAZIAS_EXATA)
+
+
+def trigramas(termo):
+    # Mesmo preenchimento do pg_trgm: dois espaços antes e um depois
+    preenchido = f"  {termo} "
+    return {preenchido[i:i + 3] for i in range(len(preenchido) - 2)}
+
+
+class IndiceFAQ:
+    """Índice invertido (somente leitura) de uma lista de perguntas do FAQ."""
+
+    def __init__(self, itens):
+        self.itens = list(itens)
+        self.assinaturas = {}
+        postings = defaultdict(Counter)
+
+        for posicao, item in enumerate(self.itens):
+            termos_pergunta = termos(item.get("pergunta", ""))
+            for termo in termos_pergunta:
+                postings[termo][posicao] += PESO_PERGUNTA
+            for termo in termos(item.get("resposta", "")):
+                postings[termo][posicao] += PESO_RESPOSTA
+            chave = assinatura(item.get("pergunta", ""))
+            if chave:
+                self.assinaturas.setdefault(chave, posicao)
+
+        total = max(len(self.itens), 1)
+        self.postings = {}
+        for termo, pesos in postings.items():
+            idf = math.log(1 + total / len(pesos))
+            self.postings[termo] = tuple((pos, idf * (1 + math.log(peso))) for pos, peso in pesos.items())
+
+        trigramas_vocab = defaultdict(list)
+        for termo in self.postings:
+            for tri in trigramas(termo):
+                trigramas_vocab[tri].append(termo)
+        self.trigramas = {tri: tuple(lista) for tri, lista in trigramas_vocab.items()}
+
+    def corrigir(self, termo):
+        """Termos do vocabulário parecidos com `termo`: [(termo, similaridade)]."""
+        if termo in self.postings:
+            return [(termo, 1.0)]
+        if len(termo) < 3:
+            return []
+        tri_consulta = trigramas(termo)
+        comuns = Counter()
+        for tri in tri_consulta:
+            for candidato in self.trigramas.get(tri, ()):
+                comuns[candidato] += 1
+        parecidos = []
+        for candidato, n in comuns.items():
+            similaridade = n / (len(tri_consulta) + len(trigramas(candidato)) - n)
+            if similaridade >= SIMILARIDADE_MINIMA:
+                parecidos.append((candidato, similaridade))
+        parecidos.sort(key=lambda par: -par[1])
+        return parecidos[:MAX_CORRECOES]
+
+    def buscar(self, consulta, limite=LIMITE_PADRAO):
+        """Posições das perguntas mais relevantes: [(posição, pontuação)]."""
+        pontuacao = defaultdict(float)
+        for termo in dict.fromkeys(termos(consulta)):
+            for correcao, similaridade in self.corrigir(termo):
+                for posicao, peso in self.postings[correcao]:
+                    pontuacao[posicao] += similaridade * peso
+        melhores = sorted(pontuacao.items(), key=lambda par: (-par[1], par[0]))
+        return melhores[:limite]
+
+    def exata(self, consulta):
+        """Posição da pergunta com as mesmas palavras, na mesma ordem, ou None."""
+        chave = assinatura(consulta)
+        return self.assinaturas.get(chave) if chave else None
+
+
+# =======================================================
+# CACHE POR ARQUIVO
+# =======================================================
+_cache = {}  # caminho -> ((mtime_ns, tamanho), IndiceFAQ)
+_lock = threading.Lock()
+
+
+def _ler_itens(caminho):
+    try:
+        with metricas.medir("json"), open(caminho, "r", encoding="utf-8") as f:
+            dados = json.load(f)
+    except FileNotFoundError:
+        print(f"AVISO: Arquivo {caminho} não encontrado.")
+        return []
+    except json.JSONDecodeError as e:
+        print(f"ERRO: Falha ao decodificar JSON em {caminho}. Detalhe: {e}")
+        return []
+    return [item for item in dados if isinstance(item, dict)] if isinstance(dados, list) else []
+
+
+def obter_indice(caminho):
+    """Índice do arquivo, reconstruído só se ele mudou desde a última leitura."""
+    try:
+        estado = os.stat(caminho)
+        versao = (estado.st_mtime_ns, estado.st_size)
+    except OSError:
+        versao = None
+    em_cache = _cache.get(caminho)
+    if em_cache is not None and em_cache[0] == versao:
+        return em_cache[1]
+    with _lock:
+        em_cache = _cache.get(caminho)
+        if em_cache is None or em_cache[0] != versao:
+            em_cache = (versao, IndiceFAQ(_ler_itens(caminho) if versao else []))
+            _cache[caminho] = em_cache
+    return em_cache[1]
+
+
+def buscar(caminho, consulta, limite=LIMITE_PADRAO):
+    """Busca no FAQ do arquivo: lista de dicts prontos para JSON."""
+    indice = obter_indice(caminho)
+    CONSULTAS.inc("api")
+    return [
+        {
+            "indice": posicao,
+            "pergunta": indice.itens[posicao].get("pergunta", ""),
+            "resposta": indice.itens[posicao].get("resposta", ""),
+            "pontuacao": round(pontos, 4),
+        }
+        for posicao, pontos in indice.buscar(consulta, limite)
+    ]
+
+
+def resposta_exata(caminho, pergunta):
+    """(posição, resposta) se a pergunta bate com uma do FAQ; senão None."""
+    indice = obter_indice(caminho)
+    CONSULTAS.inc("chat")
+    posicao = indice.exata(pergunta)
+    if posicao is None:
+        return None
+    ATALHOS_CHAT.inc()
+    return posicao, indice.itens[posicao].get("resposta", "")
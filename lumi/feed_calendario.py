@@ -0,0 +1,601 @@
+# =======================================================
+# CALENDÁRIO EM TEMPO REAL – FEED DE MUDANÇAS POR SSE
+# =======================================================
+# Cada evento salvo ou excluído no calendário vira uma linha em
+# calendario_mudanca. O id da linha é a versão do feed: crescente, única
+# entre workers (vem do banco) e guardada com o curso, a ação
+# (added|updated|removed) e o evento no formato que o template usa.
+#
+# GET /api/calendario/mudancas é um stream SSE (text/event-stream). O
+# cliente manda a última versão que viu (cabeçalho Last-Event-ID, que o
+# EventSource reenvia sozinho ao reconectar, ou ?desde=N). O servidor
+# manda primeiro o que o banco tem depois dela e depois as mudanças novas,
+# conforme chegam, cada uma com `id: <versão>`. Quem ficou para trás além
+# do que ainda está guardado (LUMI_CALENDARIO_FEED_MANTER mudanças, padrão
+# 1000) recebe `event: recarregar` e recarrega a página inteira.
+#
+# A distribuição entre as conexões abertas passa por um broker:
+#   - BrokerLocal (padrão): filas em memória, entre as threads do processo.
+#     O que foi salvo em outro worker não passa por ele: a cada batida
+#     (LUMI_CALENDARIO_SSE_BATIDA) a stream busca no banco o que chegou.
+#   - BrokerRESP (LUMI_CALENDARIO_BROKER=redis://host:porta): publica com
+#     PUBLISH num servidor que fala o protocolo do Redis e recebe de volta,
+#     por PSUBSCRIBE, as mudanças de todos os workers. Serve o Redis, o
+#     Valkey ou o substituto de `flask calendar-broker` (ServidorRESP,
+#     só pub/sub, sem dependências). Se a conexão cai, as streams abertas
+#     buscam no banco o que perderam.
+#
+# Com o worker gthread cada stream aberta ocupa uma thread; por isso cada
+# stream dura no máximo LUMI_CALENDARIO_SSE_DURACAO segundos (padrão 300,
+# o navegador reconecta sozinho de onde parou) e cada processo aceita até
+# LUMI_CALENDARIO_SSE_CONEXOES streams (padrão: metade de LUMI_THREADS, ou
+# 1000 com gevent); acima disso responde 503 e a página tenta mais tarde.
+# =======================================================
+
+import fnmatch
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+from sqlalchemy import delete, func, insert, select
+
+from lumi import metricas
+
+PREFIXO_CANAL = "lumi:calendario:"
+ACOES = ("added", "updated", "removed")
+
+MUDANCAS = metricas.REGISTRO.contador(
+    "lumi_calendar_changes_total", "Mudanças no calendário publicadas no feed (action=added|updated|removed).",
+    ("action",),
+)
+ENTREGUES = metricas.REGISTRO.contador(
+    "lumi_calendar_sse_events_total",
+    "Eventos enviados às streams SSE do calendário (source=live|replay|reload).",
+    ("source",),
+)
+STREAMS = metricas.REGISTRO.gauge(
+    "lumi_calendar_sse_streams", "Streams SSE do calendário abertas neste processo."
+)
+RECUSADAS = metricas.REGISTRO.contador(
+    "lumi_calendar_sse_rejected_total", "Streams SSE do calendário recusadas pelo limite de conexões."
+)
+
+log = logging.getLogger(__name__)
+
+
+def canal(curso):
+    return PREFIXO_CANAL + (curso or "_raiz")
+
+
+def evento_para_cliente(evento):
+    """Evento gravado em calendario.json no formato do `initialEvents` do template."""
+    return {
+        "id": evento.get("id"),
+        "title": evento.get("descricao"),
+        "date": str(evento.get("data_inicio") or "")[:10],
+        "type": evento.get("type", "Outro"),
+        "description": evento.get("description", ""),
+    }
+
+
+# ---------------------------------------------------
+# BROKERS
+# ---------------------------------------------------
+class Assinatura:
+    """Fila de mensagens de uma stream. Se encher (cliente lento), a stream
+    descarta a fila e busca no banco o que perdeu."""
+
+    def __init__(self, broker, canal, limite=256):
+        self.broker = broker
+        self.canal = canal
+        self.limite = limite
+        self.perdeu = False
+        self._fila = deque()
+        self._cond = threading.Condition()
+
+    def entregar(self, mensagem):
+        with self._cond:
+            if len(self._fila) >= self.limite:
+                self._fila.clear()
+                self.perdeu = True
+            else:
+                self._fila.append(mensagem)
+            self._cond.notify()
+
+    def avisar_perda(self):
+        with self._cond:
+            self._fila.clear()
+            self.perdeu = True
+            self._cond.notify()
+
+    def proxima(self, espera):
+        """Próxima mensagem, ou None se nada chegou em `espera` segundos (ou houve perda)."""
+        with self._cond:
+            if not self._fila and not self.perdeu:
+                self._cond.wait(espera)
+            return self._fila.popleft() if self._fila else None
+
+    def cancelar(self):
+        self.broker._remover(self)
+
+
+class BrokerLocal:
+    """Pub/sub entre as threads deste processo."""
+
+    def __init__(self):
+        self._assinaturas = {}  # canal -> set(Assinatura)
+        self._lock = threading.Lock()
+
+    def assinar(self, nome_canal):
+        assinatura = Assinatura(self, nome_canal)
+        with self._lock:
+            self._assinaturas.setdefault(nome_canal, set()).add(assinatura)
+        return assinatura
+
+    def _remover(self, assinatura):
+        with self._lock:
+            grupo = self._assinaturas.get(assinatura.canal)
+            if grupo is not None:
+                grupo.discard(assinatura)
+                if not grupo:
+                    del self._assinaturas[assinatura.canal]
+
+    def _entregar_local(self, nome_canal, mensagem):
+        with self._lock:
+            destinos = list(self._assinaturas.get(nome_canal, ()))
+        for assinatura in destinos:
+            assinatura.entregar(mensagem)
+        return len(destinos)
+
+    def _avisar_perda(self):
+        with self._lock:
+            todas = [a for grupo in self._assinaturas.values() for a in grupo]
+        for assinatura in todas:
+            assinatura.avisar_perda()
+
+    def publicar(self, nome_canal, mensagem):
+        return self._entregar_local(nome_canal, mensagem)
+
+    def reiniciar(self):
+        """Depois do fork: as assinaturas do mestre não existem no worker."""
+        with self._lock:
+            self._assinaturas.clear()
+
+    def encerrar(self):
+        pass
+
+
+def _bulk(parte):
+    dados = parte if isinstance(parte, bytes) else str(parte).encode("utf-8")
+    return b"$%d\r\n%s\r\n" % (len(dados), dados)
+
+
+def _comando(*partes):
+    """Comando no protocolo do Redis (RESP): array de bulk strings."""
+    return b"*%d\r\n" % len(partes) + b"".join(_bulk(p) for p in partes)
+
+
+def _ler_resposta(arquivo):
+    linha = arquivo.readline()
+    if not linha:
+        raise ConnectionError("Conexão fechada pelo servidor")
+    tipo, resto = linha[:1], linha[1:-2]
+    if tipo == b"+":
+        return resto.decode("utf-8")
+    if tipo == b"-":
+        raise RuntimeError(resto.decode("utf-8"))
+    if tipo == b":":
+        return int(resto)
+    if tipo == b"$":
+        tamanho = int(resto)
+        if tamanho < 0:
+            return None
+        dados = arquivo.read(tamanho + 2)
+        return dados[:-2]
+    if tipo == b"*":
+        tamanho = int(resto)
+        return None if tamanho < 0 else [_ler_resposta(arquivo) for _ in range(tamanho)]
+    raise ConnectionError(f"Resposta RESP inválida: {linha[:40]!r}")
+
+
+class BrokerRESP(BrokerLocal):
+    """Publica num servidor pub/sub com o protocolo do Redis e entrega às
+    streams deste processo o que volta pela assinatura (de qualquer worker)."""
+
+    def __init__(self, url, timeout=5.0):
+        super().__init__()
+        partes = urlsplit(url)
+        self.host = partes.hostname or "localhost"
+        self.porta = partes.port or 6379
+        self.senha = partes.password
+        self.timeout = timeout
+        self._pub = None
+        self._pub_lock = threading.Lock()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._parar = threading.Event()
+        self._pronto = threading.Event()
+        self._sub = None
+
+    def _conectar(self, timeout):
+        conexao = socket.create_connection((self.host, self.porta), timeout=self.timeout)
+        conexao.settimeout(timeout)
+        arquivo = conexao.makefile("rb")
+        if self.senha:
+            conexao.sendall(_comando("AUTH", self.senha))
+            _ler_resposta(arquivo)
+        return conexao, arquivo
+
+    def assinar(self, nome_canal):
+        self._garantir_thread()
+        # Sem a assinatura ativa, o que for publicado entre a leitura do banco
+        # e a conexão se perderia
+        self._pronto.wait(self.timeout)
+        return super().assinar(nome_canal)
+
+    def publicar(self, nome_canal, mensagem):
+        with self._pub_lock:
+            for tentativa in range(2):
+                try:
+                    if self._pub is None:
+                        self._pub = self._conectar(self.timeout)
+                    conexao, arquivo = self._pub
+                    conexao.sendall(_comando("PUBLISH", nome_canal, mensagem))
+                    return _ler_resposta(arquivo)
+                except (OSError, ConnectionError) as erro:
+                    self._fechar_pub()
+                    if tentativa:
+                        # Sem o servidor, ao menos as streams deste processo recebem
+                        log.warning("Broker do calendário indisponível (%s); entregando só neste processo", erro)
+                        return self._entregar_local(nome_canal, mensagem)
+
+    def _fechar_pub(self):
+        if self._pub is not None:
+            try:
+                self._pub[0].close()
+            except OSError:
+                pass
+            self._pub = None
+
+    def _garantir_thread(self):
+        # A thread de assinatura nasce na primeira stream do worker (depois do fork)
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._parar.clear()
+                self._thread = threading.Thread(target=self._ouvir, name="lumi-calendario-broker", daemon=True)
+                self._thread.start()
+
+    def _ouvir(self):
+        espera = 0.5
+        conectado_antes = False
+        while not self._parar.is_set():
+            try:
+                conexao, arquivo = self._sub = self._conectar(None)
+                conexao.sendall(_comando("PSUBSCRIBE", PREFIXO_CANAL + "*"))
+                _ler_resposta(arquivo)
+                self._pronto.set()
+                if conectado_antes:
+                    # Mensagens publicadas enquanto estava fora se perderam
+                    self._avisar_perda()
+                conectado_antes, espera = True, 0.5
+                while not self._parar.is_set():
+                    resposta = _ler_resposta(arquivo)
+                    if isinstance(resposta, list) and resposta and resposta[0] == b"pmessage":
+                        self._entregar_local(resposta[2].decode("utf-8"), resposta[3].decode("utf-8"))
+            except (OSError, ConnectionError, RuntimeError, ValueError) as erro:
+                if self._parar.is_set():
+                    return
+                self._pronto.clear()
+                log.warning("Assinatura do broker do calendário caiu (%s); reconectando em %.1fs", erro, espera)
+                self._avisar_perda()
+                self._parar.wait(espera)
+                espera = min(espera * 2, 30.0)
+            finally:
+                if self._sub is not None:
+                    try:
+                        self._sub[0].close()
+                    except OSError:
+                        pass
+                    self._sub = None
+
+    def reiniciar(self):
+        super().reiniciar()
+        # Conexões e thread são do mestre: esquece sem fechar (o socket é compartilhado)
+        self._pub = None
+        self._sub = None
+        self._thread = None
+        self._parar = threading.Event()
+        self._pronto = threading.Event()
+        self._pub_lock = threading.Lock()
+        self._thread_lock = threading.Lock()
+
+    def encerrar(self):
+        self._parar.set()
+        sub = self._sub
+        if sub is not None:
+            try:
+                sub[0].shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        with self._pub_lock:
+            self._fechar_pub()
+
+
+class ServidorRESP(socketserver.ThreadingTCPServer):
+    """Substituto mínimo do Redis para o feed: só PUBLISH, SUBSCRIBE,
+    PSUBSCRIBE, PING e QUIT. Para vários workers numa máquina sem Redis."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, endereco):
+        self._clientes = {}  # conexão -> (lock de escrita, canais, padrões)
+        self._lock = threading.Lock()
+        super().__init__(endereco, _ClienteRESP)
+
+    def publicar(self, nome_canal, mensagem):
+        with self._lock:
+            destinos = list(self._clientes.items())
+        entregues = 0
+        for conexao, (trava, canais, padroes) in destinos:
+            envios = []
+            if nome_canal in canais:
+                envios.append(_comando("message", nome_canal, mensagem))
+            envios.extend(_comando("pmessage", p, nome_canal, mensagem)
+                          for p in padroes if fnmatch.fnmatchcase(nome_canal, p))
+            for envio in envios:
+                try:
+                    with trava:
+                        conexao.sendall(envio)
+                    entregues += 1
+                except OSError:
+                    pass
+        return entregues
+
+
+class _ClienteRESP(socketserver.StreamRequestHandler):
+    def handle(self):
+        servidor = self.server
+        trava, canais, padroes = threading.Lock(), set(), set()
+        with servidor._lock:
+            servidor._clientes[self.connection] = (trava, canais, padroes)
+        try:
+            while True:
+                try:
+                    partes = _ler_resposta(self.rfile)
+                except (ConnectionError, ValueError, OSError):
+                    return
+                if not isinstance(partes, list) or not partes:
+                    continue
+                nome = partes[0].decode("utf-8").upper()
+                args = [p.decode("utf-8") for p in partes[1:]]
+                if nome == "PUBLISH" and len(args) == 2:
+                    resposta = b":%d\r\n" % servidor.publicar(args[0], args[1])
+                elif nome in ("SUBSCRIBE", "PSUBSCRIBE"):
+                    destino = canais if nome == "SUBSCRIBE" else padroes
+                    resposta = b""
+                    for arg in args:
+                        destino.add(arg)
+                        total = len(canais) + len(padroes)
+                        resposta += b"*3\r\n" + _bulk(nome.lower()) + _bulk(arg) + b":%d\r\n" % total
+                elif nome == "PING":
+                    resposta = b"+PONG\r\n"
+                elif nome == "AUTH":
+                    resposta = b"+OK\r\n"
+                elif nome == "QUIT":
+                    with trava:
+                        self.connection.sendall(b"+OK\r\n")
+                    return
+                else:
+                    resposta = b"-ERR comando nao suportado: " + nome.encode("utf-8") + b"\r\n"
+                with trava:
+                    self.connection.sendall(resposta)
+        finally:
+            with servidor._lock:
+                servidor._clientes.pop(self.connection, None)
+
+
+# ---------------------------------------------------
+# FEED
+# ---------------------------------------------------
+class FeedCalendario:
+    """Registro versionado das mudanças e streams SSE por curso."""
+
+    def __init__(self, app, db, tabela, broker, manter=1000, batida=15.0, duracao=300.0, conexoes=2):
+        self.app = app
+        self.db = db
+        self.tabela = tabela
+        self.broker = broker
+        self.manter = manter
+        self.batida = batida
+        self.duracao = duracao
+        self.conexoes = conexoes
+        self._abertas = 0
+        self._lock = threading.Lock()
+
+    def reiniciar(self):
+        self.broker.reiniciar()
+        with self._lock:
+            self._abertas = 0
+        STREAMS.definir(valor=0)
+
+    # ---------------------------------------------------
+    # REGISTRO DAS MUDANÇAS
+    # ---------------------------------------------------
+    def registrar(self, curso, acao, evento_id, evento=None):
+        """Grava a mudança, publica no broker e devolve a mensagem (com a versão)."""
+        if acao not in ACOES:
+            raise ValueError(f"Ação inválida: {acao!r}")
+        dados = evento_para_cliente(evento) if evento is not None else None
+        texto = json.dumps(dados, ensure_ascii=False) if dados is not None else None
+        with self.app.app_context(), self.db.engine.begin() as conexao:
+            versao = conexao.execute(
+                insert(self.tabela).values(
+                    curso=curso or None, acao=acao, evento_id=str(evento_id), evento=texto, momento=time.time(),
+                )
+            ).inserted_primary_key[0]
+            if self.manter > 0 and versao % 100 == 0:
+                conexao.execute(delete(self.tabela).where(self.tabela.c.id <= versao - self.manter))
+        mensagem = {"versao": versao, "acao": acao, "id": str(evento_id), "evento": dados}
+        MUDANCAS.inc(acao)
+        try:
+            self.broker.publicar(canal(curso), json.dumps(mensagem, ensure_ascii=False))
+        except Exception:
+            # A mudança já está no banco: as streams a pegam na próxima reconexão
+            log.exception("Falha ao publicar a mudança %s do calendário", versao)
+        return mensagem
+
+    def versao_atual(self, curso):
+        with self.app.app_context(), self.db.engine.connect() as conexao:
+            return conexao.execute(
+                select(func.coalesce(func.max(self.tabela.c.id), 0)).where(self._do_curso(curso))
+            ).scalar_one()
+
+    def _do_curso(self, curso):
+        coluna = self.tabela.c.curso
+        return coluna.is_(None) if not curso else coluna == curso
+
+    def mudancas_desde(self, curso, versao):
+        """(mensagens depois de `versao`, completo). completo=False quando
+        mudanças do intervalo já foram apagadas e o cliente precisa recarregar."""
+        t = self.tabela
+        with self.app.app_context(), self.db.engine.connect() as conexao:
+            menor, maior = conexao.execute(select(func.min(t.c.id), func.max(t.c.id))).one()
+            if versao > 0 and (menor is None or versao < menor - 1 or versao > maior):
+                # Apagadas pela limpeza, ou versão de outro banco
+                return [], False
+            linhas = conexao.execute(
+                select(t.c.id, t.c.acao, t.c.evento_id, t.c.evento)
+                .where(self._do_curso(curso), t.c.id > versao)
+                .order_by(t.c.id)
+            ).all()
+        return [
+            {"versao": v, "acao": acao, "id": evento_id, "evento": json.loads(evento) if evento else None}
+            for v, acao, evento_id, evento in linhas
+        ], True
+
+    # ---------------------------------------------------
+    # STREAM SSE
+    # ---------------------------------------------------
+    def reservar(self):
+        """Ocupa uma das conexões do processo; False se estiverem todas em uso."""
+        with self._lock:
+            if self.conexoes and self._abertas >= self.conexoes:
+                RECUSADAS.inc()
+                return False
+            self._abertas += 1
+            STREAMS.definir(valor=self._abertas)
+            return True
+
+    def liberar(self):
+        """Devolve a conexão ocupada por `reservar()`."""
+        with self._lock:
+            self._abertas -= 1
+            STREAMS.definir(valor=self._abertas)
+
+    def transmitir(self, curso, desde):
+        """Gerador do corpo text/event-stream.
+
+        Não mexe nas conexões reservadas: quem chamou `reservar()` libera ao
+        fechar a resposta, mesmo que o gerador nunca chegue a rodar (HEAD,
+        cliente que desiste antes do primeiro byte).
+        """
+        # Sem broker entre processos, o banco é a única fonte das mudanças
+        # salvas pelos outros workers
+        consultar_banco = isinstance(self.broker, BrokerLocal)
+        assinatura = self.broker.assinar(canal(curso))
+        try:
+            yield "retry: 3000\n\n"
+            fim = time.monotonic() + self.duracao if self.duracao > 0 else None
+            mensagens, completo = self.mudancas_desde(curso, desde)
+            if not completo:
+                ENTREGUES.inc("reload")
+                yield "event: recarregar\ndata: {}\n\n"
+                return
+            ultimo = desde
+            for mensagem in mensagens:
+                ENTREGUES.inc("replay")
+                yield _formatar(mensagem)
+                ultimo = max(ultimo, mensagem["versao"])
+            repassado = ultimo  # o que já foi do banco não é repetido ao chegar pelo broker
+            ao_vivo = set()  # versões acima de `repassado` já entregues pelo broker
+
+            while fim is None or time.monotonic() < fim:
+                espera = self.batida if fim is None else max(min(self.batida, fim - time.monotonic()), 0)
+                texto = assinatura.proxima(espera)
+                if assinatura.perdeu:
+                    assinatura.perdeu = False
+                    mensagens, completo = self.mudancas_desde(curso, ultimo)
+                    if not completo:
+                        ENTREGUES.inc("reload")
+                        yield "event: recarregar\ndata: {}\n\n"
+                        return
+                    for mensagem in mensagens:
+                        ENTREGUES.inc("replay")
+                        yield _formatar(mensagem)
+                        ultimo = max(ultimo, mensagem["versao"])
+                    repassado = ultimo
+                    continue
+                if texto is None:
+                    if consultar_banco:
+                        mensagens, completo = self.mudancas_desde(curso, repassado)
+                        if not completo:
+                            ENTREGUES.inc("reload")
+                            yield "event: recarregar\ndata: {}\n\n"
+                            return
+                        for mensagem in mensagens:
+                            if mensagem["versao"] not in ao_vivo:
+                                ENTREGUES.inc("replay")
+                                yield _formatar(mensagem)
+                            repassado = max(repassado, mensagem["versao"])
+                        ultimo = max(ultimo, repassado)
+                        ao_vivo = {versao for versao in ao_vivo if versao > repassado}
+                    yield ": ping\n\n"  # mantém proxies e o navegador com a conexão aberta
+                    continue
+                mensagem = json.loads(texto)
+                if mensagem["versao"] <= repassado or mensagem["versao"] in ao_vivo:
+                    continue
+                ENTREGUES.inc("live")
+                yield _formatar(mensagem)
+                ultimo = max(ultimo, mensagem["versao"])
+                if consultar_banco:
+                    ao_vivo.add(mensagem["versao"])
+        finally:
+            assinatura.cancelar()
+
+
+def _formatar(mensagem):
+    dados = json.dumps(mensagem, ensure_ascii=False)
+    return f"id: {mensagem['versao']}\nevent: mudanca\ndata: {dados}\n\n"
+
+
+def criar_broker(url):
+    if not url or url == "local":
+        return BrokerLocal()
+    if urlsplit(url).scheme not in ("redis", "resp", "tcp"):
+        raise ValueError(f"LUMI_CALENDARIO_BROKER inválido: {url!r} (use local ou redis://host:porta)")
+    return BrokerRESP(url)
+
+
+def _conexoes_padrao():
+    if os.environ.get("LUMI_WORKER_CLASS") == "gevent":
+        return 1000
+    return max(int(os.environ.get("LUMI_THREADS", "4")) // 2, 1)
+
+
+def init_app(app, db, tabela):
+    feed = FeedCalendario(
+        app, db, tabela, criar_broker(os.environ.get("LUMI_CALENDARIO_BROKER", "local")),
+        manter=int(os.environ.get("LUMI_CALENDARIO_FEED_MANTER", "1000")),
+        batida=float(os.environ.get("LUMI_CALENDARIO_SSE_BATIDA", "15")),
+        duracao=float(os.environ.get("LUMI_CALENDARIO_SSE_DURACAO", "300")),
+        conexoes=int(os.environ.get("LUMI_CALENDARIO_SSE_CONEXOES", str(_conexoes_padrao()))),
+    )
+    app.extensions["lumi_feed_calendario"] = feed
+    return feed
@@ -0,0 +1,117 @@
+# =======================================================
+# TEMPLATES: BYTECODE EM DISCO E CACHE DE FRAGMENTOS
+# =======================================================
+# - Bytecode cache: o Jinja grava o código compilado de cada template em
+#   instance/jinja_cache (ou LUMI_JINJA_CACHE_DIR; "off" desliga). Workers
+#   novos carregam o bytecode em vez de recompilar os templates grandes
+#   (calendário, flashcards, método de estudo). `flask templates-compile` e
+#   o wsgi.py (preload no mestre) compilam tudo antes da primeira requisição.
+#
+# - Cache de fragmentos: a tag {% cache %} guarda o HTML renderizado de um
+#   trecho que só depende de dados compartilhados por todos os alunos:
+#
+#       {% cache "calendario_eventos", versao_dados("calendario.json") %}
+#           ... {{ eventos|tojson }} ...
+#       {% endcache %}
+#
+#   O primeiro argumento nomeia o fragmento; os demais formam a versão.
+#   Quando ela muda (o arquivo foi alterado), o trecho é renderizado de novo.
+#   Cada curso tem a sua versão dos dados (lumi/cursos.py), então várias
+#   versões do mesmo fragmento convivem num LRU limitado a
+#   LUMI_FRAGMENTOS_MB (padrão 32) de HTML; as versões antigas saem por lá.
+#   Nada que dependa do aluno logado pode ficar dentro do bloco.
+# =======================================================
+
+import os
+import threading
+from collections import OrderedDict
+
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+from lumi import metricas
+
+FRAGMENTOS = metricas.REGISTRO.contador(
+    "lumi_template_fragments_total",
+    "Fragmentos de template servidos do cache (hit) ou renderizados (miss).",
+    ("fragment", "result"),
+)
+
+
+class CacheFragmentos:
+    """HTML renderizado por (fragmento, versão), despejando os menos usados."""
+
+    def __init__(self, limite_bytes=32 * 1024 * 1024):
+        # (nome, versão) -> html. Duas threads renderizando a mesma versão ao
+        # mesmo tempo só repetem o trabalho; o resultado é o mesmo.
+        self.limite_bytes = limite_bytes
+        self._fragmentos = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def obter(self, nome, versao, renderizar):
+        chave = (nome, versao)
+        with self._lock:
+            html = self._fragmentos.get(chave)
+            if html is not None:
+                self._fragmentos.move_to_end(chave)
+        if html is not None:
+            FRAGMENTOS.inc(nome, "hit")
+            return html
+        FRAGMENTOS.inc(nome, "miss")
+        html = renderizar()
+        with self._lock:
+            if chave not in self._fragmentos:
+                self._fragmentos[chave] = html
+                self._bytes += len(html)
+            while self._bytes > self.limite_bytes and len(self._fragmentos) > 1:
+                _, antigo = self._fragmentos.popitem(last=False)
+                self._bytes -= len(antigo)
+        return html
+
+    def limpar(self):
+        with self._lock:
+            self._fragmentos.clear()
+            self._bytes = 0
+
+
+class ExtensaoFragmentos(Extension):
+    """Tag {% cache nome[, versão...] %}...{% endcache %}."""
+
+    tags = {"cache"}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        limite = float(os.environ.get("LUMI_FRAGMENTOS_MB", "32"))
+        environment.extend(fragmentos=CacheFragmentos(int(limite * 1024 * 1024)))
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        partes = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            partes.append(parser.parse_expression())
+        corpo = parser.parse_statements(("name:endcache",), drop_needle=True)
+        chamada = self.call_method("_renderizar", [nodes.List(partes)])
+        return nodes.CallBlock(chamada, [], [], corpo).set_lineno(lineno)
+
+    def _renderizar(self, partes, caller):
+        nome, *versao = partes
+        return self.environment.fragmentos.obter(nome, tuple(versao), caller)
+
+
+def precompilar(app):
+    """Compila todos os templates (e grava o bytecode). Devolve quantos."""
+    ambiente = app.jinja_env
+    nomes = [nome for nome in ambiente.list_templates() if nome.endswith(".html")]
+    for nome in nomes:
+        ambiente.get_template(nome)
+    return len(nomes)
+
+
+def init_app(app, pasta_bytecode=None):
+    """Liga a tag {% cache %} e, se houver pasta, o bytecode cache em disco."""
+    app.jinja_env.add_extension(ExtensaoFragmentos)
+    if pasta_bytecode:
+        os.makedirs(pasta_bytecode, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(pasta_bytecode)
+    return app.jinja_env.fragmentos
@@ -0,0 +1,446 @@
+# =======================================================
+# GERAÇÃO EM LOTE DE QUESTÕES E FLASHCARDS COM O LLM
+# =======================================================
+# `flask llm-gerar` pede ao modelo questões do simulador e flashcards novos
+# para cada disciplina da matriz.json. Roda fora do servidor, uma vez por
+# semestre; o resultado são candidatos para alguém revisar antes de ir para
+# simulador.json e flashcards.json.
+#
+# Cada pedido ao modelo é uma tarefa (tipo, disciplina, lote). As tarefas
+# rodam em paralelo (--concorrencia), com no máximo --por-minuto pedidos por
+# minuto e novas tentativas com espera crescente quando o modelo falha ou
+# devolve algo que não é JSON. Cada item devolvido é:
+#
+#   1. validado: questões com enunciado, alternativas A a E distintas,
+#      gabarito entre elas e feedback (o esquema do simulador, em
+#      lumi/catalogo.py, mais essas regras); flashcards com pergunta e
+#      resposta;
+#   2. comparado com as questões e cartas que já existem e com os
+#      candidatos já aceitos: MinHash dos trigramas de palavras (sem
+#      acentos), com LSH em bandas para achar os parecidos e a similaridade
+#      de Jaccard exata para decidir (--limiar, padrão 0.6).
+#
+# Tudo é gravado na hora, em arquivos JSON Lines na pasta de saída (padrão
+# instance/geracao/): candidatos.jsonl (aceitos), rejeitados.jsonl (com o
+# motivo) e concluidas.txt (tarefas terminadas). Rodar de novo com a mesma
+# pasta retoma de onde parou: tarefas concluídas são puladas e os
+# candidatos já gravados entram na deduplicação.
+#
+# Com LUMI_LLM_BACKEND=fake o modelo é ModeloGeracaoFake: itens sintéticos
+# determinísticos, com uma repetição e um item inválido de vez em quando
+# para exercitar a validação e a deduplicação.
+# =======================================================
+
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from lumi import catalogo
+from lumi.faq import normalizar
+
+TIPOS = ("questoes", "flashcards")
+LETRAS = ("A", "B", "C", "D", "E")
+
+INSTRUCAO_GERACAO = (
+    "Você elabora material de estudo para alunos de graduação em computação. "
+    "Responda somente com JSON válido, sem texto antes ou depois e sem blocos de código."
+)
+
+log = logging.getLogger(__name__)
+
+
+class Tarefa:
+    __slots__ = ("tipo", "disciplina", "lote", "quantidade")
+
+    def __init__(self, tipo, disciplina, lote, quantidade):
+        self.tipo = tipo
+        self.disciplina = disciplina
+        self.lote = lote
+        self.quantidade = quantidade
+
+    @property
+    def id(self):
+        return f"{self.tipo}:{self.disciplina}:{self.lote}"
+
+
+def disciplinas_da_matriz(matriz):
+    """Nomes das disciplinas (Periodo de lumi/catalogo.py), sem repetir, na ordem da matriz."""
+    vistos = {}
+    for periodo in matriz or ():
+        for disciplina in periodo.disciplinas:
+            if disciplina.nome and disciplina.nome.strip():
+                vistos.setdefault(disciplina.nome.strip(), None)
+    return list(vistos)
+
+
+def sigla(disciplina):
+    palavras = [p for p in re.findall(r"\w+", normalizar(disciplina)) if len(p) > 2]
+    return "".join(p[0] for p in palavras[:4]).upper() or "GEN"
+
+
+# ---------------------------------------------------
+# PROMPT E RESPOSTA DO MODELO
+# ---------------------------------------------------
+def montar_prompt(tarefa, exemplos=()):
+    linhas = [f"Tipo: {tarefa.tipo}", f"Disciplina: {tarefa.disciplina}", f"Quantidade: {tarefa.quantidade}",
+              f"Lote: {tarefa.lote + 1}", ""]
+    if tarefa.tipo == "questoes":
+        linhas.append(
+            f"Crie {tarefa.quantidade} questões de múltipla escolha, de nível de graduação, sobre {tarefa.disciplina}. "
+            'Devolva uma lista JSON de objetos {"stem": enunciado, "options": {"A": ..., "B": ..., "C": ..., '
+            '"D": ..., "E": ...}, "correct": letra da alternativa certa, "feedback": explicação curta}.'
+        )
+    else:
+        linhas.append(
+            f"Crie {tarefa.quantidade} flashcards sobre {tarefa.disciplina}. "
+            'Devolva uma lista JSON de objetos {"pergunta": ..., "resposta": resposta em uma ou duas frases}.'
+        )
+    if tarefa.lote:
+        linhas.append("Outros lotes já cobriram parte da disciplina: escolha assuntos diferentes dentro dela.")
+    if exemplos:
+        linhas.append("Não repita estes, que já existem:")
+        linhas.extend(f"- {e}" for e in exemplos)
+    return "\n".join(linhas)
+
+
+def extrair_itens(texto):
+    """Lista de itens da resposta do modelo (aceita cercas ``` e {"itens": [...]})."""
+    texto = (texto or "").strip()
+    if texto.startswith("```"):
+        texto = texto.strip("`")
+        texto = texto[texto.find("\n") + 1:] if "\n" in texto else texto
+    inicio = min((i for i in (texto.find("["), texto.find("{")) if i >= 0), default=-1)
+    if inicio < 0:
+        raise ValueError("a resposta não tem JSON")
+    dados = json.loads(texto[inicio:texto.rfind("]" if texto[inicio] == "[" else "}") + 1])
+    if isinstance(dados, dict):
+        dados = next((v for v in dados.values() if isinstance(v, list)), None)
+    if not isinstance(dados, list):
+        raise ValueError("a resposta não é uma lista de itens")
+    return dados
+
+
+def validar_questao(item):
+    """Erros da questão gerada (lista vazia = válida)."""
+    if not isinstance(item, dict):
+        return ["item não é um objeto"]
+    erros = catalogo.validar_esquema(dict(item, id=item.get("id") or "novo"), catalogo.ESQUEMA_QUESTAO)
+    if erros:
+        return erros
+    opcoes = item["options"]
+    if tuple(sorted(opcoes)) != LETRAS:
+        erros.append(f"alternativas {sorted(opcoes)}: esperado A, B, C, D e E")
+    textos = [normalizar(t).strip() for t in opcoes.values()]
+    if not all(textos):
+        erros.append("alternativa vazia")
+    elif len(set(textos)) != len(textos):
+        erros.append("alternativas repetidas")
+    if item["correct"] not in opcoes:
+        erros.append(f"gabarito '{item['correct']}' não é uma das alternativas")
+    if not item["stem"].strip():
+        erros.append("enunciado vazio")
+    if not str(item.get("feedback") or "").strip():
+        erros.append("feedback ausente")
+    return erros
+
+
+def validar_flashcard(item):
+    if not isinstance(item, dict):
+        return ["item não é um objeto"]
+    erros = catalogo.validar_esquema(item, catalogo.ESQUEMA_FLASHCARD)
+    if not erros and not (item["pergunta"].strip() and item["resposta"].strip()):
+        erros.append("pergunta ou resposta vazia")
+    return erros
+
+
+def texto_comparado(tipo, item):
+    """O que conta para duas questões (ou cartas) serem a mesma."""
+    if tipo == "questoes":
+        return f"{item['stem']} {item['options'].get(item['correct'], '')}"
+    return item["pergunta"]
+
+
+# ---------------------------------------------------
+# DEDUPLICAÇÃO (MINHASH + LSH)
+# ---------------------------------------------------
+_PRIMO = (1 << 61) - 1
+
+
+def shingles(texto, tamanho=3):
+    """Trigramas de palavras do texto normalizado (as palavras, se forem poucas)."""
+    palavras = re.findall(r"\w+", normalizar(texto))
+    if len(palavras) < tamanho:
+        return set(palavras)
+    return {" ".join(palavras[i:i + tamanho]) for i in range(len(palavras) - tamanho + 1)}
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+class IndiceDuplicatas:
+    """Textos já vistos; `parecido` acha o mais próximo acima do limiar.
+
+    Assinatura MinHash de `permutacoes` valores dividida em `bandas`: dois
+    textos viram candidatos se coincidem numa banda inteira (com 128/32, quem
+    tem Jaccard 0.6 é candidato em ~99% dos casos; quem tem 0.2, em ~5%).
+    Os candidatos são confirmados com o Jaccard exato dos shingles.
+    """
+
+    def __init__(self, limiar=0.6, permutacoes=128, bandas=32):
+        self.limiar = limiar
+        self.bandas = bandas
+        self.linhas = permutacoes // bandas
+        aleatorio = random.Random(1)
+        self._coeficientes = [
+            (aleatorio.randrange(1, _PRIMO), aleatorio.randrange(0, _PRIMO)) for _ in range(permutacoes)
+        ]
+        self._baldes = [{} for _ in range(bandas)]
+        self._itens = []  # (shingles, texto)
+
+    def __len__(self):
+        return len(self._itens)
+
+    def _assinatura(self, conjunto):
+        hashes = [
+            struct.unpack("<Q", hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest())[0] for s in conjunto
+        ]
+        return [min((a * h + b) % _PRIMO for h in hashes) for a, b in self._coeficientes]
+
+    def _chaves(self, assinatura):
+        return [tuple(assinatura[i * self.linhas:(i + 1) * self.linhas]) for i in range(self.bandas)]
+
+    def parecido(self, texto):
+        """(similaridade, texto existente) do mais parecido acima do limiar, ou None."""
+        conjunto = shingles(texto)
+        if not conjunto:
+            return None
+        candidatos = set()
+        for banda, chave in zip(self._baldes, self._chaves(self._assinatura(conjunto))):
+            candidatos.update(banda.get(chave, ()))
+        melhor = None
+        for posicao in candidatos:
+            outro, original = self._itens[posicao]
+            similaridade = jaccard(conjunto, outro)
+            if similaridade >= self.limiar and (melhor is None or similaridade > melhor[0]):
+                melhor = (similaridade, original)
+        return melhor
+
+    def adicionar(self, texto):
+        conjunto = shingles(texto)
+        if not conjunto:
+            return
+        posicao = len(self._itens)
+        self._itens.append((conjunto, texto))
+        for banda, chave in zip(self._baldes, self._chaves(self._assinatura(conjunto))):
+            banda.setdefault(chave, []).append(posicao)
+
+
+# ---------------------------------------------------
+# LIMITE DE PEDIDOS E MODELO LOCAL
+# ---------------------------------------------------
+class LimiteTaxa:
+    """No máximo `por_minuto` pedidos por minuto, espaçados igualmente (0 = sem limite)."""
+
+    def __init__(self, por_minuto):
+        self.intervalo = 60.0 / por_minuto if por_minuto > 0 else 0.0
+        self._proximo = 0.0
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        if not self.intervalo:
+            return
+        with self._lock:
+            agora = time.monotonic()
+            vez = max(self._proximo, agora)
+            self._proximo = vez + self.intervalo
+        if vez > agora:
+            time.sleep(vez - agora)
+
+
+# Palavras dos itens sintéticos do modelo fake (e do benchmark de duplicatas)
+VOCABULARIO = (
+    "algoritmo dados memória processo rede protocolo camada modelo sistema arquitetura função variável "
+    "estrutura grafo árvore lista pilha fila complexidade desempenho segurança criptografia chave acesso "
+    "requisito projeto teste integração usuário interface banco consulta índice transação servidor cliente "
+    "nuvem contêiner serviço evento mensagem sinal circuito lógica conjunto relação matriz vetor probabilidade "
+    "inferência aprendizado treino validação ética privacidade equipe cronograma risco custo qualidade"
+).split()
+
+
+class ModeloGeracaoFake:
+    """Modelo local para testes e benchmarks: itens sintéticos a partir do prompt."""
+
+    def __init__(self, latencia=0.0):
+        self.latencia = latencia
+        self.chamadas = 0
+        self._lock = threading.Lock()
+
+    def gerar(self, prompt):
+        with self._lock:
+            self.chamadas += 1
+        if self.latencia:
+            time.sleep(self.latencia)
+        campos = dict(re.findall(r"^(Tipo|Disciplina|Quantidade): (.+)$", prompt, re.MULTILINE))
+        tipo, disciplina, quantidade = campos["Tipo"], campos["Disciplina"], int(campos["Quantidade"])
+        aleatorio = random.Random(prompt)
+        vocabulario = re.findall(r"\w+", disciplina.lower()) + list(VOCABULARIO)
+
+        def frase(n):
+            return " ".join(aleatorio.choice(vocabulario) for _ in range(n))
+
+        itens = []
+        for _ in range(quantidade):
+            if tipo == "questoes":
+                opcoes = {letra: frase(6) for letra in LETRAS}
+                itens.append({
+                    "stem": f"Em {disciplina}, qual alternativa relaciona {frase(10)}?",
+                    "options": opcoes, "correct": aleatorio.choice(LETRAS), "feedback": frase(8),
+                })
+            else:
+                itens.append({"pergunta": f"O que significa {frase(8)}?", "resposta": frase(12)})
+        if quantidade >= 3:
+            itens[-1] = dict(itens[0])  # repetição dentro do lote
+            if tipo == "questoes":
+                itens[1] = dict(itens[1], correct="F")  # gabarito fora das alternativas
+            else:
+                itens[1] = dict(itens[1], resposta="")
+        return json.dumps(itens, ensure_ascii=False)
+
+
+# ---------------------------------------------------
+# PIPELINE
+# ---------------------------------------------------
+class GeracaoLote:
+    """Roda as tarefas contra `chamar(prompt) -> texto` e grava os resultados em `pasta`."""
+
+    def __init__(self, chamar, pasta, concorrencia=4, por_minuto=30, tentativas=3, espera_base=2.0,
+                 limiar=0.6, exemplos_no_prompt=8):
+        self.chamar = chamar
+        self.pasta = pasta
+        self.concorrencia = max(concorrencia, 1)
+        self.limite = LimiteTaxa(por_minuto)
+        self.tentativas = max(tentativas, 1)
+        self.espera_base = espera_base
+        self.exemplos_no_prompt = exemplos_no_prompt
+        self.indices = {tipo: IndiceDuplicatas(limiar) for tipo in TIPOS}
+        self._exemplos = {}  # (tipo, disciplina normalizada) -> textos existentes
+        os.makedirs(pasta, exist_ok=True)
+        self.concluidas = self._ler_concluidas()
+        self._retomar_candidatos()
+
+    def _arquivo(self, nome):
+        return os.path.join(self.pasta, nome)
+
+    def _ler_concluidas(self):
+        try:
+            with open(self._arquivo("concluidas.txt"), encoding="utf-8") as f:
+                return {linha.rstrip("\n") for linha in f if linha.strip()}
+        except FileNotFoundError:
+            return set()
+
+    def _retomar_candidatos(self):
+        try:
+            with open(self._arquivo("candidatos.jsonl"), encoding="utf-8") as f:
+                for linha in f:
+                    try:
+                        registro = json.loads(linha)
+                    except json.JSONDecodeError:
+                        continue  # linha cortada por uma interrupção no meio da escrita
+                    self.indices[registro["tipo"]].adicionar(texto_comparado(registro["tipo"], registro["item"]))
+        except FileNotFoundError:
+            pass
+
+    def conhecer(self, tipo, disciplina, itens):
+        """Itens que já existem (simulador.json, flashcards.json): entram na
+        deduplicação e alguns vão no prompt como exemplos a não repetir."""
+        textos = []
+        for item in itens:
+            texto = texto_comparado(tipo, item)
+            self.indices[tipo].adicionar(texto)
+            textos.append(item["stem"] if tipo == "questoes" else item["pergunta"])
+        self._exemplos.setdefault((tipo, normalizar(disciplina).strip()), []).extend(textos)
+
+    def tarefas(self, disciplinas, tipos=TIPOS, lotes=2, por_pedido=5):
+        return [
+            Tarefa(tipo, disciplina, lote, por_pedido)
+            for disciplina in disciplinas for tipo in tipos for lote in range(lotes)
+        ]
+
+    def _executar(self, tarefa):
+        exemplos = self._exemplos.get((tarefa.tipo, normalizar(tarefa.disciplina).strip()), ())
+        exemplos = exemplos[: self.exemplos_no_prompt]
+        prompt = montar_prompt(tarefa, exemplos)
+        for tentativa in range(self.tentativas):
+            self.limite.aguardar()
+            try:
+                return extrair_itens(self.chamar(prompt))
+            except Exception as erro:
+                if tentativa + 1 == self.tentativas:
+                    raise
+                espera = self.espera_base * 2 ** tentativa * (0.5 + random.random())
+                log.warning("Tarefa %s falhou (%s); nova tentativa em %.1fs", tarefa.id, erro, espera)
+                time.sleep(espera)
+
+    def rodar(self, tarefas, progresso=None):
+        """Executa as tarefas não concluídas; devolve um resumo com as contagens."""
+        pendentes = [t for t in tarefas if t.id not in self.concluidas]
+        resumo = {"tarefas": len(tarefas), "puladas": len(tarefas) - len(pendentes), "falhas": 0,
+                  "aceitos": 0, "invalidos": 0, "duplicados": 0}
+        if not pendentes:
+            return resumo
+        with open(self._arquivo("candidatos.jsonl"), "a", encoding="utf-8") as candidatos, \
+                open(self._arquivo("rejeitados.jsonl"), "a", encoding="utf-8") as rejeitados, \
+                open(self._arquivo("concluidas.txt"), "a", encoding="utf-8") as concluidas, \
+                ThreadPoolExecutor(self.concorrencia, thread_name_prefix="lumi-geracao") as executor:
+            futuros = {executor.submit(self._executar, t): t for t in pendentes}
+            # Validação, deduplicação e escrita ficam nesta thread, na ordem de chegada
+            for futuro in as_completed(futuros):
+                tarefa = futuros[futuro]
+                try:
+                    itens = futuro.result()
+                except Exception as erro:
+                    resumo["falhas"] += 1
+                    log.error("Tarefa %s desistiu depois de %d tentativas: %s", tarefa.id, self.tentativas, erro)
+                    continue
+                for item in itens:
+                    motivo = self._avaliar(tarefa, item)
+                    registro = {"tarefa": tarefa.id, "tipo": tarefa.tipo, "disciplina": tarefa.disciplina,
+                                "item": item}
+                    if motivo is None:
+                        resumo["aceitos"] += 1
+                        candidatos.write(json.dumps(registro, ensure_ascii=False) + "\n")
+                    else:
+                        resumo["duplicados" if motivo.startswith("duplicado") else "invalidos"] += 1
+                        registro["motivo"] = motivo
+                        rejeitados.write(json.dumps(registro, ensure_ascii=False) + "\n")
+                candidatos.flush()
+                rejeitados.flush()
+                # Só depois dos itens: se parar antes disso, a tarefa roda de novo
+                concluidas.write(tarefa.id + "\n")
+                concluidas.flush()
+                self.concluidas.add(tarefa.id)
+                if progresso is not None:
+                    progresso(tarefa, resumo)
+        return resumo
+
+    def _avaliar(self, tarefa, item):
+        """None se o item foi aceito (e já entrou no índice), senão o motivo."""
+        erros = validar_questao(item) if tarefa.tipo == "questoes" else validar_flashcard(item)
+        if erros:
+            return "inválido: " + "; ".join(erros)
+        texto = texto_comparado(tarefa.tipo, item)
+        parecido = self.indices[tarefa.tipo].parecido(texto)
+        if parecido is not None:
+            return f"duplicado ({parecido[0]:.2f}): {parecido[1][:80]}"
+        self.indices[tarefa.tipo].adicionar(texto)
+        if tarefa.tipo == "questoes":
+            item["id"] = f"{sigla(tarefa.disciplina)}-IA-{hashlib.sha1(texto.encode('utf-8')).hexdigest()[:6].upper()}"
+        return None
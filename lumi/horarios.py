@@ -0,0 +1,251 @@
+# =======================================================
+# GRADE DE HORÁRIOS (matriz.json) COMO INTERVALOS
+# =======================================================
+# O matriz.json traz dia e horário como texto livre ("Segunda-feira",
+# "19h às 20h40"). Aqui cada disciplina vira uma Aula com dia da semana
+# (0 = segunda, como datetime.weekday()) e início/fim em minutos desde a
+# meia-noite. Horários que não dá para interpretar ("indeterminado", aulas
+# online) ficam em `sem_horario`.
+#
+# Índices: um por dia da semana e um por (sala, dia). Cada IndiceIntervalos
+# guarda as aulas ordenadas pelo início e o maior fim até cada posição, então
+# "o que acontece às 20h" é uma busca binária seguida de uma varredura que
+# para assim que nenhum intervalo anterior pode alcançar o instante.
+#
+# A grade é montada a partir dos objetos de lumi.catalogo e refeita só quando
+# a matriz muda (obter_grade).
+# =======================================================
+
+import re
+import threading
+from bisect import bisect_right
+from datetime import timedelta
+
+from lumi.faq import normalizar
+
+DIAS_SEMANA = (
+    "Segunda-feira", "Terça-feira", "Quarta-feira", "Quinta-feira",
+    "Sexta-feira", "Sábado", "Domingo",
+)
+_DIAS = {normalizar(nome)[:3]: i for i, nome in enumerate(DIAS_SEMANA)}
+MINUTOS_DIA = 24 * 60
+
+# "19h às 20h40", "19h-22h40", "19:00 às 20:40", "19h00 a 20h"
+HORARIO = re.compile(
+    r"(\d{1,2})\s*(?:h|:)\s*(\d{2})?\s*(?:as|a|ate|-|–)\s*(\d{1,2})\s*(?:h|:)\s*(\d{2})?"
+)
+HORA = re.compile(r"^(\d{1,2})\s*(?:h|:)?\s*(\d{2})?$")
+
+
+def interpretar_dia(texto):
+    """Índice do dia da semana (0 = segunda) ou None."""
+    return _DIAS.get(normalizar(texto).strip()[:3])
+
+
+def interpretar_horario(texto):
+    """(início, fim) em minutos desde a meia-noite, ou None."""
+    encontrado = HORARIO.search(normalizar(texto))
+    if not encontrado:
+        return None
+    h1, m1, h2, m2 = encontrado.groups()
+    inicio = int(h1) * 60 + int(m1 or 0)
+    fim = int(h2) * 60 + int(m2 or 0)
+    if not (0 <= inicio < fim <= MINUTOS_DIA):
+        return None
+    return inicio, fim
+
+
+def interpretar_hora(texto):
+    """"20h", "20h30", "20:30" ou "20" em minutos desde a meia-noite, ou None."""
+    encontrado = HORA.match(normalizar(texto).strip())
+    if not encontrado:
+        return None
+    minutos = int(encontrado.group(1)) * 60 + int(encontrado.group(2) or 0)
+    return minutos if minutos < MINUTOS_DIA else None
+
+
+def formatar_minutos(minutos):
+    return f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+
+def normalizar_periodo(texto):
+    """"1º", "1", "1o periodo" -> "1"."""
+    digitos = re.match(r"\s*(\d+)", str(texto or ""))
+    return digitos.group(1) if digitos else normalizar(str(texto or "")).strip()
+
+
+class Aula:
+    __slots__ = ("periodo", "disciplina", "dia", "inicio", "fim")
+
+    def __init__(self, periodo, disciplina, dia, inicio, fim):
+        self.periodo = periodo
+        self.disciplina = disciplina  # lumi.catalogo.Disciplina
+        self.dia = dia
+        self.inicio = inicio
+        self.fim = fim
+
+    def sobrepoe(self, outra):
+        return self.dia == outra.dia and self.inicio < outra.fim and outra.inicio < self.fim
+
+    def to_dict(self):
+        d = self.disciplina
+        return {
+            "periodo": self.periodo,
+            "disciplina": d.nome,
+            "professor": d.professor,
+            "sala": d.sala,
+            "dia": DIAS_SEMANA[self.dia] if self.dia is not None else d.dia,
+            "inicio": formatar_minutos(self.inicio) if self.inicio is not None else None,
+            "fim": formatar_minutos(self.fim) if self.fim is not None else None,
+        }
+
+
+class IndiceIntervalos:
+    """Intervalos ordenados pelo início com o maior fim acumulado."""
+
+    __slots__ = ("inicios", "aulas", "maior_fim")
+
+    def __init__(self, aulas):
+        self.aulas = sorted(aulas, key=lambda a: (a.inicio, a.fim))
+        self.inicios = [a.inicio for a in self.aulas]
+        self.maior_fim = []
+        maior = -1
+        for aula in self.aulas:
+            maior = max(maior, aula.fim)
+            self.maior_fim.append(maior)
+
+    def sobrepostos(self, inicio, fim):
+        """Aulas que se sobrepõem a [inicio, fim)."""
+        encontrados = []
+        i = bisect_right(self.inicios, fim - 1) - 1
+        while i >= 0 and self.maior_fim[i] > inicio:
+            if self.aulas[i].fim > inicio:
+                encontrados.append(self.aulas[i])
+            i -= 1
+        encontrados.reverse()
+        return encontrados
+
+    def no_instante(self, minuto):
+        return self.sobrepostos(minuto, minuto + 1)
+
+    def primeira_depois(self, minuto):
+        """Primeira aula que começa em `minuto` ou depois."""
+        i = bisect_right(self.inicios, minuto - 1)
+        return self.aulas[i] if i < len(self.aulas) else None
+
+
+class GradeHorarios:
+    """Consultas sobre a grade: aula agora/próxima, sala livre e conflitos."""
+
+    def __init__(self, matriz):
+        self.aulas = []
+        self.sem_horario = []
+        for periodo in matriz or ():
+            chave = normalizar_periodo(periodo.periodo)
+            for disciplina in periodo.disciplinas:
+                dia = interpretar_dia(disciplina.dia)
+                intervalo = interpretar_horario(disciplina.horario)
+                if dia is None or intervalo is None:
+                    self.sem_horario.append(Aula(chave, disciplina, dia, None, None))
+                else:
+                    self.aulas.append(Aula(chave, disciplina, dia, *intervalo))
+
+        grupos = {}
+        for aula in self.aulas:
+            grupos.setdefault((None, aula.dia), []).append(aula)
+            grupos.setdefault((aula.periodo, aula.dia), []).append(aula)
+            grupos.setdefault((("sala", normalizar(aula.disciplina.sala).strip()), aula.dia), []).append(aula)
+        self._indices = {chave: IndiceIntervalos(aulas) for chave, aulas in grupos.items()}
+        self._vazio = IndiceIntervalos([])
+
+        self._por_nome = {}
+        for aula in self.aulas + self.sem_horario:
+            self._por_nome.setdefault(normalizar(aula.disciplina.nome).strip(), []).append(aula)
+
+    def _indice(self, dia, periodo=None):
+        chave = normalizar_periodo(periodo) if periodo else None
+        return self._indices.get((chave, dia), self._vazio)
+
+    def periodos(self):
+        return sorted({a.periodo for a in self.aulas + self.sem_horario}, key=lambda p: (len(p), p))
+
+    # ---------------------------------------------------
+    # AGORA / PRÓXIMA
+    # ---------------------------------------------------
+    def em_andamento(self, momento, periodo=None):
+        minuto = momento.hour * 60 + momento.minute
+        return self._indice(momento.weekday(), periodo).no_instante(minuto)
+
+    def proxima(self, momento, periodo=None):
+        """(aula, datetime de início) da próxima aula a começar, ou (None, None)."""
+        minuto = momento.hour * 60 + momento.minute + (1 if momento.second or momento.microsecond else 0)
+        for deslocamento in range(8):
+            dia = (momento.weekday() + deslocamento) % 7
+            aula = self._indice(dia, periodo).primeira_depois(minuto if deslocamento == 0 else 0)
+            if aula is not None:
+                data = momento.date() + timedelta(days=deslocamento)
+                inicio = momento.replace(
+                    year=data.year, month=data.month, day=data.day,
+                    hour=aula.inicio // 60, minute=aula.inicio % 60, second=0, microsecond=0,
+                )
+                return aula, inicio
+        return None, None
+
+    # ---------------------------------------------------
+    # SALAS
+    # ---------------------------------------------------
+    def ocupacao_sala(self, sala, dia, inicio, fim=None):
+        """Aulas na sala entre [inicio, fim) (fim omitido: só o instante)."""
+        indice = self._indices.get((("sala", normalizar(sala).strip()), dia), self._vazio)
+        return indice.sobrepostos(inicio, fim if fim is not None else inicio + 1)
+
+    def sala_livre(self, sala, dia, inicio, fim=None):
+        return not self.ocupacao_sala(sala, dia, inicio, fim)
+
+    # ---------------------------------------------------
+    # CONFLITOS
+    # ---------------------------------------------------
+    def aulas_da_disciplina(self, nome):
+        return self._por_nome.get(normalizar(nome).strip(), [])
+
+    @staticmethod
+    def conflitos(aulas):
+        """Pares de aulas (de disciplinas diferentes) com horários sobrepostos."""
+        pares = []
+        por_dia = {}
+        for aula in aulas:
+            if aula.inicio is not None:
+                por_dia.setdefault(aula.dia, []).append(aula)
+        for dia in sorted(por_dia):
+            abertas = []
+            for aula in sorted(por_dia[dia], key=lambda a: (a.inicio, a.fim)):
+                abertas = [a for a in abertas if a.fim > aula.inicio]
+                pares.extend(
+                    (a, aula) for a in abertas
+                    if a.disciplina.nome != aula.disciplina.nome or a.periodo != aula.periodo
+                )
+                abertas.append(aula)
+        return pares
+
+    def conflitos_periodo(self, periodo):
+        chave = normalizar_periodo(periodo)
+        return self.conflitos([a for a in self.aulas if a.periodo == chave])
+
+
+# =======================================================
+# CACHE (refeito quando a matriz muda)
+# =======================================================
+_grade = (None, None)  # (matriz, GradeHorarios)
+_lock = threading.Lock()
+
+
+def obter_grade(matriz):
+    """Grade da matriz; `carregar_matriz()` devolve o mesmo objeto até o arquivo mudar."""
+    global _grade
+    atual = _grade
+    if atual[0] is matriz and atual[1] is not None:
+        return atual[1]
+    with _lock:
+        if _grade[0] is not matriz or _grade[1] is None:
+            _grade = (matriz, GradeHorarios(matriz))
+        return _grade[1]
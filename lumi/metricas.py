@@ -0,0 +1,495 @@
+# =======================================================
+# MÉTRICAS E PROFILING POR REQUISIÇÃO
+# =======================================================
+# - Cronometra cada requisição e quebra o tempo em fases: banco (eventos do
+#   SQLAlchemy), leitura de JSON, renderização de template e chamadas ao LLM.
+# - Expõe histogramas por rota no formato texto do Prometheus em /metrics,
+#   só para quem manda `Authorization: Bearer <LUMI_METRICS_TOKEN>` (sem o
+#   token definido a rota responde 403).
+# - Profiler amostral opcional (1 a cada N requisições) que grava pilhas no
+#   formato "folded" (uma linha por pilha), pronto para flamegraph.pl/speedscope.
+#
+# Vários processos (workers do gunicorn): com LUMI_METRICS_DIR definido
+# (o gunicorn.conf.py define uma pasta por execução), cada processo grava o
+# próprio registro em <pasta>/<pid>-<início>.json a cada
+# LUMI_METRICS_INTERVALO segundos (padrão 5) e, na hora, quando atende o
+# /metrics. O /metrics soma os arquivos de todos os processos, então
+# qualquer worker responde com os totais do servidor. Contadores e
+# histogramas de workers que já morreram continuam somando (os totais não
+# diminuem); gauges só contam os processos vivos. Sem a pasta, cada
+# processo responde só com os próprios números.
+# =======================================================
+
+import glob
+import hmac
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import (
+    Response,
+    before_render_template,
+    g,
+    has_request_context,
+    request,
+    template_rendered,
+)
+from sqlalchemy import event
+
+# Limites (em segundos) dos buckets dos histogramas
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FASES = ("db", "json", "template", "llm")
+LE_INF = 'le="+Inf"'
+
+
+# =======================================================
+# PRIMITIVAS (contador e histograma com rótulos)
+# =======================================================
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _rotulos(nomes, valores, extra=""):
+    partes = [f'{n}="{_escapar(v)}"' for n, v in zip(nomes, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+class Contador:
+    tipo = "counter"
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._valores = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, *valores_rotulos, valor=1.0):
+        with self._lock:
+            self._valores[valores_rotulos] += valor
+
+    def valor(self, *valores_rotulos):
+        return self._valores.get(valores_rotulos, 0.0)
+
+    def series(self):
+        with self._lock:
+            return [[list(chave), valor] for chave, valor in self._valores.items()]
+
+    @staticmethod
+    def linhas(nome, rotulos, series, buckets=None):
+        return [f"{nome}{_rotulos(rotulos, chave)} {valor:g}" for chave, valor in sorted(series)]
+
+    def exportar(self):
+        return self.linhas(self.nome, self.rotulos, [(tuple(c), v) for c, v in self.series()])
+
+
+class Gauge(Contador):
+    tipo = "gauge"
+
+    def definir(self, *valores_rotulos, valor):
+        with self._lock:
+            self._valores[valores_rotulos] = valor
+
+
+class Histograma:
+    tipo = "histogram"
+
+    def __init__(self, nome, ajuda, rotulos=(), buckets=BUCKETS):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self.buckets = tuple(buckets)
+        # chave -> [contagens por bucket..., soma, total]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor, *valores_rotulos):
+        with self._lock:
+            serie = self._series.get(valores_rotulos)
+            if serie is None:
+                serie = self._series[valores_rotulos] = [0] * len(self.buckets) + [0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[i] += 1
+            serie[-2] += valor
+            serie[-1] += 1
+
+    def total(self, *valores_rotulos):
+        serie = self._series.get(valores_rotulos)
+        return serie[-1] if serie else 0
+
+    def series(self):
+        with self._lock:
+            return [[list(chave), list(serie)] for chave, serie in self._series.items()]
+
+    @staticmethod
+    def linhas(nome, rotulos, series, buckets=BUCKETS):
+        linhas = []
+        for chave, serie in sorted(series):
+            for limite, contagem in zip(buckets, serie):
+                le = f'le="{limite:g}"'
+                linhas.append(f"{nome}_bucket{_rotulos(rotulos, chave, le)} {contagem}")
+            linhas.append(f"{nome}_bucket{_rotulos(rotulos, chave, LE_INF)} {serie[-1]}")
+            linhas.append(f"{nome}_sum{_rotulos(rotulos, chave)} {serie[-2]:.6f}")
+            linhas.append(f"{nome}_count{_rotulos(rotulos, chave)} {serie[-1]}")
+        return linhas
+
+    def exportar(self):
+        return self.linhas(self.nome, self.rotulos, [(tuple(c), v) for c, v in self.series()], self.buckets)
+
+
+class Registro:
+    """Conjunto de métricas exportadas em /metrics."""
+
+    def __init__(self):
+        self._metricas = {}
+        self._lock = threading.Lock()
+
+    def _registrar(self, classe, nome, ajuda, rotulos, **kwargs):
+        with self._lock:
+            if nome not in self._metricas:
+                self._metricas[nome] = classe(nome, ajuda, rotulos, **kwargs)
+            return self._metricas[nome]
+
+    def contador(self, nome, ajuda, rotulos=()):
+        return self._registrar(Contador, nome, ajuda, rotulos)
+
+    def gauge(self, nome, ajuda, rotulos=()):
+        return self._registrar(Gauge, nome, ajuda, rotulos)
+
+    def histograma(self, nome, ajuda, rotulos=(), buckets=BUCKETS):
+        return self._registrar(Histograma, nome, ajuda, rotulos, buckets=buckets)
+
+    def zerar(self):
+        """Descarta os valores (o worker não herda os números do mestre)."""
+        for metrica in list(self._metricas.values()):
+            with metrica._lock:
+                getattr(metrica, "_valores", getattr(metrica, "_series", None)).clear()
+
+    def estado(self):
+        """Valores de todas as métricas, em JSON, para somar com outros processos."""
+        return {
+            m.nome: {"tipo": m.tipo, "ajuda": m.ajuda, "rotulos": list(m.rotulos),
+                     "buckets": list(getattr(m, "buckets", ())), "series": m.series()}
+            for m in list(self._metricas.values())
+        }
+
+    def exportar(self, estado=None):
+        """Texto do Prometheus deste processo ou de um `estado` já somado."""
+        if estado is None:
+            estado = self.estado()
+        linhas = []
+        for nome, metrica in estado.items():
+            linhas.append(f"# HELP {nome} {metrica['ajuda']}")
+            linhas.append(f"# TYPE {nome} {metrica['tipo']}")
+            classe = Histograma if metrica["tipo"] == "histogram" else Contador
+            series = [(tuple(chave), valor) for chave, valor in metrica["series"]]
+            linhas.extend(classe.linhas(nome, metrica["rotulos"], series, tuple(metrica["buckets"])))
+        return "\n".join(linhas) + "\n"
+
+
+def somar_estados(estados):
+    """Soma os estados de vários processos: [(estado, vivo), ...] -> estado.
+
+    Gauges de processos que já terminaram são ignorados.
+    """
+    total = {}
+    for estado, vivo in estados:
+        for nome, metrica in estado.items():
+            if metrica["tipo"] == "gauge" and not vivo:
+                continue
+            destino = total.setdefault(nome, dict(metrica, series={}))
+            for chave, valor in metrica["series"]:
+                chave = tuple(chave)
+                if metrica["tipo"] == "histogram":
+                    atual = destino["series"].get(chave)
+                    destino["series"][chave] = valor if atual is None else [a + b for a, b in zip(atual, valor)]
+                else:
+                    destino["series"][chave] = destino["series"].get(chave, 0) + valor
+    for metrica in total.values():
+        metrica["series"] = [[list(chave), valor] for chave, valor in metrica["series"].items()]
+    return total
+
+
+def _processo_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class ArquivosMetricas:
+    """Grava o registro deste processo na pasta compartilhada e soma os de todos."""
+
+    def __init__(self, registro, pasta, intervalo=5.0):
+        self.registro = registro
+        self.pasta = pasta
+        self.intervalo = intervalo
+        self._thread = None
+        self._lock = threading.Lock()
+        self._inicio = time.time_ns()
+        os.makedirs(pasta, exist_ok=True)
+
+    def reiniciar(self):
+        """Arquivo, valores e thread próprios (chamado no worker depois do fork).
+
+        O que o mestre contou antes do fork apareceria uma vez por worker.
+        """
+        self.registro.zerar()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._inicio = time.time_ns()
+
+    @property
+    def arquivo(self):
+        return os.path.join(self.pasta, f"{os.getpid()}-{self._inicio}.json")
+
+    def gravar(self):
+        destino = self.arquivo
+        temporario = f"{destino}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(self.registro.estado(), f, separators=(",", ":"))
+        os.replace(temporario, destino)
+
+    def garantir_thread(self):
+        if self.intervalo <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._laco, name="lumi-metricas", daemon=True)
+                self._thread.start()
+
+    def _laco(self):
+        while True:
+            time.sleep(self.intervalo)
+            try:
+                self.gravar()
+            except OSError:
+                pass
+
+    def coletar(self):
+        """Estado somado de todos os processos que gravaram na pasta."""
+        self.gravar()
+        estados = []
+        for caminho in glob.glob(os.path.join(self.pasta, "*.json")):
+            try:
+                with open(caminho, encoding="utf-8") as f:
+                    estado = json.load(f)
+            except (OSError, ValueError):
+                continue  # arquivo sendo trocado ou de um processo que sumiu
+            pid = int(os.path.basename(caminho).split("-", 1)[0])
+            estados.append((estado, _processo_vivo(pid)))
+        return somar_estados(estados)
+
+
+REGISTRO = Registro()
+
+REQUISICOES = REGISTRO.contador(
+    "lumi_requests_total", "Requisições atendidas.", ("route", "method", "status")
+)
+DURACAO = REGISTRO.histograma(
+    "lumi_request_duration_seconds", "Duração total da requisição.", ("route", "method")
+)
+DURACAO_FASE = REGISTRO.histograma(
+    "lumi_request_phase_seconds",
+    "Tempo gasto por fase (db, json, template, llm) dentro da requisição.",
+    ("route", "phase"),
+)
+DURACAO_CONSULTA = REGISTRO.histograma(
+    "lumi_db_query_duration_seconds", "Duração de cada comando SQL.", ("operation",)
+)
+OPERACOES_SQL = frozenset({"select", "insert", "update", "delete", "pragma", "create", "drop"})
+DURACAO_TEMPLATE = REGISTRO.histograma(
+    "lumi_template_render_seconds", "Tempo de renderização por template.", ("template",)
+)
+
+
+# =======================================================
+# CRONÔMETRO DE FASES
+# =======================================================
+def adicionar_tempo(fase, segundos):
+    """Soma `segundos` à fase da requisição atual (ignora fora de requisição)."""
+    if has_request_context():
+        tempos = g.get("_lumi_tempos")
+        if tempos is not None:
+            tempos[fase] += segundos
+
+
+@contextmanager
+def medir(fase):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        adicionar_tempo(fase, time.perf_counter() - inicio)
+
+
+def tempos_requisicao():
+    """Quebra de tempos da requisição atual: {"total": s, "db": s, ...}."""
+    if not has_request_context() or g.get("_lumi_inicio") is None:
+        return {}
+    tempos = dict(g.get("_lumi_tempos") or {})
+    tempos["total"] = time.perf_counter() - g._lumi_inicio
+    return tempos
+
+
+def rota_atual():
+    if request.url_rule is not None:
+        return request.url_rule.rule
+    return "<sem_rota>"
+
+
+# =======================================================
+# PROFILER AMOSTRAL (pilhas "folded")
+# =======================================================
+class AmostradorPilhas:
+    """Thread que amostra periodicamente a pilha de outra thread."""
+
+    def __init__(self, thread_id, intervalo=0.005):
+        self.thread_id = thread_id
+        self.intervalo = intervalo
+        self.pilhas = Counter()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._executar, daemon=True)
+
+    def iniciar(self):
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        self._thread.join()
+
+    def _executar(self):
+        while not self._parar.wait(self.intervalo):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            quadros = []
+            while frame is not None:
+                codigo = frame.f_code
+                nome_arquivo = os.path.basename(codigo.co_filename)
+                quadros.append(f"{codigo.co_name} ({nome_arquivo}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.pilhas[";".join(reversed(quadros))] += 1
+
+    def salvar(self, caminho):
+        with open(caminho, "w", encoding="utf-8") as f:
+            for pilha, contagem in self.pilhas.most_common():
+                f.write(f"{pilha} {contagem}\n")
+
+
+# =======================================================
+# INTEGRAÇÃO COM O FLASK / SQLALCHEMY
+# =======================================================
+def _instrumentar_engine(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_lumi_inicio_query", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _depois(conn, cursor, statement, parameters, context, executemany):
+        duracao = time.perf_counter() - conn.info["_lumi_inicio_query"].pop()
+        adicionar_tempo("db", duracao)
+        operacao = statement.lstrip()[:6].lower()
+        DURACAO_CONSULTA.observar(duracao, operacao if operacao in OPERACOES_SQL else "outra")
+
+    @event.listens_for(engine, "handle_error")
+    def _erro(contexto):
+        # Consulta que falhou não passa pelo after_cursor_execute: sem isso o
+        # início dela ficaria na conexão (que volta ao pool) para sempre
+        conexao = contexto.connection
+        inicios = conexao.info.get("_lumi_inicio_query") if conexao is not None else None
+        if inicios:
+            adicionar_tempo("db", time.perf_counter() - inicios.pop())
+
+
+def init_app(app, db):
+    """Liga os cronômetros, o endpoint /metrics e o profiler amostral ao app."""
+    amostra = int(os.environ.get("LUMI_PROFILE_AMOSTRA", "0") or 0)
+    pasta_perfis = os.environ.get("LUMI_PROFILE_DIR", os.path.join(os.getcwd(), "profiles"))
+    sequencia = itertools.count(1)
+    pasta = os.environ.get("LUMI_METRICS_DIR")
+    arquivos = None
+    if pasta:
+        arquivos = ArquivosMetricas(REGISTRO, pasta, float(os.environ.get("LUMI_METRICS_INTERVALO", "5")))
+    app.extensions["lumi_metricas"] = arquivos
+
+    with app.app_context():
+        _instrumentar_engine(db.engine)
+
+    @app.before_request
+    def _iniciar_cronometro():
+        g._lumi_inicio = time.perf_counter()
+        g._lumi_tempos = defaultdict(float)
+        if amostra and next(sequencia) % amostra == 0:
+            g._lumi_amostrador = AmostradorPilhas(threading.get_ident())
+            g._lumi_amostrador.iniciar()
+
+    @app.after_request
+    def _registrar_metricas(response):
+        if arquivos is not None:
+            arquivos.garantir_thread()
+        tempos = tempos_requisicao()
+        if not tempos:
+            return response
+        rota = rota_atual()
+        REQUISICOES.inc(rota, request.method, str(response.status_code))
+        DURACAO.observar(tempos["total"], rota, request.method)
+        for fase in FASES:
+            if tempos.get(fase):
+                DURACAO_FASE.observar(tempos[fase], rota, fase)
+        response.headers["Server-Timing"] = ", ".join(
+            f"{fase};dur={tempos[fase] * 1000:.2f}" for fase in (*FASES, "total") if fase in tempos
+        )
+        return response
+
+    @app.teardown_request
+    def _finalizar_amostragem(exc):
+        amostrador = g.pop("_lumi_amostrador", None)
+        if amostrador is None:
+            return
+        amostrador.parar()
+        os.makedirs(pasta_perfis, exist_ok=True)
+        endpoint = (request.endpoint or "sem_rota").replace(".", "_")
+        nome = f"{datetime.now():%Y%m%d-%H%M%S-%f}-{endpoint}.folded"
+        amostrador.salvar(os.path.join(pasta_perfis, nome))
+
+    def _template_fim(sender, template, context, **extra):
+        inicios = g.get("_lumi_inicio_template")
+        if inicios:
+            duracao = time.perf_counter() - inicios.pop()
+            adicionar_tempo("template", duracao)
+            DURACAO_TEMPLATE.observar(duracao, template.name or "<string>")
+
+    def _template_inicio(sender, template, context, **extra):
+        if has_request_context():
+            g.setdefault("_lumi_inicio_template", []).append(time.perf_counter())
+
+    # weak=False: os receptores são funções locais e seriam coletados pelo GC
+    before_render_template.connect(_template_inicio, app, weak=False)
+    template_rendered.connect(_template_fim, app, weak=False)
+
+    def metricas_view():
+        token = os.environ.get("LUMI_METRICS_TOKEN")
+        if not token:
+            return Response("Defina LUMI_METRICS_TOKEN para expor as métricas.\n", status=403,
+                            mimetype="text/plain")
+        enviado = request.headers.get("Authorization", "").encode("utf-8")
+        if not hmac.compare_digest(enviado, f"Bearer {token}".encode("utf-8")):
+            return Response("Não autorizado.\n", status=401, mimetype="text/plain")
+        estado = arquivos.coletar() if arquivos is not None else None
+        return Response(REGISTRO.exportar(estado), mimetype="text/plain; version=0.0.4")
+
+    app.add_url_rule("/metrics", "metricas", metricas_view)
+    return arquivos
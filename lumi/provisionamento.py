@@ -0,0 +1,184 @@
+# =======================================================
+# CADASTRO DE ALUNOS EM LOTE (CSV)
+# =======================================================
+# `flask --app app users-import alunos.csv` lê um CSV com as colunas
+# matricula, email e cpf (opcionais: nome, telefone, senha, curso), separado por
+# vírgula ou ponto e vírgula, e cadastra os alunos que ainda não existem:
+#
+#   1. valida as linhas e descarta repetições dentro do próprio arquivo;
+#   2. descobre de uma vez, em blocos de consultas IN, quais e-mails,
+#      matrículas e CPFs já estão no banco (em vez de três consultas por
+#      aluno, como no /register);
+#   3. gera os hashes das senhas em paralelo em todas as CPUs
+#      (senhas.gerar_hashes);
+#   4. insere em blocos com um INSERT executemany por transação.
+#
+# Sem a coluna `senha`, cada aluno recebe uma senha aleatória, gravada no
+# arquivo de credenciais (--credenciais) para ser entregue a ele.
+#
+# O CPF é gravado só com os dígitos. Como o /register guarda o que o aluno
+# digitou, a busca dos já cadastrados procura as duas grafias (11 dígitos e
+# 000.000.000-00).
+# =======================================================
+
+import csv
+import re
+import secrets
+
+from sqlalchemy import insert, or_, select
+from sqlalchemy.exc import IntegrityError
+
+from lumi.cursos import CURSO_VALIDO
+from lumi.faq import normalizar
+
+CAMPOS_UNICOS = ("email", "matricula", "cpf")
+CAMPOS_OPCIONAIS = ("nome", "telefone", "senha", "curso")
+EMAIL = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+BLOCO_CONSULTA = 500
+
+
+def _cabecalho(nome):
+    # "Matrícula" -> "matricula", "E-mail" -> "email"
+    return re.sub(r"[^a-z0-9]", "", normalizar(nome or ""))
+
+
+def cpf_digitos(valor):
+    return re.sub(r"\D", "", valor or "")
+
+
+def _grafias_cpf(cpf):
+    return [cpf, f"{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}"]
+
+
+def ler_csv(arquivo):
+    """Lê e valida o CSV. Devolve (linhas válidas, erros).
+
+    Cada linha válida é um dict com `numero` (linha no arquivo) e os campos;
+    cada erro é (numero, mensagem).
+    """
+    amostra = arquivo.read(4096)
+    arquivo.seek(0)
+    try:
+        dialeto = csv.Sniffer().sniff(amostra, delimiters=",;")
+    except csv.Error:
+        dialeto = csv.excel
+    leitor = csv.DictReader(arquivo, dialect=dialeto)
+    leitor.fieldnames = [_cabecalho(nome) for nome in leitor.fieldnames or []]
+    faltando = [c for c in ("matricula", "email") if c not in leitor.fieldnames]
+    if faltando:
+        return [], [(1, f"Coluna(s) obrigatória(s) ausente(s): {', '.join(faltando)}.")]
+
+    linhas, erros, vistos = [], [], {campo: set() for campo in CAMPOS_UNICOS}
+    for numero, bruta in enumerate(leitor, start=2):
+        linha = {c: (bruta.get(c) or "").strip() for c in CAMPOS_UNICOS + CAMPOS_OPCIONAIS}
+        linha["numero"] = numero
+        if not linha["matricula"]:
+            erros.append((numero, "matrícula vazia"))
+            continue
+        if not EMAIL.match(linha["email"]):
+            erros.append((numero, f"e-mail inválido: {linha['email']!r}"))
+            continue
+        if linha["cpf"] and len(cpf_digitos(linha["cpf"])) != 11:
+            erros.append((numero, f"CPF inválido: {linha['cpf']!r}"))
+            continue
+        linha["cpf"] = cpf_digitos(linha["cpf"])
+        linha["curso"] = linha["curso"].lower()
+        if linha["curso"] and not CURSO_VALIDO.match(linha["curso"]):
+            erros.append((numero, f"curso inválido: {linha['curso']!r} (use letras minúsculas, números, - e _)"))
+            continue
+        repetido = next((c for c in CAMPOS_UNICOS if linha[c] and linha[c] in vistos[c]), None)
+        if repetido:
+            erros.append((numero, f"{repetido} repetido no arquivo: {linha[repetido]!r}"))
+            continue
+        for campo in CAMPOS_UNICOS:
+            if linha[campo]:
+                vistos[campo].add(linha[campo])
+        linhas.append(linha)
+    return linhas, erros
+
+
+def ja_cadastrados(conexao, tabela, linhas):
+    """Valores de e-mail/matrícula/CPF das linhas que já existem no banco."""
+    existentes = {campo: set() for campo in CAMPOS_UNICOS}
+    for inicio in range(0, len(linhas), BLOCO_CONSULTA):
+        bloco = linhas[inicio:inicio + BLOCO_CONSULTA]
+        condicoes = [
+            tabela.c[campo].in_([linha[campo] for linha in bloco if linha[campo]])
+            for campo in ("email", "matricula")
+        ]
+        condicoes.append(tabela.c.cpf.in_([g for linha in bloco if linha["cpf"] for g in _grafias_cpf(linha["cpf"])]))
+        consulta = select(*(tabela.c[campo] for campo in CAMPOS_UNICOS)).where(or_(*condicoes))
+        for registro in conexao.execute(consulta):
+            for campo, valor in zip(CAMPOS_UNICOS, registro):
+                if valor:
+                    existentes[campo].add(cpf_digitos(valor) if campo == "cpf" else valor)
+    return existentes
+
+
+def separar_novos(linhas, existentes):
+    """Divide as linhas em (novas, [(numero, motivo)] das já cadastradas)."""
+    novas, ignoradas = [], []
+    for linha in linhas:
+        campo = next((c for c in CAMPOS_UNICOS if linha[c] and linha[c] in existentes[c]), None)
+        if campo:
+            ignoradas.append((linha["numero"], f"{campo} já cadastrado: {linha[campo]!r}"))
+        else:
+            novas.append(linha)
+    return novas, ignoradas
+
+
+def definir_senhas(linhas):
+    """Senha de cada linha (a do CSV ou uma aleatória). Devolve as geradas."""
+    geradas = []
+    for linha in linhas:
+        if not linha["senha"]:
+            linha["senha"] = secrets.token_urlsafe(9)
+            geradas.append(linha)
+    return geradas
+
+
+def registros_usuarios(linhas, hashes):
+    return [
+        {
+            "username": linha["nome"] or linha["matricula"],
+            "email": linha["email"],
+            "matricula": linha["matricula"],
+            "cpf": linha["cpf"] or None,
+            "telefone": linha["telefone"] or None,
+            "curso": linha["curso"] or None,
+            "password_hash": hash_senha,
+        }
+        for linha, hash_senha in zip(linhas, hashes)
+    ]
+
+
+def inserir(engine, tabela, registros, bloco=1000):
+    """INSERT em blocos, uma transação por bloco. Devolve (inseridos, conflitos).
+
+    Se um bloco esbarrar num cadastro feito enquanto a importação rodava
+    (IntegrityError), ele é refeito linha a linha, pulando só os conflitos.
+    """
+    inseridos, conflitos = 0, []
+    for inicio in range(0, len(registros), bloco):
+        parte = registros[inicio:inicio + bloco]
+        try:
+            with engine.begin() as conexao:
+                conexao.execute(insert(tabela), parte)
+            inseridos += len(parte)
+        except IntegrityError:
+            for registro in parte:
+                try:
+                    with engine.begin() as conexao:
+                        conexao.execute(insert(tabela), registro)
+                    inseridos += 1
+                except IntegrityError:
+                    conflitos.append(registro["matricula"])
+    return inseridos, conflitos
+
+
+def gravar_credenciais(caminho, linhas):
+    with open(caminho, "w", newline="", encoding="utf-8") as arquivo:
+        escritor = csv.writer(arquivo)
+        escritor.writerow(["matricula", "email", "senha"])
+        for linha in linhas:
+            escritor.writerow([linha["matricula"], linha["email"], linha["senha"]])
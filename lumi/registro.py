@@ -0,0 +1,240 @@
+# =======================================================
+# LOGGING ASSÍNCRONO, ESTRUTURADO E ROTATIVO
+# =======================================================
+# As threads de requisição só colocam o registro numa fila (QueueHandler);
+# uma QueueListener em segundo plano formata em JSON e grava no arquivo,
+# que é rotacionado por tamanho ou por dia e comprimido com gzip.
+#
+# Um registro de acesso estruturado por requisição (rota, user_id, latência,
+# fases, tokens do LLM) substitui as linhas do werkzeug, e os acessos a
+# arquivos estáticos são amostrados em vez de gravados um a um.
+#
+# Rotação com vários processos: cada handler rotaciona sozinho, então dois
+# processos no mesmo arquivo renomeariam e comprimiriam o arquivo um do
+# outro e perderiam linhas. Por isso, nos workers do gunicorn (chamados por
+# reiniciar_pos_fork), cada processo grava no próprio arquivo, com o pid no
+# nome (lumi.1234.log); o mestre continua no lumi.log. Com
+# LUMI_LOG_ROTACAO=externa todos gravam no mesmo arquivo sem rotacionar
+# (WatchedFileHandler, que reabre o arquivo quando o logrotate o troca), e
+# LUMI_LOG_ARQUIVO=- manda tudo para a saída padrão.
+#
+# Variáveis de ambiente:
+#   LUMI_LOG_ARQUIVO            arquivo de log (padrão: lumi.log; "-" = stdout)
+#   LUMI_LOG_NIVEL              nível mínimo (padrão: INFO)
+#   LUMI_LOG_ROTACAO            "tamanho" (padrão), "diaria" ou "externa"
+#   LUMI_LOG_MAX_BYTES          limite por arquivo na rotação por tamanho (5 MB)
+#   LUMI_LOG_BACKUPS            quantos arquivos antigos manter (padrão: 7)
+#   LUMI_LOG_AMOSTRA_ESTATICOS  grava 1 a cada N acessos a /static (0 = nenhum)
+# =======================================================
+
+import atexit
+import gzip
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import shutil
+import sys
+import time
+from datetime import datetime, timezone
+
+from flask import g, has_request_context, request
+
+from lumi import metricas
+
+ANSI = re.compile(r"\x1b\[[0-9;]*m")
+# Linhas de acesso do werkzeug: '127.0.0.1 - - [data] "GET /x HTTP/1.1" 200 -'
+ACESSO_WERKZEUG = re.compile(r'"[A-Z]+ \S+ HTTP/[\d.]+"')
+
+CAMPOS_EXTRAS = (
+    "route", "method", "path", "status", "user_id", "latency_ms",
+    "fases_ms", "llm_tokens", "llm_compartilhada", "faq",
+)
+
+logger_acesso = logging.getLogger("lumi.acesso")
+
+CUSTO_LOG = metricas.REGISTRO.histograma(
+    "lumi_log_emit_seconds",
+    "Tempo gasto pela thread da requisição para enfileirar um registro de log.",
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005),
+)
+
+_listener = None
+
+
+# =======================================================
+# FORMATAÇÃO, FILTROS E HANDLERS
+# =======================================================
+class FormatadorJSON(logging.Formatter):
+    """Uma linha JSON por registro, com os campos extras conhecidos."""
+
+    def format(self, record):
+        dados = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "msg": ANSI.sub("", record.getMessage()),
+        }
+        for campo in CAMPOS_EXTRAS:
+            valor = getattr(record, campo, None)
+            if valor is not None:
+                dados[campo] = valor
+        if record.exc_info:
+            dados["exc"] = self.formatException(record.exc_info)
+        return json.dumps(dados, ensure_ascii=False)
+
+
+class FiltroAcessoWerkzeug(logging.Filter):
+    """Descarta as linhas de acesso do werkzeug (o app já grava as suas)."""
+
+    def filter(self, record):
+        if record.name != "werkzeug":
+            return True
+        return not ACESSO_WERKZEUG.search(record.getMessage())
+
+
+class QueueHandlerMedido(logging.handlers.QueueHandler):
+    """QueueHandler que mede o custo de enfileirar (o que a requisição paga)."""
+
+    def emit(self, record):
+        inicio = time.perf_counter()
+        super().emit(record)
+        CUSTO_LOG.observar(time.perf_counter() - inicio)
+
+
+def _nome_gzip(nome):
+    return nome + ".gz"
+
+
+def _rotacionar_gzip(origem, destino):
+    with open(origem, "rb") as f_in, gzip.open(destino, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(origem)
+
+
+def arquivo_do_processo(arquivo, pid=None):
+    """lumi.log -> lumi.<pid>.log: cada worker rotaciona só o próprio arquivo."""
+    raiz, extensao = os.path.splitext(arquivo)
+    return f"{raiz}.{pid or os.getpid()}{extensao}"
+
+
+def criar_handler_arquivo(arquivo, rotacao="tamanho", max_bytes=5 * 1024 * 1024, backups=7):
+    if arquivo == "-":
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(FormatadorJSON())
+        return handler
+    if rotacao == "externa":
+        handler = logging.handlers.WatchedFileHandler(arquivo, encoding="utf-8")
+        handler.setFormatter(FormatadorJSON())
+        return handler
+    if rotacao == "diaria":
+        handler = logging.handlers.TimedRotatingFileHandler(
+            arquivo, when="midnight", backupCount=backups, encoding="utf-8"
+        )
+    else:
+        handler = logging.handlers.RotatingFileHandler(
+            arquivo, maxBytes=max_bytes, backupCount=backups, encoding="utf-8"
+        )
+    handler.namer = _nome_gzip
+    handler.rotator = _rotacionar_gzip
+    handler.setFormatter(FormatadorJSON())
+    return handler
+
+
+# =======================================================
+# CONFIGURAÇÃO
+# =======================================================
+def configurar_logging(arquivo=None, por_processo=False):
+    """Liga o root logger a uma fila consumida por uma thread de escrita.
+
+    `por_processo=True` (workers) grava em lumi.<pid>.log quando a rotação
+    é feita pelo próprio app.
+    """
+    global _listener
+    parar_logging()
+
+    arquivo = arquivo or os.environ.get("LUMI_LOG_ARQUIVO", "lumi.log")
+    rotacao = os.environ.get("LUMI_LOG_ROTACAO", "tamanho")
+    if por_processo and arquivo != "-" and rotacao != "externa":
+        arquivo = arquivo_do_processo(arquivo)
+    handler = criar_handler_arquivo(
+        arquivo,
+        rotacao=rotacao,
+        max_bytes=int(os.environ.get("LUMI_LOG_MAX_BYTES", 5 * 1024 * 1024)),
+        backups=int(os.environ.get("LUMI_LOG_BACKUPS", 7)),
+    )
+
+    fila = queue.SimpleQueue()
+    handler_fila = QueueHandlerMedido(fila)
+    handler_fila.addFilter(FiltroAcessoWerkzeug())
+
+    raiz = logging.getLogger()
+    for antigo in [h for h in raiz.handlers if isinstance(h, logging.handlers.QueueHandler)]:
+        raiz.removeHandler(antigo)
+    raiz.addHandler(handler_fila)
+    raiz.setLevel(os.environ.get("LUMI_LOG_NIVEL", "INFO").upper())
+
+    _listener = logging.handlers.QueueListener(fila, handler, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def parar_logging():
+    """Esvazia a fila e encerra a thread de escrita (seguro chamar várias vezes)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(parar_logging)
+
+
+# =======================================================
+# REGISTRO DE ACESSO POR REQUISIÇÃO
+# =======================================================
+def anotar(**campos):
+    """Acrescenta campos ao registro de acesso da requisição atual."""
+    if has_request_context():
+        g.setdefault("_lumi_log_extra", {}).update(campos)
+
+
+def _user_id_carregado():
+    # Só usa o usuário que a rota já carregou: ler `session` aqui marcaria a
+    # sessão como acessada e acrescentaria "Vary: Cookie" até nos estáticos.
+    usuario = g.get("_login_user")
+    if usuario is not None and usuario.is_authenticated:
+        return usuario.get_id()
+    return None
+
+
+def init_app(app):
+    amostra_estaticos = int(os.environ.get("LUMI_LOG_AMOSTRA_ESTATICOS", "100") or 0)
+    contador_estaticos = itertools.count(1)
+
+    @app.after_request
+    def _registrar_acesso(response):
+        if request.endpoint == "static":
+            if not amostra_estaticos or next(contador_estaticos) % amostra_estaticos:
+                return response
+        tempos = metricas.tempos_requisicao()
+        extra = {
+            "route": metricas.rota_atual(),
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "user_id": _user_id_carregado(),
+            "latency_ms": round(tempos.get("total", 0) * 1000, 2),
+            "fases_ms": {
+                fase: round(tempos[fase] * 1000, 2)
+                for fase in metricas.FASES if tempos.get(fase)
+            } or None,
+        }
+        extra.update(g.get("_lumi_log_extra", {}))
+        logger_acesso.info("%s %s %s", request.method, request.path, response.status_code, extra=extra)
+        return response
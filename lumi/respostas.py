@@ -0,0 +1,193 @@
+# =======================================================
+# GET CONDICIONAL (ETag) E COMPRESSÃO DAS RESPOSTAS
+# =======================================================
+# - @condicional(versao): a view declara de que a resposta depende (versão
+#   dos arquivos de dados, dados do aluno mostrados na página). O ETag forte
+#   é o hash disso mais a versão do código (templates e static). Se o
+#   navegador manda o mesmo ETag em If-None-Match, a resposta é 304 sem
+#   executar a view: nada é lido, serializado ou renderizado.
+#
+# - Compressão: HTML e JSON acima de LUMI_COMPRESSAO_MINIMO bytes (padrão
+#   1024) saem com gzip ou, se o pacote `brotli` estiver instalado e o
+#   navegador aceitar, br. O ETag ganha o sufixo da codificação ("-gzip",
+#   "-br"), já que o corpo é outro; na comparação o sufixo é ignorado.
+#   LUMI_COMPRESSAO=off desliga (ex.: quando um proxy já comprime).
+#   Respostas com ETag têm o corpo comprimido guardado num LRU pequeno
+#   (LUMI_COMPRESSAO_CACHE entradas, padrão 128): o mesmo ETag é o mesmo corpo.
+# =======================================================
+
+import functools
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from flask import current_app, make_response, request, session
+
+from lumi import metricas
+
+# Brotli é opcional (pacote `brotli`); sem ele só gzip.
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depende do ambiente
+    brotli = None
+
+TIPOS_COMPRIMIVEIS = frozenset({"text/html", "application/json"})
+CACHE_CONTROL = "private, no-cache"
+SUFIXOS = ("-br", "-gzip")
+
+CONDICIONAIS = metricas.REGISTRO.contador(
+    "lumi_conditional_responses_total",
+    "Respostas de rotas com ETag: 304 (sem executar a view) ou 200.",
+    ("route", "status"),
+)
+BYTES_COMPRESSAO = metricas.REGISTRO.contador(
+    "lumi_response_compression_bytes_total",
+    "Bytes antes (original) e depois (comprimido) da compressão das respostas.",
+    ("encoding", "stage"),
+)
+
+
+# =======================================================
+# ETAG
+# =======================================================
+def versao_codigo(*pastas, ignorar=("dist", "uploads")):
+    """Hash de nome, mtime e tamanho dos arquivos (templates e static)."""
+    h = hashlib.sha256()
+    for pasta in pastas:
+        for raiz, subpastas, arquivos in os.walk(pasta):
+            subpastas[:] = sorted(p for p in subpastas if p not in ignorar)
+            for nome in sorted(arquivos):
+                caminho = os.path.join(raiz, nome)
+                try:
+                    estado = os.stat(caminho)
+                except OSError:
+                    continue
+                h.update(f"{os.path.relpath(caminho, pasta)}:{estado.st_mtime_ns}:{estado.st_size}\n".encode())
+    return h.hexdigest()[:16]
+
+
+def gerar_etag(*partes):
+    base = repr((current_app.extensions["lumi_respostas"], request.path, partes))
+    return hashlib.sha256(base.encode("utf-8")).hexdigest()[:32]
+
+
+def _sem_sufixo(etag):
+    for sufixo in SUFIXOS:
+        if etag.endswith(sufixo):
+            return etag[: -len(sufixo)]
+    return etag
+
+
+def condicional(versao, pagina=True):
+    """Decorator de view: ETag a partir de `versao()` e 304 sem executar a view.
+
+    `versao()` devolve um valor com repr estável (tuplas de números e strings)
+    que muda sempre que a resposta mudar, ou None para responder sem ETag.
+    Em páginas (pagina=True), mensagens flash pendentes desligam o 304: elas
+    só aparecem renderizando. APIs JSON não mostram flash (pagina=False).
+    """
+    def decorar(view):
+        @functools.wraps(view)
+        def envolvida(*args, **kwargs):
+            partes = versao()
+            if partes is None or (pagina and session.get("_flashes")):
+                return view(*args, **kwargs)
+            etag = gerar_etag(partes)
+            pedidos = request.if_none_match
+            if pedidos.star_tag or etag in {_sem_sufixo(e) for e in pedidos.as_set(include_weak=True)}:
+                response = current_app.response_class(status=304)
+                status = "304"
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                status = "200"
+            CONDICIONAIS.inc(request.url_rule.rule, status)
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = CACHE_CONTROL
+            response.vary.add("Accept-Encoding")
+            return response
+        return envolvida
+    return decorar
+
+
+# =======================================================
+# COMPRESSÃO
+# =======================================================
+def escolher_codificacao(accept_encodings):
+    if brotli is not None and accept_encodings["br"]:
+        return "br"
+    if accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+
+def comprimir(corpo, codificacao):
+    if codificacao == "br":
+        return brotli.compress(corpo, quality=5)
+    return gzip.compress(corpo, compresslevel=6)
+
+
+class CacheComprimidos:
+    """LRU de corpos comprimidos por (ETag, codificação)."""
+
+    def __init__(self, limite):
+        self.limite = limite
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave, gerar):
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                return self._itens[chave]
+        valor = gerar()
+        with self._lock:
+            self._itens[chave] = valor
+            while len(self._itens) > self.limite:
+                self._itens.popitem(last=False)
+        return valor
+
+
+def init_app(app):
+    """Guarda a versão do código (para os ETags) e liga a compressão.
+
+    Chame antes dos outros init_app: o Flask roda os after_request na ordem
+    inversa do registro, e a compressão precisa ser a última a mexer no corpo.
+    """
+    app.extensions["lumi_respostas"] = versao_codigo(
+        os.path.join(app.root_path, app.template_folder), app.static_folder
+    )
+    if os.environ.get("LUMI_COMPRESSAO", "on").lower() == "off":
+        return
+    minimo = int(os.environ.get("LUMI_COMPRESSAO_MINIMO", "1024"))
+    comprimidos = CacheComprimidos(int(os.environ.get("LUMI_COMPRESSAO_CACHE", "128")))
+
+    @app.after_request
+    def _comprimir(response):
+        if (
+            response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in TIPOS_COMPRIMIVEIS
+        ):
+            return response
+        response.vary.add("Accept-Encoding")
+        codificacao = escolher_codificacao(request.accept_encodings)
+        corpo = response.get_data()
+        if codificacao is None or len(corpo) < minimo:
+            return response
+        etag, fraco = response.get_etag()
+        if etag and not fraco:
+            comprimido = comprimidos.obter((etag, codificacao), lambda: comprimir(corpo, codificacao))
+            response.set_etag(f"{etag}-{codificacao}")
+        else:
+            comprimido = comprimir(corpo, codificacao)
+        BYTES_COMPRESSAO.inc(codificacao, "original", valor=len(corpo))
+        BYTES_COMPRESSAO.inc(codificacao, "comprimido", valor=len(comprimido))
+        response.set_data(comprimido)
+        response.headers["Content-Encoding"] = codificacao
+        return response
@@ -0,0 +1,312 @@
+# =======================================================
+# RETENÇÃO DO HISTÓRICO DO CHAT: ARQUIVO COMPRIMIDO E LIMPEZA EM LOTES
+# =======================================================
+# chat_history é lida a cada abertura do chat e a cada pergunta; ela fica
+# só com as conversas recentes:
+#
+# - Arquivo: mensagens com mais de LUMI_CHAT_RETENCAO_DIAS dias (padrão
+#   180; 0 desliga) saem de chat_history e vão, em lotes de
+#   LUMI_RETENCAO_LOTE mensagens (padrão 500) por aluno, para chat_arquivo:
+#   uma linha por lote com o JSON das mensagens comprimido com zstd (pacote
+#   `zstandard`, opcional) ou gzip. Cada lote é uma transação curta:
+#   tira as mensagens do índice de busca, DELETE ... RETURNING e INSERT do
+#   blob. Se outro worker arquivou as mesmas mensagens antes, o RETURNING
+#   volta incompleto e o lote é desfeito, então nada é arquivado duas vezes.
+#   /api/chat/arquivo lista e abre os lotes do aluno.
+#
+# - /limpar: grava em chat_limpeza até qual id o histórico do aluno foi
+#   apagado (as mensagens somem na hora das consultas) e as remove aqui, em
+#   lotes, junto com o arquivo do aluno.
+#
+# Uma thread por worker roda um ciclo a cada LUMI_RETENCAO_INTERVALO
+# segundos (padrão 3600) ou quando o /limpar a acorda, com uma pausa de
+# LUMI_RETENCAO_PAUSA segundos (padrão 0,05) entre lotes para não segurar o
+# banco. `flask chat-archive` roda um ciclo completo na hora.
+# =======================================================
+
+import gzip
+import json
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.exc import OperationalError
+
+from lumi import busca_chat, metricas
+
+# zstd é opcional (pacote `zstandard`); sem ele, gzip.
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depende do ambiente
+    zstandard = None
+
+ARQUIVADAS = metricas.REGISTRO.contador(
+    "lumi_chat_archived_messages_total", "Mensagens do chat movidas para chat_arquivo."
+)
+BYTES_ARQUIVO = metricas.REGISTRO.contador(
+    "lumi_chat_archive_bytes_total",
+    "Bytes das mensagens arquivadas antes (original) e depois (comprimido) da compressão.",
+    ("stage",),
+)
+APAGADAS = metricas.REGISTRO.contador(
+    "lumi_chat_purged_messages_total", "Mensagens apagadas pelo /limpar (em segundo plano)."
+)
+DURACAO_LOTE = metricas.REGISTRO.histograma(
+    "lumi_chat_retention_batch_seconds",
+    "Duração da transação de um lote de retenção (operation=archive|purge).",
+    ("operation",),
+)
+
+log = logging.getLogger(__name__)
+
+
+# =======================================================
+# COMPRESSÃO
+# =======================================================
+def compactar(mensagens):
+    """Lista de mensagens -> (codificação, bytes, tamanho original)."""
+    bruto = json.dumps(mensagens, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=9).compress(bruto), len(bruto)
+    return "gzip", gzip.compress(bruto, compresslevel=9), len(bruto)
+
+
+def descompactar(codificacao, dados):
+    if codificacao == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Arquivo em zstd, mas o pacote `zstandard` não está instalado.")
+        bruto = zstandard.ZstdDecompressor().decompress(dados)
+    else:
+        bruto = gzip.decompress(dados)
+    return json.loads(bruto)
+
+
+def _iso(valor):
+    return valor.isoformat() if hasattr(valor, "isoformat") else valor
+
+
+# =======================================================
+# SERVIÇO
+# =======================================================
+class ServicoRetencao:
+    """Arquiva mensagens antigas e apaga as limpas pelo aluno, em lotes."""
+
+    def __init__(self, app, db, chat, arquivo, limpeza, dias=180, lote=500, pausa=0.05, intervalo=3600.0):
+        self.app = app
+        self.db = db
+        self.chat = chat  # Table chat_history
+        self.arquivo = arquivo  # Table chat_arquivo
+        self.limpeza = limpeza  # Table chat_limpeza
+        self.dias = dias
+        self.lote = lote
+        self.pausa = pausa
+        self.intervalo = intervalo
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Thread e evento novos (threads não sobrevivem a um fork)."""
+        self._thread = None
+        self._acordar = threading.Event()
+        self._ciclo = threading.Lock()
+
+    # ---------------------------------------------------
+    # THREAD
+    # ---------------------------------------------------
+    def garantir_thread(self):
+        if self.intervalo <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        with self._ciclo:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._laco, name="lumi-retencao", daemon=True)
+                self._thread.start()
+
+    def acordar(self):
+        self.garantir_thread()
+        self._acordar.set()
+
+    def _laco(self):
+        # Workers que sobem juntos não rodam o ciclo todos ao mesmo tempo
+        self._acordar.wait(random.uniform(0, min(self.intervalo, 60)))
+        while True:
+            self._acordar.clear()
+            try:
+                self.rodar_ciclo()
+            except Exception:
+                log.exception("Falha no ciclo de retenção do chat")
+            self._acordar.wait(self.intervalo)
+
+    def rodar_ciclo(self):
+        """Apaga o que o /limpar marcou e arquiva o que passou da retenção."""
+        with self._ciclo:
+            with self.app.app_context():
+                apagadas = self.apagar_limpezas()
+                arquivadas = self.arquivar() if self.dias > 0 else 0
+                self.db.session.remove()
+        return apagadas, arquivadas
+
+    # ---------------------------------------------------
+    # ARQUIVO
+    # ---------------------------------------------------
+    def corte(self):
+        # chat_history.timestamp é gravado em UTC sem fuso (datetime.utcnow)
+        return datetime.utcnow() - timedelta(days=self.dias)
+
+    def arquivar(self, corte=None):
+        """Arquiva, lote a lote, as mensagens anteriores a `corte`. Devolve quantas."""
+        corte = corte or self.corte()
+        c = self.chat.c
+        total = 0
+        while True:
+            usuarios = self.db.session.execute(
+                select(c.user_id).where(c.timestamp < corte).group_by(c.user_id).limit(100)
+            ).scalars().all()
+            if not usuarios:
+                return total
+            arquivadas_rodada = 0
+            for user_id in usuarios:
+                while True:
+                    movidas = self._arquivar_lote(user_id, corte)
+                    arquivadas_rodada += movidas
+                    if movidas < self.lote:
+                        break
+                    time.sleep(self.pausa)
+            total += arquivadas_rodada
+            if not arquivadas_rodada:
+                # Todos os lotes desta rodada foram desfeitos (outro worker
+                # arquivando): sai e tenta no próximo ciclo
+                return total
+
+    def _arquivar_lote(self, user_id, corte):
+        c = self.chat.c
+        sessao = self.db.session
+        inicio = time.perf_counter()
+        try:
+            ids = sessao.execute(
+                select(c.id).where(c.user_id == user_id, c.timestamp < corte).order_by(c.id).limit(self.lote)
+            ).scalars().all()
+            if not ids:
+                sessao.rollback()
+                return 0
+            busca_chat.remover_do_usuario(sessao, user_id, ids)
+            linhas = sessao.execute(
+                delete(self.chat).where(c.id.in_(ids)).returning(c.id, c.role, c.content, c.timestamp)
+            ).all()
+            if len(linhas) != len(ids):
+                sessao.rollback()
+                return 0
+            linhas.sort(key=lambda linha: linha.id)
+            mensagens = [[l.id, l.role, l.content, _iso(l.timestamp)] for l in linhas]
+            codificacao, dados, tamanho = compactar(mensagens)
+            sessao.execute(insert(self.arquivo).values(
+                user_id=user_id,
+                inicio=linhas[0].timestamp,
+                fim=linhas[-1].timestamp,
+                mensagens=len(linhas),
+                codificacao=codificacao,
+                dados=dados,
+                criado_em=datetime.utcnow(),
+            ))
+            sessao.commit()
+        except OperationalError:
+            # SQLite: outro worker escreveu entre a leitura e a escrita
+            sessao.rollback()
+            log.warning("Lote de retenção do usuário %s adiado (banco ocupado)", user_id)
+            return 0
+        ARQUIVADAS.inc(valor=len(linhas))
+        BYTES_ARQUIVO.inc("original", valor=tamanho)
+        BYTES_ARQUIVO.inc("comprimido", valor=len(dados))
+        DURACAO_LOTE.observar(time.perf_counter() - inicio, "archive")
+        return len(linhas)
+
+    def listar_arquivo(self, user_id):
+        a = self.arquivo.c
+        consulta = select(a.id, a.inicio, a.fim, a.mensagens).where(a.user_id == user_id).order_by(a.inicio)
+        return [
+            {"id": l.id, "inicio": _iso(l.inicio), "fim": _iso(l.fim), "mensagens": l.mensagens}
+            for l in self.db.session.execute(consulta)
+        ]
+
+    def ler_arquivo(self, user_id, arquivo_id):
+        """Mensagens de um lote arquivado do aluno, ou None."""
+        a = self.arquivo.c
+        linha = self.db.session.execute(
+            select(a.codificacao, a.dados).where(a.id == arquivo_id, a.user_id == user_id)
+        ).first()
+        if linha is None:
+            return None
+        return [
+            {"id": i, "role": role, "content": content, "timestamp": timestamp}
+            for i, role, content, timestamp in descompactar(linha.codificacao, linha.dados)
+        ]
+
+    # ---------------------------------------------------
+    # LIMPEZA (/limpar)
+    # ---------------------------------------------------
+    def limpo_ate(self, user_id):
+        """Maior id apagado pelo /limpar ainda sem remover (0 se nenhum)."""
+        return self.db.session.execute(
+            select(self.limpeza.c.ate_id).where(self.limpeza.c.user_id == user_id)
+        ).scalar() or 0
+
+    def marcar_limpeza(self, user_id):
+        """Esconde agora todo o histórico do aluno; a remoção fica para a thread."""
+        c = self.chat.c
+        sessao = self.db.session
+        ate_id = sessao.execute(select(func.max(c.id)).where(c.user_id == user_id)).scalar()
+        sessao.execute(delete(self.arquivo).where(self.arquivo.c.user_id == user_id))
+        if ate_id is not None:
+            sessao.execute(delete(self.limpeza).where(self.limpeza.c.user_id == user_id))
+            sessao.execute(insert(self.limpeza).values(user_id=user_id, ate_id=ate_id))
+        sessao.commit()
+        if ate_id is not None:
+            if self.intervalo > 0:
+                self.acordar()
+            else:
+                self.apagar_limpezas()
+
+    def apagar_limpezas(self):
+        """Remove em lotes as mensagens marcadas pelo /limpar. Devolve quantas."""
+        sessao = self.db.session
+        l, c = self.limpeza.c, self.chat.c
+        total = 0
+        for user_id, ate_id in sessao.execute(select(l.user_id, l.ate_id)).all():
+            while True:
+                inicio = time.perf_counter()
+                ids = sessao.execute(
+                    select(c.id).where(c.user_id == user_id, c.id <= ate_id).order_by(c.id).limit(self.lote)
+                ).scalars().all()
+                if not ids:
+                    # Só remove a marca se ninguém limpou de novo no meio tempo
+                    sessao.execute(delete(self.limpeza).where(l.user_id == user_id, l.ate_id == ate_id))
+                    sessao.commit()
+                    break
+                busca_chat.remover_do_usuario(sessao, user_id, ids)
+                sessao.execute(delete(self.chat).where(c.id.in_(ids)))
+                sessao.commit()
+                total += len(ids)
+                APAGADAS.inc(valor=len(ids))
+                DURACAO_LOTE.observar(time.perf_counter() - inicio, "purge")
+                time.sleep(self.pausa)
+        return total
+
+
+def init_app(app, db, chat, arquivo, limpeza):
+    servico = ServicoRetencao(
+        app, db, chat, arquivo, limpeza,
+        dias=int(os.environ.get("LUMI_CHAT_RETENCAO_DIAS", "180")),
+        lote=int(os.environ.get("LUMI_RETENCAO_LOTE", "500")),
+        pausa=float(os.environ.get("LUMI_RETENCAO_PAUSA", "0.05")),
+        intervalo=float(os.environ.get("LUMI_RETENCAO_INTERVALO", "3600")),
+    )
+
+    @app.before_request
+    def _iniciar_retencao():
+        # A thread nasce na primeira requisição do worker (depois do fork)
+        servico.garantir_thread()
+
+    app.extensions["lumi_retencao"] = servico
+    return servico
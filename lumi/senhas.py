@@ -0,0 +1,159 @@
+# =======================================================
+# HASH DE SENHAS EM PROCESSOS SEPARADOS
+# =======================================================
+# O scrypt do werkzeug leva ~100 ms de CPU por senha. Feito dentro da
+# requisição, ele disputa a CPU (e parte do tempo o GIL) com as outras
+# threads do worker: no início do semestre, com milhares de logins, até
+# páginas que nem olham senha ficam lentas. Aqui gerar e verificar hashes
+# vão para um pool de processos (concurrent.futures), com limite de pedidos
+# na fila:
+#
+#   LUMI_SENHAS_PROCESSOS  processos do pool por worker (padrão 2; 0 = na
+#                          própria thread, usado nos testes)
+#   LUMI_SENHAS_FILA       pedidos em andamento + na fila (padrão 4 por
+#                          processo); além disso a requisição espera uma vaga
+#   LUMI_SENHAS_ESPERA     espera máxima por uma vaga em segundos (padrão 30);
+#                          estourou, ErroFilaSenhas (a rota responde 503)
+#
+# O pool nasce no primeiro uso (depois do fork do gunicorn) e usa
+# "forkserver": os processos filhos não herdam as threads nem as conexões do
+# worker. Se um filho morrer, o pool é recriado e o pedido roda na thread.
+#
+# `gerar_hashes` é a versão em lote (importação de alunos): todas as CPUs,
+# pedidos agrupados em blocos para diluir o custo de comunicação.
+# =======================================================
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from lumi import metricas
+
+DURACAO = metricas.REGISTRO.histograma(
+    "lumi_password_hash_seconds",
+    "Tempo de CPU de um hash de senha (operation=hash|verify).",
+    ("operation",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+ESPERA = metricas.REGISTRO.histograma(
+    "lumi_password_queue_wait_seconds",
+    "Espera por uma vaga e por um processo livre antes de o hash começar.",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0),
+)
+PENDENTES = metricas.REGISTRO.gauge(
+    "lumi_password_jobs_pending", "Hashes de senha em andamento ou na fila do pool."
+)
+RECUSADOS = metricas.REGISTRO.contador(
+    "lumi_password_queue_rejected_total", "Pedidos de hash que não conseguiram vaga a tempo."
+)
+
+
+class ErroFilaSenhas(RuntimeError):
+    """Fila do pool de senhas cheia por mais de LUMI_SENHAS_ESPERA segundos."""
+
+
+def _contexto():
+    metodos = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in metodos else "spawn")
+
+
+def _medido(funcao, *args):
+    """Roda no processo filho: devolve o resultado e o tempo gasto."""
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return resultado, time.perf_counter() - inicio
+
+
+def _hash_lote(senhas):
+    return [generate_password_hash(senha) for senha in senhas]
+
+
+class PoolSenhas:
+    """Gera e confere hashes de senha num pool de processos limitado."""
+
+    def __init__(self, processos=2, fila=None, espera=30.0):
+        self.processos = processos
+        self.fila = fila or max(processos, 1) * 4
+        self.espera = espera
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Esquece o pool e a fila (chamado no worker depois do fork)."""
+        self._executor = None
+        self._criando = threading.Lock()
+        self._vagas = threading.BoundedSemaphore(self.fila)
+        self._contagem = threading.Lock()
+        self._pendentes = 0
+
+    def _contar(self, delta):
+        with self._contagem:
+            self._pendentes += delta
+            PENDENTES.definir(valor=self._pendentes)
+
+    def _pool(self):
+        if self._executor is None:
+            with self._criando:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.processos, mp_context=_contexto())
+        return self._executor
+
+    def _executar(self, operacao, funcao, *args):
+        inicio = time.perf_counter()
+        if self.processos <= 0:
+            resultado, duracao = _medido(funcao, *args)
+            DURACAO.observar(duracao, operacao)
+            return resultado
+        if not self._vagas.acquire(timeout=self.espera):
+            RECUSADOS.inc()
+            raise ErroFilaSenhas("Servidor ocupado conferindo senhas. Tente de novo em instantes.")
+        self._contar(1)
+        try:
+            try:
+                resultado, duracao = self._pool().submit(_medido, funcao, *args).result()
+            except BrokenProcessPool:
+                # Um filho morreu (OOM, kill): pool novo para os próximos pedidos
+                self._executor = None
+                resultado, duracao = _medido(funcao, *args)
+        finally:
+            self._contar(-1)
+            self._vagas.release()
+        DURACAO.observar(duracao, operacao)
+        ESPERA.observar(max(time.perf_counter() - inicio - duracao, 0.0))
+        return resultado
+
+    def gerar_hash(self, senha):
+        return self._executar("hash", generate_password_hash, senha)
+
+    def verificar(self, hash_senha, senha):
+        return self._executar("verify", check_password_hash, hash_senha, senha)
+
+    def encerrar(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def gerar_hashes(senhas, processos=None, bloco=16):
+    """Hashes de muitas senhas usando todas as CPUs; mantém a ordem."""
+    senhas = list(senhas)
+    processos = processos or os.cpu_count() or 1
+    if processos <= 1 or len(senhas) <= bloco:
+        return _hash_lote(senhas)
+    blocos = [senhas[i:i + bloco] for i in range(0, len(senhas), bloco)]
+    with ProcessPoolExecutor(max_workers=processos, mp_context=_contexto()) as executor:
+        return [h for lote in executor.map(_hash_lote, blocos) for h in lote]
+
+
+def init_app(app):
+    pool = PoolSenhas(
+        processos=int(os.environ.get("LUMI_SENHAS_PROCESSOS", "2")),
+        fila=int(os.environ.get("LUMI_SENHAS_FILA", "0")) or None,
+        espera=float(os.environ.get("LUMI_SENHAS_ESPERA", "30")),
+    )
+    app.extensions["lumi_senhas"] = pool
+    return pool
@@ -0,0 +1,303 @@
+# =======================================================
+# TELEMETRIA DE ESTUDO (Modo Foco, flashcards, simulador)
+# =======================================================
+# O navegador junta os eventos e manda em lote (navigator.sendBeacon) para
+# POST /api/telemetria; o simulador registra as tentativas no servidor, que
+# é quem corrige. A requisição só valida e coloca os eventos num buffer em
+# memória: uma thread grava o buffer a cada LUMI_TELEMETRIA_INTERVALO
+# segundos (padrão 1) ou quando ele passa de LUMI_TELEMETRIA_LOTE eventos
+# (padrão 500), numa única transação:
+#
+#   1. INSERT em lote em evento_estudo: inteiros só (tipo, instante, valor,
+#      extra), sem JSON, com um único índice (user_id, dia).
+#   2. UPSERT em estudo_diario somando os totais do lote por (aluno, dia):
+#      "coluna = coluna + excluded.coluna". Somas comutam, então workers
+#      gravando ao mesmo tempo não se atrapalham.
+#
+# Painéis e APIs leem só estudo_diario. `flask telemetria-rollup` recalcula
+# tudo a partir de evento_estudo (ex.: depois de mudar o fuso horário).
+#
+# Eventos ainda no buffer se perdem se o processo morrer sem sair normalmente
+# (no encerramento normal o atexit grava o que falta); é telemetria, e o
+# 202 diz "recebido", não "gravado". Acima de LUMI_TELEMETRIA_BUFFER eventos
+# pendentes (padrão 50000; banco fora do ar) os novos são descartados.
+# LUMI_TELEMETRIA_INTERVALO=0 grava na própria requisição (usado nos testes).
+# =======================================================
+
+import atexit
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from lumi import metricas
+
+FOCO, FLASHCARD, SIMULADOR = 1, 2, 3
+TIPOS = {"foco": FOCO, "flashcard": FLASHCARD, "simulador": SIMULADOR}
+# O simulador é corrigido no servidor: o navegador não registra notas
+TIPOS_CLIENTE = ("foco", "flashcard")
+COLUNAS_DIARIO = (
+    "segundos_foco", "sessoes_foco", "sessoes_concluidas",
+    "flashcards_revisados", "simulados", "questoes", "acertos",
+)
+
+MAX_EVENTOS_LOTE = 200
+MAX_SEGUNDOS_FOCO = 4 * 3600
+# Eventos guardados offline pelo navegador ainda valem por uma semana
+JANELA_PASSADO = 7 * 24 * 3600
+JANELA_FUTURO = 5 * 60
+
+EVENTOS = metricas.REGISTRO.contador(
+    "lumi_telemetry_events_total",
+    "Eventos de estudo recebidos (aceito), inválidos (recusado) ou perdidos com o buffer cheio (descartado).",
+    ("type", "result"),
+)
+DURACAO_GRAVACAO = metricas.REGISTRO.histograma(
+    "lumi_telemetry_flush_seconds", "Tempo para gravar um lote de eventos e atualizar estudo_diario."
+)
+PENDENTES = metricas.REGISTRO.gauge(
+    "lumi_telemetry_buffer_events", "Eventos de estudo aguardando gravação."
+)
+
+log = logging.getLogger(__name__)
+
+
+class ErroTelemetria(ValueError):
+    """Lote recusado por inteiro (formato inválido ou grande demais)."""
+
+
+# =======================================================
+# VALIDAÇÃO
+# =======================================================
+def _inteiro(valor, minimo, maximo):
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+        return None
+    valor = int(valor)
+    return valor if minimo <= valor <= maximo else None
+
+
+def interpretar_evento(evento, agora):
+    """Evento do navegador -> (tipo, momento, valor, extra), ou None se inválido.
+
+    {"tipo": "foco", "t": <epoch ms do início>, "segundos": 1500, "concluida": true}
+    {"tipo": "flashcard", "t": <epoch ms>}
+    """
+    if not isinstance(evento, dict) or evento.get("tipo") not in TIPOS_CLIENTE:
+        return None
+    momento = _inteiro(evento.get("t"), (agora - JANELA_PASSADO) * 1000, (agora + JANELA_FUTURO) * 1000)
+    if momento is None:
+        return None
+    momento //= 1000
+    if evento["tipo"] == "foco":
+        segundos = _inteiro(evento.get("segundos"), 1, MAX_SEGUNDOS_FOCO)
+        if segundos is None:
+            return None
+        return FOCO, momento, segundos, 1 if evento.get("concluida") is True else 0
+    return FLASHCARD, momento, 1, 0
+
+
+def somar_diario(totais, tipo, valor, extra):
+    """Acumula um evento nos totais de um dia (dicionário de COLUNAS_DIARIO)."""
+    if tipo == FOCO:
+        totais["segundos_foco"] += valor
+        totais["sessoes_foco"] += 1
+        totais["sessoes_concluidas"] += extra
+    elif tipo == FLASHCARD:
+        totais["flashcards_revisados"] += valor
+    elif tipo == SIMULADOR:
+        totais["simulados"] += 1
+        totais["acertos"] += valor
+        totais["questoes"] += extra
+
+
+# =======================================================
+# COLETOR (buffer + thread de gravação)
+# =======================================================
+class ColetorEventos:
+    """Bufferiza eventos e grava em lote, com os totais diários, numa thread."""
+
+    def __init__(self, app, db, eventos, diario, fuso=None, intervalo=1.0, lote=500, limite=50_000):
+        self.app = app
+        self.db = db
+        self.eventos = eventos  # Table evento_estudo
+        self.diario = diario  # Table estudo_diario
+        self.fuso = fuso
+        self.intervalo = intervalo
+        self.lote = lote
+        self.limite = limite
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Buffer, lock e thread novos (threads não sobrevivem a um fork)."""
+        self._pendentes = []
+        self._cond = threading.Condition()
+        self._gravando = threading.Lock()
+        self._thread = None
+        self._parar = False
+
+    # ---------------------------------------------------
+    # ENTRADA
+    # ---------------------------------------------------
+    def registrar(self, user_id, tipo, valor, extra=0, momento=None):
+        """Registra um evento gerado no servidor (ex.: tentativa do simulador)."""
+        momento = int(time.time()) if momento is None else momento
+        return self._enfileirar([(user_id, TIPOS[tipo], momento, valor, extra)])
+
+    def receber_lote(self, user_id, eventos):
+        """Valida o lote do navegador. Devolve (aceitos, recusados)."""
+        if not isinstance(eventos, list):
+            raise ErroTelemetria("Envie {'eventos': [...]}.")
+        if len(eventos) > MAX_EVENTOS_LOTE:
+            raise ErroTelemetria(f"No máximo {MAX_EVENTOS_LOTE} eventos por envio.")
+        agora = int(time.time())
+        linhas, recusados = [], 0
+        for evento in eventos:
+            interpretado = interpretar_evento(evento, agora)
+            if interpretado is None:
+                recusados += 1
+                tipo = evento.get("tipo") if isinstance(evento, dict) else None
+                EVENTOS.inc(tipo if tipo in TIPOS else "desconhecido", "recusado")
+            else:
+                linhas.append((user_id, *interpretado))
+        return self._enfileirar(linhas), recusados
+
+    def _enfileirar(self, linhas):
+        nomes = {v: k for k, v in TIPOS.items()}
+        with self._cond:
+            espaco = max(self.limite - len(self._pendentes), 0)
+            aceitas, descartadas = linhas[:espaco], linhas[espaco:]
+            self._pendentes.extend(aceitas)
+            PENDENTES.definir(valor=len(self._pendentes))
+            if self.intervalo > 0:
+                self._garantir_thread()
+                if len(self._pendentes) >= self.lote:
+                    self._cond.notify()
+        for linha in aceitas:
+            EVENTOS.inc(nomes[linha[1]], "aceito")
+        for linha in descartadas:
+            EVENTOS.inc(nomes[linha[1]], "descartado")
+        if self.intervalo <= 0:
+            self.descarregar()
+        return len(aceitas)
+
+    def _garantir_thread(self):
+        # Chamado com self._cond travado; a thread só nasce no primeiro evento,
+        # então o mestre do gunicorn (preload) nunca tem uma para perder no fork
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._laco, name="lumi-telemetria", daemon=True)
+            self._thread.start()
+
+    # ---------------------------------------------------
+    # GRAVAÇÃO
+    # ---------------------------------------------------
+    def _laco(self):
+        while True:
+            with self._cond:
+                if len(self._pendentes) < self.lote and not self._parar:
+                    self._cond.wait(self.intervalo)
+                if self._parar and not self._pendentes:
+                    return
+            self.descarregar()
+
+    def descarregar(self):
+        """Grava agora tudo o que está no buffer. Devolve quantos eventos."""
+        with self._gravando:
+            with self._cond:
+                linhas, self._pendentes = self._pendentes, []
+            if not linhas:
+                return 0
+            try:
+                with self.app.app_context():
+                    self.gravar(linhas)
+            except Exception:
+                log.exception("Falha ao gravar %d eventos de estudo; tentando de novo no próximo lote", len(linhas))
+                with self._cond:
+                    # Devolve ao buffer (na frente), respeitando o limite
+                    self._pendentes[:0] = linhas[: max(self.limite - len(self._pendentes), 0)]
+                return 0
+            finally:
+                PENDENTES.definir(valor=len(self._pendentes))
+            return len(linhas)
+
+    def gravar(self, linhas):
+        """INSERT dos eventos e UPSERT dos totais diários numa transação."""
+        inicio = time.perf_counter()
+        registros, totais = [], {}
+        for user_id, tipo, momento, valor, extra in linhas:
+            dia = datetime.fromtimestamp(momento, self.fuso).date()
+            registros.append({
+                "user_id": user_id, "dia": dia, "tipo": tipo,
+                "momento": momento, "valor": valor, "extra": extra,
+            })
+            chave = (user_id, dia)
+            if chave not in totais:
+                totais[chave] = dict.fromkeys(COLUNAS_DIARIO, 0)
+            somar_diario(totais[chave], tipo, valor, extra)
+
+        with self.db.engine.begin() as conexao:
+            conexao.execute(insert(self.eventos), registros)
+            conexao.execute(
+                self._upsert_diario(conexao.dialect.name),
+                [dict(t, user_id=u, dia=d) for (u, d), t in totais.items()],
+            )
+        DURACAO_GRAVACAO.observar(time.perf_counter() - inicio)
+
+    def _upsert_diario(self, dialeto):
+        modulo = {"sqlite": sqlite, "postgresql": postgresql}.get(dialeto)
+        if modulo is None:
+            raise RuntimeError(f"Telemetria sem suporte a UPSERT no banco '{dialeto}'.")
+        comando = modulo.insert(self.diario)
+        return comando.on_conflict_do_update(
+            index_elements=[self.diario.c.user_id, self.diario.c.dia],
+            set_={c: self.diario.c[c] + comando.excluded[c] for c in COLUNAS_DIARIO},
+        )
+
+    def encerrar(self):
+        with self._cond:
+            self._parar = True
+            self._cond.notify()
+        self.descarregar()
+
+    # ---------------------------------------------------
+    # LEITURA E MANUTENÇÃO
+    # ---------------------------------------------------
+    def resumo(self, conexao, user_id, desde):
+        """Linhas de estudo_diario do aluno a partir de `desde` (date)."""
+        d = self.diario
+        consulta = select(d).where(d.c.user_id == user_id, d.c.dia >= desde).order_by(d.c.dia)
+        return [dict(linha._mapping) for linha in conexao.execute(consulta)]
+
+    def reconstruir_diario(self, conexao):
+        """Recalcula estudo_diario inteiro a partir de evento_estudo."""
+        e = self.eventos
+
+        def soma(tipo, expressao):
+            return func.coalesce(func.sum(case((e.c.tipo == tipo, expressao), else_=0)), 0)
+
+        agregado = select(
+            e.c.user_id, e.c.dia,
+            soma(FOCO, e.c.valor), soma(FOCO, 1), soma(FOCO, e.c.extra),
+            soma(FLASHCARD, e.c.valor),
+            soma(SIMULADOR, 1), soma(SIMULADOR, e.c.extra), soma(SIMULADOR, e.c.valor),
+        ).group_by(e.c.user_id, e.c.dia)
+        colunas = ["user_id", "dia", "segundos_foco", "sessoes_foco", "sessoes_concluidas",
+                   "flashcards_revisados", "simulados", "questoes", "acertos"]
+        conexao.execute(delete(self.diario))
+        conexao.execute(insert(self.diario).from_select(colunas, agregado))
+        return conexao.execute(select(func.count()).select_from(self.diario)).scalar()
+
+
+def init_app(app, db, eventos, diario, fuso=None):
+    coletor = ColetorEventos(
+        app, db, eventos, diario, fuso=fuso,
+        intervalo=float(os.environ.get("LUMI_TELEMETRIA_INTERVALO", "1")),
+        lote=int(os.environ.get("LUMI_TELEMETRIA_LOTE", "500")),
+        limite=int(os.environ.get("LUMI_TELEMETRIA_BUFFER", "50000")),
+    )
+    atexit.register(coletor.encerrar)
+    app.extensions["lumi_telemetria"] = coletor
+    return coletor
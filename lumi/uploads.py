@@ -0,0 +1,284 @@
+# =======================================================
+# PIPELINE DE UPLOAD DE FOTO DE PERFIL
+# =======================================================
+# 1. O arquivo é copiado em blocos para um temporário fora de /static
+#    (nunca inteiro na memória), calculando o SHA-256 e respeitando um
+#    limite de tamanho.
+# 2. O tipo real é conferido pelos "magic bytes" (a extensão não basta), e
+#    o Pillow confere, ainda na requisição, a resolução e a estrutura do
+#    arquivo (imagem truncada ou corrompida é recusada antes de salvar).
+# 3. O nome final vem do hash do conteúdo: uploads idênticos compartilham
+#    os mesmos arquivos e não são reprocessados.
+# 4. Redimensionar, recortar em quadrado e regravar em WebP (sem EXIF/GPS)
+#    acontece num pool de threads; a requisição só espera a cópia.
+#
+# Enquanto o processamento não termina, quem pedir a imagem em /static
+# espera por ela (ver `init_app`), em vez de receber 404. Se ele falhar
+# mesmo assim, `ao_falhar(nome)` é chamado para quem salvou o nome (o app
+# volta esses alunos para o avatar padrão), e `falhou(nome)` responde o
+# mesmo para quem ainda não tinha salvo.
+# =======================================================
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import request
+
+from lumi import metricas
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # sem Pillow não há como processar imagens
+    Image = None
+    ImageOps = None
+
+TAMANHOS_AVATAR = (256, 64)
+TAMANHO_BLOCO = 64 * 1024
+LIMITE_PADRAO = 8 * 1024 * 1024
+# Evita "bombas de descompressão" (ex.: PNG minúsculo com 50000x50000 px)
+MAX_PIXELS = 40_000_000
+
+ASSINATURAS = (
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+
+DURACAO_PROCESSAMENTO = metricas.REGISTRO.histograma(
+    "lumi_upload_processing_seconds", "Tempo para gerar as variantes WebP de um avatar."
+)
+UPLOADS_DEDUPLICADOS = metricas.REGISTRO.contador(
+    "lumi_upload_deduplicated_total", "Uploads cujo conteúdo já existia no disco."
+)
+
+
+class ErroUpload(ValueError):
+    """Upload recusado (tipo inválido, muito grande, imagem corrompida)."""
+
+
+def detectar_tipo(cabecalho):
+    for assinatura, tipo in ASSINATURAS:
+        if cabecalho.startswith(assinatura):
+            return tipo
+    if cabecalho[:4] == b"RIFF" and cabecalho[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def nome_avatar(base, tamanho=TAMANHOS_AVATAR[0]):
+    return f"{base}-{tamanho}.webp"
+
+
+def receber_stream(stream, pasta_tmp, limite=LIMITE_PADRAO):
+    """Copia o stream para um temporário. Devolve (caminho, sha256, tipo)."""
+    h = hashlib.sha256()
+    total = 0
+    fd, caminho = tempfile.mkstemp(prefix="upload-", dir=pasta_tmp)
+    try:
+        with os.fdopen(fd, "wb") as destino:
+            cabecalho = b""
+            while True:
+                bloco = stream.read(TAMANHO_BLOCO)
+                if not bloco:
+                    break
+                if len(cabecalho) < 16:
+                    cabecalho += bloco[: 16 - len(cabecalho)]
+                total += len(bloco)
+                if total > limite:
+                    raise ErroUpload(f"Imagem maior que o limite de {limite // (1024 * 1024)} MB.")
+                h.update(bloco)
+                destino.write(bloco)
+        tipo = detectar_tipo(cabecalho)
+        if tipo is None:
+            raise ErroUpload("O arquivo enviado não é uma imagem PNG, JPEG, GIF ou WebP válida.")
+        return caminho, h.hexdigest(), tipo
+    except BaseException:
+        os.remove(caminho)
+        raise
+
+
+def validar_imagem(caminho):
+    """Confere resolução e estrutura sem decodificar os pixels (ErroUpload se inválida)."""
+    try:
+        with Image.open(caminho) as imagem:
+            if imagem.width * imagem.height > MAX_PIXELS:
+                raise ErroUpload("Imagem com resolução grande demais.")
+            imagem.verify()
+    except ErroUpload:
+        raise
+    except Exception:
+        raise ErroUpload("A imagem enviada está corrompida ou incompleta.")
+
+
+def gerar_avatares(origem, pasta_destino, base, tamanhos=TAMANHOS_AVATAR):
+    """Recorta em quadrado, redimensiona e grava WebP sem metadados."""
+    with Image.open(origem) as imagem:
+        if imagem.width * imagem.height > MAX_PIXELS:
+            raise ErroUpload("Imagem com resolução grande demais.")
+        # Aplica a rotação do EXIF antes de descartar os metadados
+        imagem = ImageOps.exif_transpose(imagem)
+        imagem = imagem.convert("RGBA" if imagem.mode in ("RGBA", "LA", "P") else "RGB")
+        fonte = imagem
+        for tamanho in sorted(tamanhos, reverse=True):
+            fonte = ImageOps.fit(fonte, (tamanho, tamanho), Image.LANCZOS)
+            limpa = Image.new(fonte.mode, fonte.size)
+            limpa.paste(fonte)
+            destino = os.path.join(pasta_destino, nome_avatar(base, tamanho))
+            temporario = destino + ".tmp"
+            limpa.save(temporario, "WEBP", quality=85, method=4)
+            os.replace(temporario, destino)
+
+
+class ProcessadorUploads:
+    """Recebe uploads na requisição e processa as variantes em segundo plano."""
+
+    def __init__(self, pasta, workers=2, limite=LIMITE_PADRAO, pasta_tmp=None):
+        self.pasta = pasta
+        # Os temporários não podem ficar em /static: seriam servidos publicamente
+        self.pasta_tmp = pasta_tmp or tempfile.gettempdir()
+        self.workers = workers
+        self.limite = limite
+        self.ao_falhar = None
+        self._falhas = set()
+        self._pendentes = {}
+        self._reservas = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lumi-upload")
+
+    def reiniciar(self):
+        """Recria o pool (threads não sobrevivem a um fork)."""
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="lumi-upload")
+        self._pendentes = {}
+        self._reservas = {}
+        self._falhas = set()
+        self._lock = threading.Lock()
+
+    def enviar(self, stream):
+        """Valida e enfileira o upload; devolve o nome do avatar de 256 px.
+
+        O nome fica reservado (não pode ser removido) até `liberar(nome)`:
+        quem o recebeu ainda não gravou no banco que passou a usá-lo.
+        """
+        if Image is None:
+            raise ErroUpload("Processamento de imagens indisponível (Pillow não instalado).")
+        caminho, sha, _ = receber_stream(stream, self.pasta_tmp, self.limite)
+        try:
+            validar_imagem(caminho)
+        except ErroUpload:
+            os.remove(caminho)
+            raise
+        base = sha[:24]
+        nome = nome_avatar(base)
+        with self._lock:
+            ja_existe = nome in self._pendentes or all(
+                os.path.exists(os.path.join(self.pasta, nome_avatar(base, t))) for t in TAMANHOS_AVATAR
+            )
+            if not ja_existe:
+                self._falhas.discard(nome)
+                self._pendentes[nome] = self._pool.submit(self._processar, caminho, base, nome)
+            self._reservas[nome] = self._reservas.get(nome, 0) + 1
+        if ja_existe:
+            os.remove(caminho)
+            UPLOADS_DEDUPLICADOS.inc()
+        return nome
+
+    def _processar(self, caminho, base, nome):
+        inicio = time.perf_counter()
+        try:
+            gerar_avatares(caminho, self.pasta, base)
+        except Exception as e:
+            print(f"ERRO ao processar upload {nome}: {e}")
+            with self._lock:
+                if len(self._falhas) >= 1000:
+                    self._falhas.clear()
+                self._falhas.add(nome)
+            if self.ao_falhar is not None:
+                try:
+                    self.ao_falhar(nome)
+                except Exception as erro:
+                    print(f"ERRO ao desfazer avatar {nome}: {erro}")
+            raise
+        finally:
+            os.remove(caminho)
+            with self._lock:
+                self._pendentes.pop(nome, None)
+            DURACAO_PROCESSAMENTO.observar(time.perf_counter() - inicio)
+
+    def falhou(self, nome):
+        """True se as variantes de `nome` não puderam ser geradas."""
+        with self._lock:
+            return nome in self._falhas
+
+    def aguardar(self, nome, timeout=10):
+        """Bloqueia até `nome` ficar pronto (se ainda estiver na fila)."""
+        with self._lock:
+            futuro = self._pendentes.get(nome)
+        if futuro is not None:
+            try:
+                futuro.result(timeout=timeout)
+            except Exception:
+                pass
+
+    def liberar(self, nome):
+        """Desfaz a reserva feita por `enviar` (depois do commit de quem usa o nome)."""
+        with self._lock:
+            restantes = self._reservas.get(nome, 0) - 1
+            if restantes > 0:
+                self._reservas[nome] = restantes
+            else:
+                self._reservas.pop(nome, None)
+
+    def remover(self, nome, em_uso=None):
+        """Apaga um avatar (todas as variantes) ou um upload antigo avulso.
+
+        Nada é apagado se o nome está na fila, reservado por um `enviar` ou se
+        `em_uso(nome)` diz que alguém ainda aponta para ele. A verificação e a
+        remoção acontecem sob o mesmo lock da deduplicação, então outro aluno não
+        consegue reaproveitar os arquivos no meio da remoção. Devolve True se apagou.
+        """
+        with self._lock:
+            if nome in self._pendentes or nome in self._reservas:
+                return False
+            if em_uso is not None and em_uso(nome):
+                return False
+            self._remover_arquivos(nome)
+        return True
+
+    def _remover_arquivos(self, nome):
+        if nome.endswith(f"-{TAMANHOS_AVATAR[0]}.webp"):
+            base = nome[: -len(f"-{TAMANHOS_AVATAR[0]}.webp")]
+            alvos = [nome_avatar(base, t) for t in TAMANHOS_AVATAR]
+        else:
+            alvos = [nome]
+        for alvo in alvos:
+            caminho = os.path.join(self.pasta, alvo)
+            if os.path.exists(caminho):
+                try:
+                    os.remove(caminho)
+                except OSError as e:
+                    print(f"Aviso: Não foi possível remover o arquivo antigo: {e}")
+
+
+def init_app(app):
+    processador = ProcessadorUploads(
+        app.config["UPLOAD_FOLDER"],
+        workers=int(os.environ.get("LUMI_UPLOAD_WORKERS", 2)),
+        limite=int(os.environ.get("LUMI_UPLOAD_MAX_BYTES", LIMITE_PADRAO)),
+        pasta_tmp=os.environ.get("LUMI_UPLOAD_TMP") or os.path.join(app.instance_path, "uploads_tmp"),
+    )
+    os.makedirs(processador.pasta_tmp, exist_ok=True)
+    app.extensions["lumi_uploads"] = processador
+
+    @app.before_request
+    def _esperar_avatar_pendente():
+        if request.endpoint == "static":
+            filename = (request.view_args or {}).get("filename", "")
+            if filename.startswith("uploads/"):
+                processador.aguardar(filename[len("uploads/"):])
+
+    return processador
@@ -0,0 +1,227 @@
+# =======================================================
+# VARK – RESULTADOS POR ALUNO E AGREGADOS POR TURMA
+# =======================================================
+# O resultado do quiz VARK de cada aluno fica em vark_resultado, uma linha
+# por aluno com os pontos em colunas inteiras (v, a, r, k), o tipo
+# principal, o curso e o período letivo ("2025.2", no fuso da faculdade)
+# em que foi salvo. A coluna User.vark_scores_json continua sendo gravada
+# para a página do quiz.
+#
+# vark_coorte guarda os totais de cada turma (curso, período): alunos, soma
+# dos pontos de cada letra e quantos têm cada tipo principal (V, A, R, K ou
+# multimodal, quando há empate). Ela é atualizada na mesma transação que
+# salva o resultado: se o aluno refaz o quiz, o resultado anterior sai da
+# turma antiga e o novo entra na turma atual. Somas e contagens são UPSERTs
+# aditivos, então alunos salvando ao mesmo tempo não se atrapalham. O
+# primeiro resultado do aluno entra com INSERT ... ON CONFLICT DO NOTHING:
+# num envio duplo, o segundo vê a linha do primeiro e vira uma atualização.
+#
+# GET /api/vark/turmas (filtros ?curso= e ?periodo=) lê só vark_coorte. A
+# resposta fica em memória por LUMI_VARK_CACHE_SEGUNDOS (padrão 30, ou até
+# um resultado ser salvo neste processo) e tem ETag. Turmas com menos de
+# LUMI_VARK_MINIMO alunos (padrão 5) não aparecem, para não expor o
+# resultado de alguém. A rota exige `Authorization: Bearer <token>` com o
+# LUMI_PAINEL_TOKEN (painéis dos professores); sem ele definido, responde 403.
+#
+# `flask vark-rebuild` preenche vark_resultado com os resultados antigos
+# (só JSON) e refaz vark_coorte a partir de vark_resultado.
+# =======================================================
+
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from lumi import metricas
+
+LETRAS = ("V", "A", "R", "K")
+COLUNAS_SOMA = tuple(f"soma_{l.lower()}" for l in LETRAS)
+COLUNAS_TIPO = tuple(f"tipo_{l.lower()}" for l in LETRAS) + ("multimodal",)
+COLUNAS_COORTE = ("alunos",) + COLUNAS_SOMA + COLUNAS_TIPO
+
+CONSULTAS = metricas.REGISTRO.contador(
+    "lumi_vark_cohort_requests_total",
+    "Consultas aos agregados VARK por turma (result=hit|miss do cache em memória).",
+    ("result",),
+)
+
+
+def periodo_letivo(momento):
+    return f"{momento.year}.{1 if momento.month <= 6 else 2}"
+
+
+def tipo_principal(pontos):
+    """Letras com a maior pontuação, como a página do quiz ("V", "V/K")."""
+    maior = max(pontos[l] for l in LETRAS)
+    return "/".join(l for l in LETRAS if pontos[l] == maior)
+
+
+def _contribuicao(pontos, tipo, sinal=1):
+    """Quanto um resultado soma (ou tira, sinal=-1) das colunas da turma."""
+    linha = dict.fromkeys(COLUNAS_COORTE, 0)
+    linha["alunos"] = sinal
+    for letra in LETRAS:
+        linha[f"soma_{letra.lower()}"] = sinal * pontos[letra]
+    coluna = f"tipo_{tipo.lower()}" if tipo in LETRAS else "multimodal"
+    linha[coluna] = sinal
+    return linha
+
+
+class VarkTurmas:
+    """Grava os resultados VARK e mantém e serve os agregados por turma."""
+
+    def __init__(self, resultados, coortes, fuso=None, cache_segundos=30.0, minimo=5):
+        self.resultados = resultados
+        self.coortes = coortes
+        self.fuso = fuso
+        self.cache_segundos = cache_segundos
+        self.minimo = minimo
+        self._cache = {}  # (curso, periodo) -> (expira, etag, dados)
+        self._lock = threading.Lock()
+
+    def reiniciar(self):
+        with self._lock:
+            self._cache.clear()
+
+    def periodo_atual(self):
+        return periodo_letivo(datetime.now(self.fuso) if self.fuso else datetime.now())
+
+    # ---------------------------------------------------
+    # GRAVAÇÃO
+    # ---------------------------------------------------
+    def registrar(self, sessao, user_id, curso, pontos, momento=None):
+        """Grava o resultado do aluno e atualiza as turmas na transação de `sessao`
+        (Session ou Connection; quem chama faz o commit). Devolve o tipo principal."""
+        momento = momento or (datetime.now(self.fuso) if self.fuso else datetime.now())
+        curso = curso or ""
+        periodo = periodo_letivo(momento)
+        tipo = tipo_principal(pontos)
+        r = self.resultados
+        valores = {
+            "curso": curso, "periodo": periodo, "tipo_primario": tipo, "salvo_em": momento.replace(tzinfo=None),
+            **{l.lower(): pontos[l] for l in LETRAS},
+        }
+        anterior = self._anterior(sessao, user_id)
+        if anterior is None:
+            # Dois envios do primeiro resultado ao mesmo tempo: o que perder o
+            # INSERT vê a linha do outro e segue como quem refez o quiz
+            comando = self._upsert(sessao).insert(r).values(user_id=user_id, **valores)
+            if sessao.execute(comando.on_conflict_do_nothing(index_elements=[r.c.user_id])).rowcount == 0:
+                anterior = self._anterior(sessao, user_id)
+        if anterior is not None:
+            sessao.execute(update(r).where(r.c.user_id == user_id).values(**valores))
+            antigos = dict(zip(LETRAS, anterior[2:6]))
+            self._somar(sessao, anterior.curso, anterior.periodo, _contribuicao(antigos, anterior.tipo_primario, -1))
+        self._somar(sessao, curso, periodo, _contribuicao(pontos, tipo))
+        # Este processo vê a mudança na hora; os outros, quando o cache expirar
+        self.reiniciar()
+        return tipo
+
+    def _anterior(self, sessao, user_id):
+        r = self.resultados
+        return sessao.execute(
+            select(r.c.curso, r.c.periodo, r.c.v, r.c.a, r.c.r, r.c.k, r.c.tipo_primario)
+            .where(r.c.user_id == user_id)
+            .with_for_update()
+        ).first()
+
+    @staticmethod
+    def _upsert(sessao):
+        """Módulo do dialeto com insert(...).on_conflict_do_*()."""
+        dialeto = sessao.get_bind().dialect.name if hasattr(sessao, "get_bind") else sessao.dialect.name
+        modulo = {"sqlite": sqlite, "postgresql": postgresql}.get(dialeto)
+        if modulo is None:
+            raise RuntimeError(f"Agregados VARK sem suporte a UPSERT no banco '{dialeto}'.")
+        return modulo
+
+    def _somar(self, sessao, curso, periodo, linha):
+        c = self.coortes
+        comando = self._upsert(sessao).insert(c).values(curso=curso, periodo=periodo, atualizado_em=time.time(), **linha)
+        sessao.execute(comando.on_conflict_do_update(
+            index_elements=[c.c.curso, c.c.periodo],
+            set_={**{col: c.c[col] + comando.excluded[col] for col in COLUNAS_COORTE},
+                  "atualizado_em": comando.excluded.atualizado_em},
+        ))
+
+    def reconstruir(self, conexao):
+        """Refaz vark_coorte a partir de vark_resultado; devolve quantas turmas."""
+        r, c = self.resultados, self.coortes
+        colunas = [
+            r.c.curso, r.c.periodo, func.count().label("alunos"),
+            *(func.sum(r.c[l.lower()]).label(f"soma_{l.lower()}") for l in LETRAS),
+            *(func.sum(case((r.c.tipo_primario == l, 1), else_=0)).label(f"tipo_{l.lower()}") for l in LETRAS),
+            func.sum(case((r.c.tipo_primario.in_(LETRAS), 0), else_=1)).label("multimodal"),
+        ]
+        linhas = conexao.execute(select(*colunas).group_by(r.c.curso, r.c.periodo)).mappings().all()
+        conexao.execute(delete(c))
+        agora = time.time()
+        if linhas:
+            conexao.execute(insert(c), [dict(linha, atualizado_em=agora) for linha in linhas])
+        self.reiniciar()
+        return len(linhas)
+
+    # ---------------------------------------------------
+    # LEITURA (PAINEL)
+    # ---------------------------------------------------
+    def resumo(self, conectar, curso=None, periodo=None):
+        """(etag, dados) das turmas que passam nos filtros; `conectar()` só é
+        chamado quando o cache em memória expirou."""
+        chave = (curso, periodo)
+        agora = time.monotonic()
+        with self._lock:
+            guardado = self._cache.get(chave)
+        if guardado is not None and guardado[0] > agora:
+            CONSULTAS.inc("hit")
+            return guardado[1], guardado[2]
+        CONSULTAS.inc("miss")
+        c = self.coortes
+        consulta = select(c.c.curso, c.c.periodo, *(c.c[col] for col in COLUNAS_COORTE)).where(c.c.alunos > 0)
+        if curso is not None:
+            consulta = consulta.where(c.c.curso == curso)
+        if periodo is not None:
+            consulta = consulta.where(c.c.periodo == periodo)
+        with conectar() as conexao:
+            linhas = conexao.execute(consulta.order_by(c.c.curso, c.c.periodo)).mappings().all()
+        dados = self._montar(linhas)
+        etag = hashlib.sha256(json.dumps(dados, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        with self._lock:
+            self._cache[chave] = (agora + self.cache_segundos, etag, dados)
+        return etag, dados
+
+    def _montar(self, linhas):
+        turmas, total, ocultas = [], dict.fromkeys(COLUNAS_COORTE, 0), 0
+        for linha in linhas:
+            if linha["alunos"] < self.minimo:
+                ocultas += 1
+                continue
+            turmas.append(dict(_formatar(linha), curso=linha["curso"] or None, periodo=linha["periodo"]))
+            for coluna in COLUNAS_COORTE:
+                total[coluna] += linha[coluna]
+        return {"turmas": turmas, "total": _formatar(total), "ocultas": ocultas, "minimo": self.minimo}
+
+
+def _formatar(linha):
+    alunos = linha["alunos"]
+    return {
+        "alunos": alunos,
+        "media": {l: round(linha[f"soma_{l.lower()}"] / alunos, 2) if alunos else None for l in LETRAS},
+        "tipos": {
+            **{l: linha[f"tipo_{l.lower()}"] for l in LETRAS},
+            "multimodal": linha["multimodal"],
+        },
+    }
+
+
+def init_app(app, resultados, coortes, fuso=None):
+    turmas = VarkTurmas(
+        resultados, coortes, fuso=fuso,
+        cache_segundos=float(os.environ.get("LUMI_VARK_CACHE_SEGUNDOS", "30")),
+        minimo=int(os.environ.get("LUMI_VARK_MINIMO", "5")),
+    )
+    app.extensions["lumi_vark"] = turmas
+    return turmas
@@ -11,6 +11,7 @@ document.addEventListener('DOMContentLoaded', () => {
     // Variáveis para controlar o timer
     let cronometro; // Vai guardar o setInterval
     let segundosTotais;
+    let inicioSessao = null; // Date.now() do início da sessão em andamento
 
     // --- Funções Principais ---
 
@@ -19,6 +20,7 @@ document.addEventListener('DOMContentLoaded', () => {
      */
     function iniciarTimer(minutos) {
         segundosTotais = minutos * 60;
+        inicioSessao = Date.now();
         
         // Esconde a seleção de tempo e o cabeçalho
         botoesTempoContainer.classList.add('escondido');
@@ -37,18 +39,32 @@ document.addEventListener('DOMContentLoaded', () => {
 
             // Quando o tempo acabar
             if (segundosTotais <= 0) {
-                pararTimer();
+                pararTimer(true);
                 // Alerta simples para "desativar notificações" (in-app)
                 alert('Sessão de foco concluída! Ótimo trabalho.');
             }
         }, 1000);
     }
 
+    /**
+     * Registra a sessão (tempo realmente focado) na telemetria de estudo.
+     */
+    function registrarSessao(concluida) {
+        if (inicioSessao === null) return;
+        const segundos = Math.round((Date.now() - inicioSessao) / 1000);
+        if (segundos > 0 && window.LumiTelemetria) {
+            LumiTelemetria.registrar({ tipo: 'foco', t: inicioSessao, segundos, concluida });
+            LumiTelemetria.enviar();
+        }
+        inicioSessao = null;
+    }
+
     /**
      * Para o timer e reseta a interface.
      */
-    function pararTimer() {
+    function pararTimer(concluida = false) {
         clearInterval(cronometro); // Para o setInterval
+        registrarSessao(concluida);
 
         // Mostra a seleção de tempo e o cabeçalho
         botoesTempoContainer.classList.remove('escondido');
@@ -97,6 +113,9 @@ document.addEventListener('DOMContentLoaded', () => {
     });
 
     // 4. Adiciona o clique no botão de parar
-    btnParar.addEventListener('click', pararTimer);
+    btnParar.addEventListener('click', () => pararTimer());
+
+    // 5. Fechar a aba no meio da sessão registra o tempo focado até ali
+    window.addEventListener('pagehide', () => registrarSessao(false));
 
 });
\ No newline at end of file
@@ -56,8 +56,7 @@ document.addEventListener("DOMContentLoaded", () => {
     // ========================================
     async function carregarQuestoes(quantidade) {
         try {
-            // Nota: Se a rota /simulador/iniciar não existir, o código cairá no catch.
-            // Certifique-se que seu app.py tem essa rota ou a rota /api/simulador_config
+            // As questões vêm sem gabarito; os ids ficam na sessão para a correção
             const response = await fetch("/simulador/iniciar", { 
                 method: "POST",
                 headers: {
@@ -70,12 +69,8 @@ document.addEventListener("DOMContentLoaded", () => {
             });
 
             if (!response.ok) {
-                // Tenta fallback para rota de config se a rota de iniciar falhar
-                console.warn("Rota /simulador/iniciar falhou, tentando carregar JSON direto...");
-                const fallback = await fetch("/api/simulador_config");
-                if(!fallback.ok) throw new Error(`Erro HTTP: ${response.status}`);
-                const dataFallback = await fallback.json();
-                return dataFallback.data.questions.slice(0, quantidade); // Retorna array direto
+                const corpo = await response.json().catch(() => ({}));
+                throw new Error(corpo.erro || `Erro HTTP: ${response.status}`);
             }
 
             const data = await response.json();
@@ -84,8 +79,7 @@ document.addEventListener("DOMContentLoaded", () => {
                 throw new Error(data.erro);
             }
 
-            // Garante que retorna o array de questões
-            return data.questoes || data.data?.questions || data;
+            return data.questoes;
 
         } catch (error) {
             console.error("❌ Erro ao carregar questões:", error);
@@ -309,28 +303,30 @@ document.addEventListener("DOMContentLoaded", () => {
 
     async function finalizar() {
         clearInterval(timerInterval);
+        finishBtn.disabled = true;
 
-        // Calcula resultado no front-end mesmo (mais rápido e garantido)
-        let acertos = 0;
-        let gabaritoArr = [];
-
-        QUESTOES.forEach((q, index) => {
-            // Compatibilidade de chaves para 'correct' ou 'correta'
-            const respostaCorreta = q.correct || q.correta; 
-            const respostaUser = RESPOSTAS[index];
-            
-            if (respostaUser === respostaCorreta) {
-                acertos++;
-            }
-
-            gabaritoArr.push({
-                numero: index + 1,
-                correta: respostaCorreta,
-                usuario: respostaUser
+        // A correção é feita no servidor: o navegador não recebe o gabarito,
+        // e é lá que a tentativa entra na telemetria de estudo
+        let resultado;
+        try {
+            const response = await fetch("/simulador/resultado", {
+                method: "POST",
+                headers: { "Content-Type": "application/json" },
+                body: JSON.stringify({ respostas: RESPOSTAS })
             });
-        });
+            resultado = await response.json();
+            if (!response.ok || resultado.erro) {
+                throw new Error(resultado.erro || `Erro HTTP: ${response.status}`);
+            }
+        } catch (error) {
+            console.error("❌ Erro ao corrigir o simulado:", error);
+            alert("Não foi possível corrigir o simulado. Tente novamente.");
+            finishBtn.disabled = false;
+            return;
+        }
 
-        const total = QUESTOES.length;
+        const acertos = resultado.acertos;
+        const total = resultado.total;
         const percentual = ((acertos / total) * 100).toFixed(1);
 
         // Atualizar UI
@@ -338,6 +334,7 @@ document.addEventListener("DOMContentLoaded", () => {
         inicioBox.classList.add("hidden");
         resultadoBox.classList.remove("hidden");
         if(timerBox) timerBox.classList.add("hidden");
+        finishBtn.disabled = false;
 
         document.getElementById("resumo-corretas").textContent = acertos;
         document.getElementById("resumo-total").textContent = total;
@@ -357,13 +354,14 @@ document.addEventListener("DOMContentLoaded", () => {
         const ul = document.getElementById("lista-gabarito");
         ul.innerHTML = "";
         
-        gabaritoArr.forEach((item) => {
+        resultado.gabarito.forEach((item) => {
             const li = document.createElement("li");
-            const acertou = item.usuario === item.correta;
+            const marcada = RESPOSTAS[item.numero - 1];
+            const acertou = marcada === item.correta;
             li.className = acertou ? "correto" : "incorreto";
             
             // Se o usuário não respondeu
-            const respUser = item.usuario ? item.usuario : "Não respondeu";
+            const respUser = marcada ? marcada : "Não respondeu";
 
             li.innerHTML = `
                 <span><strong>Q${item.numero}:</strong> Sua resp: <b>${respUser}</b></span>
@@ -0,0 +1,41 @@
+// Fila de eventos de estudo enviada em lote para /api/telemetria.
+// Os eventos são juntados e mandados com navigator.sendBeacon, que não
+// segura a página e continua funcionando quando a aba é fechada.
+(function () {
+    const ENDPOINT = '/api/telemetria';
+    const MAX_LOTE = 50;          // o servidor aceita até 200 por envio
+    const INTERVALO_MS = 15000;   // envia o que tiver a cada 15 s
+
+    let fila = [];
+
+    function enviar() {
+        if (fila.length === 0) return;
+        const lote = fila.splice(0, MAX_LOTE);
+        const corpo = JSON.stringify({ eventos: lote });
+        const enviado = navigator.sendBeacon
+            && navigator.sendBeacon(ENDPOINT, new Blob([corpo], { type: 'application/json' }));
+        if (!enviado) {
+            fetch(ENDPOINT, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: corpo,
+                keepalive: true,
+            }).catch(() => {});
+        }
+        if (fila.length > 0) enviar();
+    }
+
+    function registrar(evento) {
+        fila.push(Object.assign({ t: Date.now() }, evento));
+        if (fila.length >= MAX_LOTE) enviar();
+    }
+
+    setInterval(enviar, INTERVALO_MS);
+    // 'hidden' cobre troca de aba, minimizar e fechar no celular
+    document.addEventListener('visibilitychange', () => {
+        if (document.visibilityState === 'hidden') enviar();
+    });
+    window.addEventListener('pagehide', enviar);
+
+    window.LumiTelemetria = { registrar, enviar };
+})();
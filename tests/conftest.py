@@ -0,0 +1,92 @@
+# =======================================================
+# CONFIGURAÇÃO COMPARTILHADA DOS TESTES
+# =======================================================
+# O engine do SQLAlchemy é criado na importação do app, então o banco de
+# teste precisa ser definido ANTES do primeiro `import app`. Sem isso os
+# testes rodariam (e fariam drop_all) no lumi_database.db real.
+# =======================================================
+import os
+import tempfile
+
+import pytest
+
+# Arquivo temporário, não ":memory:": o banco em memória é uma conexão só,
+# compartilhada entre threads, e os testes com requisições simultâneas
+# (coalescência do /ask) misturariam as transações umas das outras.
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="lumi-banco-"), "testes.db")
+os.environ["LUMI_LLM_BACKEND"] = "fake"
+# Sessões de teste vão para uma pasta temporária, não para ./flask_session
+os.environ["LUMI_SESSION_DIR"] = tempfile.mkdtemp(prefix="lumi-sessoes-")
+# O log dos testes não deve ir para o lumi.log versionado
+os.environ["LUMI_LOG_ARQUIVO"] = os.path.join(tempfile.mkdtemp(prefix="lumi-log-"), "lumi.log")
+# Temporários dos uploads (instance/uploads_tmp em produção)
+os.environ["LUMI_UPLOAD_TMP"] = tempfile.mkdtemp(prefix="lumi-uploads-")
+# Os testes não geram static/dist (ver lumi/estaticos.py)
+os.environ["LUMI_ASSETS"] = "off"
+# Snapshots dos dados (flask data-compile) numa pasta temporária, não em instance/
+os.environ["LUMI_SNAPSHOT_DIR"] = tempfile.mkdtemp(prefix="lumi-snapshots-")
+# Bytecode dos templates (instance/jinja_cache em produção)
+os.environ["LUMI_JINJA_CACHE_DIR"] = tempfile.mkdtemp(prefix="lumi-jinja-")
+# Telemetria gravada na própria requisição (sem a thread de lote)
+os.environ["LUMI_TELEMETRIA_INTERVALO"] = "0"
+# Hash de senhas na própria thread (o pool de processos tem teste próprio)
+os.environ["LUMI_SENHAS_PROCESSOS"] = "0"
+# Retenção do chat sem thread e sem pausa entre lotes (/limpar apaga na hora)
+os.environ["LUMI_RETENCAO_INTERVALO"] = "0"
+os.environ["LUMI_RETENCAO_PAUSA"] = "0"
+# Uso de tokens do LLM gravado na própria requisição (sem a thread de lote)
+os.environ["LUMI_LLM_USO_INTERVALO"] = "0"
+
+
+# =======================================================
+# BANCO DE TESTE E CLIENTE LOGADO
+# =======================================================
+# Os módulos mudam quem é cadastrado sobrescrevendo a fixture `alunos` (e
+# `logado`, para outro aluno ou nenhum); um teste só pode usar
+# @pytest.mark.parametrize("alunos", [...]). O app só é importado dentro
+# das fixtures, depois das variáveis acima.
+SENHA = "123456"
+
+
+@pytest.fixture
+def alunos():
+    """Alunos cadastrados pelo `banco`; cada item vai direto para User(...)."""
+    return [{"username": "aluno", "email": "aluno@teste.com", "matricula": "T1"}]
+
+
+@pytest.fixture
+def logado(alunos):
+    """Identificador de quem faz login no `client` (None: ninguém)."""
+    return alunos[0]["email"] if alunos else None
+
+
+@pytest.fixture
+def banco(alunos):
+    """Tabelas criadas com os `alunos` cadastrados; tudo é apagado no fim."""
+    from app import app, db, User
+
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+        for dados in alunos:
+            user = User(**dados)
+            user.set_password(SENHA)
+            db.session.add(user)
+        db.session.commit()
+    yield db
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(banco, logado):
+    """Cliente de teste do Flask com `logado` já autenticado."""
+    from app import app
+
+    with app.test_client() as client:
+        if logado:
+            # Segue o redirect, como o navegador: a página consome o flash do login
+            client.post('/login', data={'login_identifier': logado, 'password': SENHA},
+                        follow_redirects=True)
+        yield client
@@ -0,0 +1,36 @@
+# =======================================================
+# TESTES – SUÍTE DE BENCHMARKS
+# =======================================================
+# Garante que os benchmarks continuam executáveis (uma rodada cada),
+# sem medir desempenho de verdade.
+# =======================================================
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+sys.path.append(str(Path(__file__).resolve().parents[1] / "benchmarks"))
+
+import app as lumi_app
+import bench_lumi
+
+
+def test_microbenchmarks_executam():
+    resultados = bench_lumi.executar(
+        lumi_app, rodadas_min=1, tempo_min=0, incluir_e2e=False, saida=lambda _: None
+    )
+    assert set(resultados) == {f"micro/{nome}" for nome in bench_lumi.MICRO}
+    assert all(r["rodadas"] >= 1 for r in resultados.values())
+
+
+def test_e2e_nivel_pequeno_executa():
+    try:
+        resultados = bench_lumi.executar(
+            lumi_app, niveis=(10,), rodadas_min=1, tempo_min=0, saida=lambda _: None
+        )
+    finally:
+        with lumi_app.app.app_context():
+            lumi_app.db.session.remove()
+            lumi_app.db.drop_all()
+    assert "e2e/10/index" in resultados
+    assert "e2e/10/ask" in resultados
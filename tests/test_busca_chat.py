@@ -0,0 +1,68 @@
+# =======================================================
+# TESTES – BUSCA NO HISTÓRICO DO CHAT
+# =======================================================
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app import app, db, User, ChatHistory, salvar_mensagem_no_banco
+
+
+@pytest.fixture
+def alunos():
+    return [{'username': email, 'email': email, 'matricula': matricula}
+            for email, matricula in (('aluno@teste.com', 'B1'), ('outro@teste.com', 'B2'))]
+
+
+def _ids():
+    with app.app_context():
+        return [u.id for u in User.query.order_by(User.id)]
+
+
+def test_busca_ignora_acentos_e_destaca_trecho(client):
+    aluno, _ = _ids()
+    with app.app_context():
+        salvar_mensagem_no_banco(aluno, 'model', 'A prova de Cálculo I é na semana 12.')
+        salvar_mensagem_no_banco(aluno, 'model', 'Algoritmos usa Python.')
+
+    dados = client.get('/api/chat/busca?q=calculo').get_json()
+    assert dados['success']
+    assert len(dados['resultados']) == 1
+    assert '<mark>Cálculo</mark>' in dados['resultados'][0]['trecho']
+
+
+def test_busca_so_retorna_mensagens_do_proprio_usuario(client):
+    aluno, outro = _ids()
+    with app.app_context():
+        salvar_mensagem_no_banco(outro, 'user', 'segredo sobre cálculo')
+    assert client.get('/api/chat/busca?q=calculo').get_json()['resultados'] == []
+
+
+def test_busca_por_prefixo_e_escape_html(client):
+    aluno, _ = _ids()
+    with app.app_context():
+        salvar_mensagem_no_banco(aluno, 'user', '<script>alert(1)</script> estruturas de dados')
+    trecho = client.get('/api/chat/busca?q=estrut').get_json()['resultados'][0]['trecho']
+    assert '<script>' not in trecho
+    assert '<mark>estruturas</mark>' in trecho
+
+
+def test_limpar_remove_do_indice_e_reindex_recupera(client):
+    aluno, _ = _ids()
+    with app.app_context():
+        salvar_mensagem_no_banco(aluno, 'user', 'matrícula trancada')
+    client.get('/limpar')
+    assert client.get('/api/chat/busca?q=matricula').get_json()['resultados'] == []
+
+    # Linhas inseridas sem passar pelo salvar_mensagem_no_banco só aparecem após o backfill
+    with app.app_context():
+        db.session.add(ChatHistory(user_id=aluno, role='user', content='rematrícula online'))
+        db.session.commit()
+    assert client.get('/api/chat/busca?q=rematricula').get_json()['resultados'] == []
+    result = app.test_cli_runner().invoke(args=['chat-reindex'])
+    assert result.exit_code == 0
+    assert len(client.get('/api/chat/busca?q=rematricula').get_json()['resultados']) == 1
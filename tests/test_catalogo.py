@@ -0,0 +1,110 @@
+# =======================================================
+# TESTES – MODELOS COMPACTOS (simulador, matriz, calendário)
+# =======================================================
+
+import json
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app import app, carregar_banco_questoes, carregar_calendario, carregar_matriz
+from lumi import catalogo
+
+
+def test_objetos_sem_dict_e_textos_repetidos_compartilhados():
+    banco = carregar_banco_questoes()
+    questoes = banco.questoes()
+    assert not hasattr(questoes[0], '__dict__')
+    # Mesma tupla de letras e mesma string de gabarito em todas as questões
+    assert all(q.letras is questoes[0].letras for q in questoes)
+    mesmas_respostas = [q for q in questoes if q.correta == questoes[0].correta]
+    assert all(q.correta is questoes[0].correta for q in mesmas_respostas)
+
+    salas = [d.sala for p in carregar_matriz() for d in p.disciplinas if d.sala == 'H103']
+    assert len(salas) > 1 and all(s is salas[0] for s in salas)
+
+
+def test_cache_e_reconstruido_quando_arquivo_muda(tmp_path):
+    caminho = tmp_path / 'calendario.json'
+    caminho.write_text('[{"data_inicio": "2025-08-04", "descricao": "Aulas"}]', encoding='utf-8')
+    eventos = catalogo.carregar(str(caminho), catalogo.construir_calendario)
+    assert catalogo.carregar(str(caminho), catalogo.construir_calendario) is eventos
+    assert eventos[0].to_dict()['mes_curto'] == 'AGO'
+
+    caminho.write_text('[{"data_inicio": "2025-09-01", "descricao": "Provas"}, '
+                       '{"data_inicio": "2025-08-01", "descricao": "Início"}]', encoding='utf-8')
+    catalogo.invalidar(str(caminho))
+    novos = catalogo.carregar(str(caminho), catalogo.construir_calendario)
+    assert [e.titulo for e in novos] == ['Início', 'Provas']
+
+
+def test_simulador_guarda_so_ids_na_sessao_e_corrige(client):
+    resp = client.post('/simulador/iniciar', json={'quantidade': 5, 'disciplina': 'FMC'})
+    assert len(resp.get_json()['questoes']) == 5
+    with client.session_transaction() as sessao:
+        ids = sessao['simulador_questoes']
+    assert all(isinstance(i, str) and i.startswith('FMC') for i in ids)
+
+    banco = carregar_banco_questoes()
+    respostas = {str(i): banco.por_id[qid].correta for i, qid in enumerate(ids)}
+    resultado = client.post('/simulador/resultado', json={'respostas': respostas}).get_json()
+    assert resultado['acertos'] == 5 and resultado['total'] == 5
+
+
+def test_calendario_renderiza_eventos_do_cache(client):
+    resp = client.get('/calendario')
+    assert resp.status_code == 200
+    assert f'"date": "{carregar_calendario()[0].data}"'.encode() in resp.data
+
+
+def _copiar_fontes(pasta):
+    for nome in ('simulador.json', 'matriz.json', 'calendario.json'):
+        (pasta / nome).write_bytes((Path(__file__).resolve().parents[1] / nome).read_bytes())
+
+
+def test_snapshot_compilado_e_usado_e_desatualizado_cai_para_json(tmp_path):
+    _copiar_fontes(tmp_path)
+    assert catalogo.compilar(str(tmp_path), str(tmp_path)) == {'simulador': [], 'matriz': [], 'calendario': []}
+
+    caminho = str(tmp_path / 'calendario.json')
+    snapshot = catalogo.caminho_snapshot(catalogo.CALENDARIO, str(tmp_path))
+    do_json = catalogo.CALENDARIO(json.loads((tmp_path / 'calendario.json').read_text(encoding='utf-8')))
+    do_snapshot = catalogo.CALENDARIO.montar(catalogo.ler_snapshot(catalogo.CALENDARIO, caminho, snapshot))
+    # Eventos sem id no JSON ganham um uuid a cada normalização
+    sem_id = lambda eventos: [{**e.to_dict(), 'id': None} for e in eventos]
+    assert sem_id(do_snapshot) == sem_id(do_json)
+
+    banco = catalogo.SIMULADOR.montar(catalogo.ler_snapshot(
+        catalogo.SIMULADOR, str(tmp_path / 'simulador.json'),
+        catalogo.caminho_snapshot(catalogo.SIMULADOR, str(tmp_path)),
+    ))
+    assert banco.to_dict() == carregar_banco_questoes().to_dict()
+
+    # Mesmo conteúdo com outro mtime (ex.: git checkout) continua valendo
+    os.utime(caminho, ns=(0, 1))
+    assert catalogo.ler_snapshot(catalogo.CALENDARIO, caminho, snapshot) is not None
+    # Conteúdo alterado: snapshot desatualizado
+    (tmp_path / 'calendario.json').write_text('[]', encoding='utf-8')
+    assert catalogo.ler_snapshot(catalogo.CALENDARIO, caminho, snapshot) is None
+
+
+def test_esquema_invalido_nao_gera_snapshot(tmp_path):
+    _copiar_fontes(tmp_path)
+    (tmp_path / 'calendario.json').write_text(
+        '[{"data_inicio": "2025-13-01", "descricao": "X"}, {"descricao": "Sem data"}]', encoding='utf-8'
+    )
+    erros = catalogo.compilar(str(tmp_path), str(tmp_path))['calendario']
+    assert any('data_inicio' in e and 'ausente' in e for e in erros)
+    assert not os.path.exists(catalogo.caminho_snapshot(catalogo.CALENDARIO, str(tmp_path)))
+
+    questao = {'id': 'Q1', 'stem': 'Pergunta', 'options': {'A': 'x', 'B': 'y'}, 'correct': 'C'}
+    erros = catalogo.SIMULADOR.validar({'pools': [{'discipline': 'D', 'questions': [questao, questao]}]})
+    assert any('correct' in e for e in erros) and any('repetido' in e for e in erros)
+
+
+def test_comando_data_compile():
+    resultado = app.test_cli_runner().invoke(args=['data-compile'])
+    assert resultado.exit_code == 0, resultado.output
+    assert os.path.exists(catalogo.caminho_snapshot(catalogo.SIMULADOR, os.environ['LUMI_SNAPSHOT_DIR']))
@@ -0,0 +1,107 @@
+# =======================================================
+# TESTES – SINGLE-FLIGHT DAS CHAMADAS AO LLM
+# =======================================================
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import app as lumi_app
+from app import app, User, ChatHistory
+from lumi import coalescencia
+
+
+def test_chave_ignora_caixa_acentos_espacos_e_pontuacao_final():
+    a = coalescencia.chave_pergunta("Quando é a  semana de provas?", "v1")
+    assert a == coalescencia.chave_pergunta("quando e a semana de provas", "v1")
+    assert a != coalescencia.chave_pergunta("quando e a semana de provas", "v2")
+
+
+def test_chamadas_simultaneas_dividem_resultado_e_erro():
+    grupo = coalescencia.GrupoUnico()
+    liberar = threading.Event()
+    chamadas = []
+
+    def lenta():
+        chamadas.append(1)
+        liberar.wait(5)
+        return "resposta"
+
+    resultados = []
+    threads = [threading.Thread(target=lambda: resultados.append(grupo.executar("k", lenta))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    while len(chamadas) < 1 or grupo._chamadas["k"].compartilhada < 4:
+        time.sleep(0.001)
+    liberar.set()
+    for t in threads:
+        t.join()
+    assert len(chamadas) == 1
+    assert sorted(c for _, c in resultados) == [False, True, True, True, True]
+    assert {r for r, _ in resultados} == {"resposta"}
+
+    # Terminada a chamada a chave é liberada; erros também são compartilhados
+    def falha():
+        raise RuntimeError("quota")
+
+    with pytest.raises(RuntimeError):
+        grupo.executar("k", falha)
+    assert grupo.executar("k", lambda: "nova") == ("nova", False)
+
+
+@pytest.fixture
+def alunos():
+    return [{'username': f'Aluno {i}', 'email': f'sf{i}@teste.com', 'matricula': f'SF{i}'} for i in range(3)]
+
+
+@pytest.fixture
+def clientes(banco, alunos):
+    lista = []
+    for aluno in alunos:
+        cliente = app.test_client()
+        cliente.post('/login', data={'login_identifier': aluno['email'], 'password': '123456'},
+                     follow_redirects=True)
+        lista.append(cliente)
+    return lista
+
+
+def test_ask_simultaneos_chamam_o_llm_uma_vez(clientes, monkeypatch):
+    original = lumi_app.perguntar_ao_modelo
+    chegaram = threading.Event()
+
+    def lenta(texto, modelo=None):
+        chegaram.set()
+        time.sleep(0.5)
+        return original(texto, modelo)
+
+    monkeypatch.setattr(lumi_app, "perguntar_ao_modelo", lenta)
+    chamadas_antes = lumi_app.model.chamadas
+    respostas = [None] * len(clientes)
+
+    def perguntar(i, texto):
+        respostas[i] = clientes[i].post('/ask', json={'pergunta': texto}).get_json()['resposta']
+
+    threads = [threading.Thread(target=perguntar, args=(0, 'Qual a sala de Redes?'))]
+    threads[0].start()
+    chegaram.wait(5)
+    threads += [
+        threading.Thread(target=perguntar, args=(i, texto))
+        for i, texto in ((1, 'qual a sala de redes'), (2, 'QUAL A SALA DE REDES?'))
+    ]
+    for t in threads[1:]:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert lumi_app.model.chamadas - chamadas_antes == 1
+    assert len(set(respostas)) == 1
+    with app.app_context():
+        # Cada aluno tem a sua pergunta e a sua resposta no histórico
+        for i in range(3):
+            user = User.query.filter_by(matricula=f'SF{i}').one()
+            assert ChatHistory.query.filter_by(user_id=user.id).count() == 2
@@ -0,0 +1,82 @@
+# =======================================================
+# TESTES – CONSUMO DE TOKENS DO LLM E COTAS
+# =======================================================
+
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app import app, UsoLLM, UsoLLMHora, consumo, CONTEXTO_INICIAL
+from lumi import consumo_llm
+
+
+@pytest.fixture
+def client(client):
+    consumo.reiniciar()
+    yield client
+    consumo.cota_aluno = consumo.cota_dia = 0
+    consumo.reiniciar()
+
+
+def test_chamada_gera_linha_e_total_da_hora(client):
+    client.post('/ask', json={'pergunta': 'Quando começam as provas?'})
+    client.post('/ask', json={'pergunta': 'E as férias?'})
+    with app.app_context():
+        chamadas = UsoLLM.query.all()
+        horas = UsoLLMHora.query.all()
+        assert len(chamadas) == 2 and all(c.estimado == 1 for c in chamadas)
+        # Backend fake: o prompt estimado inclui todo o system instruction
+        assert all(c.prompt_tokens > consumo_llm.estimar_tokens(CONTEXTO_INICIAL) for c in chamadas)
+        assert len(horas) == 1 and horas[0].chamadas == 2
+        assert horas[0].prompt_tokens == sum(c.prompt_tokens for c in chamadas)
+
+    dados = client.get('/api/llm/uso').get_json()
+    assert dados['tokens_hoje'] == horas[0].prompt_tokens + horas[0].output_tokens
+    assert dados['cota'] is None
+
+
+def test_cota_do_aluno_recusa_com_429(client):
+    consumo.cota_aluno = 1
+    primeira = client.post('/ask', json={'pergunta': 'Qual a sala de Redes?'})
+    assert primeira.status_code == 200
+    segunda = client.post('/ask', json={'pergunta': 'E a de Cálculo?'})
+    assert segunda.status_code == 429
+    assert segunda.get_json()['cota'] == 'aluno'
+    with app.app_context():
+        assert UsoLLM.query.count() == 1
+
+    # Um processo novo (outro worker) lê o gasto do dia do banco
+    consumo.reiniciar()
+    assert client.post('/ask', json={'pergunta': 'E a de Física?'}).status_code == 429
+
+
+def test_falha_ao_reler_as_bases_nao_conta_o_lote_duas_vezes(client, monkeypatch):
+    consumo.cota_aluno = consumo.cota_dia = 10_000
+    assert consumo.usado_hoje(1) == (0, 0)
+    totais_do_banco = consumo._totais_do_banco
+    monkeypatch.setattr(consumo, "_totais_do_banco", lambda *args: 1 / 0)
+    consumo.registrar(1, consumo_llm.Uso(100, 0, 20, False), 0.5)
+    with app.app_context():
+        assert UsoLLM.query.count() == 1  # gravou; só a releitura falhou
+
+    monkeypatch.setattr(consumo, "_totais_do_banco", totais_do_banco)
+    assert consumo.usado_hoje(1) == (120, 120)
+    consumo.registrar(1, consumo_llm.Uso(100, 0, 20, False), 0.5)
+    assert consumo.usado_hoje(1) == (240, 240)
+
+
+def test_uso_do_gemini_e_custo_por_secao():
+    meta = SimpleNamespace(prompt_token_count=1200, cached_content_token_count=1000, candidates_token_count=80)
+    assert consumo_llm.medir_uso(SimpleNamespace(usage_metadata=meta), 'x', 'y') == (1200, 1000, 80, False)
+    assert consumo_llm.medir_uso(SimpleNamespace(), 'uma pergunta', 'ok').estimado
+
+    secoes = [('base', 'palavra ' * 300), ('flashcards', 'cartao ' * 900)]
+    totais = {'chamadas': 10, 'prompt_tokens': 25_000}  # 2400 de contexto + 100 da pergunta
+    linhas = {nome: (por_chamada, fracao) for nome, por_chamada, fracao, _ in consumo_llm.custo_por_secao(secoes, totais)}
+    assert linhas['flashcards'][0] == 3 * linhas['base'][0] == 1800
+    assert linhas['pergunta do aluno'][0] == 100
+    assert abs(sum(f for _, f in linhas.values()) - 100) < 0.01
@@ -0,0 +1,120 @@
+# =======================================================
+# TESTES – DADOS POR CURSO E CACHE LRU
+# =======================================================
+
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app import app, dados_cursos, contexto_do_curso, CONTEXTO_INICIAL
+from lumi import cursos
+
+MATRIZ_CURSO = [{"periodo": "1º", "disciplinas": [
+    {"nome": "ANATOMIA I", "professor": "Dra. Ana", "dia": "Segunda-feira", "horario": "19h às 20h40", "sala": "M201"},
+    {"nome": "FISIOLOGIA", "professor": "Dr. Caio", "dia": "Segunda-feira", "horario": "20h às 21h", "sala": "M202"},
+]}]
+
+
+@pytest.fixture
+def pasta_cursos(tmp_path, monkeypatch):
+    curso = tmp_path / "medicina"
+    curso.mkdir()
+    (curso / "matriz.json").write_text(json.dumps(MATRIZ_CURSO), encoding="utf-8")
+    (curso / "informacoes.txt").write_text("Você é a Lumi do curso de Medicina.", encoding="utf-8")
+    monkeypatch.setattr(dados_cursos, "pasta_cursos", str(tmp_path))
+    dados_cursos.reiniciar()
+    yield tmp_path
+    dados_cursos.reiniciar()
+
+
+@pytest.fixture
+def alunos():
+    return [{'username': email, 'email': email, 'matricula': email, 'curso': curso}
+            for email, curso in (('med@teste.com', 'medicina'), ('raiz@teste.com', None))]
+
+
+@pytest.fixture
+def logado():
+    return None
+
+
+@pytest.fixture
+def client(client, pasta_cursos):
+    return client
+
+
+def _logar(client, email):
+    client.get('/logout')
+    client.post('/login', data={'login_identifier': email, 'password': '123456'})
+
+
+def test_cada_curso_ve_a_propria_grade_e_contexto(client):
+    _logar(client, 'med@teste.com')
+    conflitos = client.get('/api/horarios/conflitos?periodo=1').get_json()['conflitos']
+    assert [[a['disciplina'], b['disciplina']] for a, b in conflitos] == [['ANATOMIA I', 'FISIOLOGIA']]
+
+    with app.test_request_context():
+        contexto = contexto_do_curso('medicina')
+        assert contexto.texto.startswith("Você é a Lumi do curso de Medicina.")
+        assert "ANATOMIA I" in contexto.modelo.system_instruction
+        # Sem calendário próprio: o do curso vem da raiz
+        assert dict(contexto.secoes)["calendário"] in CONTEXTO_INICIAL
+        assert contexto_do_curso('medicina') is contexto
+        assert contexto_do_curso('sem-pasta').texto == CONTEXTO_INICIAL
+
+    _logar(client, 'raiz@teste.com')
+    conflitos = client.get('/api/horarios/conflitos?periodo=1').get_json()['conflitos']
+    assert all('ANATOMIA I' not in (a['disciplina'], b['disciplina']) for a, b in conflitos)
+
+
+def test_salvar_evento_cria_o_calendario_do_curso(client, pasta_cursos):
+    raiz = Path(dados_cursos.pasta_raiz, 'calendario.json').read_bytes()
+    _logar(client, 'med@teste.com')
+    resp = client.post('/save_calendar_event', json={'date': '2025-11-03', 'title': 'Semana de Anatomia'})
+    assert resp.get_json()['success']
+    eventos = json.loads((pasta_cursos / 'medicina' / 'calendario.json').read_text(encoding='utf-8'))
+    assert eventos[-1]['descricao'] == 'Semana de Anatomia'
+    assert Path(dados_cursos.pasta_raiz, 'calendario.json').read_bytes() == raiz
+
+
+def test_faq_do_curso_vale_para_pagina_busca_chat_e_etag(client, pasta_cursos):
+    item = {"pergunta": "Onde fica o laboratório de anatomia?", "resposta": "No Bloco M, sala 12."}
+    arquivo = pasta_cursos / 'medicina' / 'faq.json'
+    arquivo.write_text(json.dumps([item]), encoding='utf-8')
+
+    _logar(client, 'med@teste.com')
+    client.get('/')  # consome o flash do login (página com flash não tem ETag)
+    pagina = client.get('/faq')
+    assert 'laboratório de anatomia' in pagina.get_data(as_text=True)
+    busca = client.get('/api/faq/busca?q=anatomia').get_json()['resultados']
+    assert [r['resposta'] for r in busca] == [item['resposta']]
+    resposta = client.post('/ask', json={'pergunta': item['pergunta']}).get_json()
+    assert resposta['fonte'] == 'faq' and resposta['resposta'] == item['resposta']
+
+    # O ETag acompanha o arquivo que a página mostra
+    item['resposta'] = 'No Bloco N, sala 3.'
+    arquivo.write_text(json.dumps([item]), encoding='utf-8')
+    os.utime(arquivo, ns=(0, os.stat(arquivo).st_mtime_ns + 10**9))
+    nova = client.get('/faq', headers={'If-None-Match': pagina.headers['ETag']})
+    assert nova.status_code == 200 and 'Bloco N' in nova.get_data(as_text=True)
+
+    _logar(client, 'raiz@teste.com')
+    assert 'laboratório de anatomia' not in client.get('/faq').get_data(as_text=True)
+
+
+def test_lru_despeja_os_menos_usados_pelo_tamanho():
+    cache = cursos.CacheLRU(limite_bytes=3 * cursos.tamanho_aproximado("x" * 1000) + 100)
+    for chave in "abc":
+        cache.obter(chave, 1, lambda: "x" * 1000)
+    cache.obter("a", 1, lambda: pytest.fail("'a' ainda devia estar no cache"))
+    cache.obter("d", 1, lambda: "y" * 1000)  # despeja "b", o menos usado
+    assert cache.estatisticas()["entradas"] == 3
+    recarregadas = []
+    cache.obter("b", 1, lambda: recarregadas.append("b") or "x" * 1000)
+    cache.obter("a", 2, lambda: recarregadas.append("a") or "z" * 1000)  # versão nova
+    assert recarregadas == ["b", "a"]
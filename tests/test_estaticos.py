@@ -0,0 +1,87 @@
+# =======================================================
+# TESTES – PIPELINE DE ARQUIVOS ESTÁTICOS
+# =======================================================
+
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from flask import Flask, url_for
+from PIL import Image
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from lumi import estaticos
+
+
+@pytest.fixture
+def app_estatico(tmp_path, monkeypatch):
+    pasta = tmp_path / "static"
+    (pasta / "css").mkdir(parents=True)
+    (pasta / "uploads").mkdir()
+    (pasta / "css" / "app.css").write_text("body { color: #333; }\n" * 100)
+    Image.new("RGB", (600, 300), "purple").save(pasta / "logo.png")
+    Image.new("RGB", (10, 10)).save(pasta / "uploads" / "avatar.png")
+
+    monkeypatch.setenv("LUMI_ASSETS", "auto")
+    app = Flask(__name__, static_folder=str(pasta))
+    estaticos.init_app(app)
+    return app
+
+
+def test_url_for_aponta_para_arquivo_com_hash(app_estatico):
+    with app_estatico.test_request_context():
+        url_css = url_for("static", filename="css/app.css")
+        url_logo = url_for("static", filename="logo.png", largura=100)
+        url_upload = url_for("static", filename="uploads/avatar.png", largura=100)
+    assert url_css.startswith("/static/dist/css/app.") and url_css.endswith(".css")
+    assert url_logo.endswith(".w128.png")
+    # Uploads ficam fora do pipeline e a largura não vira query string
+    assert url_upload == "/static/uploads/avatar.png"
+
+
+def test_serve_variante_pre_comprimida_com_cache_imutavel(app_estatico):
+    with app_estatico.test_request_context():
+        url_css = url_for("static", filename="css/app.css")
+    client = app_estatico.test_client()
+    resp = client.get(url_css, headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert resp.mimetype == "text/css"
+    assert resp.headers["Cache-Control"] == estaticos.CACHE_IMUTAVEL
+    assert "Accept-Encoding" in resp.headers["Vary"]
+    assert client.get(url_css).headers.get("Content-Encoding") is None
+
+
+def test_negocia_formato_de_imagem_pelo_accept(app_estatico):
+    with app_estatico.test_request_context():
+        url_logo = url_for("static", filename="logo.png", largura=128)
+    client = app_estatico.test_client()
+    assert client.get(url_logo, headers={"Accept": "image/webp,*/*"}).mimetype == "image/webp"
+    assert client.get(url_logo, headers={"Accept": "*/*"}).mimetype == "image/png"
+
+
+def test_reconstrucao_incremental(app_estatico):
+    pasta = app_estatico.static_folder
+    assert estaticos.construir_manifesto(pasta)["processados"] == 0
+    Path(pasta, "css", "app.css").write_text("body { color: red; }\n" * 100)
+    manifesto = estaticos.construir_manifesto(pasta)
+    assert manifesto["processados"] == 1
+    # A versão antiga é removida de dist/
+    assert len(list(Path(pasta, "dist", "css").glob("app.*.css"))) == 1
+
+
+def test_construcoes_simultaneas_nao_apagam_o_trabalho_uma_da_outra(tmp_path):
+    pasta = tmp_path / "static"
+    pasta.mkdir()
+    for i in range(20):
+        (pasta / f"pagina{i}.css").write_text(f".c{i} {{ color: #{i:03}; }}\n" * 100)
+
+    # Workers sem preload subindo juntos sobre a mesma pasta
+    with ThreadPoolExecutor(4) as executor:
+        manifestos = list(executor.map(lambda _: estaticos.construir_manifesto(str(pasta)), range(4)))
+    assert sum(m["processados"] for m in manifestos) == 20  # só o primeiro gerou
+    assert all(m["arquivos"] == manifestos[0]["arquivos"] for m in manifestos)
+    for entrada in manifestos[0]["arquivos"].values():
+        assert all((pasta / url).exists() for url in estaticos._urls_da_entrada(entrada))
+    assert sorted(p.name for p in (pasta / "dist").glob("manifest*")) == ["manifest.json"]
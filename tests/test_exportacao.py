@@ -0,0 +1,107 @@
+# =======================================================
+# TESTES – EXPORTAÇÃO DOS DADOS DO ALUNO
+# =======================================================
+
+import hashlib
+import io
+import json
+import sys
+import zipfile
+from datetime import date, datetime
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app import (
+    app, db, UserFlashcard, ChatHistory, ChatArquivo, ChatLimpeza, EventoEstudo, exportador,
+)
+from lumi import retencao, telemetria
+
+
+@pytest.fixture
+def alunos():
+    return [{'username': f'Aluno {i}', 'email': f'aluno{i}@teste.com', 'matricula': f'M{i}', 'curso': 'medicina'}
+            for i in (1, 2)]
+
+
+def _ndjson(texto):
+    return [json.loads(linha) for linha in texto.splitlines()]
+
+
+def test_zip_e_ndjson_trazem_os_dados_do_aluno(client):
+    client.post('/save_vark_result', json={'scores': {'V': 8, 'A': 2, 'R': 3, 'K': 1}, 'primaryType': 'V'})
+    with app.app_context():
+        codificacao, dados, _ = retencao.compactar([[1, 'user', 'mensagem arquivada', '2024-01-10T12:00:00']])
+        db.session.add(ChatArquivo(user_id=1, inicio=datetime(2024, 1, 10), fim=datetime(2024, 1, 10),
+                                   mensagens=1, codificacao=codificacao, dados=dados))
+        for conteudo in ('limpa pelo aluno', 'oi', 'olá!'):
+            db.session.add(ChatHistory(user_id=1, role='user', content=conteudo))
+        db.session.add(ChatHistory(user_id=2, role='user', content='de outro aluno'))
+        db.session.add(ChatLimpeza(user_id=1, ate_id=1))
+        db.session.add(UserFlashcard(user_id=1, materia='Anatomia', pergunta='P?', resposta='R'))
+        db.session.add(EventoEstudo(user_id=1, dia=date(2025, 3, 1), tipo=telemetria.SIMULADOR,
+                                    momento=1740830400, valor=7, extra=10))
+        db.session.commit()
+
+    resposta = client.get('/api/exportar')
+    assert resposta.is_streamed and resposta.mimetype == 'application/zip'
+    assert 'lumi-M1.zip' in resposta.headers['Content-Disposition']
+    arquivo = zipfile.ZipFile(io.BytesIO(resposta.get_data()))
+    assert sorted(arquivo.namelist()) == [
+        'chat.ndjson', 'estudo.ndjson', 'flashcards.ndjson', 'perfil.json', 'vark.json',
+    ]
+    perfil = json.loads(arquivo.read('perfil.json'))
+    assert perfil['matricula'] == 'M1' and 'password_hash' not in perfil
+    assert json.loads(arquivo.read('vark.json'))['pontos'] == {'V': 8, 'A': 2, 'R': 3, 'K': 1}
+    chat = _ndjson(arquivo.read('chat.ndjson').decode('utf-8'))
+    assert [(m['content'], m['arquivada']) for m in chat] == [
+        ('mensagem arquivada', True), ('oi', False), ('olá!', False),
+    ]
+    estudo = _ndjson(arquivo.read('estudo.ndjson').decode('utf-8'))
+    assert estudo == [{'tipo': 'simulador', 'momento': '2025-03-01T12:00:00+00:00', 'acertos': 7, 'questoes': 10}]
+
+    linhas = _ndjson(client.get('/api/exportar?formato=ndjson').get_data(as_text=True))
+    assert [l['secao'] for l in linhas] == ['perfil', 'vark', 'flashcards', 'chat', 'chat', 'chat', 'estudo']
+    assert client.get('/api/exportar?formato=csv').status_code == 400
+
+
+def test_historico_grande_sai_em_pedacos_do_mesmo_tamanho(client, monkeypatch):
+    monkeypatch.setattr(exportador, 'bloco', 8 * 1024)
+    monkeypatch.setattr(exportador, 'lote', 100)
+    with app.app_context():
+        db.session.execute(db.insert(ChatHistory), [
+            {'user_id': 1, 'role': 'model', 'content': hashlib.sha256(str(i).encode()).hexdigest() * 2}
+            for i in range(5000)
+        ])
+        db.session.commit()
+
+    resposta = client.get('/api/exportar', buffered=False)
+    pedacos = list(resposta.response)
+    resposta.close()
+    # O tamanho de cada pedaço depende do bloco (mais o que o zlib segura
+    # antes de fechar um bloco deflate), não do tamanho do histórico
+    assert len(pedacos) > 10
+    assert max(len(p) for p in pedacos) < exportador.bloco + 64 * 1024
+    chat = zipfile.ZipFile(io.BytesIO(b''.join(pedacos))).read('chat.ndjson').decode('utf-8')
+    assert len(chat.splitlines()) == 5000
+
+
+def test_exportacao_em_lote_grava_um_zip_por_aluno_e_retoma(client, tmp_path):
+    pasta = tmp_path / 'exportacao'
+    pasta.mkdir()
+    (pasta / 'M2.zip').write_bytes(b'ja exportado')
+    runner = app.test_cli_runner()
+
+    resultado = runner.invoke(args=['users-export', str(pasta), '--curso', 'medicina'])
+    assert resultado.exit_code == 0, resultado.output
+    assert '1 exportado(s), 1 já existente(s), 0 falha(s)' in resultado.output
+    perfil = json.loads(zipfile.ZipFile(pasta / 'M1.zip').read('perfil.json'))
+    assert perfil['email'] == 'aluno1@teste.com'
+    assert sorted(p.name for p in pasta.iterdir()) == ['M1.zip', 'M2.zip']
+
+    (pasta / 'M2.zip').unlink()
+    resultado = runner.invoke(args=['users-export', str(pasta), '--matricula', 'M2', '--concorrencia', '2'])
+    assert '1 exportado(s), 0 já existente(s)' in resultado.output
+    assert zipfile.ZipFile(pasta / 'M2.zip').testzip() is None
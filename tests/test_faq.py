@@ -0,0 +1,84 @@
+# =======================================================
+# TESTES – BUSCA NO FAQ
+# =======================================================
+
+import json
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app import app, ChatHistory, CAMINHO_FAQ, model
+from lumi import faq
+
+ITENS = [
+    {"pergunta": "Qual é o procedimento para trancar a matrícula?", "resposta": "Abra um requerimento no Portal."},
+    {"pergunta": "Quais são os horários da biblioteca?", "resposta": "Das 7h30 às 22h."},
+    {"pergunta": "Como funciona o acesso ao Wi-Fi do campus?", "resposta": "Use seu RA como login."},
+]
+
+
+def test_indice_ignora_acentos_e_tolera_erros():
+    indice = faq.IndiceFAQ(ITENS)
+    assert indice.buscar("matricula")[0][0] == 0
+    assert indice.buscar("bibliotca")[0][0] == 1
+    assert indice.buscar("wifi")[0][0] == 2
+    assert indice.buscar("xyzw") == []
+
+
+def test_pergunta_exata_ignora_pontuacao_e_palavras_vazias():
+    indice = faq.IndiceFAQ(ITENS)
+    assert indice.exata("qual o procedimento pra trancar matricula") == 0
+    assert indice.exata("trancar") is None
+
+
+def test_pergunta_exata_distingue_interrogativos_e_ordem():
+    indice = faq.IndiceFAQ([
+        {"pergunta": "Onde posso consultar minhas notas e faltas?", "resposta": "No Portal do Aluno."},
+        {"pergunta": "Como posso justificar uma falta?", "resposta": "Com atestado na secretaria."},
+    ])
+    assert indice.exata("como posso justificar falta") == 1
+    assert indice.exata("Quando posso justificar uma falta?") is None
+    assert indice.exata("Quando posso consultar minhas notas e faltas?") is None
+    assert indice.exata("Posso justificar como uma falta?") is None
+    # Na busca por relevância os interrogativos continuam sem peso
+    assert indice.buscar("Quando posso justificar uma falta?")[0][0] == 1
+
+
+def test_indice_so_e_reconstruido_quando_o_arquivo_muda(tmp_path):
+    caminho = str(tmp_path / "faq.json")
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(ITENS[:1], f)
+    primeiro = faq.obter_indice(caminho)
+    assert faq.obter_indice(caminho) is primeiro
+
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(ITENS, f)
+    os.utime(caminho, ns=(0, os.stat(caminho).st_mtime_ns + 1))
+    novo = faq.obter_indice(caminho)
+    assert novo is not primeiro
+    assert len(novo.itens) == 3
+
+
+def test_api_busca_faq(client):
+    resp = client.get('/api/faq/busca?q=biblioteca')
+    dados = resp.get_json()
+    assert dados['success']
+    assert 'biblioteca' in dados['resultados'][0]['pergunta'].lower()
+    assert client.get('/api/faq/busca?q=').status_code == 400
+
+
+def test_ask_responde_pergunta_do_faq_sem_chamar_o_llm(client):
+    pergunta = faq.obter_indice(CAMINHO_FAQ).itens[0]
+    chamadas = model.chamadas
+    resp = client.post('/ask', json={'pergunta': pergunta['pergunta']}).get_json()
+    assert resp['resposta'] == pergunta['resposta']
+    assert resp['fonte'] == 'faq'
+    assert model.chamadas == chamadas
+    with app.app_context():
+        assert ChatHistory.query.count() == 2
+
+    client.post('/ask', json={'pergunta': 'Me explique recursão'})
+    assert model.chamadas == chamadas + 1
+
@@ -0,0 +1,122 @@
+# =======================================================
+# TESTES – FEED DE MUDANÇAS DO CALENDÁRIO (SSE)
+# =======================================================
+
+import json
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app import dados_cursos, feed
+from lumi import feed_calendario
+
+
+@pytest.fixture
+def alunos():
+    return [{'username': 'med', 'email': 'med@teste.com', 'matricula': 'M1', 'curso': 'medicina'}]
+
+
+@pytest.fixture
+def client(client, tmp_path, monkeypatch):
+    # Os eventos vão para o calendário de um curso numa pasta temporária
+    (tmp_path / "medicina").mkdir()
+    monkeypatch.setattr(dados_cursos, "pasta_cursos", str(tmp_path))
+    monkeypatch.setattr(feed, "duracao", 0.3)
+    monkeypatch.setattr(feed, "batida", 0.1)
+    dados_cursos.reiniciar()
+    yield client
+    dados_cursos.reiniciar()
+
+
+def _eventos_sse(texto):
+    return [json.loads(bloco.split("data: ", 1)[1]) for bloco in texto.split("\n\n") if "event: mudanca" in bloco]
+
+
+def test_salvar_e_excluir_geram_versoes_e_o_stream_retoma(client):
+    criado = client.post('/save_calendar_event', json={'date': '2025-11-03', 'title': 'Prova de Anatomia'}).get_json()
+    assert criado['mudanca']['acao'] == 'added'
+    evento_id = criado['mudanca']['id']
+    editado = client.post('/save_calendar_event', json={'id': evento_id, 'date': '2025-11-04',
+                                                         'title': 'Prova de Anatomia'}).get_json()
+    assert editado['mudanca']['acao'] == 'updated'
+    assert editado['mudanca']['evento']['date'] == '2025-11-04'
+    removido = client.post('/delete_calendar_event', json={'id': evento_id}).get_json()['mudanca']
+    assert removido['acao'] == 'removed' and removido['evento'] is None
+
+    # Retomando depois da primeira: só as duas seguintes, em ordem
+    resposta = client.get('/api/calendario/mudancas',
+                          headers={'Last-Event-ID': str(criado['mudanca']['versao'])})
+    assert resposta.mimetype == 'text/event-stream'
+    recebidas = _eventos_sse(resposta.get_data(as_text=True))
+    assert [m['acao'] for m in recebidas] == ['updated', 'removed']
+    assert recebidas[-1]['versao'] == removido['versao'] == feed.versao_atual('medicina')
+    assert feed.versao_atual(None) == 0
+
+
+def test_stream_recebe_mudancas_ao_vivo_e_manda_recarregar(client, monkeypatch):
+    monkeypatch.setattr(feed, "duracao", 2)
+    assinada = threading.Event()
+    assinar = feed.broker.assinar
+    monkeypatch.setattr(feed.broker, "assinar", lambda canal: (assinar(canal), assinada.set())[0])
+
+    blocos = []
+    leitor = threading.Thread(target=lambda: blocos.extend(feed.transmitir('medicina', 0)))
+    leitor.start()
+    assert assinada.wait(2)
+    feed.registrar('medicina', 'added', 'e1', {'id': 'e1', 'data_inicio': '2025-12-01', 'descricao': 'Feriado'})
+    feed.registrar('outro-curso', 'added', 'e2', {'id': 'e2', 'data_inicio': '2025-12-02', 'descricao': 'X'})
+    leitor.join(5)
+    recebidas = _eventos_sse("".join(blocos))
+    assert [(m['id'], m['evento']['title']) for m in recebidas] == [('e1', 'Feriado')]
+
+    # Mudanças antigas já apagadas: o cliente precisa recarregar a página
+    monkeypatch.setattr(feed, "manter", 1)
+    for i in range(100):
+        feed.registrar('medicina', 'removed', f'x{i}')
+    mudancas, completo = feed.mudancas_desde('medicina', 1)
+    assert not completo and mudancas == []
+    texto = client.get('/api/calendario/mudancas?desde=1').get_data(as_text=True)
+    assert 'event: recarregar' in texto
+
+
+def test_mudanca_de_outro_worker_chega_na_batida_e_conexao_volta_sem_ler_o_corpo(client, monkeypatch):
+    monkeypatch.setattr(feed, "duracao", 2)
+    monkeypatch.setattr(feed, "conexoes", 1)
+    monkeypatch.setattr(feed, "_abertas", 0)
+    # Salva só no banco, sem publicar no BrokerLocal (como faria outro worker)
+    monkeypatch.setattr(feed.broker, "publicar", lambda canal, texto: None)
+    gerador = feed.transmitir('medicina', 0)
+    assert next(gerador) == "retry: 3000\n\n"
+    feed.registrar('medicina', 'added', 'e1', {'id': 'e1', 'data_inicio': '2025-12-01', 'descricao': 'Feriado'})
+    bloco = next(gerador)
+    gerador.close()
+    assert [m['id'] for m in _eventos_sse(bloco)] == ['e1']
+
+    # Resposta fechada antes do primeiro byte (HEAD, cliente que desistiu)
+    for abrir in (client.get, client.get, client.head):
+        resposta = abrir('/api/calendario/mudancas')
+        assert resposta.status_code == 200
+        resposta.close()
+    assert feed._abertas == 0
+
+
+def test_broker_resp_entrega_entre_processos():
+    servidor = feed_calendario.ServidorRESP(("127.0.0.1", 0))
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    url = "redis://127.0.0.1:%d" % servidor.server_address[1]
+    worker_a, worker_b = feed_calendario.criar_broker(url), feed_calendario.criar_broker(url)
+    try:
+        assinatura = worker_a.assinar(feed_calendario.canal('medicina'))
+        outra = worker_a.assinar(feed_calendario.canal(None))
+        assert worker_b.publicar(feed_calendario.canal('medicina'), '{"versao": 7}') == 1
+        assert assinatura.proxima(2) == '{"versao": 7}'
+        assert outra.proxima(0.1) is None
+    finally:
+        worker_a.encerrar()
+        worker_b.encerrar()
+        servidor.shutdown()
+        servidor.server_close()
@@ -0,0 +1,38 @@
+# =======================================================
+# TESTES – CACHE DE FRAGMENTOS E BYTECODE DOS TEMPLATES
+# =======================================================
+
+import os
+import sys
+from pathlib import Path
+
+from jinja2 import DictLoader, Environment
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app import app
+from lumi import fragmentos
+
+
+def test_fragmento_so_e_renderizado_quando_a_versao_muda():
+    ambiente = Environment(loader=DictLoader({
+        "pagina.html": '{% cache "lista", versao %}{{ itens|join(",") }}{% endcache %} | {{ usuario }}',
+    }), extensions=[fragmentos.ExtensaoFragmentos], autoescape=True)
+    template = ambiente.get_template("pagina.html")
+
+    assert template.render(itens=["a", "b"], versao=1, usuario="Ana") == "a,b | Ana"
+    # Mesma versão: o trecho vem do cache, o resto é renderizado por requisição
+    assert template.render(itens=["x"], versao=1, usuario="<Bia>") == "a,b | &lt;Bia&gt;"
+    assert template.render(itens=["x"], versao=2, usuario="Bia") == "x | Bia"
+
+
+def test_precompilar_grava_bytecode():
+    pasta = os.environ["LUMI_JINJA_CACHE_DIR"]
+    assert fragmentos.precompilar(app) >= 10
+    assert any(nome.endswith(".cache") for nome in os.listdir(pasta))
+
+
+def test_comando_templates_compile():
+    resultado = app.test_cli_runner().invoke(args=['templates-compile'])
+    assert resultado.exit_code == 0, resultado.output
+    assert "templates compilados" in resultado.output
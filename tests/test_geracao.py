@@ -0,0 +1,93 @@
+# =======================================================
+# TESTES – GERAÇÃO EM LOTE DE QUESTÕES E FLASHCARDS
+# =======================================================
+
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app import app
+from lumi import geracao
+
+
+def _linhas(arquivo):
+    return [json.loads(linha) for linha in arquivo.read_text(encoding="utf-8").splitlines()]
+
+
+def test_gera_valida_deduplica_e_retoma(tmp_path):
+    modelo = geracao.ModeloGeracaoFake()
+    falhar = ["Tipo: questoes\nDisciplina: Redes\nQuantidade: 5\nLote: 2\n"]
+
+    def instavel(prompt):
+        if any(prompt.startswith(p) for p in falhar):
+            raise RuntimeError("429 Too Many Requests")
+        return modelo.gerar(prompt)
+
+    lote = geracao.GeracaoLote(instavel, str(tmp_path), concorrencia=3, por_minuto=0, tentativas=2, espera_base=0)
+    tarefas = lote.tarefas(["Redes", "Banco de Dados"], lotes=2, por_pedido=5)
+    resumo = lote.rodar(tarefas)
+    # Cada lote do modelo local: 3 itens bons, 1 inválido e 1 repetido
+    assert resumo["falhas"] == 1
+    assert (resumo["aceitos"], resumo["invalidos"], resumo["duplicados"]) == (21, 7, 7)
+    assert "questoes:Redes:1" not in (tmp_path / "concluidas.txt").read_text(encoding="utf-8")
+
+    # Outra execução na mesma pasta: só a tarefa que falhou roda de novo
+    falhar.clear()
+    chamadas = modelo.chamadas
+    lote = geracao.GeracaoLote(instavel, str(tmp_path), por_minuto=0, espera_base=0)
+    resumo = lote.rodar(lote.tarefas(["Redes", "Banco de Dados"], lotes=2, por_pedido=5))
+    assert resumo["puladas"] == 7 and resumo["aceitos"] == 3 and modelo.chamadas == chamadas + 1
+
+    candidatos = _linhas(tmp_path / "candidatos.jsonl")
+    assert len(candidatos) == 24
+    questoes = [c["item"] for c in candidatos if c["tipo"] == "questoes"]
+    assert all(not geracao.validar_questao(q) for q in questoes)
+    assert len({q["id"] for q in questoes}) == len(questoes)
+    assert {q["id"].split("-IA-")[0] for q in questoes} == {"R", "BD"}
+
+
+def test_validacao_e_itens_parecidos_com_os_existentes(tmp_path):
+    existente = {
+        "id": "FCI-S1-Q1",
+        "stem": "Qual alternativa descreve corretamente o papel da base em um sistema de numeração?",
+        "options": {"A": "A base é a quantidade de símbolos do sistema", "B": "b", "C": "c", "D": "d", "E": "e"},
+        "correct": "A", "feedback": "A base define o alfabeto de dígitos.",
+    }
+    reescrita = dict(existente, stem="Qual alternativa descreve corretamente o papel da base num sistema de numeração?")
+    nova = dict(existente, stem="O que um escalonador de processos decide em um sistema operacional multitarefa?",
+                options={"A": "Qual processo usa a CPU e por quanto tempo", "B": "b", "C": "c", "D": "d", "E": "e"})
+    quatro = dict(nova, options={"A": "x", "B": "y", "C": "z", "D": "w"})
+
+    assert geracao.validar_questao(quatro) == ["alternativas ['A', 'B', 'C', 'D']: esperado A, B, C, D e E"]
+    assert geracao.validar_questao(dict(nova, feedback=" ")) == ["feedback ausente"]
+    assert geracao.extrair_itens('```json\n{"itens": [{"pergunta": "p"}]}\n```') == [{"pergunta": "p"}]
+
+    resposta = json.dumps([reescrita, nova, quatro])
+    lote = geracao.GeracaoLote(lambda prompt: resposta, str(tmp_path), por_minuto=0)
+    lote.conhecer("questoes", "Fundamentos de Computação", [existente])
+    resumo = lote.rodar([geracao.Tarefa("questoes", "Fundamentos de Computação", 0, 3)])
+    assert (resumo["aceitos"], resumo["duplicados"], resumo["invalidos"]) == (1, 1, 1)
+    motivos = [r["motivo"] for r in _linhas(tmp_path / "rejeitados.jsonl")]
+    assert motivos[0].startswith("duplicado") and "papel da base" in motivos[0]
+
+
+def test_limite_de_pedidos_por_minuto():
+    limite = geracao.LimiteTaxa(por_minuto=1200)  # um a cada 50 ms
+    inicio = time.monotonic()
+    for _ in range(5):
+        limite.aguardar()
+    assert time.monotonic() - inicio >= 0.19
+
+
+def test_cli_roda_de_ponta_a_ponta_com_o_modelo_local(tmp_path):
+    saida = tmp_path / "geracao"
+    resultado = app.test_cli_runner().invoke(args=[
+        "llm-gerar", "--disciplina", "Redes de Computadores", "--lotes", "1", "--por-minuto", "0",
+        "--saida", str(saida),
+    ])
+    assert resultado.exit_code == 0, resultado.output
+    assert "6 candidato(s) novo(s)" in resultado.output
+    assert {c["tipo"] for c in _linhas(saida / "candidatos.jsonl")} == {"questoes", "flashcards"}
@@ -0,0 +1,75 @@
+# =======================================================
+# TESTES – GRADE DE HORÁRIOS
+# =======================================================
+
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app import carregar_grade, carregar_matriz
+from lumi import catalogo, horarios
+
+
+def _grade(*disciplinas):
+    return horarios.GradeHorarios([catalogo.Periodo("1º", [catalogo.Disciplina(*d) for d in disciplinas], [], [])])
+
+
+def test_interpreta_dias_e_horarios_em_texto_livre():
+    assert horarios.interpretar_dia("Segunda-feira") == 0
+    assert horarios.interpretar_dia("sábado") == 5
+    assert horarios.interpretar_horario("19h às 20h40") == (19 * 60, 20 * 60 + 40)
+    assert horarios.interpretar_horario("19:00 - 22:40") == (19 * 60, 22 * 60 + 40)
+    assert horarios.interpretar_horario("indeterminado") is None
+    assert horarios.interpretar_hora("20h30") == 20 * 60 + 30
+
+
+def test_aula_agora_proxima_e_sala_livre():
+    grade = _grade(
+        ("Cálculo", "Ana", "Segunda-feira", "19h às 20h40", "H103"),
+        ("Redes", "Bia", "Segunda-feira", "21h às 22h40", "H103"),
+        ("Dados", "Caio", "Quarta-feira", "19h às 22h40", "H104"),
+        ("Leitura", "Davi", "Sábado", "indeterminado", "Online via AVA"),
+    )
+    segunda_1930 = datetime(2025, 10, 20, 19, 30)
+    assert [a.disciplina.nome for a in grade.em_andamento(segunda_1930)] == ["Cálculo"]
+    aula, inicio = grade.proxima(segunda_1930, "1º")
+    assert aula.disciplina.nome == "Redes" and inicio == datetime(2025, 10, 20, 21, 0)
+    # Depois da última aula da semana volta para a segunda seguinte
+    aula, inicio = grade.proxima(datetime(2025, 10, 24, 23, 0))
+    assert aula.disciplina.nome == "Cálculo" and inicio == datetime(2025, 10, 27, 19, 0)
+
+    assert not grade.sala_livre("h103", 0, 20 * 60)
+    assert grade.sala_livre("H103", 0, 20 * 60 + 40, 21 * 60)
+    assert not grade.sala_livre("H103", 0, 20 * 60, 21 * 60 + 30)
+    assert [a.disciplina.nome for a in grade.sem_horario] == ["Leitura"]
+
+
+def test_conflitos_entre_disciplinas():
+    grade = _grade(
+        ("Cálculo", "Ana", "Segunda-feira", "19h às 22h40", "H103"),
+        ("Redes", "Bia", "Segunda-feira", "21h às 22h40", "H104"),
+        ("Dados", "Caio", "Segunda-feira", "22h40 às 23h", "H104"),
+    )
+    pares = grade.conflitos_periodo("1")
+    assert [(a.disciplina.nome, b.disciplina.nome) for a, b in pares] == [("Cálculo", "Redes")]
+
+
+def test_grade_so_e_refeita_quando_a_matriz_muda():
+    assert carregar_grade() is carregar_grade()
+    assert carregar_grade() is horarios.obter_grade(carregar_matriz())
+
+
+def test_apis_de_horarios(client):
+    resp = client.get('/api/horarios/agora?periodo=1º&momento=2025-10-20T19:30').get_json()
+    assert resp['agora'][0]['inicio'] == '19:00'
+    assert resp['proxima']['inicia_em'] == '2025-10-20T21:00'
+
+    resp = client.get('/api/horarios/sala?sala=H103&dia=domingo&hora=20h').get_json()
+    assert resp['livre'] is True
+    assert client.get('/api/horarios/sala?sala=H103&dia=segunda&hora=25h').status_code == 400
+
+    resp = client.get('/api/horarios/conflitos?periodo=2').get_json()
+    assert resp['success'] and all(a['dia'] == b['dia'] for a, b in resp['conflitos'])
+    assert client.get('/api/horarios/conflitos?disciplina=Inexistente').status_code == 400
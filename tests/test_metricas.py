@@ -0,0 +1,99 @@
+# =======================================================
+# TESTES – MÉTRICAS E PROFILING
+# =======================================================
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app import app, db, CAMINHO_FLASHCARDS
+from lumi import catalogo, metricas
+
+
+def test_server_timing_quebra_fases(client):
+    # Força a releitura do JSON (os decks ficam em cache até o arquivo mudar)
+    catalogo.invalidar(CAMINHO_FLASHCARDS)
+    response = client.get('/flashcards')
+    assert response.status_code == 200
+    timing = response.headers['Server-Timing']
+    assert 'db;dur=' in timing
+    assert 'json;dur=' in timing
+    assert 'template;dur=' in timing
+    assert 'total;dur=' in timing
+
+
+def test_metrics_exporta_histograma_por_rota(client, monkeypatch):
+    client.get('/faq')
+    monkeypatch.delenv("LUMI_METRICS_TOKEN", raising=False)
+    assert client.get('/metrics').status_code == 403
+    monkeypatch.setenv("LUMI_METRICS_TOKEN", "segredo")
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer segrede'}).status_code == 401
+    texto = client.get('/metrics', headers={'Authorization': 'Bearer segredo'}).get_data(as_text=True)
+    assert '# TYPE lumi_request_duration_seconds histogram' in texto
+    assert 'lumi_request_duration_seconds_count{route="/faq",method="GET"}' in texto
+    assert 'lumi_request_phase_seconds_bucket{route="/faq",phase="template",le="+Inf"}' in texto
+
+
+def test_consulta_com_erro_nao_deixa_inicio_na_conexao(client):
+    with app.app_context(), db.engine.connect() as conexao:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conexao.exec_driver_sql("SELECT * FROM tabela_que_nao_existe")
+            conexao.rollback()
+        assert conexao.info["_lumi_inicio_query"] == []
+
+
+def test_amostrador_gera_pilhas_folded(tmp_path):
+    import threading
+    import time
+
+    amostrador = metricas.AmostradorPilhas(threading.get_ident(), intervalo=0.001)
+    amostrador.iniciar()
+    fim = time.perf_counter() + 0.05
+    while time.perf_counter() < fim:
+        sum(range(1000))
+    amostrador.parar()
+    destino = tmp_path / 'perfil.folded'
+    amostrador.salvar(destino)
+    linhas = destino.read_text(encoding='utf-8').splitlines()
+    assert linhas
+    pilha, contagem = linhas[0].rsplit(' ', 1)
+    assert 'test_amostrador_gera_pilhas_folded' in pilha
+    assert int(contagem) >= 1
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="precisa de fork")
+def test_metrics_soma_os_arquivos_de_todos_os_processos(tmp_path):
+    registro = metricas.Registro()
+    pedidos = registro.contador("x_total", "Pedidos.", ("rota",))
+    abertos = registro.gauge("x_abertos", "Abertos agora.")
+    duracao = registro.histograma("x_seconds", "Duração.", buckets=(0.1, 1.0))
+    arquivos = metricas.ArquivosMetricas(registro, str(tmp_path), intervalo=0)
+    pedidos.inc("/a")
+    abertos.definir(valor=2)
+    duracao.observar(0.05)
+
+    # Dois workers: cada um só conta o que fez depois do fork e grava o próprio arquivo
+    for _ in range(2):
+        pid = os.fork()
+        if pid == 0:
+            arquivos.reiniciar()
+            pedidos.inc("/a", valor=3)
+            abertos.definir(valor=1)
+            duracao.observar(0.5)
+            arquivos.gravar()
+            os._exit(0)
+        os.waitpid(pid, 0)
+
+    texto = registro.exportar(arquivos.coletar())
+    assert 'x_total{rota="/a"} 7' in texto
+    assert 'x_abertos 2' in texto  # gauges de processos que terminaram não contam
+    assert 'x_seconds_count 3' in texto
+    assert 'x_seconds_bucket{le="0.1"} 1' in texto
+    assert len(list(tmp_path.glob("*.json"))) == 3
@@ -0,0 +1,64 @@
+# =======================================================
+# TESTES – MODO DE PRODUÇÃO (gunicorn com preload)
+# =======================================================
+
+import os
+import runpy
+import sys
+from pathlib import Path
+
+import pytest
+
+RAIZ = Path(__file__).resolve().parents[1]
+sys.path.append(str(RAIZ))
+
+from app import app, db, reiniciar_pos_fork
+from lumi import estaticos, registro
+
+
+def test_configuracao_do_gunicorn(monkeypatch, tmp_path):
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    monkeypatch.setenv("LUMI_METRICS_DIR", str(tmp_path))
+    monkeypatch.delenv("LUMI_PRELOAD", raising=False)
+    conf = runpy.run_path(str(RAIZ / "gunicorn.conf.py"))
+    assert conf["preload_app"] is True
+    assert conf["workers"] == 3
+    assert conf["worker_class"] == "gthread"
+    assert callable(conf["post_worker_init"])
+    assert conf["pasta_metricas_temporaria"] is False  # a pasta informada nunca é apagada
+
+
+def test_sem_preload_o_mestre_gera_os_estaticos(monkeypatch, tmp_path):
+    monkeypatch.setenv("LUMI_METRICS_DIR", str(tmp_path))
+    monkeypatch.setenv("LUMI_PRELOAD", "0")
+    monkeypatch.setenv("LUMI_ASSETS", "auto")
+    construidas = []
+    monkeypatch.setattr(estaticos, "construir_manifesto", construidas.append)
+    conf = runpy.run_path(str(RAIZ / "gunicorn.conf.py"))
+    conf["on_starting"](None)
+    assert construidas == [str(RAIZ / "static")]
+    assert os.environ["LUMI_ASSETS"] == "manifesto"  # os workers só leem o manifesto
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="precisa de fork")
+def test_worker_apos_fork_responde_e_registra_log():
+    with app.app_context():
+        db.create_all()
+    leitura, escrita = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # worker
+        status = 1
+        try:
+            listener_mestre = registro._listener
+            reiniciar_pos_fork()
+            resposta = app.test_client().get('/login')
+            if resposta.status_code == 200 and registro._listener is not listener_mestre:
+                status = 0
+        finally:
+            os.write(escrita, bytes([status]))
+            os._exit(0)
+    os.close(escrita)
+    with os.fdopen(leitura, "rb") as entrada:
+        status = entrada.read()
+    os.waitpid(pid, 0)
+    assert status == b"\x00"
@@ -0,0 +1,73 @@
+# =======================================================
+# TESTES – LOGGING ESTRUTURADO E ROTATIVO
+# =======================================================
+
+import gzip
+import json
+import logging
+import logging.handlers
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from lumi import registro
+
+
+def _registro(nome, msg, args=(), **extra):
+    record = logging.LogRecord(nome, logging.INFO, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_formatador_json_inclui_campos_e_remove_ansi():
+    record = _registro("lumi.acesso", "\x1b[36mGET /ask\x1b[0m", route="/ask", user_id="7", latency_ms=3.2)
+    dados = json.loads(registro.FormatadorJSON().format(record))
+    assert dados["msg"] == "GET /ask"
+    assert dados["route"] == "/ask"
+    assert dados["user_id"] == "7"
+    assert dados["latency_ms"] == 3.2
+
+
+def test_filtro_descarta_acesso_do_werkzeug():
+    filtro = registro.FiltroAcessoWerkzeug()
+    acesso = _registro("werkzeug", '127.0.0.1 - - [14/Dec/2025] "%s" 304 -', ("GET /static/style.css HTTP/1.1",))
+    aviso = _registro("werkzeug", "Running on http://127.0.0.1:5000")
+    assert not filtro.filter(acesso)
+    assert filtro.filter(aviso)
+    assert filtro.filter(_registro("lumi.acesso", "GET / 200"))
+
+
+def test_rotacao_por_tamanho_comprime_arquivo_antigo(tmp_path):
+    arquivo = tmp_path / "lumi.log"
+    handler = registro.criar_handler_arquivo(str(arquivo), max_bytes=200, backups=2)
+    try:
+        for i in range(10):
+            handler.emit(_registro("lumi", f"mensagem {i} " + "x" * 40))
+    finally:
+        handler.close()
+    rotacionado = tmp_path / "lumi.log.1.gz"
+    assert rotacionado.exists()
+    linhas = gzip.decompress(rotacionado.read_bytes()).decode("utf-8").splitlines()
+    assert all(json.loads(linha)["logger"] == "lumi" for linha in linhas)
+
+
+def test_workers_gravam_cada_um_no_proprio_arquivo(tmp_path, monkeypatch):
+    arquivo = str(tmp_path / "lumi.log")
+    assert registro.arquivo_do_processo(arquivo, 4321) == str(tmp_path / "lumi.4321.log")
+    try:
+        registro.configurar_logging(arquivo, por_processo=True)
+        logging.getLogger("lumi.teste").warning("do worker")
+        registro.parar_logging()
+        assert not (tmp_path / "lumi.log").exists()
+        (linha,) = Path(registro.arquivo_do_processo(arquivo)).read_text(encoding="utf-8").splitlines()
+        assert json.loads(linha)["msg"] == "do worker"
+
+        # Rotação externa: mesmo arquivo para todos, reaberto quando o logrotate o troca
+        monkeypatch.setenv("LUMI_LOG_ROTACAO", "externa")
+        listener = registro.configurar_logging(arquivo, por_processo=True)
+        assert isinstance(listener.handlers[0], logging.handlers.WatchedFileHandler)
+        assert listener.handlers[0].baseFilename == arquivo
+    finally:
+        monkeypatch.delenv("LUMI_LOG_ROTACAO")
+        registro.configurar_logging()
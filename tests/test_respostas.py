@@ -0,0 +1,71 @@
+# =======================================================
+# TESTES – ETAG, 304 E COMPRESSÃO
+# =======================================================
+
+import gzip
+import sys
+from pathlib import Path
+
+from sqlalchemy import event
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import app as lumi_app
+from app import app, db, User, UserFlashcard
+
+
+def test_simulador_config_sem_gabarito_e_304_sem_executar_a_view(client, monkeypatch):
+    resp = client.get('/api/simulador_config')
+    questao = resp.get_json()['data']['pools'][0]['questions'][0]
+    assert 'correct' not in questao and 'feedback' not in questao
+    assert questao['options']
+    etag = resp.headers['ETag']
+    assert resp.headers['Cache-Control'] == 'private, no-cache'
+
+    def falhar():
+        raise AssertionError("a view não deveria rodar")
+
+    monkeypatch.setattr(lumi_app, 'carregar_banco_questoes', falhar)
+    resp = client.get('/api/simulador_config', headers={'If-None-Match': etag})
+    assert resp.status_code == 304
+    assert resp.data == b''
+
+
+def test_resposta_comprimida_com_etag_proprio(client):
+    resp = client.get('/calendario', headers={'Accept-Encoding': 'gzip'})
+    assert resp.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in resp.headers['Vary']
+    assert b'initialEvents' in gzip.decompress(resp.data)
+    etag = resp.headers['ETag']
+    assert etag.endswith('-gzip"')
+
+    resp = client.get('/calendario', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert resp.status_code == 304
+    # Respostas pequenas não são comprimidas
+    assert 'Content-Encoding' not in client.get('/api/faq/busca?q=xyzw', headers={'Accept-Encoding': 'gzip'}).headers
+
+
+def test_etag_da_pagina_muda_com_os_dados_do_aluno(client):
+    etag = client.get('/flashcards').headers['ETag']
+    assert client.get('/flashcards', headers={'If-None-Match': etag}).status_code == 304
+
+    with app.app_context():
+        user = User.query.filter_by(email='aluno@teste.com').first()
+        db.session.add(UserFlashcard(user_id=user.id, materia='FMC', pergunta='P?', resposta='R'))
+        db.session.commit()
+    resp = client.get('/flashcards', headers={'If-None-Match': etag})
+    assert resp.status_code == 200
+    assert resp.headers['ETag'] != etag
+
+    # A versão vem de um agregado: o 304 não lê o texto dos cartões
+    consultas = []
+    with app.app_context():
+        motor = db.engine
+    ouvir = lambda conn, cursor, sql, *args: consultas.append(sql)
+    event.listen(motor, "before_cursor_execute", ouvir)
+    try:
+        novo = client.get('/flashcards', headers={'If-None-Match': resp.headers['ETag']})
+    finally:
+        event.remove(motor, "before_cursor_execute", ouvir)
+    assert novo.status_code == 304
+    assert not any('pergunta' in sql for sql in consultas)
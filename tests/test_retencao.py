@@ -0,0 +1,79 @@
+# =======================================================
+# TESTES – RETENÇÃO, ARQUIVO E LIMPEZA DO CHAT
+# =======================================================
+
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app import (
+    app, db, User, ChatHistory, ChatArquivo, ChatLimpeza, salvar_mensagem_no_banco, servico_retencao,
+)
+
+
+def _aluno():
+    with app.app_context():
+        return User.query.filter_by(email='aluno@teste.com').one().id
+
+
+def _conversa(user_id, dias_atras, textos):
+    with app.app_context():
+        for texto in textos:
+            salvar_mensagem_no_banco(user_id, 'user', texto)
+        if dias_atras:
+            ChatHistory.query.filter(ChatHistory.content.in_(textos)).update(
+                {"timestamp": datetime.utcnow() - timedelta(days=dias_atras)}
+            )
+            db.session.commit()
+
+
+def test_mensagens_antigas_vao_para_o_arquivo_e_continuam_legiveis(client, monkeypatch):
+    aluno = _aluno()
+    antigas = [f'pergunta antiga sobre cálculo {i}' for i in range(5)]
+    _conversa(aluno, 400, antigas)
+    _conversa(aluno, 0, ['pergunta recente sobre cálculo'])
+    monkeypatch.setattr(servico_retencao, 'lote', 2)
+
+    with app.app_context():
+        assert servico_retencao.arquivar() == 5
+        assert [m.content for m in ChatHistory.query.all()] == ['pergunta recente sobre cálculo']
+        assert ChatArquivo.query.count() == 3  # lotes de 2 + 2 + 1
+        assert servico_retencao.arquivar() == 0
+
+    # Fora da tabela quente: a busca só acha a recente
+    assert len(client.get('/api/chat/busca?q=calculo').get_json()['resultados']) == 1
+
+    arquivos = client.get('/api/chat/arquivo').get_json()['arquivos']
+    assert [a['mensagens'] for a in arquivos] == [2, 2, 1]
+    lidas = [
+        m['content']
+        for a in arquivos
+        for m in client.get(f"/api/chat/arquivo/{a['id']}").get_json()['mensagens']
+    ]
+    assert lidas == antigas
+    assert client.get('/api/chat/arquivo/9999').status_code == 404
+
+
+def test_limpar_esconde_na_hora_e_apaga_em_segundo_plano(client, monkeypatch):
+    aluno = _aluno()
+    _conversa(aluno, 0, ['mensagem sobre redes', 'outra sobre redes'])
+    _conversa(aluno, 400, ['bem antiga sobre redes'])
+    with app.app_context():
+        servico_retencao.arquivar()
+
+    # Com a thread ligada, o /limpar só marca e acorda a thread
+    monkeypatch.setattr(servico_retencao, 'intervalo', 60)
+    acordou = []
+    monkeypatch.setattr(servico_retencao, 'acordar', lambda: acordou.append(True))
+    client.get('/limpar')
+    assert acordou
+
+    assert client.get('/api/chat/busca?q=redes').get_json()['resultados'] == []
+    assert client.get('/api/chat/arquivo').get_json()['arquivos'] == []
+    with app.app_context():
+        assert ChatHistory.query.count() == 3  # 2 antigas ainda na tabela + boas-vindas
+        assert servico_retencao.apagar_limpezas() == 2
+        assert [m.role for m in ChatHistory.query.all()] == ['model']
+        assert ChatLimpeza.query.count() == 0
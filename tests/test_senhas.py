@@ -0,0 +1,84 @@
+# =======================================================
+# TESTES – POOL DE SENHAS E CADASTRO EM LOTE
+# =======================================================
+
+import csv
+import sys
+from pathlib import Path
+
+import pytest
+from werkzeug.security import check_password_hash
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app import app, User
+from lumi import senhas
+
+
+def test_pool_de_processos_gera_e_confere_hashes():
+    pool = senhas.PoolSenhas(processos=1, fila=2)
+    try:
+        hash_senha = pool.gerar_hash("segredo")
+        assert check_password_hash(hash_senha, "segredo")
+        assert pool.verificar(hash_senha, "segredo") is True
+        assert pool.verificar(hash_senha, "outra") is False
+    finally:
+        pool.encerrar()
+
+
+def test_fila_cheia_recusa_o_pedido():
+    pool = senhas.PoolSenhas(processos=1, fila=1, espera=0.01)
+    pool._vagas.acquire()  # a única vaga ocupada
+    with pytest.raises(senhas.ErroFilaSenhas):
+        pool.gerar_hash("segredo")
+
+
+def test_hashes_em_lote_mantem_a_ordem():
+    hashes = senhas.gerar_hashes([f"senha{i}" for i in range(20)], processos=2, bloco=4)
+    assert [check_password_hash(h, f"senha{i}") for i, h in enumerate(hashes)] == [True] * 20
+
+
+@pytest.fixture
+def alunos():
+    return [{'username': 'Antigo', 'email': 'antigo@teste.com', 'matricula': 'A0', 'cpf': '111.111.111-11'}]
+
+
+def test_importar_csv(banco, tmp_path):
+    arquivo = tmp_path / "alunos.csv"
+    arquivo.write_text(
+        "Matrícula;E-mail;CPF;Nome\n"
+        "M1;m1@teste.com;222.222.222-22;Ana\n"
+        "M2;m2@teste.com;;\n"
+        "A0;outro@teste.com;;\n"            # matrícula já cadastrada
+        "M3;sem-arroba;;\n"                 # e-mail inválido
+        "M1;m1b@teste.com;;\n"              # repetida no arquivo
+        "M4;m4@teste.com;22222222222;\n"    # mesmo CPF de M1, sem pontuação
+        "M5;m5@teste.com;111 111 111 11;\n",  # CPF já cadastrado com pontuação
+        encoding="utf-8",
+    )
+    credenciais = tmp_path / "senhas.csv"
+    runner = app.test_cli_runner()
+
+    resultado = runner.invoke(args=["users-import", str(arquivo)])
+    assert resultado.exit_code != 0 and "--credenciais" in resultado.output
+
+    resultado = runner.invoke(args=["users-import", str(arquivo), "--credenciais", str(credenciais),
+                                    "--processos", "1"])
+    assert resultado.exit_code == 0, resultado.output
+    assert "2 aluno(s) cadastrado(s)" in resultado.output
+    assert "linha 7: cpf repetido no arquivo: '22222222222'" in resultado.output
+    assert "linha 8: cpf já cadastrado: '11111111111'" in resultado.output
+
+    with open(credenciais, encoding="utf-8") as f:
+        linhas = {linha["matricula"]: linha for linha in csv.DictReader(f)}
+    assert set(linhas) == {"M1", "M2"}
+    with app.app_context():
+        ana = User.query.filter_by(matricula="M1").one()
+        assert ana.username == "Ana" and ana.cpf == "22222222222"
+        assert ana.check_password(linhas["M1"]["senha"])
+        assert User.query.filter_by(matricula="M2").one().username == "M2"
+        assert User.query.count() == 3
+
+    # Rodar de novo não duplica ninguém
+    resultado = runner.invoke(args=["users-import", str(arquivo), "--credenciais", str(credenciais)])
+    assert "0 aluno(s) novo(s)" in resultado.output
@@ -0,0 +1,164 @@
+# =======================================================
+# TESTES – TELEMETRIA DE ESTUDO
+# =======================================================
+
+import http.cookiejar
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from pathlib import Path
+
+import pytest
+from werkzeug.serving import make_server
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app import app, db, EventoEstudo, EstudoDiario, coletor
+
+RAIZ = Path(__file__).resolve().parents[1]
+
+# Roda static/js/simulador.js no Node com um DOM mínimo e o fetch apontando
+# para o servidor de teste, clicando como o aluno faria na página
+PAGINA_SIMULADOR = r"""
+const fs = require("fs"), vm = require("vm");
+class Elemento {
+    constructor() {
+        this.filhos = []; this.ouvintes = {}; this.style = {}; this.textContent = ""; this.value = "";
+        const classes = new Set();
+        this.classList = { add: c => classes.add(c), remove: c => classes.delete(c),
+                           toggle: c => classes.has(c) ? classes.delete(c) : classes.add(c) };
+    }
+    set innerHTML(html) { this._html = html; if (html === "") this.filhos = []; }
+    get innerHTML() { return this._html || ""; }
+    appendChild(filho) { this.filhos.push(filho); return filho; }
+    setAttribute() {}
+    addEventListener(tipo, f) { (this.ouvintes[tipo] ||= []).push(f); }
+    async disparar(tipo) { for (const f of this.ouvintes[tipo] || []) await f({}); }
+}
+const elementos = {};
+const el = id => elementos[id] ||= new Elemento();
+const document = {
+    addEventListener: (tipo, f) => { document.pronto = f; },
+    querySelector: () => null, getElementById: el, createElement: () => new Elemento(),
+};
+const alertas = [];
+const contexto = {
+    document, console, alertas, window: { scrollTo() {} },
+    alert: m => alertas.push(m), confirm: () => true, setInterval: () => 0, clearInterval() {},
+    fetch: (url, opcoes = {}) => fetch(process.env.LUMI_BASE + url,
+        { ...opcoes, headers: { ...(opcoes.headers || {}), Cookie: process.env.LUMI_COOKIE } }),
+};
+vm.runInNewContext(fs.readFileSync(process.env.LUMI_SCRIPT, "utf8"), contexto);
+(async () => {
+    el("num-questoes").value = "3"; el("tempo-prova").value = "10"; el("disciplina").value = "todas";
+    document.pronto();
+    await el("start-btn").disparar("click");
+    for (let i = 0; i < 3; i++) {
+        await el("alternativas-box").filhos[0].filhos[0].disparar("change");  // marca a alternativa A
+        if (i < 2) await el("next-btn").disparar("click");
+    }
+    await el("finish-btn").disparar("click");
+    for (let i = 0; i < 100 && el("resumo-total").textContent === ""; i++) await new Promise(r => setTimeout(r, 50));
+    console.log(JSON.stringify({
+        corretas: el("resumo-corretas").textContent, total: el("resumo-total").textContent,
+        itens: el("lista-gabarito").filhos.length, alertas,
+    }));
+})();
+"""
+
+
+def _agora_ms():
+    return int(time.time() * 1000)
+
+
+def test_lote_vira_eventos_e_totais_do_dia(client):
+    t = _agora_ms()
+    resp = client.post('/api/telemetria', json={'eventos': [
+        {'tipo': 'foco', 't': t, 'segundos': 1500, 'concluida': True},
+        {'tipo': 'foco', 't': t, 'segundos': 300},
+        {'tipo': 'flashcard', 't': t},
+        {'tipo': 'flashcard', 't': t},
+        {'tipo': 'simulador', 't': t},           # só o servidor registra
+        {'tipo': 'foco', 't': t, 'segundos': -5},
+        {'tipo': 'foco', 't': 0, 'segundos': 60},  # antigo demais
+    ]})
+    assert resp.status_code == 202
+    assert resp.get_json() == {'success': True, 'aceitos': 4, 'recusados': 3}
+
+    # Um segundo lote soma no mesmo dia (UPSERT incremental)
+    client.post('/api/telemetria', json={'eventos': [{'tipo': 'foco', 't': t, 'segundos': 200}]})
+    with app.app_context():
+        assert EventoEstudo.query.count() == 5
+        (dia,) = EstudoDiario.query.all()
+        assert (dia.segundos_foco, dia.sessoes_foco, dia.sessoes_concluidas) == (2000, 3, 1)
+        assert dia.flashcards_revisados == 2
+
+
+def test_lote_invalido_e_recusado(client):
+    assert client.post('/api/telemetria', data='nada', content_type='text/plain').status_code == 400
+    eventos = [{'tipo': 'flashcard', 't': _agora_ms()}] * 201
+    assert client.post('/api/telemetria', json={'eventos': eventos}).status_code == 400
+
+
+def test_resumo_le_totais_incluindo_simulador(client):
+    client.post('/simulador/iniciar', json={'quantidade': 4})
+    client.post('/simulador/resultado', json={'respostas': {}})
+    client.post('/api/telemetria', json={'eventos': [{'tipo': 'foco', 't': _agora_ms(), 'segundos': 600}]})
+
+    resp = client.get('/api/estudo/resumo?dias=3').get_json()
+    assert len(resp['dias']) == 3
+    hoje = resp['dias'][-1]
+    assert (hoje['segundos_foco'], hoje['simulados'], hoje['questoes']) == (600, 1, 4)
+    assert resp['total']['segundos_foco'] == 600
+
+
+def test_reconstruir_diario_bate_com_o_incremental(client):
+    t = _agora_ms()
+    client.post('/api/telemetria', json={'eventos': [
+        {'tipo': 'foco', 't': t, 'segundos': 120, 'concluida': True},
+        {'tipo': 'flashcard', 't': t - 86_400_000},
+    ]})
+    with app.app_context():
+        def totais():
+            return sorted(
+                (d.dia, d.segundos_foco, d.sessoes_concluidas, d.flashcards_revisados)
+                for d in EstudoDiario.query.all()
+            )
+        incremental = totais()
+        with db.engine.begin() as conexao:
+            assert coletor.reconstruir_diario(conexao) == 2
+        db.session.expire_all()
+        assert totais() == incremental
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="Node.js não instalado")
+def test_pagina_do_simulador_corrige_no_servidor_e_registra_a_tentativa(client):
+    servidor = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{servidor.server_port}"
+    try:
+        cookies = http.cookiejar.CookieJar()
+        navegador = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(cookies))
+        navegador.open(base + "/login", urllib.parse.urlencode(
+            {"login_identifier": "aluno@teste.com", "password": "123456"}).encode())
+        saida = subprocess.run(
+            ["node", "-e", PAGINA_SIMULADOR],
+            env=dict(os.environ, LUMI_BASE=base, LUMI_SCRIPT=str(RAIZ / "static" / "js" / "simulador.js"),
+                     LUMI_COOKIE="; ".join(f"{c.name}={c.value}" for c in cookies)),
+            capture_output=True, text=True, timeout=30,
+        )
+    finally:
+        servidor.shutdown()
+    assert saida.returncode == 0, saida.stderr
+    pagina = json.loads(saida.stdout.strip().splitlines()[-1])
+    assert pagina["alertas"] == [] and pagina["total"] == 3 and pagina["itens"] == 3
+
+    with app.app_context():
+        (tentativa,) = EventoEstudo.query.all()
+        assert (tentativa.valor, tentativa.extra) == (pagina["corretas"], 3)
@@ -0,0 +1,135 @@
+# =======================================================
+# TESTES – UPLOAD DE FOTO DE PERFIL
+# =======================================================
+
+import io
+import sys
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import app as lumi_app
+from lumi import uploads
+
+
+def _png(cor="red", tamanho=(800, 600), exif=False):
+    imagem = Image.new("RGB", tamanho, cor)
+    buffer = io.BytesIO()
+    if exif:
+        dados_exif = Image.Exif()
+        dados_exif[0x010F] = "CameraSecreta"  # Make
+        imagem.save(buffer, "JPEG", exif=dados_exif)
+    else:
+        imagem.save(buffer, "PNG")
+    buffer.seek(0)
+    return buffer
+
+
+def test_detecta_tipo_pelos_magic_bytes():
+    assert uploads.detectar_tipo(b"\x89PNG\r\n\x1a\n....") == "png"
+    assert uploads.detectar_tipo(b"\xff\xd8\xff\xe0") == "jpeg"
+    assert uploads.detectar_tipo(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == "webp"
+    assert uploads.detectar_tipo(b"<?php echo 1; ?>") is None
+
+
+def test_recusa_arquivo_que_nao_e_imagem(tmp_path):
+    processador = uploads.ProcessadorUploads(str(tmp_path))
+    with pytest.raises(uploads.ErroUpload):
+        processador.enviar(io.BytesIO(b"<html>nao sou png</html>"))
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_recusa_na_requisicao_imagem_truncada(tmp_path):
+    processador = uploads.ProcessadorUploads(str(tmp_path), pasta_tmp=str(tmp_path / "tmp"))
+    (tmp_path / "tmp").mkdir()
+    completa = _png(tamanho=(300, 300)).getvalue()
+    with pytest.raises(uploads.ErroUpload, match="corrompida"):
+        processador.enviar(io.BytesIO(completa[: len(completa) // 2]))
+    assert [p.name for p in tmp_path.iterdir()] == ["tmp"]
+    assert list((tmp_path / "tmp").iterdir()) == []
+
+
+def test_gera_webp_quadrado_sem_metadados_e_deduplica(tmp_path):
+    processador = uploads.ProcessadorUploads(str(tmp_path))
+    nome = processador.enviar(_png(exif=True))
+    processador.aguardar(nome)
+
+    assert nome.endswith("-256.webp")
+    with Image.open(tmp_path / nome) as imagem:
+        assert imagem.format == "WEBP"
+        assert imagem.size == (256, 256)
+        assert not imagem.getexif()
+    assert (tmp_path / nome.replace("-256", "-64")).exists()
+
+    # Mesmo conteúdo -> mesmo nome, sem reprocessar nem duplicar arquivos
+    assert processador.enviar(_png(exif=True)) == nome
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+@pytest.fixture
+def alunos():
+    return [{'username': 'Foto', 'email': 'foto@teste.com', 'matricula': 'F1'}]
+
+
+def _avatar_salvo():
+    with lumi_app.app.app_context():
+        return lumi_app.User.query.filter_by(email='foto@teste.com').one().profile_image
+
+
+def test_rota_profile_usa_pipeline(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(lumi_app.processador_uploads, "pasta", str(tmp_path))
+    resp = client.post('/profile', data={
+        'nome': 'Foto', 'email': 'foto@teste.com',
+        'profile_pic': (_png("blue"), 'avatar.png'),
+    }, content_type='multipart/form-data')
+    assert resp.status_code == 302
+    nome = _avatar_salvo()
+    lumi_app.processador_uploads.aguardar(nome)
+    assert (tmp_path / nome).exists()
+
+
+def test_falha_no_processamento_mantem_o_avatar_anterior(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(lumi_app.processador_uploads, "pasta", str(tmp_path))
+
+    def quebrar(*args):
+        raise OSError("disco cheio")
+
+    monkeypatch.setattr(uploads, "gerar_avatares", quebrar)
+    client.post('/profile', data={
+        'nome': 'Foto', 'email': 'foto@teste.com',
+        'profile_pic': (_png("green"), 'avatar.png'),
+    }, content_type='multipart/form-data')
+    for pendente in list(lumi_app.processador_uploads._pendentes):
+        lumi_app.processador_uploads.aguardar(pendente)
+    assert _avatar_salvo() == 'lumi-2.png'
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_remover_respeita_reserva_e_uso_verificados_sob_o_lock(tmp_path):
+    processador = uploads.ProcessadorUploads(str(tmp_path))
+    nome = processador.enviar(_png("purple"))
+    processador.aguardar(nome)
+
+    # Outro aluno recebeu o mesmo avatar deduplicado e ainda não gravou no banco
+    assert processador.enviar(_png("purple")) == nome
+    processador.liberar(nome)
+    assert processador.remover(nome) is False
+    assert (tmp_path / nome).exists()
+
+    processador.liberar(nome)
+    verificados = []
+
+    def em_uso(n):
+        assert processador._lock.locked()
+        verificados.append(n)
+        return True
+
+    assert processador.remover(nome, em_uso=em_uso) is False
+    assert verificados == [nome]
+    assert (tmp_path / nome).exists()
+
+    assert processador.remover(nome, em_uso=lambda n: False) is True
+    assert list(tmp_path.iterdir()) == []
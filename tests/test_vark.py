@@ -0,0 +1,135 @@
+# =======================================================
+# TESTES – RESULTADOS VARK E AGREGADOS POR TURMA
+# =======================================================
+
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app import app, db, User, VarkCoorte, turmas_vark
+
+
+@pytest.fixture
+def alunos():
+    return [{'username': f'aluno{i}', 'email': f'aluno{i}@teste.com', 'matricula': f'M{i}', 'curso': curso}
+            for i, curso in enumerate(['medicina', 'medicina', 'medicina', 'direito'])]
+
+
+@pytest.fixture
+def logado():
+    return None
+
+
+@pytest.fixture
+def client(client, monkeypatch):
+    monkeypatch.setattr(turmas_vark, "minimo", 2)
+    monkeypatch.delenv("LUMI_PAINEL_TOKEN", raising=False)
+    turmas_vark.reiniciar()
+    yield client
+    turmas_vark.reiniciar()
+
+
+def _salvar(client, i, pontos):
+    client.post('/login', data={'login_identifier': f'aluno{i}@teste.com', 'password': '123456'})
+    resposta = client.post('/save_vark_result', json={'scores': pontos, 'primaryType': 'X'})
+    client.get('/logout')
+    return resposta
+
+
+def _coortes():
+    with app.app_context():
+        return {
+            (c.curso, c.periodo): (c.alunos, c.soma_v, c.soma_k, c.tipo_v, c.tipo_k, c.multimodal)
+            for c in VarkCoorte.query.all()
+        }
+
+
+def test_salvar_atualiza_turma_e_refazer_nao_conta_duas_vezes(client):
+    periodo = turmas_vark.periodo_atual()
+    assert _salvar(client, 0, {'V': 8, 'A': 2, 'R': 3, 'K': 1}).status_code == 200
+    assert _salvar(client, 1, {'V': 4, 'A': 2, 'R': 3, 'K': 4}).status_code == 200
+    assert _coortes() == {('medicina', periodo): (2, 12, 5, 1, 0, 1)}
+
+    # Refez o quiz: sai o resultado anterior, entra o novo
+    _salvar(client, 0, {'V': 1, 'A': 2, 'R': 3, 'K': 9})
+    assert _coortes() == {('medicina', periodo): (2, 5, 13, 0, 1, 1)}
+    with app.app_context():
+        assert json.loads(db.session.get(User, 1).vark_scores_json)['K'] == 9
+
+    # Resultado de um período anterior migra para a turma do período atual
+    with app.app_context():
+        turmas_vark.registrar(db.session, 3, 'medicina', {'V': 5, 'A': 1, 'R': 1, 'K': 1},
+                              momento=datetime(2024, 3, 10))
+        db.session.commit()
+    assert _coortes()[('medicina', '2024.1')][0] == 1
+    _salvar(client, 2, {'V': 5, 'A': 5, 'R': 1, 'K': 1})
+    assert _coortes()[('medicina', '2024.1')][0] == 0
+    assert _coortes()[('medicina', periodo)][0] == 3
+
+    assert _salvar(client, 3, {'V': -1, 'A': 2, 'R': 3, 'K': 4}).status_code == 400
+
+
+def test_rota_usa_cache_etag_token_e_esconde_turmas_pequenas(client, monkeypatch):
+    for i, pontos in enumerate([{'V': 8, 'A': 2, 'R': 3, 'K': 1}, {'V': 6, 'A': 2, 'R': 3, 'K': 1},
+                                {'V': 1, 'A': 2, 'R': 3, 'K': 9}, {'V': 1, 'A': 9, 'R': 3, 'K': 1}]):
+        _salvar(client, i, pontos)
+
+    # Só os painéis com o token leem os agregados, nem com login de aluno
+    client.post('/login', data={'login_identifier': 'aluno0@teste.com', 'password': '123456'})
+    assert client.get('/api/vark/turmas').status_code == 403  # sem LUMI_PAINEL_TOKEN
+    monkeypatch.setenv("LUMI_PAINEL_TOKEN", "segredo")
+    assert client.get('/api/vark/turmas').status_code == 401
+    assert client.get('/api/vark/turmas', headers={'Authorization': 'Bearer errado'}).status_code == 401
+    client.get('/logout')
+
+    painel = {'Authorization': 'Bearer segredo'}
+    resposta = client.get('/api/vark/turmas', headers=painel)
+    dados = resposta.get_json()
+    assert [t['curso'] for t in dados['turmas']] == ['medicina']  # direito tem um aluno só
+    assert dados['ocultas'] == 1 and dados['total']['alunos'] == 3
+    assert dados['turmas'][0]['media']['V'] == 5.0
+    assert dados['turmas'][0]['tipos'] == {'V': 2, 'A': 0, 'R': 0, 'K': 1, 'multimodal': 0}
+    assert client.get('/api/vark/turmas?curso=direito', headers=painel).get_json()['turmas'] == []
+
+    etag = resposta.headers['ETag']
+    assert client.get('/api/vark/turmas', headers={**painel, 'If-None-Match': etag}).status_code == 304
+
+
+def test_rebuild_copia_resultados_antigos_e_confere_com_os_incrementais(client):
+    _salvar(client, 0, {'V': 8, 'A': 2, 'R': 3, 'K': 1})
+    _salvar(client, 1, {'V': 4, 'A': 2, 'R': 3, 'K': 4})
+    incrementais = _coortes()
+    with app.app_context():
+        antigo = db.session.get(User, 4)  # salvou antes das colunas existirem
+        antigo.vark_scores_json = json.dumps({'V': 1, 'A': 7, 'R': 2, 'K': 2})
+        db.session.commit()
+
+    resultado = app.test_cli_runner().invoke(args=['vark-rebuild', '--periodo', '2024.2'])
+    assert resultado.exit_code == 0, resultado.output
+    assert "1 resultado(s) antigo(s) copiado(s); 2 turma(s)" in resultado.output
+    refeitas = _coortes()
+    assert refeitas.pop(('direito', '2024.2'))[0] == 1
+    assert refeitas == incrementais
+
+
+def test_envio_duplo_do_primeiro_resultado_vira_atualizacao(client, monkeypatch):
+    periodo = turmas_vark.periodo_atual()
+    assert _salvar(client, 0, {'V': 8, 'A': 2, 'R': 3, 'K': 1}).status_code == 200
+
+    # O segundo envio leu antes do primeiro gravar: não há resultado anterior
+    anterior = turmas_vark._anterior
+    leituras = []
+
+    def atrasado(sessao, user_id):
+        leituras.append(user_id)
+        return None if len(leituras) == 1 else anterior(sessao, user_id)
+
+    monkeypatch.setattr(turmas_vark, "_anterior", atrasado)
+    assert _salvar(client, 0, {'V': 1, 'A': 2, 'R': 3, 'K': 9}).status_code == 200
+    assert leituras == [1, 1]
+    assert _coortes() == {('medicina', periodo): (1, 1, 9, 0, 1, 0)}
@@ -0,0 +1,15 @@
+# =======================================================
+# PONTO DE ENTRADA DE PRODUÇÃO
+# =======================================================
+# gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Com preload_app (padrão em gunicorn.conf.py) este módulo é importado uma
+# única vez no processo mestre: catálogo, FAQ e CONTEXTO_INICIAL são montados
+# antes do fork e compartilhados (copy-on-write) por todos os workers, assim
+# como os templates, compilados aqui (ou lidos do bytecode em instance/).
+# =======================================================
+
+from app import app
+from lumi import fragmentos
+
+fragmentos.precompilar(app)